@@ -5,7 +5,6 @@ M-FastGate v0.2.0 管理接口
 from datetime import datetime, timedelta
 from typing import List, Optional
 import uuid
-import json
 import io
 import csv
 import httpx
@@ -20,6 +19,17 @@ from ..database import get_db
 from ..middleware.auth import verify_admin_token
 from ..services.key_manager import KeyManager
 from ..services.audit_service import AuditService
+from ..services.audit_writer import audit_writer
+from ..services.metrics import gateway_metrics
+from ..services.route_table import route_table
+from ..services.load_balancer import load_balancer
+from ..services.upstream_health import upstream_health
+from ..services.circuit_breaker import circuit_breaker
+from ..services.retry_budget import retry_budget
+from ..services.hedging import hedge_policy
+from ..services.single_flight import single_flight
+from ..services.response_cache import response_cache
+from ..services.embedding_batcher import embedding_batcher
 from ..models.api_key import APIKeyCreate, APIKeyUpdate, APIKeyResponse, APIKeyDB
 from ..models.proxy_route import (
     ProxyRouteCreate, ProxyRouteDB, ProxyRouteUpdate, ProxyRouteResponse,
@@ -27,6 +37,7 @@ from ..models.proxy_route import (
 )
 from ..models.audit_log import AuditLogResponse, AuditLogDB, china_tz
 from ..config import settings
+from ..utils import jsoncodec
 
 router = APIRouter()
 
@@ -163,10 +174,22 @@ async def create_proxy_route(
         "target_host": route_dict["target_host"],
         "target_path": route_dict["target_path"],
         "target_protocol": route_dict["target_protocol"],
+        "target_hosts": list_to_json(route_dict.get("target_hosts")),
+        "lb_strategy": route_dict["lb_strategy"],
+        "lb_hash_key": route_dict.get("lb_hash_key"),
         "strip_path_prefix": route_dict["strip_path_prefix"],
         "add_headers": dict_to_json(route_dict.get("add_headers")),
         "add_body_fields": dict_to_json(route_dict.get("add_body_fields")),
         "remove_headers": list_to_json(route_dict.get("remove_headers")),
+        "stream_mode": route_dict["stream_mode"],
+        "batch_mode": route_dict["batch_mode"],
+        "hedge_enabled": route_dict["hedge_enabled"],
+        "hedge_delay_ms": route_dict.get("hedge_delay_ms"),
+        "coalesce_enabled": route_dict["coalesce_enabled"],
+        "cache_enabled": route_dict["cache_enabled"],
+        "cache_ttl": route_dict.get("cache_ttl"),
+        "cache_max_entry_bytes": route_dict.get("cache_max_entry_bytes"),
+        "cache_key_fields": list_to_json(route_dict.get("cache_key_fields")),
         "timeout": route_dict["timeout"],
         "retry_count": route_dict["retry_count"],
         "is_active": route_dict["is_active"],
@@ -180,6 +203,7 @@ async def create_proxy_route(
     db.add(db_route)
     db.commit()
     db.refresh(db_route)
+    route_table.invalidate()
     
     # 转换为响应格式
     return convert_db_route_to_response(db_route)
@@ -247,7 +271,7 @@ async def update_proxy_route(
         if field in ["match_headers", "add_headers", "match_body_schema", "add_body_fields"]:
             # 字典类型字段转换为JSON字符串
             setattr(route, field, dict_to_json(value) if value is not None else None)
-        elif field == "remove_headers":
+        elif field in ["remove_headers", "target_hosts", "cache_key_fields"]:
             # 列表类型字段转换为JSON字符串
             setattr(route, field, list_to_json(value) if value is not None else None)
         else:
@@ -257,6 +281,8 @@ async def update_proxy_route(
     route.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(route)
+    route_table.invalidate()
+    response_cache.invalidate_route(route_id)
     
     return convert_db_route_to_response(route)
 
@@ -270,8 +296,8 @@ def convert_db_route_to_response(db_route: 'ProxyRouteDB') -> ProxyRouteResponse
         if not json_str:
             return default
         try:
-            return json.loads(json_str)
-        except (json.JSONDecodeError, TypeError):
+            return jsoncodec.loads(json_str)
+        except (jsoncodec.JSONDecodeError, TypeError):
             return default
     
     return ProxyRouteResponse(
@@ -285,10 +311,22 @@ def convert_db_route_to_response(db_route: 'ProxyRouteDB') -> ProxyRouteResponse
         target_host=db_route.target_host,
         target_path=db_route.target_path,
         target_protocol=db_route.target_protocol,
+        target_hosts=safe_json_parse(db_route.target_hosts),
+        lb_strategy=db_route.lb_strategy or 'round_robin',
+        lb_hash_key=db_route.lb_hash_key,
         strip_path_prefix=db_route.strip_path_prefix,
         add_headers=safe_json_parse(db_route.add_headers),
         add_body_fields=safe_json_parse(db_route.add_body_fields),
         remove_headers=safe_json_parse(db_route.remove_headers, []),
+        stream_mode=db_route.stream_mode or 'audit',
+        batch_mode=db_route.batch_mode or 'none',
+        hedge_enabled=bool(db_route.hedge_enabled),
+        hedge_delay_ms=db_route.hedge_delay_ms,
+        coalesce_enabled=bool(db_route.coalesce_enabled),
+        cache_enabled=bool(db_route.cache_enabled),
+        cache_ttl=db_route.cache_ttl,
+        cache_max_entry_bytes=db_route.cache_max_entry_bytes,
+        cache_key_fields=safe_json_parse(db_route.cache_key_fields),
         timeout=db_route.timeout,
         retry_count=db_route.retry_count,
         is_active=db_route.is_active,
@@ -316,6 +354,8 @@ async def delete_proxy_route(
     
     db.delete(route)
     db.commit()
+    route_table.invalidate()
+    response_cache.invalidate_route(route_id)
     
     return {"message": "Proxy route deleted successfully"}
 
@@ -341,6 +381,7 @@ async def toggle_proxy_route(
     route.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(route)
+    route_table.invalidate()
     
     return {"message": f"Route {'enabled' if route.is_active else 'disabled'} successfully"}
 
@@ -420,14 +461,14 @@ async def test_proxy_route(
         # 应用请求头转换
         processed_headers = test_headers.copy()
         if route.add_headers:
-            add_headers = json.loads(route.add_headers) if isinstance(route.add_headers, str) else route.add_headers
+            add_headers = jsoncodec.loads(route.add_headers) if isinstance(route.add_headers, str) else route.add_headers
             processed_headers.update(add_headers)
             test_result["test_result"]["headers_applied"] = True
         
         # 应用请求体转换
         processed_body = test_body.copy()
         if route.add_body_fields:
-            add_body_fields = json.loads(route.add_body_fields) if isinstance(route.add_body_fields, str) else route.add_body_fields
+            add_body_fields = jsoncodec.loads(route.add_body_fields) if isinstance(route.add_body_fields, str) else route.add_body_fields
             processed_body.update(add_body_fields)
             test_result["test_result"]["body_modified"] = True
         
@@ -571,7 +612,7 @@ async def export_audit_logs(
     
     elif format == "json":
         return StreamingResponse(
-            io.BytesIO(json.dumps(logs, ensure_ascii=False, indent=2).encode("utf-8")),
+            io.BytesIO(jsoncodec.dumpb(logs, indent=True)),
             media_type="application/json",
             headers={"Content-Disposition": "attachment; filename=audit_logs.json"}
         )
@@ -660,22 +701,51 @@ async def get_metrics(
     for status_code, count in status_stats:
         status_distribution[str(status_code)] = count
     
+    # P95 与每分钟请求数来自进程内指标（自本进程启动以来 / 最近60秒）
+    p95_seconds = gateway_metrics.request_duration.quantile(0.95)
+    
     return {
         "total_requests": total_requests,
         "total_errors": total_errors,
         "success_rate": round(success_rate, 2),
         "average_response_time": round(avg_response_time, 2) if avg_response_time else 0,
-        "p95_response_time": 0,  # TODO: 实现P95计算
-        "requests_per_minute": 0,  # TODO: 实现每分钟请求数
+        "p95_response_time": round((p95_seconds or 0) * 1000, 2),
+        "requests_per_minute": gateway_metrics.request_rate.total(),
         "active_api_keys": active_keys,
         "active_routes": active_routes,
         "top_paths": [{"path": path, "count": count} for path, count in top_paths],
         "top_source_paths": [{"source_path": source_path, "count": count} for source_path, count in top_source_paths],
         "top_api_keys": [{"source_path": path, "count": count} for path, count in top_api_keys],
-        "status_distribution": status_distribution
+        "status_distribution": status_distribution,
+        "audit_queue": audit_writer.stats(),
+        "retry_budget": retry_budget.stats(),
+        "hedging": hedge_policy.stats(),
+        "coalescing": single_flight.stats(),
+        "response_cache": response_cache.stats(),
+        "embedding_batch": embedding_batcher.stats()
     }
 
 
+@router.get("/upstreams/health")
+async def get_upstream_health(
+    token: str = Depends(verify_admin_token)
+):
+    """
+    获取上游主机健康状态（被动摘除、主动探测、在途请求数）
+    """
+    return upstream_health.stats(in_flight=load_balancer.in_flight)
+
+
+@router.get("/upstreams/circuits")
+async def get_upstream_circuits(
+    token: str = Depends(verify_admin_token)
+):
+    """
+    获取上游主机熔断状态（滚动窗口失败率、熔断剩余时间、拒绝次数）
+    """
+    return circuit_breaker.stats()
+
+
 @router.get("/metrics/hourly")
 async def get_hourly_metrics(
     hours: int = Query(24, ge=1, le=168, description="获取最近多少小时的数据"),
@@ -4,26 +4,290 @@ M-FastGate v0.2.0 统一代理接口
 
 import time
 from datetime import datetime
+from typing import Any, Dict, Optional, Set, Tuple
+from urllib.parse import urlsplit
+import httpx
 from fastapi import APIRouter, Request, HTTPException, Depends
 from fastapi.responses import StreamingResponse, Response
-from sqlalchemy.orm import Session
-from ..database import get_db
 from ..middleware.auth import api_key_auth, get_source_path, get_client_ip
-from ..services.proxy_engine import ProxyEngine
+from ..services.proxy_engine import get_proxy_engine, StreamedBody
+from ..services.body_view import JSONBodyView, body_schema_keys
 from ..services.route_matcher import RouteMatcher
+from ..services.route_table import route_table
 from ..services.audit_service import AuditService
+from ..services.metrics import gateway_metrics, observe_stream_response
+from ..services.rate_limiter import rate_limiter, RateLimitResult
+from ..services.single_flight import single_flight
+from ..services.embedding_batcher import embedding_batcher
+from ..services.response_cache import (
+    response_cache, split_key_fields, CachedResponse, HIT, MISS, STALE, REVALIDATED
+)
 from ..models.api_key import APIKeyResponse
 from ..models.audit_log import generate_request_id
 from ..config import settings
+from ..utils import jsoncodec
 
 router = APIRouter()
 
+# 客户端条件请求头（合并的上游请求不转发）
+CONDITIONAL_HEADERS = ("if-none-match", "if-modified-since")
+# 304 响应不携带的实体头
+_ENTITY_HEADERS = ("content-length", "content-encoding", "transfer-encoding")
+
+
+def _should_stream_body(headers, candidates) -> bool:
+    """
+    判断请求体是否可以边读边转发：候选路由都不检查、不改写请求体，
+    且请求体不是 JSON 或 JSON 超过 json_min_bytes（小 JSON 仍需解析以识别 stream 参数）
+    
+    Args:
+        headers: 请求头
+        candidates: 前缀树筛出的候选路由
+        
+    Returns:
+        bool: 是否使用流式请求体
+    """
+    config = settings.proxy.get('stream_request_body', {})
+    if not config.get('enabled', True):
+        return False
+    
+    content_type = headers.get("content-type", "")
+    if not content_type:
+        return False
+    
+    if any(route.get("match_body_schema") or route.get("add_body_fields") for route in candidates):
+        return False
+    
+    if "application/json" not in content_type:
+        return True
+    
+    try:
+        content_length = int(headers.get("content-length", ""))
+    except ValueError:
+        return False
+    return content_length >= config.get('json_min_bytes', 1048576)
+
+
+def _routing_body_keys(candidates) -> Optional[Set[str]]:
+    """
+    路由匹配需要的请求体顶层字段（含用于识别流式请求的 stream）
+    
+    Args:
+        candidates: 前缀树筛出的候选路由
+        
+    Returns:
+        Optional[Set[str]]: 字段集合，存在需要完整结构的 match_body_schema 时返回 None
+    """
+    keys = {"stream"}
+    for route in candidates:
+        schema = route.get("match_body_schema")
+        if not schema:
+            continue
+        route_keys = route["_body_keys"] if "_body_keys" in route else body_schema_keys(schema)
+        if route_keys is None:
+            return None
+        keys |= route_keys
+    return keys
+
+
+def _coalesce_key(request, route_match, target_url, body_view, request_body, api_key_info,
+                  vary=None) -> Optional[str]:
+    """
+    非流式请求的合并键（路由未开启请求合并时返回 None）
+    
+    Args:
+        request: 客户端请求
+        route_match: 匹配的路由
+        target_url: 目标URL
+        body_view: JSON 请求体视图
+        request_body: 非 JSON 请求体
+        api_key_info: 调用方 API Key 信息
+        vary: 转发给上游的条件请求头（缓存重新校验时），取值不同的请求不合并
+        
+    Returns:
+        Optional[str]: 合并键
+    """
+    if not route_match.get("coalesce_enabled"):
+        return None
+    
+    if body_view is not None:
+        try:
+            body = body_view.parsed()
+        except jsoncodec.JSONDecodeError:
+            body = body_view.raw
+        body_size = body_view.size
+    else:
+        body = request_body
+        body_size = len(request_body or b"")
+    return single_flight.make_key(
+        request.method, route_match.get("route_id"), _target_path(target_url), body, body_size,
+        api_key=api_key_info.key_value, source_path=api_key_info.source_path, vary=vary
+    )
+
+
+def _cache_key(request, route_match, target_url, body_view, request_body) -> Optional[str]:
+    """
+    非流式请求的响应缓存键（路由未开启响应缓存时返回 None）
+    
+    Args:
+        request: 客户端请求
+        route_match: 匹配的路由
+        target_url: 目标URL
+        body_view: JSON 请求体视图
+        request_body: 非 JSON 请求体
+        
+    Returns:
+        Optional[str]: 缓存键
+    """
+    if not route_match.get("cache_enabled"):
+        return None
+    
+    body, body_fields = request_body, None
+    if body_view is not None:
+        key_fields = route_match.get("_cache_key_fields") or split_key_fields(route_match.get("cache_key_fields"))
+        if key_fields[0]:
+            body_fields = body_view.extract(key_fields[0])
+        else:
+            try:
+                body = body_view.parsed()
+            except jsoncodec.JSONDecodeError:
+                body = body_view.raw
+    return response_cache.make_key(
+        route_match, request.method, _target_path(target_url), request.headers, body, body_fields
+    )
+
+
+async def _forward_embedding_batch(proxy_engine, route_match, method, target_url, headers,
+                                   request_body, on_response_headers=None) -> Optional[httpx.Response]:
+    """
+    batch_mode 为 embeddings 的路由：加入 embedding 合批，等待拆分后的响应
+    
+    Args:
+        proxy_engine: 代理引擎
+        route_match: 匹配的路由
+        method: HTTP方法
+        target_url: 目标URL
+        headers: 转发请求头
+        request_body: 请求体（已注入路由字段）
+        on_response_headers: 收到上游响应头时的回调（只对发起合批请求的调用方生效）
+        
+    Returns:
+        Optional[httpx.Response]: 拆分后的响应，路由未开启合批或请求不适合合批时返回 None
+    """
+    if route_match.get("batch_mode") != "embeddings" or method != "POST" or request_body is None:
+        return None
+    try:
+        body = request_body if isinstance(request_body, dict) else jsoncodec.loads(request_body)
+    except jsoncodec.JSONDecodeError:
+        return None
+    if not isinstance(body, dict) or body.get("stream"):
+        return None
+    
+    async def send(batch_body, batch_headers):
+        response = await proxy_engine.forward_request(
+            route_config=route_match,
+            method=method,
+            url=target_url,
+            headers=batch_headers,
+            json=batch_body,
+            is_stream_request=False,
+            on_response_headers=on_response_headers
+        )
+        await response.aread()
+        return response
+    
+    return await embedding_batcher.submit(route_match, _target_path(target_url), headers, body, send)
+
+
+def _target_path(target_url: str) -> str:
+    """目标URL的路径和查询字符串（不含主机，负载均衡到不同目标的相同请求得到相同的值）"""
+    parts = urlsplit(target_url)
+    return f"{parts.path}?{parts.query}" if parts.query else parts.path
+
+
+def _cached_response(entry: CachedResponse, headers) -> Tuple[httpx.Response, Any]:
+    """
+    由缓存条目构造响应，客户端 If-None-Match 与条目 ETag 一致时返回 304
+    
+    Args:
+        entry: 缓存条目
+        headers: 客户端请求头
+        
+    Returns:
+        Tuple[httpx.Response, Any]: (只含状态码和响应头的响应对象, 响应体)，
+        磁盘缓存命中时响应体为映射文件的 memoryview，不复制
+    """
+    if response_cache.not_modified(entry, headers):
+        return httpx.Response(304, headers=entry.headers), b""
+    return httpx.Response(entry.status_code, headers=entry.headers), entry.body
+
+
+def _strip_conditional_headers(headers: Dict[str, str]) -> Dict[str, str]:
+    """
+    去掉客户端的条件请求头（合并的上游请求不能带某个客户端自己的校验器，
+    否则该客户端拿到的 304 会被共享给没有缓存的其他客户端）
+    """
+    return {name: value for name, value in headers.items() if name.lower() not in CONDITIONAL_HEADERS}
+
+
+def _shared_response(route_match, response: httpx.Response, headers) -> Tuple[httpx.Response, Any]:
+    """
+    按当前客户端的 If-None-Match 处理合并请求共享的上游响应，ETag 一致时返回 304
+    
+    Args:
+        route_match: 匹配的路由
+        response: 共享的上游响应（已读取响应体）
+        headers: 当前客户端请求头
+        
+    Returns:
+        Tuple[httpx.Response, Any]: (响应对象, 响应体)，未命中条件时响应体为 None（使用响应对象自身的内容）
+    """
+    if response.status_code != 200 or not headers.get("if-none-match"):
+        return response, None
+    shared = CachedResponse(
+        route_match.get("route_id"), response.status_code,
+        {name: value for name, value in response.headers.items() if name.lower() not in _ENTITY_HEADERS},
+        response.content, 0, 0
+    )
+    if not response_cache.not_modified(shared, headers):
+        return response, None
+    return _cached_response(shared, headers)
+
+
+async def _check_rate_limit(audit_service, api_key_info, route_match,
+                            audit_record: Dict[str, Any]) -> Optional[RateLimitResult]:
+    """
+    限流检查（API Key / source_path / 路由 / 全局），超限时记录审计后返回 429
+    
+    Args:
+        audit_service: 审计服务
+        api_key_info: 调用方 API Key 信息
+        route_match: 匹配的路由
+        audit_record: 超限时写入的请求开始审计记录
+        
+    Returns:
+        Optional[RateLimitResult]: 限流检查结果，未开启限流时返回 None
+        
+    Raises:
+        HTTPException: 超过限流配额（429）
+    """
+    rate_limit = await rate_limiter.check(api_key_info, route_match)
+    if rate_limit is not None and not rate_limit.allowed:
+        detail = f"Rate limit exceeded ({rate_limit.scope})"
+        await audit_service.log_request_start(audit_record)
+        await audit_service.log_request_complete(audit_record["request_id"], {
+            "status_code": 429,
+            "response_time": datetime.now(),
+            "error_message": detail
+        })
+        raise HTTPException(status_code=429, detail=detail, headers=rate_limit.headers())
+    return rate_limit
+
 
 @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "HEAD", "OPTIONS"])
 async def universal_proxy(
     path: str,
     request: Request,
-    db: Session = Depends(get_db),
     api_key_info: APIKeyResponse = Depends(api_key_auth)
 ):
     """
@@ -39,76 +303,79 @@ async def universal_proxy(
     
     # 初始化服务
     route_matcher = RouteMatcher()
-    proxy_engine = ProxyEngine()
+    proxy_engine = get_proxy_engine()
     audit_service = AuditService()
+    request_metrics = gateway_metrics.start_request("unmatched", request.method)
+    request_body = None
+    body_view = None
+    streamed_body = None
+    
+    def unforwarded_audit_record() -> Dict[str, Any]:
+        """未转发到上游的请求（未匹配路由、被限流）的审计记录"""
+        return {
+            "request_id": request_id,
+            "api_key": api_key_info.key_value,
+            "source_path": source_path,
+            "path": request_path,
+            "method": request.method,
+            "ip_address": client_ip,
+            "request_time": datetime.fromtimestamp(start_time),
+            "user_agent": request.headers.get("user-agent", ""),
+            "request_headers": dict(request.headers),
+            "request_body": body_view.audit_text() if body_view is not None else None
+        }
     
     try:
-        # 获取请求体（如果存在）
-        request_body = None
-        if request.method in ["POST", "PUT", "PATCH"]:
-            content_type = request.headers.get("content-type", "")
-            if "application/json" in content_type:
-                request_body = await request.json()
-            elif content_type:
-                request_body = await request.body()
-        
-        # 获取所有活跃的代理路由
-        from ..models.proxy_route import ProxyRouteDB
-        routes = db.query(ProxyRouteDB).filter(ProxyRouteDB.is_active == True).all()
-        
-        # 转换为字典格式
-        route_dicts = []
-        for route in routes:
-            route_dict = {
-                "route_id": route.route_id,
-                "route_name": route.route_name,
-                "description": route.description,
-                "match_path": route.match_path,
-                "match_method": route.match_method,
-                "match_headers": route.match_headers,
-                "match_body_schema": route.match_body_schema,
-                "target_host": route.target_host,
-                "target_path": route.target_path,
-                "target_protocol": route.target_protocol,
-                "strip_path_prefix": route.strip_path_prefix,
-                "add_headers": route.add_headers,
-                "add_body_fields": route.add_body_fields,
-                "remove_headers": route.remove_headers,
-                "timeout": route.timeout,
-                "retry_count": route.retry_count,
-                "is_active": route.is_active,
-                "priority": route.priority
-            }
-            route_dicts.append(route_dict)
+        # 获取内存中的路由表快照（已排序、已预解析），前缀树候选路由只依赖路径和方法
+        snapshot = await route_table.get_snapshot()
+        candidates = snapshot.candidates(request_path, request.method)
         
         # 构建请求信息
         request_info = {
             "path": request_path,
             "method": request.method,
             "headers": dict(request.headers),
-            "body": request_body if isinstance(request_body, dict) else {}
+            "body": {}
         }
         
-        # 路由匹配
-        route_match = route_matcher.find_matching_route(request_info, route_dicts)
+        # 候选路由都不校验请求体时，读取请求体之前先匹配路由并做限流检查，被限流的请求不读取请求体
+        route_match = None
+        rate_limit = None
+        matched_before_body = not any(route.get("match_body_schema") for route in candidates)
+        if matched_before_body:
+            route_match = route_matcher.find_matching_route(request_info, candidates, presorted=True)
+            if route_match:
+                request_metrics.route = route_match.get("route_id")
+                rate_limit = await _check_rate_limit(audit_service, api_key_info, route_match,
+                                                     unforwarded_audit_record())
+        
+        # 获取请求体（如果存在）：候选路由都不检查、不改写请求体时边读边转发；
+        # JSON 请求体只提取路由需要的顶层字段，不做完整解析
+        if request.method in ["POST", "PUT", "PATCH"]:
+            content_type = request.headers.get("content-type", "")
+            if _should_stream_body(request.headers, candidates):
+                streamed_body = StreamedBody(
+                    request.stream(),
+                    settings.proxy.get('stream_request_body', {}).get('audit_prefix_bytes', 4096)
+                )
+            elif "application/json" in content_type:
+                body_view = JSONBodyView(await request.body())
+            elif content_type:
+                request_body = await request.body()
+        
+        body_fields = body_view.extract(_routing_body_keys(candidates)) if body_view is not None else {}
+        
+        # 路由匹配：先由前缀树索引筛出候选路由，再做请求头和请求体校验
+        if not matched_before_body:
+            request_info["body"] = body_fields
+            route_match = route_matcher.find_matching_route(request_info, candidates, presorted=True)
         
         # 临时调试：打印路由匹配结果
         print(f"DEBUG: Route match result: {route_match}")
         
         if not route_match:
             # 记录未匹配的审计日志（异步）
-            await audit_service.log_request_start({
-                "request_id": request_id,
-                "api_key": api_key_info.key_value,
-                "source_path": source_path,
-                "path": request_path,
-                "method": request.method,
-                "ip_address": client_ip,
-                "request_time": datetime.fromtimestamp(start_time),
-                "user_agent": request.headers.get("user-agent", ""),
-                "request_headers": dict(request.headers),
-                "request_body": request_body if isinstance(request_body, dict) else None
-            })
+            await audit_service.log_request_start(unforwarded_audit_record())
             
             await audit_service.log_request_complete(request_id, {
                 "status_code": 404,
@@ -121,13 +388,31 @@ async def universal_proxy(
                 detail="No matching route configuration found"
             )
         
+        if not matched_before_body:
+            request_metrics.route = route_match.get("route_id")
+            rate_limit = await _check_rate_limit(audit_service, api_key_info, route_match,
+                                                 unforwarded_audit_record())
+        
         # 构建目标URL
-        target_url = proxy_engine.build_target_url(route_match, request_path)
+        target_url = proxy_engine.build_target_url(
+            route_match, request_path, api_key=api_key_info.key_value, headers=request.headers
+        )
         
 
         # 临时打印调试信息
         print(f"DEBUG: original_path={request_path}, target_url={target_url}, route_id={route_match.get('route_id')}")
         
+        # 注入字段时按字节拼接，只有与已有键冲突时才完整解析并重新序列化；不改写时原样转发原始字节
+        if body_view is not None:
+            request_body = body_view.raw
+            add_body_fields = route_match.get("add_body_fields")
+            if isinstance(add_body_fields, dict) and add_body_fields:
+                spliced = body_view.with_fields(add_body_fields, route_match.get("_body_fields_fragment"))
+                if spliced is not None:
+                    request_body = spliced
+                elif isinstance(body_view.parsed(), dict):
+                    request_body = body_view.parsed()
+        
         # 异步记录请求开始（不等待，不阻塞）
         await audit_service.log_request_start({
             "request_id": request_id,
@@ -140,13 +425,32 @@ async def universal_proxy(
             "request_time": datetime.fromtimestamp(start_time),
             "user_agent": request.headers.get("user-agent", ""),
             "request_headers": dict(request.headers),
-            "request_body": request_body if isinstance(request_body, dict) else None,
-            "request_size": len(str(request_body)) if request_body else 0
+            "request_body": body_view.audit_text() if body_view is not None else None,
+            "request_size": body_view.size if body_view is not None else len(request_body or b"")
         })
         
+        # 流式请求体：收到上游响应头后再按响应类型决定流式转发或读取完整响应
+        if streamed_body is not None:
+            response = await proxy_engine.forward_streamed_body(
+                route_config=route_match,
+                method=request.method,
+                url=target_url,
+                body=streamed_body,
+                headers=dict(request.headers)
+            )
+            request_metrics.first_byte()
+            if proxy_engine.is_stream_response(response):
+                result = proxy_engine.relay_streamed_body_response(
+                    response, streamed_body, audit_service=audit_service, request_id=request_id
+                )
+                result = observe_stream_response(result, request_metrics)
+                if rate_limit is not None:
+                    result.headers.update(rate_limit.headers())
+                return result
+        
         # 预判断是否为流式请求
         is_likely_stream = False
-        if isinstance(request_body, dict) and request_body.get("stream") is True:
+        if body_fields.get("stream") is True:
             is_likely_stream = True
         
         # 临时调试：打印流式请求判断
@@ -170,36 +474,116 @@ async def universal_proxy(
                     request_id=request_id
                 )
                 print(f"DEBUG: forward_stream_request completed successfully")
+                # 流式响应在传输结束时记录指标
+                result = observe_stream_response(result, request_metrics)
+                if rate_limit is not None:
+                    result.headers.update(rate_limit.headers())
                 return result
             except Exception as stream_error:
                 print(f"DEBUG: forward_stream_request failed: {type(stream_error).__name__}: {str(stream_error)}")
                 raise
         
         # 非流式请求的传统处理
-        response = await proxy_engine.forward_request(
-            route_config=route_match,
-            method=request.method,
-            url=target_url,
-            headers=dict(request.headers),
-            json=request_body if isinstance(request_body, dict) else None,
-            content=request_body if isinstance(request_body, bytes) else None,
-            is_stream_request=False
-        )
+        coalesced_with = None
+        cached, cache_status, cached_body = None, None, None
+        if streamed_body is None:
+            cache_key = _cache_key(request, route_match, target_url, body_view, request_body)
+            if cache_key is not None:
+                cached, cache_status = response_cache.lookup(cache_key, request.headers)
+            
+            upstream_headers = dict(request.headers)
+            validators = None
+            if cache_status == STALE:
+                # 过期条目带条件请求头向上游重新校验
+                validators = response_cache.conditional_headers(cached)
+            coalesce_key = None
+            if cache_status != HIT:
+                coalesce_key = _coalesce_key(request, route_match, target_url, body_view, request_body,
+                                             api_key_info, vary=validators)
+            if coalesce_key is not None:
+                upstream_headers = _strip_conditional_headers(upstream_headers)
+            if validators:
+                upstream_headers.update(validators)
+            
+            async def fetch():
+                batched = await _forward_embedding_batch(
+                    proxy_engine, route_match, request.method, target_url, upstream_headers, request_body,
+                    on_response_headers=request_metrics.first_byte
+                )
+                if batched is not None:
+                    return batched
+                upstream_response = await proxy_engine.forward_request(
+                    route_config=route_match,
+                    method=request.method,
+                    url=target_url,
+                    headers=upstream_headers,
+                    json=request_body if isinstance(request_body, dict) else None,
+                    content=request_body if isinstance(request_body, bytes) else None,
+                    is_stream_request=False,
+                    on_response_headers=request_metrics.first_byte
+                )
+                # 读取完整响应体，合并的请求共享同一份字节
+                await upstream_response.aread()
+                return upstream_response
+            
+            if cache_status == HIT:
+                response, cached_body = _cached_response(cached, request.headers)
+            else:
+                if coalesce_key is not None:
+                    response, coalesced_with = await single_flight.do(coalesce_key, request_id, fetch)
+                else:
+                    response = await fetch()
+                
+                if cache_status == STALE and response.status_code == 304:
+                    response_cache.refresh(cache_key, cached, route_match, response.headers)
+                    cache_status = REVALIDATED
+                    response, cached_body = _cached_response(cached, request.headers)
+                elif cache_key is not None:
+                    if coalesced_with is None:
+                        response_cache.store(cache_key, route_match, response.status_code,
+                                             response.headers, response.content)
+                    cache_status = MISS
+                
+                if coalesce_key is not None and cached_body is None:
+                    # 客户端的条件请求头没有转发给上游，按共享的响应在本地判断
+                    response, cached_body = _shared_response(route_match, response, request.headers)
+        if response.status_code >= 500:
+            request_metrics.upstream_error(f"status_{response.status_code}")
         
         # 非流式响应处理
-        response_content = await response.aread()
+        if cached_body is not None:
+            response_content = cached_body
+        else:
+            try:
+                response_content = await response.aread()
+            finally:
+                if streamed_body is not None:
+                    await response.aclose()
         
         # 异步记录非流式请求完成（不等待）
-        await audit_service.log_request_complete(request_id, {
+        complete_info = {
             "status_code": response.status_code,
             "response_time": datetime.now(),
             "is_stream": False,
             "response_headers": dict(response.headers),
-            "response_body": response_content if len(response_content) < 10240 else None,  # 限制大小
+            "response_body": bytes(response_content) if len(response_content) < 10240 else None,  # 限制大小
             "response_size": len(response_content) if response_content else 0
-        })
+        }
+        if streamed_body is not None:
+            complete_info["request_body"] = streamed_body.audit_body()
+            complete_info["request_size"] = streamed_body.size
+        if coalesced_with is not None:
+            complete_info["coalesced_with"] = coalesced_with
+        await audit_service.log_request_complete(request_id, complete_info)
         
         processed_headers = proxy_engine._process_response_headers(dict(response.headers))
+        if cache_status is not None:
+            processed_headers["x-cache"] = cache_status
+            if cache_status != MISS:
+                processed_headers["age"] = str(cached.age(time.time()))
+        if rate_limit is not None:
+            processed_headers.update(rate_limit.headers())
+        request_metrics.finish(response.status_code)
         
         return Response(
             content=response_content,
@@ -208,10 +592,28 @@ async def universal_proxy(
             media_type=response.headers.get("content-type", "application/json")
         )
             
-    except HTTPException:
+    except HTTPException as e:
+        if e.status_code in (502, 504):
+            request_metrics.upstream_error(f"status_{e.status_code}")
+        request_metrics.finish(e.status_code)
+        
+        # 已记录开始的请求（上游 502/504、熔断 503、合批拆分失败等）按错误状态完成审计
+        if audit_service.is_pending(request_id):
+            error_info = {
+                "status_code": e.status_code,
+                "response_time": datetime.now(),
+                "error_message": str(e.detail)
+            }
+            if streamed_body is not None:
+                error_info["request_body"] = streamed_body.audit_body()
+                error_info["request_size"] = streamed_body.size
+            await audit_service.log_request_complete(request_id, error_info)
         raise
         
     except Exception as e:
+        request_metrics.upstream_error(type(e).__name__)
+        request_metrics.finish(500)
+        
         # 记录错误的审计日志（异步）
         end_time = time.time()
         
@@ -225,7 +627,7 @@ async def universal_proxy(
             "request_time": datetime.fromtimestamp(start_time),
             "user_agent": request.headers.get("user-agent", ""),
             "request_headers": dict(request.headers),
-            "request_body": request_body if isinstance(request_body, dict) else None
+            "request_body": body_view.audit_text() if body_view is not None else None
         })
         
         await audit_service.log_request_complete(request_id, {
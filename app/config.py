@@ -41,7 +41,18 @@ class Config:
             "security": {
                 "admin_token": "admin_secret_token_dev",
                 "key_prefix": "fg_",
-                "default_expiry_days": 365
+                "default_expiry_days": 365,
+                "key_cache": {
+                    "enabled": True,
+                    "max_size": 10000,
+                    "ttl": 60,
+                    "negative_ttl": 5
+                },
+                "usage_tracker": {
+                    "enabled": True,
+                    "flush_interval_ms": 1000,
+                    "flush_max_hits": 1000
+                }
             },
             "logging": {
                 "level": "INFO",
@@ -50,7 +61,19 @@ class Config:
             },
             "rate_limiting": {
                 "enabled": True,
-                "default_requests_per_minute": 100
+                "default_requests_per_minute": 100,
+                "burst": None,
+                "global_requests_per_minute": 0,
+                "routes": {},
+                "source_paths": {},
+                "max_buckets": 100000,
+                "backend": "local",
+                "socket": {
+                    "path": "/tmp/fastgate-ratelimit.sock",
+                    "lease_size": 10,
+                    "lease_ttl": 1.0,
+                    "timeout_ms": 50
+                }
             },
             "proxy": {
                 "timeout": 30,
@@ -63,7 +86,103 @@ class Config:
                 ],
                 "async_audit": True,
                 "audit_full_request": True,
-                "audit_full_response": True
+                "audit_full_response": True,
+                "pool": {
+                    "max_connections": 200,
+                    "max_keepalive_connections": 100,
+                    "keepalive_expiry": 30,
+                    "max_connections_per_host": 0,
+                    "connect_timeout": 10,
+                    "write_timeout": 10,
+                    "pool_timeout": None
+                },
+                "route_table": {
+                    "refresh_interval": 5
+                },
+                "audit_writer": {
+                    "queue_size": 10000,
+                    "batch_size": 200,
+                    "linger_ms": 50,
+                    "overflow_policy": "drop",
+                    "spill_file": "logs/audit_spill.jsonl",
+                    "pending_timeout": 600
+                },
+                "stream_request_body": {
+                    "enabled": True,
+                    "json_min_bytes": 1048576,
+                    "audit_prefix_bytes": 4096
+                },
+                "upstream_health": {
+                    "passive": {
+                        "enabled": True,
+                        "consecutive_failures": 5,
+                        "base_ejection_seconds": 30,
+                        "max_ejection_seconds": 300
+                    },
+                    "active": {
+                        "enabled": False,
+                        "interval_seconds": 10,
+                        "timeout_seconds": 2,
+                        "path": "/health",
+                        "healthy_threshold": 2,
+                        "unhealthy_threshold": 3
+                    }
+                },
+                "circuit_breaker": {
+                    "enabled": True,
+                    "window_seconds": 30,
+                    "minimum_requests": 20,
+                    "failure_rate_threshold": 0.5,
+                    "open_seconds": 30,
+                    "half_open_max_calls": 3
+                },
+                "retry": {
+                    "deadline_seconds": 0,
+                    "base_backoff_seconds": 0.5,
+                    "max_backoff_seconds": 10,
+                    "budget_ratio": 0.2,
+                    "min_retries_per_second": 5,
+                    "budget_window_seconds": 10,
+                    "deadline_header": "x-request-deadline-ms",
+                    "accept_client_deadline": True
+                },
+                "hedging": {
+                    "default_delay_ms": 1000,
+                    "min_delay_ms": 10,
+                    "min_samples": 50,
+                    "p95_refresh_seconds": 5,
+                    "max_extra_ratio": 0.1,
+                    "budget_window_seconds": 10
+                },
+                "coalescing": {
+                    "key_scope": "api_key",
+                    "max_body_bytes": 1048576
+                },
+                "embedding_batch": {
+                    "window_ms": 5,
+                    "max_items": 256
+                },
+                "response_cache": {
+                    "enabled": True,
+                    "max_bytes": 67108864,
+                    "default_ttl_seconds": 60,
+                    "max_entry_bytes": 1048576,
+                    "methods": ["GET", "HEAD", "POST"],
+                    "disk": {
+                        "enabled": False,
+                        "path": "./app/data/response_cache",
+                        "segment_bytes": 67108864,
+                        "max_bytes": 1073741824,
+                        "compaction_interval_seconds": 300,
+                        "compaction_dead_ratio": 0.5,
+                        "sync_interval_seconds": 1,
+                        "max_pending_writes": 1024
+                    }
+                }
+            },
+            "metrics": {
+                "enabled": True,
+                "path": "/metrics"
             }
         }
     
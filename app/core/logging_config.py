@@ -2,43 +2,67 @@ import logging
 import sys
 from logging.handlers import RotatingFileHandler
 import os
+from typing import Optional, Union
 
-LOGS_DIR = "logs"
-if not os.path.exists(LOGS_DIR):
-    os.makedirs(LOGS_DIR)
+from ..config import settings
 
 LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(module)s:%(funcName)s:%(lineno)d - %(message)s"
 DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
-# Configure a console handler
-console_handler = logging.StreamHandler(sys.stdout)
-console_handler.setLevel(logging.INFO)
-console_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
-
-# Configure a rotating file handler
-file_handler = RotatingFileHandler(
-    os.path.join(LOGS_DIR, "app.log"),
-    maxBytes=10 * 1024 * 1024,  # 10 MB
-    backupCount=5,
-    encoding="utf-8",
-)
-file_handler.setLevel(logging.INFO)
-file_handler.setFormatter(logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT))
-
-def setup_logging(log_level: int = logging.INFO):
+
+def _resolve_level(log_level: Union[int, str]) -> int:
+    """
+    Converts a level name such as "WARNING" to its numeric value (unknown names fall back to INFO).
+    """
+    if isinstance(log_level, int):
+        return log_level
+    level = logging.getLevelName(str(log_level).upper())
+    return level if isinstance(level, int) else logging.INFO
+
+
+def setup_logging(log_level: Optional[Union[int, str]] = None, log_file: Optional[str] = None):
     """
     Configures the root logger and adds handlers.
+    Level and file default to settings.logging (overridable with LOG_LEVEL / LOG_FILE);
+    an empty file disables the rotating file handler.
     """
+    logging_config = settings.logging
+    level = _resolve_level(log_level if log_level is not None else logging_config.get('level', 'INFO'))
+    log_file = log_file if log_file is not None else logging_config.get('file')
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=DATE_FORMAT)
+
+    # Configure a console handler
+    console_handler = logging.StreamHandler(sys.stdout)
+    console_handler.setLevel(level)
+    console_handler.setFormatter(formatter)
+    handlers = [console_handler]
+
+    # Configure a rotating file handler
+    if log_file:
+        log_dir = os.path.dirname(log_file)
+        if log_dir:
+            os.makedirs(log_dir, exist_ok=True)
+        file_handler = RotatingFileHandler(
+            log_file,
+            maxBytes=10 * 1024 * 1024,  # 10 MB
+            backupCount=5,
+            encoding="utf-8",
+        )
+        file_handler.setLevel(level)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+
     # Get the root logger
     root_logger = logging.getLogger()
-    root_logger.setLevel(log_level)
+    root_logger.setLevel(level)
 
     # Remove any existing handlers to avoid duplicate logging
-    if root_logger.hasHandlers():
-        root_logger.handlers.clear()
+    for handler in list(root_logger.handlers):
+        root_logger.removeHandler(handler)
+        handler.close()
 
-    root_logger.addHandler(console_handler)
-    root_logger.addHandler(file_handler)
+    for handler in handlers:
+        root_logger.addHandler(handler)
 
     # Set higher level for noisy libraries if needed
     # logging.getLogger("uvicorn.access").setLevel(logging.WARNING)
@@ -51,8 +75,3 @@ def get_logger(name: str) -> logging.Logger:
     The logger will inherit handlers from the root logger.
     """
     return logging.getLogger(name)
-
-# Optional: Basic configuration to ensure logs are emitted if setup_logging is not called explicitly
-# This is a fallback and it's better to call setup_logging() at application startup.
-# logging.basicConfig(level=logging.INFO, handlers=[console_handler, file_handler], format=LOG_FORMAT, datefmt=DATE_FORMAT)
-
@@ -126,6 +126,7 @@ class DatabaseInitializer:
                 ip_address VARCHAR(50),
                 is_stream BOOLEAN DEFAULT FALSE,
                 stream_chunks INTEGER DEFAULT 0,
+                coalesced_with VARCHAR(50),
                 error_message TEXT,
                 request_headers TEXT,
                 request_body TEXT,
@@ -149,10 +150,22 @@ class DatabaseInitializer:
                 target_host VARCHAR(200) NOT NULL,
                 target_path VARCHAR(500) NOT NULL,
                 target_protocol VARCHAR(10) DEFAULT 'http',
+                target_hosts TEXT,
+                lb_strategy VARCHAR(30) DEFAULT 'round_robin',
+                lb_hash_key VARCHAR(100),
                 strip_path_prefix BOOLEAN DEFAULT FALSE,
                 add_headers TEXT,
                 add_body_fields TEXT,
                 remove_headers TEXT,
+                stream_mode VARCHAR(20) DEFAULT 'audit',
+                batch_mode VARCHAR(20) DEFAULT 'none',
+                hedge_enabled BOOLEAN DEFAULT FALSE,
+                hedge_delay_ms INTEGER,
+                coalesce_enabled BOOLEAN DEFAULT FALSE,
+                cache_enabled BOOLEAN DEFAULT FALSE,
+                cache_ttl INTEGER,
+                cache_max_entry_bytes INTEGER,
+                cache_key_fields TEXT,
                 timeout INTEGER DEFAULT 30,
                 retry_count INTEGER DEFAULT 0,
                 is_active BOOLEAN DEFAULT TRUE,
@@ -293,7 +306,7 @@ class DatabaseInitializer:
                 
                 return stats
         
-    except Exception as e:
+        except Exception as e:
             print(f"获取数据库统计失败: {e}")
             return None
 
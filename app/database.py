@@ -3,7 +3,7 @@
 """
 
 import os
-from sqlalchemy import create_engine, MetaData
+from sqlalchemy import create_engine, MetaData, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from .config import settings
@@ -53,6 +53,43 @@ def create_tables():
     
     # 创建所有表
     Base.metadata.create_all(bind=engine)
+    
+    # 为已存在的旧表补齐新增列
+    migrate_columns()
+
+
+def migrate_columns(bind=None):
+    """
+    为已存在的表补齐模型中新增的列（create_all 不会修改已有表）
+    
+    Args:
+        bind: 数据库引擎，默认使用应用数据库
+    
+    Returns:
+        List[str]: 新增的列（table.column）
+    """
+    bind = bind or engine
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=bind.dialect)
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"
+                default = getattr(column.server_default, "arg", None)
+                if isinstance(default, str):
+                    ddl += f" DEFAULT '{default}'"
+                conn.execute(text(ddl))
+                added.append(f"{table.name}.{column.name}")
+    
+    return added
 
 
 def drop_tables():
@@ -4,11 +4,21 @@ M-FastGate v0.3.0 FastAPI 应用入口
 
 from datetime import datetime
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 from .config import settings
 from .database import create_tables
 from .api import admin, proxy, ui
+from .services.proxy_engine import init_proxy_engine, close_proxy_engine
+from .services.usage_tracker import usage_tracker
+from .services.audit_writer import audit_writer
+from .services.rate_limiter import rate_limiter
+from .services.route_table import route_table
+from .services.upstream_health import upstream_health
+from .services.circuit_breaker import circuit_breaker
+from .services.response_cache import response_cache
+from .services.metrics import gateway_metrics
 from .core.logging_config import setup_logging, get_logger
 
 # Get a logger instance for this module
@@ -27,13 +37,38 @@ async def lifespan(app: FastAPI):
     create_tables()
     logger.info("📊 Database tables created")
     
-    # 初始化代理引擎服务
+    # 初始化代理引擎服务（进程内共享连接池）
+    init_proxy_engine()
     logger.info("🌐 Proxy engine initialized")
     
+    # 启动 API Key 使用统计批量写回
+    usage_tracker.start()
+    
+    # 启动审计日志批量写入器
+    audit_writer.start()
+    
+    # 连接跨进程限流计数服务（本地后端无操作）
+    await rate_limiter.start()
+    
+    # 启动上游主动健康探测（未开启时无操作）
+    upstream_health.start(route_table.upstream_targets)
+    
+    # 打开响应缓存磁盘层并启动后台压缩（未开启时无操作）
+    response_cache.start()
+    
     yield
     
     # 关闭时执行
     logger.info("🔄 Shutting down...")
+    await upstream_health.stop()
+    await response_cache.stop()
+    await rate_limiter.close()
+    await usage_tracker.stop()
+    logger.info("📈 Usage counters flushed")
+    await audit_writer.stop()
+    logger.info("📝 Audit queue drained")
+    await close_proxy_engine()
+    logger.info("🌐 Proxy engine closed")
     logger.info("✅ Cleanup completed")
 
 
@@ -77,6 +112,21 @@ async def health_check():
         }
     }
 
+# Prometheus 指标接口（仅读取内存指标，不访问数据库）
+async def prometheus_metrics():
+    """Prometheus 文本格式指标"""
+    return PlainTextResponse(
+        gateway_metrics.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+gateway_metrics.bind_audit_writer(audit_writer)
+gateway_metrics.bind_circuit_breaker(circuit_breaker)
+metrics_config = settings.get('metrics', {})
+if metrics_config.get('enabled', True):
+    app.add_api_route(metrics_config.get('path', '/metrics'), prometheus_metrics,
+                      methods=["GET"], include_in_schema=False)
+
 # 根路径信息
 @app.get("/")
 async def root():
@@ -93,7 +143,8 @@ async def root():
             "universal_proxy": "/{path:path}",
             "route_management": "/admin/routes",
             "audit_logs": "/admin/logs",
-            "metrics": "/admin/metrics"
+            "metrics": "/admin/metrics",
+            "prometheus_metrics": settings.get('metrics.path', '/metrics')
         }
     }
 
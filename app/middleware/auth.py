@@ -6,8 +6,11 @@ from fastapi import HTTPException, status, Request, Depends, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from typing import Optional
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 from ..database import get_db
 from ..services.key_manager import KeyManager
+from ..services.key_cache import api_key_cache
+from ..services.usage_tracker import usage_tracker
 from ..models.api_key import APIKeyResponse
 from ..config import settings
 
@@ -197,9 +200,13 @@ async def api_key_auth(
             detail="API Key is required. Use X-API-Key header or Authorization Bearer token."
         )
     
-    # 验证API Key
+    # 验证API Key：优先查缓存，未命中时在线程池中查库，避免阻塞事件循环
     key_manager = KeyManager(db)
-    api_key_info = key_manager.validate_key(api_key)
+    cached, api_key_info = api_key_cache.get(api_key)
+    if not cached:
+        generation = api_key_cache.generation
+        api_key_info = await run_in_threadpool(key_manager.validate_key, api_key)
+        api_key_cache.set(api_key, api_key_info, generation)
     
     if not api_key_info:
         raise HTTPException(
@@ -207,8 +214,11 @@ async def api_key_auth(
             detail="Invalid or expired API Key"
         )
     
-    # 更新使用统计
-    key_manager.update_usage(api_key)
+    # 更新使用统计：后台写回任务运行时只在内存累加，否则同步写库
+    if usage_tracker.running:
+        usage_tracker.record(api_key)
+    else:
+        key_manager.update_usage(api_key)
 
     return api_key_info
 
@@ -49,6 +49,9 @@ class AuditLogDB(Base):
     is_stream = Column(Boolean, default=False, index=True)
     stream_chunks = Column(Integer, default=0)
     
+    # 请求合并：被合并的请求记录共享其上游响应的首个请求ID
+    coalesced_with = Column(String(50), nullable=True)
+    
     # 详细审计字段（可选）
     request_headers = Column(Text, nullable=True)
     request_body = Column(Text, nullable=True)
@@ -88,6 +91,9 @@ class AuditLogCreate(BaseModel):
     is_stream: bool = False
     stream_chunks: int = 0
     
+    # 请求合并
+    coalesced_with: Optional[str] = None
+    
     # 详细审计（可选）
     request_headers: Optional[str] = None
     request_body: Optional[str] = None
@@ -139,6 +145,9 @@ class AuditLogResponse(BaseModel):
     is_stream: bool
     stream_chunks: int
     
+    # 请求合并
+    coalesced_with: Optional[str] = None
+    
     # 详细审计
     request_headers: Optional[str]
     request_body: Optional[str]
@@ -7,8 +7,8 @@ from typing import Optional, List, Dict, Any
 from sqlalchemy import Column, String, DateTime, Integer, Text, Boolean
 from pydantic import BaseModel, Field
 from ..database import Base
+from ..utils import jsoncodec
 import uuid
-import json
 
 # 定义中国时区
 china_tz = timezone(timedelta(hours=8))
@@ -36,12 +36,38 @@ class ProxyRouteDB(Base):
     target_path = Column(String(500), nullable=False)
     target_protocol = Column(String(10), default='http')
     
+    # 上游负载均衡：target_hosts 为带权重的目标池（JSON数组字符串），为空时只使用 target_host
+    target_hosts = Column(Text, nullable=True)
+    lb_strategy = Column(String(30), default='round_robin', server_default='round_robin')
+    lb_hash_key = Column(String(100), nullable=True)  # 一致性哈希键：api_key 或 header:<请求头名称>
+    
     # 转换规则
     strip_path_prefix = Column(Boolean, default=False)
     add_headers = Column(Text, nullable=True)  # JSON字符串
     add_body_fields = Column(Text, nullable=True)  # JSON字符串
     remove_headers = Column(Text, nullable=True)  # JSON数组字符串
     
+    # 流式转发模式：audit 解析并合并响应用于审计，passthrough 原样透传仅记录状态/大小/耗时
+    stream_mode = Column(String(20), default='audit', server_default='audit')
+    
+    # 合批模式：embeddings 时短时间窗口内的 embedding 请求去重后合并为一次上游请求
+    batch_mode = Column(String(20), default='none', server_default='none')
+    
+    # 对冲请求：首次尝试在 hedge_delay_ms 内未收到响应头时向另一个目标再发一次，先响应者胜出
+    # （hedge_delay_ms 为空时使用该路由实时的 P95 首字节耗时）
+    hedge_enabled = Column(Boolean, default=False, server_default='0')
+    hedge_delay_ms = Column(Integer, nullable=True)
+    
+    # 请求合并：同时到达的相同非流式请求只向上游转发一次并共享响应
+    coalesce_enabled = Column(Boolean, default=False, server_default='0')
+    
+    # 响应缓存：cache_ttl / cache_max_entry_bytes 为空时使用全局配置，
+    # cache_key_fields 为参与缓存键的请求体顶层字段或 header:<请求头名称>（JSON数组字符串），为空时使用整个请求体
+    cache_enabled = Column(Boolean, default=False, server_default='0')
+    cache_ttl = Column(Integer, nullable=True)
+    cache_max_entry_bytes = Column(Integer, nullable=True)
+    cache_key_fields = Column(Text, nullable=True)
+    
     # 其他配置
     timeout = Column(Integer, default=30)
     retry_count = Column(Integer, default=0)
@@ -53,6 +79,17 @@ class ProxyRouteDB(Base):
     updated_at = Column(DateTime, default=get_china_time, onupdate=get_china_time)
 
 
+LB_STRATEGY_PATTERN = '^(round_robin|least_outstanding|p2c|consistent_hash)$'
+LB_HASH_KEY_PATTERN = '^(api_key|header:.+)$'
+BATCH_MODE_PATTERN = '^(none|embeddings)$'
+
+
+class UpstreamTarget(BaseModel):
+    """上游目标"""
+    host: str = Field(..., min_length=1, max_length=200, description="目标主机，如：172.16.99.204:3398")
+    weight: int = Field(default=1, ge=1, le=100, description="权重")
+
+
 class ProxyRouteCreate(BaseModel):
     """创建代理路由请求模型"""
     route_name: str = Field(..., min_length=1, max_length=100, description="路由名称")
@@ -69,12 +106,36 @@ class ProxyRouteCreate(BaseModel):
     target_path: str = Field(..., description="目标路径，如：/v1/chat/completions")
     target_protocol: str = Field(default='http', description="协议：http/https")
     
+    # 上游负载均衡
+    target_hosts: Optional[List[UpstreamTarget]] = Field(None, description="带权重的上游目标池，为空时只使用 target_host")
+    lb_strategy: str = Field(default='round_robin', pattern=LB_STRATEGY_PATTERN, description="负载均衡策略：round_robin/least_outstanding/p2c/consistent_hash")
+    lb_hash_key: Optional[str] = Field(None, pattern=LB_HASH_KEY_PATTERN, description="一致性哈希键：api_key 或 header:<请求头名称>")
+    
     # 转换规则
     strip_path_prefix: bool = Field(default=False, description="是否剔除路径前缀")
     add_headers: Optional[Dict[str, str]] = Field(None, description="新增请求头")
     add_body_fields: Optional[Dict[str, Any]] = Field(None, description="新增请求体字段")
     remove_headers: Optional[List[str]] = Field(None, description="移除请求头列表")
     
+    # 流式转发
+    stream_mode: str = Field(default='audit', pattern='^(audit|passthrough)$', description="流式转发模式：audit/passthrough")
+    
+    # 合批模式
+    batch_mode: str = Field(default='none', pattern=BATCH_MODE_PATTERN, description="合批模式：none/embeddings")
+    
+    # 对冲请求
+    hedge_enabled: bool = Field(default=False, description="是否对非流式请求启用对冲")
+    hedge_delay_ms: Optional[int] = Field(None, ge=1, le=60000, description="对冲延迟（毫秒），为空时使用路由实时 P95")
+    
+    # 请求合并
+    coalesce_enabled: bool = Field(default=False, description="是否合并同时到达的相同非流式请求")
+    
+    # 响应缓存
+    cache_enabled: bool = Field(default=False, description="是否缓存非流式请求的响应")
+    cache_ttl: Optional[int] = Field(None, ge=0, le=2592000, description="缓存有效期（秒），为空时使用全局默认值，上游 Cache-Control 优先")
+    cache_max_entry_bytes: Optional[int] = Field(None, ge=1, description="单个响应的最大缓存字节数，为空时使用全局默认值")
+    cache_key_fields: Optional[List[str]] = Field(None, description="参与缓存键的请求体顶层字段或 header:<请求头名称>，为空时使用整个请求体")
+    
     # 其他配置
     timeout: int = Field(default=30, ge=1, le=300, description="超时时间（秒）")
     retry_count: int = Field(default=0, ge=0, le=5, description="重试次数")
@@ -98,12 +159,36 @@ class ProxyRouteUpdate(BaseModel):
     target_path: Optional[str] = None
     target_protocol: Optional[str] = None
     
+    # 上游负载均衡
+    target_hosts: Optional[List[UpstreamTarget]] = None
+    lb_strategy: Optional[str] = Field(None, pattern=LB_STRATEGY_PATTERN)
+    lb_hash_key: Optional[str] = Field(None, pattern=LB_HASH_KEY_PATTERN)
+    
     # 转换规则
     strip_path_prefix: Optional[bool] = None
     add_headers: Optional[Dict[str, str]] = None
     add_body_fields: Optional[Dict[str, Any]] = None
     remove_headers: Optional[List[str]] = None
     
+    # 流式转发
+    stream_mode: Optional[str] = Field(None, pattern='^(audit|passthrough)$')
+    
+    # 合批模式
+    batch_mode: Optional[str] = Field(None, pattern=BATCH_MODE_PATTERN)
+    
+    # 对冲请求
+    hedge_enabled: Optional[bool] = None
+    hedge_delay_ms: Optional[int] = Field(None, ge=1, le=60000)
+    
+    # 请求合并
+    coalesce_enabled: Optional[bool] = None
+    
+    # 响应缓存
+    cache_enabled: Optional[bool] = None
+    cache_ttl: Optional[int] = Field(None, ge=0, le=2592000)
+    cache_max_entry_bytes: Optional[int] = Field(None, ge=1)
+    cache_key_fields: Optional[List[str]] = None
+    
     # 其他配置
     timeout: Optional[int] = Field(None, ge=1, le=300)
     retry_count: Optional[int] = Field(None, ge=0, le=5)
@@ -128,12 +213,36 @@ class ProxyRouteResponse(BaseModel):
     target_path: str
     target_protocol: str
     
+    # 上游负载均衡
+    target_hosts: Optional[List[Dict[str, Any]]] = None
+    lb_strategy: str = 'round_robin'
+    lb_hash_key: Optional[str] = None
+    
     # 转换规则
     strip_path_prefix: bool
     add_headers: Optional[Dict[str, str]]
     add_body_fields: Optional[Dict[str, Any]]
     remove_headers: Optional[List[str]]
     
+    # 流式转发
+    stream_mode: str = 'audit'
+    
+    # 合批模式
+    batch_mode: str = 'none'
+    
+    # 对冲请求
+    hedge_enabled: bool = False
+    hedge_delay_ms: Optional[int] = None
+    
+    # 请求合并
+    coalesce_enabled: bool = False
+    
+    # 响应缓存
+    cache_enabled: bool = False
+    cache_ttl: Optional[int] = None
+    cache_max_entry_bytes: Optional[int] = None
+    cache_key_fields: Optional[List[str]] = None
+    
     # 其他配置
     timeout: int
     retry_count: int
@@ -182,8 +291,8 @@ def json_to_dict(json_str: Optional[str]) -> Optional[Dict]:
     if not json_str:
         return None
     try:
-        return json.loads(json_str)
-    except json.JSONDecodeError:
+        return jsoncodec.loads(json_str)
+    except jsoncodec.JSONDecodeError:
         return None
 
 
@@ -200,7 +309,7 @@ def dict_to_json(data: Optional[Dict]) -> Optional[str]:
     if not data:
         return None
     try:
-        return json.dumps(data, ensure_ascii=False)
+        return jsoncodec.dumps(data)
     except (TypeError, ValueError):
         return None
 
@@ -218,6 +327,6 @@ def list_to_json(data: Optional[List]) -> Optional[str]:
     if not data:
         return None
     try:
-        return json.dumps(data, ensure_ascii=False)
+        return jsoncodec.dumps(data)
     except (TypeError, ValueError):
         return None 
\ No newline at end of file
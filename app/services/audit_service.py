@@ -1,10 +1,10 @@
 """
 审计日志服务 - v0.2.0
 移除Phase 2.4相关代码，添加first_response_time处理，优化异步处理性能
+请求开始、首次响应、请求完成的信息先在内存中合并，完成时一次性交给 AuditWriter 批量写入
 """
 
-import asyncio
-import json
+import time
 from datetime import datetime, timezone, timedelta
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session, joinedload
@@ -15,10 +15,19 @@ from ..models.audit_log import (
 from ..models.api_key import APIKeyDB  # 导入 APIKeyDB
 from ..database import get_db
 from ..config import settings
+from .audit_writer import AuditWriter, audit_writer
+from ..utils import jsoncodec
 import structlog
 
 logger = structlog.get_logger(__name__)
 
+# 进行中请求的审计记录：{request_id: record}，请求完成时合并为完整的一行写入
+_pending_records: Dict[str, Dict[str, Any]] = {}
+
+# 未完成记录的清理间隔（秒）
+PENDING_SWEEP_INTERVAL = 60
+_last_sweep = time.monotonic()
+
 # 定义中国时区
 china_tz = timezone(timedelta(hours=8))
 
@@ -47,29 +56,19 @@ class AuditService:
     
     async def log_request_start(self, request_info: Dict[str, Any]) -> str:
         """
-        记录请求开始（异步）
+        记录请求开始（仅在内存中暂存，请求完成时合并为一行写入）
         
         Args:
             request_info: 请求信息
             
         Returns:
-            str: 日志ID
+            str: 请求ID（同步审计模式下返回日志ID）
         """
-        if self.async_audit:
-            # 异步处理，不阻塞主请求
-            asyncio.create_task(self._log_request_start_impl(request_info))
-            return request_info.get("request_id", "")
-        else:
-            return await self._log_request_start_impl(request_info)
-    
-    async def _log_request_start_impl(self, request_info: Dict[str, Any]) -> str:
-        """记录请求开始的实现 - 使用后台线程避免阻塞"""
         try:
             log_id = generate_log_id()
             request_id = request_info.get("request_id") or generate_request_id()
             
-            # 准备数据库记录数据
-            db_log_data = {
+            _pending_records[request_id] = {
                 "id": log_id,
                 "request_id": request_id,
                 "api_key": request_info.get("api_key"),
@@ -82,39 +81,15 @@ class AuditService:
                 "user_agent": request_info.get("user_agent"),
                 "ip_address": request_info.get("ip_address"),
                 "request_headers": self._serialize_headers(request_info.get("request_headers")),
-                "request_body": self._serialize_body(request_info.get("request_body"))
+                "request_body": self._serialize_body(request_info.get("request_body")),
+                "response_size": 0,
+                "stream_chunks": 0,
+                "is_stream": False,
+                "_started": time.monotonic()
             }
             
-            # 在后台线程中执行数据库操作，完全不阻塞主线程
-            def save_to_db():
-                try:
-                    # 创建审计日志记录
-                    db_log = AuditLogDB(**db_log_data)
-                    
-                    # 保存到数据库
-                    db = next(get_db())
-                    try:
-                        db.add(db_log)
-                        db.commit()
-                    finally:
-                        db.close()
-                except Exception as e:
-                    # 后台线程中的错误抛出到主线程
-                    raise e
-            
-            # 使用后台线程执行数据库操作
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, save_to_db)
-            
-            self.logger.info(
-                "Request start logged (async)",
-                request_id=request_id,
-                log_id=log_id,
-                method=request_info.get("method"),
-                path=request_info.get("path")
-            )
-            
-            return log_id
+            await self._sweep_pending()
+            return request_id if self.async_audit else log_id
             
         except Exception as e:
             self.logger.error(
@@ -124,6 +99,10 @@ class AuditService:
             )
             return ""
     
+    def is_pending(self, request_id: str) -> bool:
+        """请求是否已记录开始但尚未完成"""
+        return request_id in _pending_records
+    
     async def log_first_response(self, request_id: str, first_response_time: datetime) -> None:
         """
         记录首次响应时间（用于流式响应）
@@ -132,87 +111,61 @@ class AuditService:
             request_id: 请求ID
             first_response_time: 首次响应时间
         """
-        # 对于首次响应记录，也要完全异步，不阻塞流式响应
-        asyncio.create_task(self._log_first_response_impl(request_id, first_response_time))
-    
-    async def _log_first_response_impl(self, request_id: str, first_response_time: datetime) -> None:
-        """记录首次响应时间的实现"""
-        try:
-            db = next(get_db())
-            try:
-                audit_log = db.query(AuditLogDB).filter(AuditLogDB.request_id == request_id).first()
-                if audit_log:
-                    audit_log.first_response_time = first_response_time
-                    db.commit()
-                    
-                    self.logger.debug(
-                        "First response time logged",
-                        request_id=request_id,
-                        first_response_time=first_response_time
-                    )
-                else:
-                    self.logger.warning("Audit log not found for first response", request_id=request_id)
-            finally:
-                db.close()
-                    
-        except Exception as e:
-            self.logger.error(
-                "Failed to log first response time",
-                error=str(e),
-                request_id=request_id
-            )
+        record = _pending_records.get(request_id)
+        if record is not None and record.get("first_response_time") is None:
+            record["first_response_time"] = first_response_time
     
     async def log_request_complete(self, request_id: str, response_info: Dict[str, Any]) -> None:
         """
-        记录请求完成
+        记录请求完成：合并请求开始时暂存的信息，作为完整的一行提交给写入器
         
         Args:
             request_id: 请求ID
             response_info: 响应信息
         """
-        if self.async_audit:
-            asyncio.create_task(self._log_request_complete_impl(request_id, response_info))
-        else:
-            await self._log_request_complete_impl(request_id, response_info)
-    
-    async def _log_request_complete_impl(self, request_id: str, response_info: Dict[str, Any]) -> None:
-        """记录请求完成的实现"""
+        record = _pending_records.pop(request_id, None)
+        if record is None:
+            self.logger.warning("Audit log not found for completion", request_id=request_id)
+            return
+        
         try:
-            db = next(get_db())
+            record["status_code"] = response_info.get("status_code")
+            record["response_time"] = response_info.get("response_time", get_china_time())
+            record["response_size"] = response_info.get("response_size", record["response_size"])
+            record["is_stream"] = response_info.get("is_stream", record["is_stream"])
+            record["stream_chunks"] = response_info.get("stream_chunks", record["stream_chunks"])
+            record["error_message"] = response_info.get("error_message")
+            # 流式请求体的大小和审计前缀在转发完成后才确定
+            if "request_size" in response_info:
+                record["request_size"] = response_info["request_size"]
+            if "request_body" in response_info:
+                record["request_body"] = self._serialize_body(response_info["request_body"])
+            if response_info.get("coalesced_with"):
+                record["coalesced_with"] = response_info["coalesced_with"]
+            if response_info.get("first_response_time"):
+                record["first_response_time"] = response_info["first_response_time"]
+            
+            # 计算响应时间（毫秒）
             try:
-                audit_log = db.query(AuditLogDB).filter(AuditLogDB.request_id == request_id).first()
-                if audit_log:
-                    # 更新响应信息
-                    audit_log.status_code = response_info.get("status_code")
-                    audit_log.response_time = response_info.get("response_time", get_china_time())
-                    audit_log.response_size = response_info.get("response_size", 0)
-                    audit_log.is_stream = response_info.get("is_stream", False)
-                    audit_log.stream_chunks = response_info.get("stream_chunks", 0)
-                    audit_log.error_message = response_info.get("error_message")
-                    
-                    # 计算响应时间（毫秒）
-                    if audit_log.request_time and audit_log.response_time:
-                        response_time_delta = audit_log.response_time - audit_log.request_time
-                        audit_log.response_time_ms = int(response_time_delta.total_seconds() * 1000)
-                    
-                    # 可选记录响应头和响应体
-                    if self.audit_full_response:
-                        audit_log.response_headers = self._serialize_headers(response_info.get("response_headers"))
-                        audit_log.response_body = self._serialize_body(response_info.get("response_body"))
-                    
-                    db.commit()
-                    
-                    self.logger.info(
-                        "Request complete logged",
-                        request_id=request_id,
-                        status_code=response_info.get("status_code"),
-                        response_time_ms=audit_log.response_time_ms,
-                        is_stream=audit_log.is_stream
-                    )
-                else:
-                    self.logger.warning("Audit log not found for completion", request_id=request_id)
-            finally:
-                db.close()
+                response_time_delta = record["response_time"] - record["request_time"]
+                record["response_time_ms"] = int(response_time_delta.total_seconds() * 1000)
+            except (TypeError, AttributeError):
+                record["response_time_ms"] = None
+            
+            # 可选记录响应头和响应体
+            if self.audit_full_response:
+                record["response_headers"] = self._serialize_headers(response_info.get("response_headers"))
+                record["response_body"] = self._serialize_body(response_info.get("response_body"))
+            
+            await self._submit(record)
+            
+            self.logger.info(
+                "Request complete logged",
+                request_id=request_id,
+                status_code=record["status_code"],
+                response_time_ms=record["response_time_ms"],
+                is_stream=record["is_stream"]
+            )
                     
         except Exception as e:
             self.logger.error(
@@ -223,50 +176,43 @@ class AuditService:
     
     async def log_stream_chunk(self, request_id: str, chunk_size: int) -> None:
         """
-        记录流式响应块信息（增量更新）
+        记录流式响应块信息（内存中增量累加）
         
         Args:
             request_id: 请求ID
             chunk_size: 块大小
         """
-        # 对于流式响应，完全异步处理，绝不阻塞主流程
-        # 即使 async_audit 为 False，也要异步处理流式块记录
-        asyncio.create_task(self._log_stream_chunk_impl(request_id, chunk_size))
+        record = _pending_records.get(request_id)
+        if record is not None:
+            record["stream_chunks"] += 1
+            record["response_size"] += chunk_size
     
-    async def _log_stream_chunk_impl(self, request_id: str, chunk_size: int) -> None:
-        """记录流式响应块的实现"""
-        try:
-            # 使用异步数据库操作，减少阻塞
-            import asyncio
-            import threading
-            
-            def update_in_thread():
-                try:
-                    db = next(get_db())
-                    try:
-                        audit_log = db.query(AuditLogDB).filter(AuditLogDB.request_id == request_id).first()
-                        if audit_log:
-                            # 增量更新
-                            audit_log.stream_chunks = (audit_log.stream_chunks or 0) + 1
-                            audit_log.response_size = (audit_log.response_size or 0) + chunk_size
-                            db.commit()
-                    finally:
-                        db.close()
-                except Exception as e:
-                    # 在线程中的错误不抛出，只记录
-                    pass
-            
-            # 在后台线程中执行数据库更新，完全不阻塞事件循环
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, update_in_thread)
-                    
-        except Exception as e:
-            # 流式块记录失败不应该影响主流程，只记录警告
-            self.logger.warning(
-                "Failed to log stream chunk",
-                error=str(e),
-                request_id=request_id
-            )
+    async def _submit(self, record: Dict[str, Any]) -> None:
+        """将完整记录提交给写入器（同步审计模式下直接写入）"""
+        record["created_at"] = get_china_time()
+        row = AuditWriter.build_row(record)
+        if self.async_audit:
+            await audit_writer.submit(row)
+        else:
+            await audit_writer.write_direct(row)
+    
+    async def _sweep_pending(self) -> None:
+        """将长时间未完成的请求按未完成状态写入，避免暂存记录无限增长"""
+        global _last_sweep
+        now = time.monotonic()
+        if now - _last_sweep < PENDING_SWEEP_INTERVAL:
+            return
+        _last_sweep = now
+        
+        pending_timeout = settings.proxy.get('audit_writer', {}).get('pending_timeout', 600)
+        expired = [
+            request_id for request_id, record in _pending_records.items()
+            if now - record["_started"] > pending_timeout
+        ]
+        for request_id in expired:
+            await self._submit(_pending_records.pop(request_id))
+        if expired:
+            self.logger.warning("Incomplete audit records flushed", count=len(expired))
     
     def get_logs(
         self,
@@ -426,7 +372,7 @@ class AuditService:
                 else:
                     sanitized[key] = "[REDACTED]"
             
-            json_str = json.dumps(sanitized, ensure_ascii=False)
+            json_str = jsoncodec.dumps(sanitized)
             
             # 限制大小
             if len(json_str) > self.MAX_HEADER_SIZE:
@@ -453,7 +399,7 @@ class AuditService:
         
         try:
             if isinstance(body, (dict, list)):
-                json_str = json.dumps(body, ensure_ascii=False)
+                json_str = jsoncodec.dumps(body)
             elif isinstance(body, str):
                 json_str = body
             else:
@@ -491,6 +437,7 @@ class AuditService:
             "ip_address": db_log.ip_address,
             "is_stream": db_log.is_stream,
             "stream_chunks": db_log.stream_chunks,
+            "coalesced_with": db_log.coalesced_with,
             "error_message": db_log.error_message,
             "request_headers": db_log.request_headers,
             "request_body": db_log.request_body,
@@ -521,6 +468,7 @@ class AuditService:
             "ip_address": db_log.ip_address,
             "is_stream": db_log.is_stream,
             "stream_chunks": db_log.stream_chunks,
+            "coalesced_with": db_log.coalesced_with,
             "error_message": db_log.error_message,
             "request_headers": db_log.request_headers,
             "request_body": db_log.request_body,
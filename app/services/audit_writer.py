@@ -0,0 +1,311 @@
+"""
+审计日志批量写入器
+审计记录在内存中组装完整后放入有界队列，由单个消费者按批次（batch_size / linger_ms）
+通过 executemany 一次性写入；队列满时按配置的溢出策略处理：
+- drop: 丢弃并计数
+- block: 等待队列空出位置（对请求施加背压）
+- spill: 先缓存在内存中，由消费者每批一次在线程池中追加写入本地 JSONL 文件，队列空闲时回放入库
+"""
+
+import asyncio
+import os
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+import structlog
+
+from ..config import settings
+from ..database import engine
+from ..models.audit_log import AuditLogDB
+from ..utils import jsoncodec
+
+logger = structlog.get_logger(__name__)
+
+OVERFLOW_POLICIES = ("drop", "block", "spill")
+
+# 队列停止标记
+_STOP = object()
+
+# 审计表的全部列及日期列，executemany 要求每行键一致
+AUDIT_COLUMNS = tuple(column.name for column in AuditLogDB.__table__.columns)
+DATETIME_COLUMNS = frozenset(
+    column.name for column in AuditLogDB.__table__.columns if isinstance(column.type, DateTime)
+)
+
+
+class AuditWriter:
+    """审计日志单消费者批量写入器"""
+
+    def __init__(
+        self,
+        queue_size: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        linger_ms: Optional[int] = None,
+        overflow_policy: Optional[str] = None,
+        spill_file: Optional[str] = None,
+        bind: Optional[Engine] = None
+    ):
+        """
+        初始化写入器
+
+        Args:
+            queue_size: 队列容量
+            batch_size: 单批最大行数
+            linger_ms: 凑批等待时间（毫秒）
+            overflow_policy: 队列满时的处理策略（drop / block / spill）
+            spill_file: spill 策略使用的本地文件
+            bind: 数据库引擎，默认使用应用数据库
+        """
+        writer_config = settings.proxy.get('audit_writer', {})
+        self.queue_size = queue_size or writer_config.get('queue_size', 10000)
+        self.batch_size = batch_size or writer_config.get('batch_size', 200)
+        self.linger = (linger_ms if linger_ms is not None else writer_config.get('linger_ms', 50)) / 1000
+        self.overflow_policy = overflow_policy or writer_config.get('overflow_policy', 'drop')
+        self.spill_file = spill_file or writer_config.get('spill_file', 'logs/audit_spill.jsonl')
+        if self.overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Invalid audit overflow policy: {self.overflow_policy}")
+
+        self.logger = logger.bind(service="audit_writer")
+        self._engine = bind or engine
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # 等待消费者追加写入溢出文件的记录（不在请求路径上写文件）
+        self._spill_buffer: List[Dict[str, Any]] = []
+
+        # 统计计数
+        self.written = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        """消费者是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    @property
+    def depth(self) -> int:
+        """当前队列深度"""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> Dict[str, Any]:
+        """写入器统计信息"""
+        return {
+            "running": self.running,
+            "queue_depth": self.depth,
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy,
+            "written": self.written,
+            "dropped": self.dropped,
+            "spilled": self.spilled,
+            "spill_pending": len(self._spill_buffer),
+            "failed": self.failed
+        }
+
+    @staticmethod
+    def build_row(record: Dict[str, Any]) -> Dict[str, Any]:
+        """按审计表全部列补齐一行"""
+        return {column: record.get(column) for column in AUDIT_COLUMNS}
+
+    async def submit(self, row: Dict[str, Any]) -> None:
+        """
+        提交一行审计记录
+
+        Args:
+            row: 完整的审计记录（键为审计表列名）
+        """
+        if not self.running:
+            # 写入器未启动（如脚本或测试中直接使用），直接写入
+            await self.write_direct(row)
+            return
+
+        try:
+            self._queue.put_nowait(row)
+            return
+        except asyncio.QueueFull:
+            pass
+
+        if self.overflow_policy == "block":
+            await self._queue.put(row)
+        elif self.overflow_policy == "spill":
+            self._spill_buffer.append(row)
+        else:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                self.logger.warning("Audit queue full, dropping records", dropped=self.dropped)
+
+    async def write_direct(self, row: Dict[str, Any]) -> None:
+        """
+        绕过队列，在线程池中直接写入一行（同步审计模式使用）
+
+        Args:
+            row: 完整的审计记录
+        """
+        try:
+            await run_in_threadpool(self._insert, [row])
+            self.written += 1
+        except Exception as e:
+            self.failed += 1
+            self.logger.error("Failed to write audit log", error=str(e), request_id=row.get("request_id"))
+
+    def start(self) -> None:
+        """启动消费者（需在事件循环中调用）"""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+        self.logger.info("Audit writer started", batch_size=self.batch_size,
+                         linger_ms=int(self.linger * 1000), overflow_policy=self.overflow_policy)
+
+    async def stop(self) -> None:
+        """停止消费者并写完队列中剩余记录"""
+        if self.running:
+            # 放入停止标记，消费者写完当前批次后退出
+            await self._queue.put(_STOP)
+            await self._task
+        self._task = None
+
+        if self._queue is not None:
+            remaining = []
+            self._drain(remaining, self._queue.qsize() + 1)
+            for start in range(0, len(remaining), self.batch_size):
+                await self._write_batch(remaining[start:start + self.batch_size])
+            self._queue = None
+        await self._flush_spill()
+
+        self.logger.info("Audit writer stopped", **self.stats())
+
+    async def _run(self) -> None:
+        """消费循环：取到首条记录后等待 linger 凑批，再批量写入"""
+        stopping = False
+        while not stopping:
+            batch = []
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch.append(first)
+            stopping = self._drain(batch, self.batch_size)
+            if not stopping and len(batch) < self.batch_size and self.linger > 0:
+                await asyncio.sleep(self.linger)
+                stopping = self._drain(batch, self.batch_size)
+
+            await self._write_batch(batch)
+            await self._flush_spill()
+
+            if self._queue.empty() and self.overflow_policy == "spill" and os.path.exists(self.spill_file):
+                await self._replay_spill()
+
+    def _drain(self, batch: List[Dict[str, Any]], limit: int) -> bool:
+        """
+        非阻塞地从队列取出记录直到批次满
+
+        Returns:
+            bool: 是否取到了停止标记
+        """
+        while len(batch) < limit:
+            try:
+                row = self._queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return False
+            if row is _STOP:
+                return True
+            batch.append(row)
+        return False
+
+    async def _write_batch(self, batch: List[Dict[str, Any]]) -> None:
+        """写入一批记录，失败时按溢出策略保留"""
+        try:
+            await run_in_threadpool(self._insert, batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.logger.error("Failed to write audit batch", error=str(e), rows=len(batch))
+            if self.overflow_policy == "spill":
+                await run_in_threadpool(self._spill, batch)
+            else:
+                self.failed += len(batch)
+
+    def _insert(self, rows: List[Dict[str, Any]], ignore_duplicates: bool = False) -> None:
+        """executemany 批量插入"""
+        statement = AuditLogDB.__table__.insert()
+        if ignore_duplicates and self._engine.dialect.name == "sqlite":
+            statement = statement.prefix_with("OR IGNORE")
+        with self._engine.begin() as conn:
+            conn.execute(statement, rows)
+
+    async def _flush_spill(self) -> None:
+        """在线程池中把内存中等待溢出的记录一次性追加写入溢出文件"""
+        rows, self._spill_buffer = self._spill_buffer, []
+        if rows:
+            await run_in_threadpool(self._spill, rows)
+
+    def _spill(self, rows: List[Dict[str, Any]]) -> None:
+        """追加写入溢出文件（同步，在线程池中调用）"""
+        try:
+            directory = os.path.dirname(self.spill_file)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(jsoncodec.dumps(row, default=_json_default) + "\n")
+            self.spilled += len(rows)
+        except Exception as e:
+            self.failed += len(rows)
+            self.logger.error("Failed to spill audit records", error=str(e), rows=len(rows))
+
+    async def _replay_spill(self) -> None:
+        """队列空闲时把溢出文件回放入库"""
+        try:
+            replayed = await run_in_threadpool(self._replay_spill_sync)
+            if replayed:
+                self.written += replayed
+                self.logger.info("Audit spill file replayed", rows=replayed)
+        except Exception as e:
+            self.logger.error("Failed to replay audit spill file", error=str(e))
+
+    def _replay_spill_sync(self) -> int:
+        """读取溢出文件并分批写入，成功后删除文件"""
+        replay_file = self.spill_file + ".replay"
+        if not os.path.exists(replay_file):
+            os.replace(self.spill_file, replay_file)
+
+        replayed = 0
+        batch = []
+        with open(replay_file, "r", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                batch.append(_restore_row(jsoncodec.loads(line)))
+                if len(batch) >= self.batch_size:
+                    # 回放可能因中途失败而重复执行，忽略已写入的主键
+                    self._insert(batch, ignore_duplicates=True)
+                    replayed += len(batch)
+                    batch = []
+        if batch:
+            self._insert(batch, ignore_duplicates=True)
+            replayed += len(batch)
+
+        os.remove(replay_file)
+        return replayed
+
+
+def _json_default(value: Any) -> Any:
+    """溢出文件序列化：日期转 ISO 字符串"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _restore_row(data: Dict[str, Any]) -> Dict[str, Any]:
+    """溢出文件反序列化：恢复日期列"""
+    row = AuditWriter.build_row(data)
+    for column in DATETIME_COLUMNS:
+        if isinstance(row.get(column), str):
+            row[column] = datetime.fromisoformat(row[column])
+    return row
+
+
+# 全局写入器实例
+audit_writer = AuditWriter()
@@ -0,0 +1,301 @@
+"""
+请求体惰性视图 - 只提取路由需要的顶层字段
+路由匹配通常只需要 model、stream 等少数顶层字段，按字节扫描顶层对象，跳过其他值（如很长的 messages），
+只对需要的字段做 JSON 解析；未改写时原样转发原始字节
+
+add_body_fields 按字节注入：把预先序列化的字段片段拼接到顶层对象的结束括号之前，
+只有与已有顶层键冲突时才完整解析并重新序列化
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, Optional, Set
+from ..utils import jsoncodec
+
+# 简单键值匹配之外的 JSON Schema 关键字（与 RouteMatcher._validate_json_schema 一致）
+JSON_SCHEMA_KEYWORDS = {"type", "properties", "required", "items", "additionalProperties", "enum", "const"}
+
+_WHITESPACE = re.compile(rb"[ \t\n\r]*")
+_SCALAR_END = re.compile(rb"[ \t\n\r,}\]]")
+
+_QUOTE = 0x22
+_BACKSLASH = 0x5C
+_OPENERS = (0x7B, 0x5B)  # { [
+
+# 平均每个引号对应的字节数低于该值时（大量短字符串），逐个跳过不如完整解析快
+MIN_BYTES_PER_QUOTE = 256
+
+
+def body_schema_keys(schema: Any) -> Optional[Set[str]]:
+    """
+    计算 match_body_schema 需要的顶层字段
+
+    Args:
+        schema: 已解析的 match_body_schema
+
+    Returns:
+        Optional[Set[str]]: 简单键值匹配时返回字段集合；JSON Schema 或无法解析时返回 None（需要完整解析）
+    """
+    if not isinstance(schema, dict) or not schema:
+        return None
+    if any(key in schema for key in JSON_SCHEMA_KEYWORDS):
+        return None
+    return set(schema)
+
+
+def encode_fields_fragment(fields: Any) -> Optional[bytes]:
+    """
+    预先序列化 add_body_fields 为可直接拼接的对象成员片段（不含花括号）
+
+    Args:
+        fields: 已解析的 add_body_fields
+
+    Returns:
+        Optional[bytes]: 如 b'"user":"gw","n":1'，不是非空对象时返回 None
+    """
+    if not isinstance(fields, dict) or not fields:
+        return None
+    encoded = jsoncodec.dumpb(fields)
+    return encoded[1:-1]
+
+
+def _skip_whitespace(buf: bytes, pos: int) -> int:
+    return _WHITESPACE.match(buf, pos).end()
+
+
+@lru_cache(maxsize=256)
+def _key_pattern(key: str) -> "re.Pattern[bytes]":
+    """匹配作为对象键出现的 `"键名":`（作为字符串值出现时不匹配）"""
+    return re.compile(re.escape(jsoncodec.dumpb(key)) + rb"[ \t\n\r]*:")
+
+
+def _last_non_whitespace(buf: bytes, pos: int) -> int:
+    while pos >= 0 and buf[pos] in b" \t\n\r":
+        pos -= 1
+    return pos
+
+
+def _skip_string(buf: bytes, pos: int) -> int:
+    """跳过从 pos 处引号开始的字符串（按 memchr 查找下一个未转义引号）"""
+    end = buf.find(b'"', pos + 1)
+    while end != -1:
+        back = end - 1
+        while buf[back] == _BACKSLASH:
+            back -= 1
+        if (end - 1 - back) % 2 == 0:
+            return end + 1
+        end = buf.find(b'"', end + 1)
+    raise ValueError(f"Unterminated string at {pos}")
+
+
+def _last_bracket(buf: bytes, start: int, stop: int) -> int:
+    return max(buf.rfind(b"]", start, stop), buf.rfind(b"}", start, stop))
+
+
+def _skip_container(buf: bytes, pos: int) -> int:
+    """
+    跳过从 pos 处开始的对象或数组：在相邻两个字符串之间按段统计括号数，
+    容器结束后到下一个键之前只可能出现 ',' 或顶层的 '}'，因此结束位置就是段内最后的括号
+    """
+    depth = 0
+    while True:
+        quote = buf.find(b'"', pos)
+        stop = len(buf) if quote == -1 else quote
+        depth += (buf.count(b"{", pos, stop) + buf.count(b"[", pos, stop)
+                  - buf.count(b"}", pos, stop) - buf.count(b"]", pos, stop))
+        if depth <= 0:
+            end = _last_bracket(buf, pos, stop)
+            if depth == -1:
+                # 顶层对象也在本段结束
+                end = _last_bracket(buf, pos, end)
+            elif depth < -1:
+                raise ValueError(f"Unbalanced brackets near {pos}")
+            if end < 0:
+                raise ValueError(f"Unbalanced brackets near {pos}")
+            return end + 1
+        if quote == -1:
+            raise ValueError("Unterminated container")
+        pos = _skip_string(buf, quote)
+
+
+def _skip_value(buf: bytes, pos: int) -> int:
+    """跳过一个 JSON 值，返回其结束位置（不构造对象）"""
+    if pos >= len(buf):
+        raise ValueError("Unexpected end of body")
+
+    first = buf[pos]
+    if first == _QUOTE:
+        return _skip_string(buf, pos)
+    if first in _OPENERS:
+        return _skip_container(buf, pos)
+
+    match = _SCALAR_END.search(buf, pos)
+    end = match.start() if match else len(buf)
+    if end == pos:
+        raise ValueError(f"Unexpected character at {pos}")
+    return end
+
+
+def scan_top_level(buf: bytes, wanted: Iterable[str]) -> Dict[str, Any]:
+    """
+    扫描 JSON 对象的顶层字段，只解析 wanted 中的字段（重复键以最后一个为准，与 json.loads 一致）
+
+    Args:
+        buf: 原始请求体
+        wanted: 需要提取的字段
+
+    Returns:
+        Dict[str, Any]: 提取到的字段
+
+    Raises:
+        ValueError: 不是 JSON 对象或格式错误
+    """
+    wanted = set(wanted)
+    found: Dict[str, Any] = {}
+
+    pos = _skip_whitespace(buf, 0)
+    if pos >= len(buf) or buf[pos] != 0x7B:
+        raise ValueError("Body is not a JSON object")
+    pos = _skip_whitespace(buf, pos + 1)
+
+    if pos < len(buf) and buf[pos] == 0x7D:
+        pos += 1
+    else:
+        while True:
+            key_end = _skip_string(buf, pos) if pos < len(buf) and buf[pos] == _QUOTE else -1
+            if key_end < 0:
+                raise ValueError(f"Expected key at {pos}")
+            raw_key = buf[pos + 1:key_end - 1]
+            key = jsoncodec.loads(buf[pos:key_end]) if b"\\" in raw_key else raw_key.decode("utf-8")
+
+            pos = _skip_whitespace(buf, key_end)
+            if pos >= len(buf) or buf[pos] != 0x3A:
+                raise ValueError(f"Expected ':' at {pos}")
+            pos = _skip_whitespace(buf, pos + 1)
+
+            value_end = _skip_value(buf, pos)
+            if key in wanted:
+                found[key] = jsoncodec.loads(buf[pos:value_end])
+
+            pos = _skip_whitespace(buf, value_end)
+            if pos < len(buf) and buf[pos] == 0x2C:
+                pos = _skip_whitespace(buf, pos + 1)
+                continue
+            if pos < len(buf) and buf[pos] == 0x7D:
+                pos += 1
+                break
+            raise ValueError(f"Expected ',' or '}}' at {pos}")
+
+    if _skip_whitespace(buf, pos) != len(buf):
+        raise ValueError("Extra data after JSON object")
+    return found
+
+
+class JSONBodyView:
+    """JSON 请求体的惰性视图"""
+
+    __slots__ = ("raw", "_parsed", "_is_parsed")
+
+    def __init__(self, raw: bytes):
+        """
+        初始化
+
+        Args:
+            raw: 原始请求体
+        """
+        self.raw = raw
+        self._parsed: Any = None
+        self._is_parsed = False
+
+    @property
+    def size(self) -> int:
+        """请求体字节数"""
+        return len(self.raw)
+
+    def parsed(self) -> Any:
+        """
+        完整解析请求体（结果缓存）
+
+        Raises:
+            jsoncodec.JSONDecodeError: 请求体不是合法 JSON
+        """
+        if not self._is_parsed:
+            self._parsed = jsoncodec.loads(self.raw)
+            self._is_parsed = True
+        return self._parsed
+
+    def extract(self, keys: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        提取顶层字段
+
+        Args:
+            keys: 需要的字段，None 表示全部（完整解析）
+
+        Returns:
+            Dict[str, Any]: 字段字典；请求体不是 JSON 对象时返回空字典
+        """
+        if keys is not None and not self._is_parsed:
+            keys = set(keys)
+            # 大量短字符串时逐个跳过不如完整解析快
+            if self.raw.count(b'"') * MIN_BYTES_PER_QUOTE <= self.size:
+                try:
+                    return scan_top_level(self.raw, keys)
+                except ValueError:
+                    # 扫描失败时按完整解析处理（非法 JSON 时抛出与原逻辑相同的异常）
+                    pass
+
+        body = self.parsed()
+        if not isinstance(body, dict):
+            return {}
+        return body if keys is None else {key: body[key] for key in keys if key in body}
+
+    def with_fields(self, fields: Dict[str, Any], fragment: Optional[bytes] = None) -> Optional[bytes]:
+        """
+        按字节把字段注入顶层对象（拼接到结束括号之前）
+
+        Args:
+            fields: 要注入的字段
+            fragment: 预先序列化的片段（encode_fields_fragment），None 时现场序列化
+
+        Returns:
+            Optional[bytes]: 注入后的请求体；字段与已有顶层键冲突或请求体不是对象时返回 None，
+                由调用方完整解析后合并
+        """
+        if fragment is None:
+            fragment = encode_fields_fragment(fields)
+            if fragment is None:
+                return self.raw
+
+        raw = self.raw
+        start = _skip_whitespace(raw, 0)
+        end = _last_non_whitespace(raw, len(raw) - 1)
+        if start >= end or raw[start] != 0x7B or raw[end] != 0x7D:
+            return None
+
+        if self._has_any_key(fields):
+            return None
+
+        # 结束括号前第一个非空白字符是起始括号时为空对象，不需要逗号
+        separator = b"" if _last_non_whitespace(raw, end - 1) == start else b","
+        return b"".join((raw[:end], separator, fragment, raw[end:]))
+
+    def _has_any_key(self, keys: Iterable[str]) -> bool:
+        """
+        顶层是否已有任一键：任何层级都找不到 `"键名":` 时必然不存在，否则精确提取
+        用 \\u 转义写出的同名键不会被识别，注入字段位于对象末尾，按“后出现者生效”解析时仍覆盖原值
+        """
+        if not any(_key_pattern(key).search(self.raw) for key in keys):
+            return False
+        return bool(self.extract(keys))
+
+    def audit_text(self, limit: int = 10240) -> str:
+        """
+        审计用的请求体文本（超出 limit 时截断）
+
+        Args:
+            limit: 最大字节数
+        """
+        text = self.raw[:limit].decode("utf-8", errors="replace")
+        if self.size > limit:
+            text += f"...[truncated, {self.size} bytes]"
+        return text
@@ -0,0 +1,292 @@
+"""
+上游熔断器
+按上游主机维护熔断状态（closed / open / half_open）：
+- closed: 正常转发，按秒分槽的滚动窗口统计请求数和失败数（连接错误、超时和 5xx），
+  窗口内请求数达到 minimum_requests 且失败率达到 failure_rate_threshold 时熔断
+- open: 直接拒绝（代理引擎返回 503），open_seconds 后进入半开
+- half_open: 最多放行 half_open_max_calls 个试探请求，全部成功后恢复 closed，任一失败重新熔断
+
+熔断中的主机集合在状态变化时更新，负载均衡选择和转发前检查只做一次字典查询
+"""
+
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class HostCircuit:
+    """单个上游主机的熔断状态"""
+
+    __slots__ = ("state", "opened_at", "open_until", "trial_calls", "trial_successes",
+                 "opens", "rejected", "last_failure", "_totals", "_failures", "_stamps")
+
+    def __init__(self, window_seconds: int):
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.open_until = 0.0
+        self.trial_calls = 0
+        self.trial_successes = 0
+        self.opens = 0
+        self.rejected = 0
+        self.last_failure: Optional[str] = None
+        self._totals = [0] * window_seconds
+        self._failures = [0] * window_seconds
+        self._stamps = [0] * window_seconds
+
+    def add(self, failed: bool, now: float) -> None:
+        """向滚动窗口记录一次结果"""
+        second = int(now)
+        index = second % len(self._stamps)
+        if self._stamps[index] != second:
+            self._stamps[index] = second
+            self._totals[index] = 0
+            self._failures[index] = 0
+        self._totals[index] += 1
+        if failed:
+            self._failures[index] += 1
+
+    def window(self, now: float) -> Tuple[int, int]:
+        """滚动窗口内的 (请求数, 失败数)"""
+        oldest = int(now) - len(self._stamps)
+        total = failures = 0
+        for count, failed, stamp in zip(self._totals, self._failures, self._stamps):
+            if stamp > oldest:
+                total += count
+                failures += failed
+        return total, failures
+
+    def reset_window(self) -> None:
+        """清空滚动窗口"""
+        for index in range(len(self._stamps)):
+            self._totals[index] = self._failures[index] = self._stamps[index] = 0
+
+
+class CircuitBreaker:
+    """按上游主机的熔断器"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化熔断器
+
+        Args:
+            config: 熔断配置，默认读取 proxy.circuit_breaker
+        """
+        config = config if config is not None else settings.proxy.get('circuit_breaker', {})
+
+        self.enabled = config.get('enabled', True)
+        self.window_seconds = max(int(config.get('window_seconds', 30)), 1)
+        self.minimum_requests = config.get('minimum_requests', 20)
+        self.failure_rate_threshold = config.get('failure_rate_threshold', 0.5)
+        self.open_seconds = config.get('open_seconds', 30)
+        self.half_open_max_calls = max(int(config.get('half_open_max_calls', 3)), 1)
+
+        self.logger = logger.bind(service="circuit_breaker")
+        self._hosts: Dict[str, HostCircuit] = {}
+        # 熔断中的主机及进入半开的时间
+        self._open: Dict[str, float] = {}
+
+    def _circuit(self, host: str) -> HostCircuit:
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            circuit = self._hosts[host] = HostCircuit(self.window_seconds)
+        return circuit
+
+    def open_hosts(self, now: Optional[float] = None) -> Set[str]:
+        """
+        当前熔断（尚未到半开时间）的主机，供负载均衡跳过
+
+        Args:
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            Set[str]: 主机集合
+        """
+        if not self._open:
+            return set()
+        now = time.monotonic() if now is None else now
+        return {host for host, until in self._open.items() if until > now}
+
+    def state(self, host: str, now: Optional[float] = None) -> str:
+        """
+        主机当前的熔断状态（open 到期时转为 half_open）
+
+        Args:
+            host: 目标主机
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            str: closed / open / half_open
+        """
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            return CLOSED
+        if circuit.state == OPEN:
+            now = time.monotonic() if now is None else now
+            if circuit.open_until <= now:
+                self._to_half_open(host, circuit)
+        return circuit.state
+
+    def allow(self, host: str, now: Optional[float] = None) -> bool:
+        """
+        转发前检查是否放行；半开状态下占用一个试探名额
+
+        Args:
+            host: 目标主机
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            bool: 是否放行
+        """
+        if not self.enabled:
+            return True
+        circuit = self._hosts.get(host)
+        if circuit is None or circuit.state == CLOSED:
+            return True
+        now = time.monotonic() if now is None else now
+        state = self.state(host, now)
+        if state == HALF_OPEN:
+            # 试探请求迟迟没有结果（如被客户端取消）时，过了 open_seconds 重新放行一批
+            if circuit.trial_calls >= self.half_open_max_calls and now - circuit.opened_at >= self.open_seconds:
+                circuit.opened_at = now
+                circuit.trial_calls = circuit.trial_successes
+            if circuit.trial_calls < self.half_open_max_calls:
+                circuit.trial_calls += 1
+                return True
+        circuit.rejected += 1
+        return False
+
+    def retry_after(self, host: str, now: Optional[float] = None) -> int:
+        """
+        距离下次放行试探请求的秒数（用于 Retry-After）
+
+        Args:
+            host: 目标主机
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            int: 秒数，至少为 1
+        """
+        circuit = self._hosts.get(host)
+        if circuit is None:
+            return 1
+        now = time.monotonic() if now is None else now
+        if circuit.state == OPEN:
+            return max(int(circuit.open_until - now + 0.999), 1)
+        return max(int(circuit.opened_at + self.open_seconds - now + 0.999), 1)
+
+    def record_success(self, host: str, now: Optional[float] = None) -> None:
+        """
+        记录一次成功转发
+
+        Args:
+            host: 目标主机
+            now: 当前时间（monotonic 秒）
+        """
+        if not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        circuit = self._circuit(host)
+        if circuit.state == HALF_OPEN:
+            circuit.trial_successes += 1
+            if circuit.trial_successes >= self.half_open_max_calls:
+                circuit.state = CLOSED
+                circuit.reset_window()
+                self.logger.info("Circuit closed", host=host)
+            return
+        if circuit.state == CLOSED:
+            circuit.add(False, now)
+
+    def record_failure(self, host: str, reason: str, now: Optional[float] = None) -> bool:
+        """
+        记录一次失败转发（连接错误、超时或 5xx），失败率达到阈值或半开试探失败时熔断
+
+        Args:
+            host: 目标主机
+            reason: 失败原因
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            bool: 本次是否触发熔断
+        """
+        if not self.enabled:
+            return False
+        now = time.monotonic() if now is None else now
+        circuit = self._circuit(host)
+        circuit.last_failure = reason
+
+        if circuit.state == HALF_OPEN:
+            self._trip(host, circuit, now, reason)
+            return True
+        if circuit.state == OPEN:
+            return False
+
+        circuit.add(True, now)
+        total, failures = circuit.window(now)
+        if total < self.minimum_requests or failures < total * self.failure_rate_threshold:
+            return False
+        self._trip(host, circuit, now, reason, total=total, failures=failures)
+        return True
+
+    def _trip(self, host: str, circuit: HostCircuit, now: float, reason: str, **window) -> None:
+        circuit.state = OPEN
+        circuit.opens += 1
+        circuit.opened_at = now
+        circuit.open_until = now + self.open_seconds
+        self._open[host] = circuit.open_until
+        self.logger.warning("Circuit opened", host=host, reason=reason,
+                            open_seconds=self.open_seconds, **window)
+
+    def _to_half_open(self, host: str, circuit: HostCircuit) -> None:
+        circuit.state = HALF_OPEN
+        circuit.opened_at = circuit.open_until
+        circuit.trial_calls = 0
+        circuit.trial_successes = 0
+        self._open.pop(host, None)
+        self.logger.info("Circuit half-open", host=host, trial_calls=self.half_open_max_calls)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        熔断状态快照（管理接口使用）
+
+        Returns:
+            Dict[str, Any]: 各主机的熔断状态
+        """
+        now = time.monotonic()
+        hosts: List[Dict[str, Any]] = []
+        for host, circuit in sorted(self._hosts.items()):
+            state = self.state(host, now)
+            total, failures = circuit.window(now)
+            hosts.append({
+                "host": host,
+                "state": state,
+                "window_requests": total,
+                "window_failures": failures,
+                "failure_rate": round(failures / total, 3) if total else 0.0,
+                "open_remaining_seconds": round(max(circuit.open_until - now, 0), 1) if state == OPEN else 0,
+                "opens": circuit.opens,
+                "rejected": circuit.rejected,
+                "last_failure": circuit.last_failure,
+            })
+        return {
+            "enabled": self.enabled,
+            "window_seconds": self.window_seconds,
+            "minimum_requests": self.minimum_requests,
+            "failure_rate_threshold": self.failure_rate_threshold,
+            "open_seconds": self.open_seconds,
+            "half_open_max_calls": self.half_open_max_calls,
+            "open_circuits": sum(1 for entry in hosts if entry["state"] == OPEN),
+            "hosts": hosts,
+        }
+
+
+# 全局熔断器实例
+circuit_breaker = CircuitBreaker()
@@ -0,0 +1,700 @@
+"""
+响应缓存磁盘层
+内存 LRU 之后的第二层缓存，条目追加写入分段文件，同一主机上的多个 worker 共享同一目录：
+- 记录格式：固定头（魔数、类型、各段长度、状态码、写入/过期时间、CRC32）+ 缓存键 + 元数据 JSON + 响应体
+- 每个 worker 在内存中维护 缓存键 -> 文件位置 的索引，启动时扫描全部分段重建，
+  之后按 sync_interval_seconds 增量扫描其他 worker 追加的记录；同一个键以写入时间较新的记录为准
+- 读取只查内存索引并通过 mmap 返回 memoryview，响应体不复制为 Python bytes
+- 写入先进入有界队列（超过 max_pending_writes 时丢弃），由后台任务在线程池中批量追加，
+  同步和压缩也在线程池中执行，事件循环上不做文件 IO；后台任务未启动时（脚本、测试）同步执行
+- 追加写入持有目录文件锁（非阻塞，锁被占用时跳过本批写入）；当前分段超过 segment_bytes 时切换到新分段
+- 后台压缩：失效字节比例超过 compaction_dead_ratio 的旧分段，把仍有效的记录重写到当前分段后删除；
+  总大小超过 max_bytes 时删除最旧的分段；过期条目在压缩时丢弃
+"""
+
+import asyncio
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+from starlette.concurrency import run_in_threadpool
+
+from ..utils import jsoncodec
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台：只能单进程使用
+    fcntl = None
+
+logger = structlog.get_logger(__name__)
+
+MAGIC = b"FGC1"
+# 魔数, 类型, 键长度, 元数据长度, 响应体长度, 状态码, 写入时间, 过期时间, CRC32
+_HEADER = struct.Struct("<4sBHIIHddI")
+KIND_PUT = 0
+KIND_DELETE_ROUTE = 1
+
+_SEGMENT_PREFIX = "segment-"
+_SEGMENT_SUFFIX = ".dat"
+_LOCK_FILE = ".lock"
+
+
+def _segment_name(segment_id: int) -> str:
+    return f"{_SEGMENT_PREFIX}{segment_id:08d}{_SEGMENT_SUFFIX}"
+
+
+def _parse_segment_name(name: str) -> Optional[int]:
+    if not (name.startswith(_SEGMENT_PREFIX) and name.endswith(_SEGMENT_SUFFIX)):
+        return None
+    try:
+        return int(name[len(_SEGMENT_PREFIX):-len(_SEGMENT_SUFFIX)])
+    except ValueError:
+        return None
+
+
+class _Slot:
+    """索引项：一条记录在分段文件中的位置"""
+
+    __slots__ = ("segment", "offset", "size", "meta_len", "body_len", "status",
+                 "stored_at", "expires_at", "route_id", "key_len")
+
+    def __init__(self, segment: int, offset: int, key_len: int, meta_len: int, body_len: int,
+                 status: int, stored_at: float, expires_at: float, route_id: str):
+        self.segment = segment
+        self.offset = offset
+        self.key_len = key_len
+        self.meta_len = meta_len
+        self.body_len = body_len
+        self.size = _HEADER.size + key_len + meta_len + body_len
+        self.status = status
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.route_id = route_id
+
+    @property
+    def meta_offset(self) -> int:
+        return self.offset + _HEADER.size + self.key_len
+
+    @property
+    def body_offset(self) -> int:
+        return self.meta_offset + self.meta_len
+
+    def moved(self, segment: int, offset: int) -> "_Slot":
+        """压缩后的新位置"""
+        return _Slot(segment, offset, self.key_len, self.meta_len, self.body_len,
+                     self.status, self.stored_at, self.expires_at, self.route_id)
+
+
+class _Segment:
+    """分段文件及其只读映射"""
+
+    __slots__ = ("id", "path", "scanned", "_map")
+
+    def __init__(self, segment_id: int, path: str):
+        self.id = segment_id
+        self.path = path
+        self.scanned = 0
+        self._map: Optional[mmap.mmap] = None
+
+    def view(self, end: int) -> Optional[mmap.mmap]:
+        """
+        覆盖到 end 的映射，文件增长后重新映射（旧映射由仍在使用的 memoryview 持有，不主动关闭）
+
+        Args:
+            end: 需要读取到的位置
+
+        Returns:
+            Optional[mmap.mmap]: 映射，文件为空或已被删除时返回 None
+        """
+        if self._map is not None and len(self._map) >= end:
+            return self._map
+        try:
+            with open(self.path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size == 0 or size < end:
+                    return None
+                self._map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            return None
+        return self._map
+
+    def file_size(self) -> Optional[int]:
+        try:
+            return os.path.getsize(self.path)
+        except OSError:
+            return None
+
+
+class DiskCache:
+    """分段文件响应缓存"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化磁盘缓存（首次使用时才打开目录）
+
+        Args:
+            config: 磁盘缓存配置（proxy.response_cache.disk）
+        """
+        config = config or {}
+        self.enabled = config.get('enabled', False)
+        self.path = config.get('path', './app/data/response_cache')
+        self.segment_bytes = config.get('segment_bytes', 67108864)
+        self.max_bytes = config.get('max_bytes', 1073741824)
+        self.compaction_interval = config.get('compaction_interval_seconds', 300)
+        self.compaction_dead_ratio = config.get('compaction_dead_ratio', 0.5)
+        self.sync_interval = config.get('sync_interval_seconds', 1)
+        self.max_pending_writes = config.get('max_pending_writes', 1024)
+
+        self.logger = logger.bind(service="disk_cache")
+        self._index: Dict[str, _Slot] = {}
+        self._route_tombstones: Dict[str, float] = {}
+        self._segments: Dict[int, _Segment] = {}
+        self._active = 0
+        self._opened = False
+        self._last_sync = 0.0
+        # 保护索引和分段表的修改（写入非阻塞获取，压缩阻塞获取）
+        self._mutex = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # 等待后台写入的 (类型, 键或路由ID, 条目或删除时间)
+        self._writes: "deque[Tuple[int, str, Any]]" = deque()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+
+        self.hits = 0
+        self.writes = 0
+        self.skipped_writes = 0
+        self.compactions = 0
+
+    @property
+    def running(self) -> bool:
+        """后台写入、同步和压缩任务是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    def open(self) -> None:
+        """创建目录并扫描全部分段重建索引"""
+        if self._opened:
+            return
+        os.makedirs(self.path, exist_ok=True)
+        with self._mutex:
+            self._sync_segments(time.time())
+            if not self._segments:
+                self._active = 1
+                open(os.path.join(self.path, _segment_name(1)), "ab").close()
+                self._sync_segments(time.time())
+        self._opened = True
+        self.logger.info("Disk cache opened", path=self.path, entries=len(self._index),
+                         segments=len(self._segments))
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Tuple[str, int, Dict[str, str], memoryview, float, float]]:
+        """
+        读取缓存条目
+
+        Args:
+            key: 缓存键
+            now: 当前时间（time.time 秒）
+
+        Returns:
+            Optional[Tuple]: (路由ID, 状态码, 响应头, 响应体, 写入时间, 过期时间)，
+            响应体为映射文件的 memoryview；未命中时返回 None
+        """
+        if not self.enabled:
+            return None
+        self.open()
+        now = time.time() if now is None else now
+
+        slot = self._index.get(key)
+        if slot is None and not self.running and self.sync(now):
+            slot = self._index.get(key)
+        if slot is None:
+            return None
+        deleted_at = self._route_tombstones.get(slot.route_id)
+        if deleted_at is not None and slot.stored_at <= deleted_at:
+            return None
+        # 后台同步和写入已把记录所在范围映射好，这里通常只是切片
+        segment = self._segments.get(slot.segment)
+        mapped = segment.view(slot.offset + slot.size) if segment is not None else None
+        if mapped is None:
+            return None
+
+        meta = jsoncodec.loads(mapped[slot.meta_offset:slot.body_offset])
+        body = memoryview(mapped)[slot.body_offset:slot.body_offset + slot.body_len]
+        self.hits += 1
+        return slot.route_id, slot.status, meta.get("headers") or {}, body, slot.stored_at, slot.expires_at
+
+    def put(self, key: str, entry) -> bool:
+        """
+        写入缓存条目：后台任务运行时进入写入队列，否则直接追加（目录锁被其他 worker 或压缩占用时跳过）
+
+        Args:
+            key: 缓存键
+            entry: CachedResponse
+
+        Returns:
+            bool: 是否写入（或进入写入队列）
+        """
+        if not self.enabled:
+            return False
+        if self.running:
+            return self._enqueue(KIND_PUT, key, entry)
+        self.open()
+        return self._append_batch([self._encode(KIND_PUT, key, entry)]) == 1
+
+    def delete_route(self, route_id: str, now: Optional[float] = None) -> None:
+        """
+        写入路由删除标记，各 worker 同步后丢弃该路由在此之前写入的条目
+
+        Args:
+            route_id: 路由ID
+            now: 当前时间（time.time 秒）
+        """
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        # 先记录删除时间，读取时即可过滤该路由的旧条目；清理索引和持久化在后台执行
+        if self._route_tombstones.get(route_id, 0) < now:
+            self._route_tombstones[route_id] = now
+        if self.running:
+            if not self._enqueue(KIND_DELETE_ROUTE, route_id, now):
+                self.logger.warning("Route tombstone not persisted", route_id=route_id)
+            return
+        self.open()
+        self._drop_route(route_id, now)
+        if self._append_batch([self._encode(KIND_DELETE_ROUTE, route_id, now)]) != 1:
+            self.logger.warning("Route tombstone not persisted", route_id=route_id)
+
+    def sync(self, now: Optional[float] = None, force: bool = False) -> bool:
+        """
+        增量扫描其他 worker 追加的记录和压缩删除的分段
+
+        Args:
+            now: 当前时间（time.time 秒）
+            force: 忽略同步间隔
+
+        Returns:
+            bool: 是否执行了同步
+        """
+        now = time.time() if now is None else now
+        if not force and now - self._last_sync < self.sync_interval:
+            return False
+        if not self._mutex.acquire(blocking=False):
+            return False
+        try:
+            self._sync_segments(now)
+        finally:
+            self._mutex.release()
+        return True
+
+    def compact(self, now: Optional[float] = None) -> Dict[str, int]:
+        """
+        压缩分段（在线程池中执行；其他 worker 正在压缩时跳过）
+
+        Args:
+            now: 当前时间（time.time 秒）
+
+        Returns:
+            Dict[str, int]: 本次重写的分段数、删除的分段数、丢弃的条目数
+        """
+        result = {"rewritten": 0, "deleted": 0, "dropped": 0}
+        if not self.enabled:
+            return result
+        self.open()
+        now = time.time() if now is None else now
+
+        with self._mutex:
+            lock_fd = self._try_lock()
+            if lock_fd is False:
+                return result
+            try:
+                self._sync_segments(now)
+                self._roll_active()
+
+                # 丢弃过期条目，统计各分段仍有效的字节数
+                live: Dict[int, List[Tuple[str, _Slot]]] = {}
+                for key, slot in list(self._index.items()):
+                    if slot.expires_at <= now:
+                        self._index.pop(key, None)
+                        result["dropped"] += 1
+                        continue
+                    live.setdefault(slot.segment, []).append((key, slot))
+
+                sealed = sorted(segment_id for segment_id in self._segments if segment_id != self._active)
+                total = sum(self._segments[segment_id].file_size() or 0 for segment_id in self._segments)
+
+                # 超过总大小上限时删除最旧的分段
+                for segment_id in list(sealed):
+                    if total <= self.max_bytes:
+                        break
+                    total -= self._segments[segment_id].file_size() or 0
+                    for key, slot in live.pop(segment_id, []):
+                        if self._index.get(key) is slot:
+                            self._index.pop(key, None)
+                            result["dropped"] += 1
+                    self._remove_segment(segment_id)
+                    sealed.remove(segment_id)
+                    result["deleted"] += 1
+
+                # 失效字节比例过高的分段：有效记录重写到当前分段，路由删除标记随之重写一次
+                tombstones_written = False
+                for segment_id in sealed:
+                    size = self._segments[segment_id].file_size() or 0
+                    entries = live.get(segment_id, [])
+                    live_bytes = sum(slot.size for _, slot in entries)
+                    if size and 1 - live_bytes / size < self.compaction_dead_ratio:
+                        continue
+                    if not tombstones_written:
+                        self._write_tombstones()
+                        tombstones_written = True
+                    self._rewrite(segment_id, entries)
+                    self._remove_segment(segment_id)
+                    result["rewritten"] += 1
+            finally:
+                self._unlock(lock_fd)
+
+        self.compactions += 1
+        if result["rewritten"] or result["deleted"] or result["dropped"]:
+            self.logger.info("Disk cache compacted", **result)
+        return result
+
+    async def _run(self) -> None:
+        """后台循环：在线程池中批量写入、同步其他 worker 的记录，并定期压缩"""
+        interval = max(self.sync_interval, 0.1)
+        next_compaction = time.monotonic() + self.compaction_interval
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if self._stopping:
+                return
+            try:
+                if self._writes:
+                    await run_in_threadpool(self._flush_writes)
+                if time.time() - self._last_sync >= self.sync_interval:
+                    await run_in_threadpool(self.sync)
+                if time.monotonic() >= next_compaction:
+                    next_compaction = time.monotonic() + self.compaction_interval
+                    await run_in_threadpool(self.compact)
+            except Exception as e:
+                self.logger.error("Disk cache background task failed", error=str(e))
+
+    def start(self) -> None:
+        """打开磁盘缓存并启动后台写入、同步和压缩（需在事件循环中调用，未开启时无操作）"""
+        if not self.enabled or self.running:
+            return
+        self.open()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        self.logger.info("Disk cache background task started", sync_interval=self.sync_interval,
+                         compaction_interval=self.compaction_interval)
+
+    async def stop(self) -> None:
+        """停止后台任务并写入队列中剩余的记录
+
+        不取消任务而是通知其在当前一轮结束后退出，避免取消正在线程池中执行的写入或同步
+        """
+        if self._task is not None:
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        if self._writes:
+            await run_in_threadpool(self._flush_writes)
+
+    def stats(self) -> Dict[str, Any]:
+        """磁盘缓存统计快照"""
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._index),
+            "segments": len(self._segments),
+            "bytes": sum(segment.file_size() or 0 for segment in list(self._segments.values())),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "writes": self.writes,
+            "pending_writes": len(self._writes),
+            "skipped_writes": self.skipped_writes,
+            "compactions": self.compactions,
+        }
+
+    # ---- 写入 ----
+
+    def _enqueue(self, kind: int, key: str, value: Any) -> bool:
+        """加入写入队列并唤醒后台任务，队列已满时丢弃"""
+        if len(self._writes) >= self.max_pending_writes:
+            self.skipped_writes += 1
+            return False
+        self._writes.append((kind, key, value))
+        self._wakeup.set()
+        return True
+
+    def _flush_writes(self) -> None:
+        """写入队列中的全部记录（在线程池中执行）"""
+        records = []
+        while self._writes:
+            kind, key, value = self._writes.popleft()
+            if kind == KIND_DELETE_ROUTE:
+                self._drop_route(key, value)
+            records.append(self._encode(kind, key, value))
+        if records:
+            self._append_batch(records)
+
+    @staticmethod
+    def _encode(kind: int, key: str, value: Any) -> Tuple:
+        """
+        编码一条记录
+
+        Args:
+            kind: KIND_PUT / KIND_DELETE_ROUTE
+            key: 缓存键或路由ID
+            value: CachedResponse 或删除时间
+
+        Returns:
+            Tuple: (类型, 缓存键, 键字节, 元数据, 响应体, 状态码, 写入时间, 过期时间, 路由ID)
+        """
+        if kind == KIND_DELETE_ROUTE:
+            return kind, None, key.encode("utf-8"), b"", b"", 0, value, value, None
+        meta = jsoncodec.dumpb({"route_id": value.route_id, "headers": value.headers})
+        return (kind, key, key.encode("utf-8"), meta, value.body, value.status_code,
+                value.stored_at, value.expires_at, value.route_id)
+
+    def _append_batch(self, records: List[Tuple]) -> int:
+        """
+        持有目录锁依次追加记录，并把写入的范围映射好供读取
+
+        Args:
+            records: _encode 编码的记录
+
+        Returns:
+            int: 写入的记录数（目录锁被占用时整批跳过）
+        """
+        if not self._mutex.acquire(blocking=False):
+            self.skipped_writes += len(records)
+            return 0
+        written = 0
+        try:
+            lock_fd = self._try_lock()
+            if lock_fd is False:
+                return 0
+            ends: Dict[int, int] = {}
+            try:
+                for kind, key, key_bytes, meta, body, status, stored_at, expires_at, route_id in records:
+                    crc = zlib.crc32(body, zlib.crc32(meta, zlib.crc32(key_bytes)))
+                    header = _HEADER.pack(MAGIC, kind, len(key_bytes), len(meta), len(body),
+                                          status, stored_at, expires_at, crc)
+                    size = len(header) + len(key_bytes) + len(meta) + len(body)
+                    self._roll_active(size)
+                    offset = self._write(self._active, (header, key_bytes, meta, body))
+                    ends[self._active] = offset + size
+                    if kind == KIND_PUT:
+                        self._index_record(key, _Slot(self._active, offset, len(key_bytes), len(meta), len(body),
+                                                      status, stored_at, expires_at, route_id or ""))
+                    written += 1
+            finally:
+                self._unlock(lock_fd)
+            for segment_id, end in ends.items():
+                segment = self._segments.get(segment_id)
+                if segment is not None:
+                    segment.view(end)
+        except OSError as e:
+            self.logger.warning("Disk cache write failed", error=str(e))
+        finally:
+            self.skipped_writes += len(records) - written
+            self.writes += written
+            self._mutex.release()
+        return written
+
+    def _write(self, segment_id: int, parts) -> int:
+        """追加到分段末尾（调用方持有目录锁），返回写入位置"""
+        path = os.path.join(self.path, _segment_name(segment_id))
+        fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            offset = os.fstat(fd).st_size
+            if hasattr(os, "writev"):
+                os.writev(fd, parts)
+            else:
+                for part in parts:
+                    os.write(fd, part)
+        finally:
+            os.close(fd)
+        if segment_id not in self._segments:
+            self._segments[segment_id] = _Segment(segment_id, path)
+        return offset
+
+    def _roll_active(self, needed: int = 0) -> None:
+        """
+        跟上其他 worker 切换的分段，当前分段写入 needed 字节后会超过 segment_bytes 时切换到新分段
+        （调用方持有目录锁）
+        """
+        while os.path.exists(os.path.join(self.path, _segment_name(self._active + 1))):
+            self._active += 1
+        path = os.path.join(self.path, _segment_name(self._active))
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        if size and size + needed > self.segment_bytes:
+            self._active += 1
+            path = os.path.join(self.path, _segment_name(self._active))
+            open(path, "ab").close()
+            self._segments[self._active] = _Segment(self._active, path)
+
+    def _write_tombstones(self) -> None:
+        """把已知的路由删除标记写入当前分段（调用方持有目录锁）"""
+        for route_id, deleted_at in list(self._route_tombstones.items()):
+            key_bytes = route_id.encode("utf-8")
+            header = _HEADER.pack(MAGIC, KIND_DELETE_ROUTE, len(key_bytes), 0, 0, 0,
+                                  deleted_at, deleted_at, zlib.crc32(key_bytes))
+            self._roll_active(len(header) + len(key_bytes))
+            self._write(self._active, (header, key_bytes))
+
+    def _rewrite(self, segment_id: int, entries: List[Tuple[str, _Slot]]) -> None:
+        """把分段中仍有效的记录复制到当前分段（调用方持有目录锁）"""
+        segment = self._segments[segment_id]
+        for key, slot in entries:
+            mapped = segment.view(slot.offset + slot.size)
+            if mapped is None or self._index.get(key) is not slot:
+                continue
+            self._roll_active(slot.size)
+            offset = self._write(self._active, (mapped[slot.offset:slot.offset + slot.size],))
+            self._index[key] = slot.moved(self._active, offset)
+
+    def _remove_segment(self, segment_id: int) -> None:
+        segment = self._segments.pop(segment_id, None)
+        if segment is not None:
+            try:
+                os.unlink(segment.path)
+            except FileNotFoundError:
+                pass
+
+    def _try_lock(self):
+        """获取目录文件锁（非阻塞），返回文件描述符；被占用时返回 False"""
+        if fcntl is None:
+            return None
+        fd = os.open(os.path.join(self.path, _LOCK_FILE), os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        return fd
+
+    def _unlock(self, fd) -> None:
+        if fd is None or fd is False:
+            return
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    # ---- 索引 ----
+
+    def _sync_segments(self, now: float) -> None:
+        """发现新分段、丢弃已删除分段并扫描新追加的记录（调用方持有 _mutex）"""
+        self._last_sync = now
+        try:
+            names = os.listdir(self.path)
+        except FileNotFoundError:
+            return
+        present = {}
+        for name in names:
+            segment_id = _parse_segment_name(name)
+            if segment_id is not None:
+                present[segment_id] = os.path.join(self.path, name)
+
+        vanished = [segment_id for segment_id in self._segments if segment_id not in present]
+        if vanished:
+            for segment_id in vanished:
+                del self._segments[segment_id]
+            gone = set(vanished)
+            for key, slot in list(self._index.items()):
+                if slot.segment in gone:
+                    self._index.pop(key, None)
+
+        for segment_id in sorted(present):
+            segment = self._segments.get(segment_id)
+            if segment is None:
+                segment = self._segments[segment_id] = _Segment(segment_id, present[segment_id])
+            size = segment.file_size()
+            if size is None or size <= segment.scanned:
+                continue
+            mapped = segment.view(size)
+            if mapped is not None:
+                segment.scanned = self._scan(segment_id, mapped, segment.scanned, size)
+        if present:
+            self._active = max(self._active, max(present))
+
+    def _scan(self, segment_id: int, mapped: mmap.mmap, start: int, end: int) -> int:
+        """
+        扫描 [start, end) 内的记录写入索引，返回下次扫描的起点
+        （末尾不完整的记录留到下次；损坏的记录跳到下一个魔数继续）
+        """
+        pos = start
+        while pos + _HEADER.size <= end:
+            magic, kind, key_len, meta_len, body_len, status, stored_at, expires_at, crc = \
+                _HEADER.unpack_from(mapped, pos)
+            total = _HEADER.size + key_len + meta_len + body_len
+            if magic == MAGIC and pos + total > end:
+                # 可能是其他 worker 正在写入的记录；之后存在完整记录时说明是中断写入留下的残片
+                next_pos = mapped.find(MAGIC, pos + 1, end)
+                while next_pos >= 0 and not self._valid_at(mapped, next_pos, end):
+                    next_pos = mapped.find(MAGIC, next_pos + 1, end)
+                if next_pos < 0:
+                    break
+                pos = next_pos
+                continue
+            if magic != MAGIC or not self._valid_at(mapped, pos, end):
+                next_pos = mapped.find(MAGIC, pos + 1, end)
+                if next_pos < 0:
+                    return end
+                pos = next_pos
+                continue
+
+            key_start = pos + _HEADER.size
+            key = bytes(mapped[key_start:key_start + key_len]).decode("utf-8", "replace")
+            if kind == KIND_DELETE_ROUTE:
+                self._apply_route_tombstone(key, stored_at)
+            elif kind == KIND_PUT:
+                meta = jsoncodec.loads(mapped[key_start + key_len:key_start + key_len + meta_len])
+                self._index_record(key, _Slot(segment_id, pos, key_len, meta_len, body_len, status,
+                                              stored_at, expires_at, meta.get("route_id") or ""))
+            pos += total
+        return pos
+
+    @staticmethod
+    def _valid_at(mapped: mmap.mmap, pos: int, end: int) -> bool:
+        """pos 处是否为完整且校验通过的记录"""
+        if pos + _HEADER.size > end:
+            return False
+        magic, _, key_len, meta_len, body_len, _, _, _, crc = _HEADER.unpack_from(mapped, pos)
+        total = _HEADER.size + key_len + meta_len + body_len
+        if magic != MAGIC or pos + total > end:
+            return False
+        return zlib.crc32(memoryview(mapped)[pos + _HEADER.size:pos + total]) == crc
+
+    def _index_record(self, key: str, slot: _Slot) -> None:
+        """按写入时间决定是否替换索引项（压缩重写的旧记录不会覆盖较新的记录）"""
+        deleted_at = self._route_tombstones.get(slot.route_id)
+        if deleted_at is not None and slot.stored_at <= deleted_at:
+            return
+        current = self._index.get(key)
+        if current is None or slot.stored_at >= current.stored_at:
+            self._index[key] = slot
+
+    def _apply_route_tombstone(self, route_id: str, deleted_at: float) -> None:
+        if self._route_tombstones.get(route_id, 0) >= deleted_at:
+            return
+        self._route_tombstones[route_id] = deleted_at
+        self._drop_route(route_id, deleted_at)
+
+    def _drop_route(self, route_id: str, deleted_at: float) -> None:
+        """从索引中删除路由在 deleted_at 之前写入的条目"""
+        for key, slot in list(self._index.items()):
+            if slot.route_id == route_id and slot.stored_at <= deleted_at:
+                self._index.pop(key, None)
@@ -0,0 +1,282 @@
+"""
+Embedding 请求合批
+路由 batch_mode 为 embeddings 时，短时间窗口内到达的 embedding 请求合并为一次上游请求：
+- 同一路由、目标路径、model 及其余参数（encoding_format、dimensions、user 等）相同的请求进入同一批，
+  文本输入和 token 数组输入分别合批；转发给上游的请求头也须相同（strip_headers 中的请求头
+  以及 x-request-id 等每个请求各不相同的传输 / 追踪请求头除外，这些请求头使用该批第一个请求的取值）
+- 批内相同的 input 只发送一次；窗口 window_ms 到期或不重复输入达到 max_items 时发送
+- 上游返回的 data 按 index 拆回各请求，index 按各请求自己的 input 顺序重新编号，
+  usage 按各输入的长度比例估算后分摊给各请求（重复输入各自计费）
+- 上游失败时，同一批的所有请求收到相同的错误响应
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+import httpx
+import structlog
+from fastapi import HTTPException
+
+from ..config import settings
+from ..utils import jsoncodec
+from .single_flight import body_digest
+
+logger = structlog.get_logger(__name__)
+
+# 不参与合批分组的请求体字段
+_UNGROUPED_FIELDS = ("input",)
+
+# 不影响上游行为、不参与合批分组的请求头（每个请求各不相同的传输 / 追踪字段）
+_UNGROUPED_HEADERS = ("content-length", "connection", "accept-encoding", "x-request-id", "traceparent", "tracestate")
+
+
+def split_inputs(value: Any) -> Optional[Tuple[str, List[Any]]]:
+    """
+    拆分 embedding 请求的 input
+
+    Args:
+        value: 请求体 input 字段（字符串、字符串数组、token 数组或 token 数组的数组）
+
+    Returns:
+        Optional[Tuple[str, List[Any]]]: (text / tokens, 输入列表)，无法合批的格式返回 None
+    """
+    if isinstance(value, str):
+        return "text", [value]
+    if not isinstance(value, list) or not value:
+        return None
+    if all(isinstance(item, str) for item in value):
+        return "text", list(value)
+    if all(isinstance(item, int) for item in value):
+        return "tokens", [tuple(value)]
+    if all(isinstance(item, list) and all(isinstance(token, int) for token in item) for item in value):
+        return "tokens", [tuple(item) for item in value]
+    return None
+
+
+class _Batch:
+    """一个正在收集的批次"""
+
+    __slots__ = ("key", "headers", "params", "kind", "send", "items", "positions", "callers", "timer")
+
+    def __init__(self, key: str, headers: Dict[str, str], params: Dict[str, Any], kind: str, send):
+        self.key = key
+        self.headers = headers
+        self.params = params
+        self.kind = kind
+        self.send = send
+        # 不重复的输入及其在批内的位置
+        self.items: List[Any] = []
+        self.positions: Dict[Any, int] = {}
+        # (等待结果的 future, 该请求各输入在批内的位置)
+        self.callers: List[Tuple["asyncio.Future", List[int]]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, inputs: List[Any], future: "asyncio.Future") -> None:
+        positions = []
+        for item in inputs:
+            position = self.positions.get(item)
+            if position is None:
+                position = self.positions[item] = len(self.items)
+                self.items.append(item)
+            positions.append(position)
+        self.callers.append((future, positions))
+
+    def added_items(self, inputs: List[Any]) -> int:
+        """加入后新增的不重复输入数"""
+        return len({item for item in inputs if item not in self.positions})
+
+
+class EmbeddingBatcher:
+    """Embedding 请求合批"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化合批器
+
+        Args:
+            config: 合批配置，默认读取 proxy.embedding_batch
+        """
+        config = config if config is not None else settings.proxy.get('embedding_batch', {})
+
+        self.window = config.get('window_ms', 5) / 1000
+        self.max_items = max(int(config.get('max_items', 256)), 1)
+
+        self.logger = logger.bind(service="embedding_batcher")
+        self._batches: Dict[str, _Batch] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.requests = 0
+        self.items = 0
+        self.unique_items = 0
+
+    def batch_key(self, route_config: Dict[str, Any], target_path: str, headers: Dict[str, str],
+                  body: Dict[str, Any], kind: str) -> str:
+        """
+        合批分组键：路由 + 目标路径 + 输入类型 + 除 input 外的请求体字段 + 转发给上游的请求头
+
+        Args:
+            route_config: 路由配置
+            target_path: 目标路径（不含主机，负载均衡到不同目标的请求可以合批）
+            headers: 请求头（strip_headers 和 _UNGROUPED_HEADERS 中的请求头不参与分组）
+            body: 请求体
+            kind: text / tokens
+
+        Returns:
+            str: 分组键
+        """
+        params = {key: value for key, value in body.items() if key not in _UNGROUPED_FIELDS}
+        ungrouped = set(_UNGROUPED_HEADERS)
+        ungrouped.update(name.lower() for name in settings.proxy.get('strip_headers', []))
+        grouped_headers = {name.lower(): value for name, value in headers.items() if name.lower() not in ungrouped}
+        return "\x1f".join((route_config.get("route_id") or "", target_path, kind,
+                            body_digest(params), body_digest(grouped_headers)))
+
+    async def submit(
+        self,
+        route_config: Dict[str, Any],
+        target_path: str,
+        headers: Dict[str, str],
+        body: Dict[str, Any],
+        send: Callable[[Dict[str, Any], Dict[str, str]], Awaitable[httpx.Response]]
+    ) -> Optional[httpx.Response]:
+        """
+        加入合批并等待拆分后的响应
+
+        Args:
+            route_config: 路由配置
+            target_path: 目标路径
+            headers: 请求头（只有转发给上游的请求头相同的请求才合批，同一批使用第一个请求的请求头）
+            body: 已解析的请求体
+            send: 发送合批请求的协程函数，参数为 (请求体, 请求头)，返回已读取响应体的响应
+
+        Returns:
+            Optional[httpx.Response]: 该请求的响应，请求不适合合批时返回 None（由调用方直接转发）
+        """
+        if not isinstance(body.get("model"), str):
+            return None
+        split = split_inputs(body.get("input"))
+        if split is None:
+            return None
+        kind, inputs = split
+
+        key = self.batch_key(route_config, target_path, headers, body, kind)
+        batch = self._batches.get(key)
+        if batch is not None and len(batch.items) + batch.added_items(inputs) > self.max_items:
+            self._flush(batch)
+            batch = None
+        if batch is None:
+            params = {name: value for name, value in body.items() if name not in _UNGROUPED_FIELDS}
+            batch = _Batch(key, dict(headers), params, kind, send)
+            self._batches[key] = batch
+            batch.timer = asyncio.get_running_loop().call_later(self.window, self._flush, batch)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.add(inputs, future)
+        self.requests += 1
+        self.items += len(inputs)
+        if len(batch.items) >= self.max_items:
+            self._flush(batch)
+        return await future
+
+    def _flush(self, batch: _Batch) -> None:
+        """结束收集并在后台发送（窗口到期或数量达到上限时调用）"""
+        if self._batches.get(batch.key) is batch:
+            del self._batches[batch.key]
+        if batch.timer is not None:
+            batch.timer.cancel()
+            batch.timer = None
+        task = asyncio.ensure_future(self._send(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, batch: _Batch) -> None:
+        """发送合批请求并把结果分发给各请求"""
+        self.batches += 1
+        self.unique_items += len(batch.items)
+        body = dict(batch.params)
+        body["input"] = [list(item) for item in batch.items] if batch.kind == "tokens" else list(batch.items)
+        try:
+            response = await batch.send(body, batch.headers)
+            results = self._split(batch, response)
+        except Exception as e:
+            for future, _ in batch.callers:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        if len(batch.callers) > 1:
+            self.logger.debug("Embedding batch sent", requests=len(batch.callers), items=len(batch.items))
+        for (future, _), result in zip(batch.callers, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _split(self, batch: _Batch, response: httpx.Response) -> List[httpx.Response]:
+        """
+        把合批响应拆成各请求的响应
+
+        Args:
+            batch: 批次
+            response: 上游响应（已读取响应体）
+
+        Returns:
+            List[httpx.Response]: 与 batch.callers 一一对应的响应
+
+        Raises:
+            HTTPException: 上游响应不是 JSON 对象或缺少 data 列表，或返回的 data 与输入数量不一致
+        """
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in ("content-length", "content-encoding", "transfer-encoding")
+        }
+        if response.status_code != 200:
+            return [httpx.Response(response.status_code, headers=headers, content=response.content)
+                    for _ in batch.callers]
+
+        try:
+            payload = jsoncodec.loads(response.content)
+        except jsoncodec.JSONDecodeError:
+            payload = None
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if not isinstance(data, list):
+            raise HTTPException(status_code=502, detail="Upstream returned invalid embeddings response")
+        embeddings = {
+            item["index"]: item for item in data
+            if isinstance(item, dict) and isinstance(item.get("index"), int)
+        }
+        if any(position not in embeddings for position in range(len(batch.items))):
+            raise HTTPException(status_code=502, detail="Upstream returned incomplete embeddings batch")
+
+        usage = payload.get("usage")
+        usage = usage if isinstance(usage, dict) else {}
+        weights = [max(len(item), 1) for item in batch.items]
+        total_weight = sum(weights)
+
+        results = []
+        for _, positions in batch.callers:
+            share = sum(weights[position] for position in positions) / total_weight
+            caller_payload = dict(payload)
+            caller_payload["data"] = [
+                {**embeddings[position], "index": index} for index, position in enumerate(positions)
+            ]
+            caller_payload["usage"] = {
+                name: round(value * share) if isinstance(value, int) else value
+                for name, value in usage.items()
+            }
+            results.append(httpx.Response(200, headers=headers, content=jsoncodec.dumpb(caller_payload)))
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """合批统计快照"""
+        return {
+            "window_ms": round(self.window * 1000, 3),
+            "max_items": self.max_items,
+            "collecting": len(self._batches),
+            "batches": self.batches,
+            "requests": self.requests,
+            "items": self.items,
+            "unique_items": self.unique_items,
+        }
+
+
+# 全局 embedding 合批实例
+embedding_batcher = EmbeddingBatcher()
@@ -0,0 +1,114 @@
+"""
+对冲请求策略
+路由开启 hedge_enabled 后，非流式请求的首次尝试超过对冲延迟仍未收到响应头时，向另一个目标再发一次，
+先收到响应头的一方胜出，另一方被取消：
+- 对冲延迟：路由配置的 hedge_delay_ms；为空时取该路由实时的 P95 首字节耗时
+  （样本不足 min_samples 时使用 default_delay_ms），按 p95_refresh_seconds 缓存
+- 额外负载上限：滚动窗口内对冲次数不超过开启对冲的请求数 × max_extra_ratio
+"""
+
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import structlog
+
+from ..config import settings
+from .metrics import RateWindow, gateway_metrics
+
+logger = structlog.get_logger(__name__)
+
+
+class HedgePolicy:
+    """对冲延迟计算与额外负载预算"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None, metrics=None):
+        """
+        初始化对冲策略
+
+        Args:
+            config: 对冲配置，默认读取 proxy.hedging
+            metrics: 提供路由首字节耗时直方图的指标集合，默认为全局网关指标
+        """
+        config = config if config is not None else settings.proxy.get('hedging', {})
+
+        self.default_delay = config.get('default_delay_ms', 1000) / 1000
+        self.min_delay = config.get('min_delay_ms', 10) / 1000
+        self.min_samples = config.get('min_samples', 50)
+        self.p95_refresh = config.get('p95_refresh_seconds', 5)
+        self.max_extra_ratio = config.get('max_extra_ratio', 0.1)
+        self.window_seconds = max(int(config.get('budget_window_seconds', 10)), 1)
+
+        self.metrics = metrics or gateway_metrics
+        self.logger = logger.bind(service="hedging")
+        self._eligible = RateWindow(self.window_seconds)
+        self._hedged = RateWindow(self.window_seconds)
+        # 路由 -> (P95 秒数, 计算时间)
+        self._p95_cache: Dict[str, Tuple[float, float]] = {}
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.rejected = 0
+
+    def delay(self, route_config: Dict[str, Any], now: Optional[float] = None) -> float:
+        """
+        路由的对冲延迟（秒）
+
+        Args:
+            route_config: 路由配置
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            float: 对冲延迟
+        """
+        delay_ms = route_config.get("hedge_delay_ms")
+        if delay_ms:
+            return delay_ms / 1000
+
+        route_id = route_config.get("route_id") or ""
+        now = time.monotonic() if now is None else now
+        cached = self._p95_cache.get(route_id)
+        if cached is not None and now - cached[1] < self.p95_refresh:
+            return cached[0]
+
+        p95 = None
+        if self.metrics.ttfb.count(route_id) >= self.min_samples:
+            p95 = self.metrics.ttfb.quantile(0.95, (route_id,))
+        delay = max(p95, self.min_delay) if p95 else self.default_delay
+        self._p95_cache[route_id] = (delay, now)
+        return delay
+
+    def record_request(self, now: Optional[float] = None) -> None:
+        """记录一次开启对冲的请求"""
+        self._eligible.add(1, now)
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        """
+        申请发出一次对冲请求
+
+        Args:
+            now: 当前时间（time.time 秒）
+
+        Returns:
+            bool: 是否在额外负载预算内
+        """
+        if self._hedged.total(now) >= self._eligible.total(now) * self.max_extra_ratio:
+            self.rejected += 1
+            return False
+        self._hedged.add(1, now)
+        self.hedges += 1
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """对冲统计快照"""
+        return {
+            "window_seconds": self.window_seconds,
+            "eligible_requests": self._eligible.total(),
+            "hedged_requests": self._hedged.total(),
+            "max_extra_ratio": self.max_extra_ratio,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "rejected": self.rejected,
+        }
+
+
+# 全局对冲策略实例
+hedge_policy = HedgePolicy()
@@ -0,0 +1,136 @@
+"""
+API Key 验证缓存
+进程内 LRU + TTL 缓存，缓存验证通过的 APIKeyResponse，并对无效 Key 做短时负缓存；
+Key 被更新或删除时由 KeyManager 立即失效对应条目
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Optional, Tuple
+
+import structlog
+
+from ..config import settings
+from ..models.api_key import APIKeyResponse
+
+logger = structlog.get_logger(__name__)
+
+
+class APIKeyCache:
+    """API Key 验证结果缓存"""
+
+    def __init__(
+        self,
+        max_size: Optional[int] = None,
+        ttl: Optional[float] = None,
+        negative_ttl: Optional[float] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        初始化缓存
+
+        Args:
+            max_size: 最大条目数
+            ttl: 有效Key的缓存时间（秒）
+            negative_ttl: 无效Key的负缓存时间（秒）
+            enabled: 是否启用
+        """
+        cache_config = settings.security.get('key_cache', {})
+        self.enabled = cache_config.get('enabled', True) if enabled is None else enabled
+        self.max_size = max_size or cache_config.get('max_size', 10000)
+        self.ttl = ttl if ttl is not None else cache_config.get('ttl', 60)
+        self.negative_ttl = negative_ttl if negative_ttl is not None else cache_config.get('negative_ttl', 5)
+
+        self.logger = logger.bind(service="key_cache")
+        self._entries: "OrderedDict[str, Tuple[Optional[APIKeyResponse], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # 每次失效递增，用于丢弃失效前发起的数据库查询结果
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """当前失效代数"""
+        return self._generation
+
+    def get(self, key_value: str) -> Tuple[bool, Optional[APIKeyResponse]]:
+        """
+        查询缓存
+
+        Args:
+            key_value: API Key Value
+
+        Returns:
+            Tuple[bool, Optional[APIKeyResponse]]: (是否命中, Key信息)，命中但为None表示无效Key
+        """
+        if not self.enabled:
+            return False, None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key_value)
+            if entry is None:
+                return False, None
+
+            api_key_info, cached_until = entry
+            if cached_until < now:
+                del self._entries[key_value]
+                return False, None
+
+            # 按缓存的 expires_at 检查是否已过期
+            if api_key_info is not None and api_key_info.expires_at and api_key_info.expires_at < datetime.utcnow():
+                api_key_info = None
+                self._entries[key_value] = (None, now + self.negative_ttl)
+
+            self._entries.move_to_end(key_value)
+            return True, api_key_info
+
+    def set(self, key_value: str, api_key_info: Optional[APIKeyResponse], generation: Optional[int] = None) -> None:
+        """
+        写入缓存
+
+        Args:
+            key_value: API Key Value
+            api_key_info: 验证结果，None 表示无效Key（负缓存）
+            generation: 发起查询时的失效代数，期间发生过失效则丢弃本次结果
+        """
+        if not self.enabled:
+            return
+
+        ttl = self.ttl if api_key_info is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key_value] = (api_key_info, time.monotonic() + ttl)
+            self._entries.move_to_end(key_value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key_value: str) -> None:
+        """
+        失效单个Key
+
+        Args:
+            key_value: API Key Value
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.pop(key_value, None)
+        self.logger.debug("API key cache entry invalidated")
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 全局缓存实例
+api_key_cache = APIKeyCache()
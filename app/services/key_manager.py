@@ -2,7 +2,6 @@
 API Key 管理服务
 """
 
-import json
 from datetime import datetime
 from typing import List, Optional
 from sqlalchemy.orm import Session
@@ -11,6 +10,8 @@ from ..models.api_key import (
     APIKeyDB, APIKeyCreate, APIKeyUpdate, APIKeyResponse,
     generate_api_key, calculate_expires_at
 )
+from .key_cache import api_key_cache
+from ..utils import jsoncodec
 
 
 class KeyManager:
@@ -42,7 +43,7 @@ class KeyManager:
             key_id=key_id,
             key_value=key_value,
             source_path=key_data.source_path,
-            permissions=json.dumps(key_data.permissions),
+            permissions=jsoncodec.dumps(key_data.permissions),
             expires_at=expires_at,
             rate_limit=key_data.rate_limit
         )
@@ -50,6 +51,7 @@ class KeyManager:
         self.db.add(db_key)
         self.db.commit()
         self.db.refresh(db_key)
+        api_key_cache.invalidate(key_value)
         
         return self._to_response(db_key)
     
@@ -125,7 +127,7 @@ class KeyManager:
             db_key.source_path = key_data.source_path
         
         if key_data.permissions is not None:
-            db_key.permissions = json.dumps(key_data.permissions)
+            db_key.permissions = jsoncodec.dumps(key_data.permissions)
         
         if key_data.expires_at is not None:
             db_key.expires_at = key_data.expires_at
@@ -138,6 +140,7 @@ class KeyManager:
         
         self.db.commit()
         self.db.refresh(db_key)
+        api_key_cache.invalidate(db_key.key_value)
         
         return self._to_response(db_key)
     
@@ -155,8 +158,10 @@ class KeyManager:
         if not db_key:
             return False
         
+        key_value = db_key.key_value
         self.db.delete(db_key)
         self.db.commit()
+        api_key_cache.invalidate(key_value)
         return True
     
     def validate_key(self, key_value: str) -> Optional[APIKeyResponse]:
@@ -217,7 +222,7 @@ class KeyManager:
         """
         permissions = []
         try:
-            permissions = json.loads(db_key.permissions)
+            permissions = jsoncodec.loads(db_key.permissions)
         except:
             permissions = []
         
@@ -0,0 +1,304 @@
+"""
+上游负载均衡
+一个路由可以配置带权重的上游目标池（target_hosts），按 lb_strategy 为每次尝试选择目标：
+- round_robin: 平滑加权轮询（SWRR）
+- least_outstanding: 在途请求数 / 权重最小的目标
+- p2c: 按权重随机取两个目标，选在途请求数 / 权重较小的一个
+- consistent_hash: 按 API Key 或指定请求头做一致性哈希（虚拟节点数与权重成正比），取不到哈希键时按 p2c 选择
+
+在途请求数按目标主机在内存中统计（同一主机被多个路由共用时合并计数），由代理引擎在每次转发期间占用；
+被健康检查摘除、判定为不健康或熔断中的目标不参与选择，目标全部不可用时忽略健康状态
+"""
+
+import bisect
+import hashlib
+import random
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Set, Tuple
+
+import structlog
+
+from ..utils import jsoncodec
+from .upstream_health import upstream_health
+from .circuit_breaker import circuit_breaker
+
+logger = structlog.get_logger(__name__)
+
+STRATEGIES = ("round_robin", "least_outstanding", "p2c", "consistent_hash")
+
+# 每单位权重的虚拟节点数
+VIRTUAL_NODES = 160
+
+Targets = Tuple[Tuple[str, int], ...]
+
+
+def parse_targets(target_hosts: Any, target_host: Optional[str] = None) -> Targets:
+    """
+    解析上游目标池
+
+    Args:
+        target_hosts: 目标列表（JSON 字符串或列表），元素为 "host:port" 或 {"host": ..., "weight": ...}
+        target_host: 路由的主目标，目标池为空时使用
+
+    Returns:
+        Targets: ((host, weight), ...)，忽略格式错误或权重不为正的元素
+    """
+    if isinstance(target_hosts, str):
+        try:
+            target_hosts = jsoncodec.loads(target_hosts)
+        except (jsoncodec.JSONDecodeError, TypeError):
+            target_hosts = None
+
+    targets: List[Tuple[str, int]] = []
+    if isinstance(target_hosts, list):
+        for item in target_hosts:
+            if isinstance(item, str):
+                host, weight = item, 1
+            elif isinstance(item, dict):
+                host, weight = item.get("host"), item.get("weight", 1)
+            else:
+                continue
+            if not host or not isinstance(host, str) or not isinstance(weight, int) or weight <= 0:
+                continue
+            targets.append((host.strip(), weight))
+
+    if not targets and target_host:
+        targets.append((target_host, 1))
+    return tuple(targets)
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class UpstreamPool:
+    """单个路由的上游目标池（保存轮询状态和哈希环）"""
+
+    def __init__(self, targets: Targets, strategy: str = "round_robin", hash_key: Optional[str] = None):
+        """
+        初始化目标池
+
+        Args:
+            targets: ((host, weight), ...)
+            strategy: 负载均衡策略
+            hash_key: 一致性哈希键：api_key 或 header:<请求头名称>
+        """
+        self.targets = targets
+        self.strategy = strategy if strategy in STRATEGIES else "round_robin"
+        self.hash_key = hash_key
+        self.hosts = [host for host, _ in targets]
+        self.weights = [weight for _, weight in targets]
+        self._current = [0] * len(targets)
+        self._cursor = 0
+        self._ring_hashes: List[int] = []
+        self._ring_index: List[int] = []
+        self._rng = random.Random()
+
+    def matches(self, targets: Targets, strategy: str, hash_key: Optional[str]) -> bool:
+        """路由配置是否与当前目标池一致（不一致时需要重建）"""
+        return self.targets == targets and self.strategy == strategy and self.hash_key == hash_key
+
+    def select(self, in_flight: Mapping[str, int], key: Optional[str] = None,
+               exclude: Optional[Iterable[str]] = None,
+               unavailable: Optional[Set[str]] = None) -> str:
+        """
+        选择一个目标
+
+        Args:
+            in_flight: 按主机统计的在途请求数
+            key: 一致性哈希键的值
+            exclude: 排除的主机（如本次请求已尝试过的），全部被排除时忽略
+            unavailable: 健康检查判定不可用的主机，全部不可用时忽略
+
+        Returns:
+            str: 目标主机
+        """
+        candidates = list(range(len(self.hosts)))
+        if unavailable:
+            candidates = [i for i in candidates if self.hosts[i] not in unavailable] or candidates
+        if exclude:
+            excluded = set(exclude)
+            candidates = [i for i in candidates if self.hosts[i] not in excluded] or candidates
+        if len(candidates) == 1:
+            return self.hosts[candidates[0]]
+
+        if self.strategy == "consistent_hash" and key is not None:
+            return self.hosts[self._select_hash(key, candidates)]
+        if self.strategy == "least_outstanding":
+            return self.hosts[self._select_least(in_flight, candidates)]
+        if self.strategy in ("p2c", "consistent_hash"):
+            return self.hosts[self._select_p2c(in_flight, candidates)]
+        return self.hosts[self._select_swrr(candidates)]
+
+    def _load(self, in_flight: Mapping[str, int], index: int) -> float:
+        return in_flight.get(self.hosts[index], 0) / self.weights[index]
+
+    def _select_swrr(self, candidates: List[int]) -> int:
+        """平滑加权轮询：每轮各目标加上自身权重，选当前值最大者并减去总权重"""
+        total = 0
+        best = candidates[0]
+        for i in candidates:
+            self._current[i] += self.weights[i]
+            total += self.weights[i]
+            if self._current[i] > self._current[best]:
+                best = i
+        self._current[best] -= total
+        return best
+
+    def _select_least(self, in_flight: Mapping[str, int], candidates: List[int]) -> int:
+        """在途请求数 / 权重最小，负载相同时从轮转的起点开始取第一个，避免总是选中第一个目标"""
+        self._cursor = (self._cursor + 1) % len(candidates)
+        best = candidates[self._cursor]
+        best_load = self._load(in_flight, best)
+        for offset in range(1, len(candidates)):
+            i = candidates[(self._cursor + offset) % len(candidates)]
+            load = self._load(in_flight, i)
+            if load < best_load:
+                best, best_load = i, load
+        return best
+
+    def _select_p2c(self, in_flight: Mapping[str, int], candidates: List[int]) -> int:
+        """按权重随机取两个不同目标，选负载较小者"""
+        weights = [self.weights[i] for i in candidates]
+        first = self._rng.choices(range(len(candidates)), weights)[0]
+        second = self._rng.choices(range(len(candidates) - 1), weights[:first] + weights[first + 1:])[0]
+        if second >= first:
+            second += 1
+        a, b = candidates[first], candidates[second]
+        return a if self._load(in_flight, a) <= self._load(in_flight, b) else b
+
+    def _select_hash(self, key: str, candidates: List[int]) -> int:
+        """一致性哈希：沿哈希环顺时针找到第一个候选目标"""
+        if not self._ring_hashes:
+            self._build_ring()
+        allowed = set(candidates)
+        start = bisect.bisect(self._ring_hashes, _hash(key))
+        size = len(self._ring_hashes)
+        for offset in range(size):
+            index = self._ring_index[(start + offset) % size]
+            if index in allowed:
+                return index
+        return candidates[0]
+
+    def _build_ring(self) -> None:
+        points = sorted(
+            (_hash(f"{host}#{replica}"), index)
+            for index, (host, weight) in enumerate(self.targets)
+            for replica in range(weight * VIRTUAL_NODES)
+        )
+        self._ring_hashes = [point for point, _ in points]
+        self._ring_index = [index for _, index in points]
+
+
+class LoadBalancer:
+    """上游负载均衡器：按路由缓存目标池，按主机统计在途请求数"""
+
+    def __init__(self):
+        """初始化负载均衡器"""
+        self._pools: Dict[str, UpstreamPool] = {}
+        self._in_flight: Dict[str, int] = {}
+        self.logger = logger.bind(service="load_balancer")
+
+    def pool_for(self, route_config: Dict[str, Any]) -> UpstreamPool:
+        """
+        获取路由的目标池，路由的目标、策略或哈希键变化后重建
+
+        Args:
+            route_config: 路由配置（路由表编译后带有 _upstreams）
+
+        Returns:
+            UpstreamPool: 目标池
+        """
+        targets = route_config.get("_upstreams")
+        if targets is None:
+            targets = parse_targets(route_config.get("target_hosts"), route_config.get("target_host"))
+        strategy = route_config.get("lb_strategy")
+        if strategy not in STRATEGIES:
+            strategy = "round_robin"
+        hash_key = route_config.get("lb_hash_key")
+
+        pool_key = route_config.get("route_id") or route_config.get("target_host")
+        pool = self._pools.get(pool_key)
+        if pool is None or not pool.matches(targets, strategy, hash_key):
+            pool = UpstreamPool(targets, strategy, hash_key)
+            self._pools[pool_key] = pool
+            self.logger.info("Upstream pool built", route_id=pool_key, targets=len(targets), strategy=strategy)
+        return pool
+
+    def select(
+        self,
+        route_config: Dict[str, Any],
+        api_key: Optional[str] = None,
+        headers: Optional[Mapping[str, str]] = None,
+        exclude: Optional[Iterable[str]] = None
+    ) -> str:
+        """
+        为一次尝试选择上游主机
+
+        Args:
+            route_config: 路由配置
+            api_key: 调用方 API Key（一致性哈希键为 api_key 时使用）
+            headers: 请求头（一致性哈希键为 header:<名称> 时使用，名称不区分大小写）
+            exclude: 排除的主机，如重试时已尝试过的主机
+
+        Returns:
+            str: 目标主机（host:port）
+        """
+        # 单目标路由（绝大多数）不经过目标池
+        targets = route_config.get("_upstreams")
+        if targets is None and not route_config.get("target_hosts"):
+            return route_config["target_host"]
+        if targets is not None and len(targets) <= 1:
+            return targets[0][0] if targets else route_config["target_host"]
+
+        pool = self.pool_for(route_config)
+        if not pool.hosts:
+            return route_config["target_host"]
+
+        key = None
+        if pool.strategy == "consistent_hash":
+            key = self._hash_value(pool.hash_key, api_key, headers)
+        unavailable = upstream_health.unavailable()
+        open_hosts = circuit_breaker.open_hosts()
+        if open_hosts:
+            unavailable = unavailable | open_hosts
+        return pool.select(self._in_flight, key=key, exclude=exclude, unavailable=unavailable)
+
+    @staticmethod
+    def _hash_value(hash_key: Optional[str], api_key: Optional[str],
+                    headers: Optional[Mapping[str, str]]) -> Optional[str]:
+        if hash_key and hash_key.startswith("header:"):
+            if not headers:
+                return None
+            name = hash_key[len("header:"):].strip().lower()
+            value = headers.get(name)
+            if value is None:
+                value = next((v for k, v in headers.items() if k.lower() == name), None)
+            return value or None
+        return api_key or None
+
+    @contextmanager
+    def track(self, host: str) -> Iterator[None]:
+        """
+        在转发期间占用一个在途请求计数
+
+        Args:
+            host: 目标主机
+        """
+        self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        try:
+            yield
+        finally:
+            remaining = self._in_flight.get(host, 1) - 1
+            if remaining > 0:
+                self._in_flight[host] = remaining
+            else:
+                self._in_flight.pop(host, None)
+
+    def in_flight(self, host: str) -> int:
+        """主机当前的在途请求数"""
+        return self._in_flight.get(host, 0)
+
+
+# 全局负载均衡器实例
+load_balancer = LoadBalancer()
@@ -0,0 +1,436 @@
+"""
+进程内指标注册表
+在代理热路径上只做内存计数（计数器、仪表、直方图），由 /metrics 以 Prometheus 文本格式导出，
+抓取时不访问数据库；直方图按桶估算分位数，供 /admin/metrics 的 P95 使用
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+# 默认耗时桶（秒），覆盖从毫秒级到长流式请求
+DEFAULT_LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0
+)
+
+
+def _escape_label_value(value: str) -> str:
+    """转义标签值"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    """格式化标签"""
+    parts = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """格式化数值"""
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labelvalues: Sequence[str]) -> Tuple[str, ...]:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return tuple(str(value) for value in labelvalues)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        """计数加 amount"""
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues: str) -> float:
+        """获取指定标签的计数"""
+        return self._values.get(self._key(labelvalues), 0)
+
+    def total(self) -> float:
+        """所有标签的计数之和"""
+        return sum(self._values.values())
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        """所有标签及计数"""
+        with self._lock:
+            return list(self._values.items())
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in self.items():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(_Metric):
+    """可增可减的仪表，也可以绑定取值函数"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._function = function
+
+    def set(self, value: float, *labelvalues: str) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labelvalues: str, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def value(self, *labelvalues: str) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labelvalues), 0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        if self._function is not None:
+            try:
+                lines.append(f"{self.name} {_format_value(self._function())}")
+            except Exception:
+                pass
+            return lines
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """固定桶直方图"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # {labels: [各桶计数..., +Inf桶计数, 总和]}
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        """记录一次观测值"""
+        key = self._key(labelvalues)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [0] * (len(self.buckets) + 2)
+                self._values[key] = state
+            state[index] += 1
+            state[-1] += value
+
+    def _merged(self, labelvalues: Optional[Sequence[str]] = None) -> Optional[List[float]]:
+        """合并指定标签（或全部标签）的桶计数"""
+        with self._lock:
+            if labelvalues is not None:
+                state = self._values.get(self._key(labelvalues))
+                return list(state) if state else None
+            states = list(self._values.values())
+        if not states:
+            return None
+        return [sum(column) for column in zip(*states)]
+
+    def count(self, *labelvalues: str) -> int:
+        """观测次数（不传标签时为全部标签之和）"""
+        state = self._merged(labelvalues if labelvalues else None)
+        return int(sum(state[:-1])) if state else 0
+
+    def quantile(self, q: float, labelvalues: Optional[Sequence[str]] = None) -> Optional[float]:
+        """
+        按桶线性插值估算分位数
+
+        Args:
+            q: 分位（0-1）
+            labelvalues: 标签值，不传时合并全部标签
+
+        Returns:
+            Optional[float]: 估算值，没有观测时返回 None
+        """
+        state = self._merged(labelvalues)
+        if not state:
+            return None
+        counts = state[:-1]
+        total = sum(counts)
+        if total == 0:
+            return None
+
+        rank = q * total
+        cumulative = 0
+        for index, bucket_count in enumerate(counts):
+            if cumulative + bucket_count >= rank and bucket_count:
+                if index >= len(self.buckets):
+                    # 落在 +Inf 桶时只能返回最大有限边界
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += bucket_count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(cumulative)}")
+        return lines
+
+
+class RateWindow:
+    """按秒分槽的滑动窗口计数（用于每分钟请求数）"""
+
+    def __init__(self, window_seconds: int = 60):
+        self.window_seconds = window_seconds
+        self._slots = [0] * window_seconds
+        self._stamps = [0] * window_seconds
+        self._lock = threading.Lock()
+
+    def add(self, amount: int = 1, now: Optional[float] = None) -> None:
+        second = int(now if now is not None else time.time())
+        index = second % self.window_seconds
+        with self._lock:
+            if self._stamps[index] != second:
+                self._stamps[index] = second
+                self._slots[index] = 0
+            self._slots[index] += amount
+
+    def total(self, now: Optional[float] = None) -> int:
+        second = int(now if now is not None else time.time())
+        oldest = second - self.window_seconds
+        with self._lock:
+            return sum(count for count, stamp in zip(self._slots, self._stamps) if stamp > oldest)
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Iterable[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """导出 Prometheus 文本格式"""
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+class GatewayMetrics:
+    """网关指标集合"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        registry = self.registry
+
+        self.requests_total = registry.counter(
+            "fastgate_requests_total", "Proxied requests by route, method and status",
+            ("route", "method", "status")
+        )
+        self.request_duration = registry.histogram(
+            "fastgate_request_duration_seconds", "End-to-end proxy latency", ("route",)
+        )
+        self.ttfb = registry.histogram(
+            "fastgate_ttfb_seconds", "Time to first upstream byte", ("route",)
+        )
+        self.in_flight = registry.gauge(
+            "fastgate_requests_in_flight", "Requests currently being proxied"
+        )
+        self.upstream_errors = registry.counter(
+            "fastgate_upstream_errors_total", "Upstream failures by route and reason",
+            ("route", "reason")
+        )
+        self.request_rate = RateWindow(60)
+
+    def bind_audit_writer(self, writer) -> None:
+        """导出审计写入器的队列深度和丢弃计数"""
+        self.registry.gauge("fastgate_audit_queue_depth", "Audit records waiting to be written",
+                            function=lambda: writer.depth)
+        self.registry.gauge("fastgate_audit_dropped_records", "Audit records dropped on queue overflow",
+                            function=lambda: writer.dropped)
+        self.registry.gauge("fastgate_audit_spilled_records", "Audit records spilled to disk on overflow",
+                            function=lambda: writer.spilled)
+
+    def bind_circuit_breaker(self, breaker) -> None:
+        """导出熔断中的上游主机数"""
+        self.registry.gauge("fastgate_open_circuits", "Upstream hosts with an open circuit",
+                            function=lambda: len(breaker.open_hosts()))
+
+    def start_request(self, route: str, method: str) -> "RequestMetrics":
+        """开始记录一个请求"""
+        return RequestMetrics(self, route, method)
+
+    def render(self) -> str:
+        return self.registry.render()
+
+
+class RequestMetrics:
+    """单个请求的指标记录（finish 幂等）"""
+
+    __slots__ = ("metrics", "route", "method", "started", "first_byte_seen", "finished")
+
+    def __init__(self, metrics: GatewayMetrics, route: str, method: str):
+        self.metrics = metrics
+        self.route = route
+        self.method = method
+        self.started = time.perf_counter()
+        self.first_byte_seen = False
+        self.finished = False
+        metrics.in_flight.inc()
+
+    def first_byte(self) -> None:
+        """记录首字节耗时"""
+        if not self.first_byte_seen:
+            self.first_byte_seen = True
+            self.metrics.ttfb.observe(time.perf_counter() - self.started, self.route)
+
+    def upstream_error(self, reason: str) -> None:
+        """记录上游错误"""
+        self.metrics.upstream_errors.inc(self.route, reason)
+
+    def finish(self, status_code: int) -> None:
+        """记录请求结束"""
+        if self.finished:
+            return
+        self.finished = True
+        metrics = self.metrics
+        metrics.in_flight.dec()
+        metrics.requests_total.inc(self.route, self.method, str(status_code))
+        metrics.request_duration.observe(time.perf_counter() - self.started, self.route)
+        metrics.request_rate.add()
+
+
+async def observe_stream(body_iterator, request_metrics: RequestMetrics, status_code: int = 200):
+    """
+    包装流式响应体：首个分块记录 TTFB，结束时记录请求完成
+
+    Args:
+        body_iterator: 原始响应体迭代器
+        request_metrics: 请求指标记录
+        status_code: 响应状态码
+    """
+    try:
+        async for chunk in body_iterator:
+            if not request_metrics.first_byte_seen:
+                request_metrics.first_byte()
+            yield chunk
+    except Exception as e:
+        request_metrics.upstream_error(type(e).__name__)
+        request_metrics.finish(502)
+        raise
+    finally:
+        request_metrics.finish(status_code)
+
+
+class ObservedStreamingResponse(Response):
+    """
+    包装流式响应：ASGI 调用结束时记录请求完成
+
+    客户端在响应体开始迭代之前断开时 observe_stream 的生成器不会运行，finally 中的 finish 也不会执行，
+    因此在 ASGI 调用外层再保证一次（finish 可重复调用）
+    """
+
+    def __init__(self, response: Response, request_metrics: RequestMetrics):
+        self.response = response
+        self.request_metrics = request_metrics
+        self.status_code = response.status_code
+        self.media_type = response.media_type
+        self.background = None
+        # 与原响应共用响应头列表，之后对 headers 的修改同样作用于原响应
+        self.raw_headers = response.raw_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.response(scope, receive, send)
+        finally:
+            self.request_metrics.finish(self.status_code)
+
+
+def observe_stream_response(response, request_metrics: RequestMetrics) -> ObservedStreamingResponse:
+    """
+    流式响应记录指标：首个分块记录 TTFB，响应体结束或 ASGI 调用结束时记录请求完成
+
+    Args:
+        response: 流式响应（StreamingResponse）
+        request_metrics: 请求指标记录
+
+    Returns:
+        ObservedStreamingResponse: 包装后的响应
+    """
+    response.body_iterator = observe_stream(response.body_iterator, request_metrics, response.status_code)
+    return ObservedStreamingResponse(response, request_metrics)
+
+
+# 全局指标实例
+gateway_metrics = GatewayMetrics()
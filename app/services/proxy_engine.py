@@ -4,35 +4,127 @@
 """
 
 import asyncio
+import time
 import httpx
-import json
-from typing import Dict, Any, Optional, AsyncGenerator, List
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncGenerator, AsyncIterator, Callable
+from urllib.parse import urlsplit
 from fastapi import HTTPException, Response
 from fastapi.responses import StreamingResponse
 import structlog
 
 from ..config import settings
+from .sse_parser import SSEParser, OpenAIStreamAccumulator
+from .load_balancer import load_balancer
+from .upstream_health import upstream_health
+from .circuit_breaker import circuit_breaker
+from .retry_budget import retry_budget
+from .hedging import hedge_policy
+from ..utils import jsoncodec
 
 logger = structlog.get_logger(__name__)
 
+# 请求扩展键：收到上游响应头时的回调（由客户端 response 事件钩子调用）
+ON_RESPONSE_HEADERS = "fastgate.on_response_headers"
+
+
+class StreamedBody:
+    """边读边转发的请求体：不整体缓冲，只保留前 prefix_limit 字节用于审计"""
+    
+    def __init__(self, source: AsyncIterator[bytes], prefix_limit: int = 4096):
+        """
+        初始化
+        
+        Args:
+            source: 客户端请求体字节流（如 request.stream()）
+            prefix_limit: 审计保留的前缀字节数
+        """
+        self.source = source
+        self.prefix_limit = prefix_limit
+        self.prefix = bytearray()
+        self.size = 0
+    
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self.source:
+            if not chunk:
+                continue
+            self.size += len(chunk)
+            if len(self.prefix) < self.prefix_limit:
+                self.prefix += chunk[:self.prefix_limit - len(self.prefix)]
+            yield chunk
+    
+    def audit_body(self) -> str:
+        """审计用的请求体前缀"""
+        text = self.prefix.decode("utf-8", errors="replace")
+        if self.size > len(self.prefix):
+            text += f"...[truncated, {self.size} bytes]"
+        return text
+
 
 class ProxyEngine:
     """通用代理转发引擎"""
     
-    def __init__(self):
-        """初始化代理引擎"""
+    def __init__(self, pool_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化代理引擎
+        
+        Args:
+            pool_config: 连接池配置，默认读取 proxy.pool
+        """
+        pool_config = pool_config if pool_config is not None else settings.proxy.get('pool', {})
+        
         self.client = httpx.AsyncClient(
             timeout=httpx.Timeout(
-                connect=10.0,
+                connect=pool_config.get('connect_timeout', 10.0),
                 read=settings.proxy['timeout'],
-                write=10.0,
-                pool=None
+                write=pool_config.get('write_timeout', 10.0),
+                pool=pool_config.get('pool_timeout')
             ),
-            limits=httpx.Limits(max_keepalive_connections=100, max_connections=200),
-            follow_redirects=True
+            limits=httpx.Limits(
+                max_keepalive_connections=pool_config.get('max_keepalive_connections', 100),
+                max_connections=pool_config.get('max_connections', 200),
+                keepalive_expiry=pool_config.get('keepalive_expiry', 30.0)
+            ),
+            follow_redirects=True,
+            event_hooks={"response": [self._on_response_headers]}
         )
+        
+        # 单个上游主机的并发连接上限（0 表示不限制）
+        self.max_connections_per_host = pool_config.get('max_connections_per_host', 0) or 0
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
         self.logger = logger.bind(service="proxy_engine")
     
+    @staticmethod
+    async def _on_response_headers(response: httpx.Response) -> None:
+        """收到上游响应头时（响应体读取之前）调用请求扩展中的回调"""
+        callback = response.request.extensions.get(ON_RESPONSE_HEADERS)
+        if callback is not None:
+            callback()
+    
+    @asynccontextmanager
+    async def _host_slot(self, url: str) -> AsyncIterator[None]:
+        """
+        占用目标主机的连接槽位，超过 max_connections_per_host 时排队等待；
+        占用期间（含排队）计入该主机的在途请求数，供负载均衡选择
+        
+        Args:
+            url: 目标URL
+        """
+        host = urlsplit(url).netloc
+        with load_balancer.track(host):
+            if not self.max_connections_per_host:
+                yield
+                return
+            
+            semaphore = self._host_semaphores.get(host)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_connections_per_host)
+                self._host_semaphores[host] = semaphore
+            
+            async with semaphore:
+                yield
+    
     async def forward_request(
         self,
         route_config: Dict[str, Any],
@@ -43,6 +135,7 @@ class ProxyEngine:
         json: Optional[Dict[str, Any]] = None,
         content: Optional[bytes] = None,
         is_stream_request: bool = False,  # 新增：标识是否为流式请求
+        on_response_headers: Optional[Callable[[], None]] = None,
         **kwargs
     ) -> httpx.Response:
         """
@@ -57,6 +150,7 @@ class ProxyEngine:
             json: JSON请求体
             content: 原始请求体
             is_stream_request: 是否为流式请求
+            on_response_headers: 收到上游响应头时的回调（响应体读取之前，对冲时以先到的一方为准）
             **kwargs: 其他请求参数
             
         Returns:
@@ -65,7 +159,7 @@ class ProxyEngine:
         Raises:
             HTTPException: 转发失败时抛出
         """
-        timeout = route_config.get('timeout', settings.proxy.get('timeout', 30))
+        timeout = route_config.get('timeout') or settings.proxy.get('timeout', 30)
         retry_count = route_config.get('retry_count', settings.proxy.get('max_retries', 0))
         
         # 处理请求头
@@ -81,9 +175,13 @@ class ProxyEngine:
         
         if params:
             request_kwargs["params"] = params
+        if on_response_headers is not None:
+            request_kwargs["extensions"] = {ON_RESPONSE_HEADERS: on_response_headers}
             
+        processed_body = None
         if json is not None:
-            request_kwargs["json"] = self._process_request_body(json, route_config)
+            processed_body = self._process_request_body(json, route_config)
+            request_kwargs["content"] = self._encode_json_body(processed_body, processed_headers)
         elif content is not None:
             request_kwargs["content"] = content
         
@@ -91,9 +189,33 @@ class ProxyEngine:
         request_kwargs.update(kwargs)
         
         last_exception = None
+        tried_hosts = set()
+        deadline = retry_budget.deadline(timeout, headers)
+        deadline_exceeded = False
+        attempts = 0
+        retry_budget.record_request()
         
-        # 执行请求（带重试）
+        # 对冲只用于非流式请求；对冲尝试各自上报转发结果
+        hedged = bool(route_config.get('hedge_enabled')) and not is_stream_request
+        if hedged:
+            hedge_policy.record_request()
+        
+        # 执行请求（带重试），路由配置了多个上游目标时每次重试换一个未尝试过的目标；
+        # 所有尝试和退避共享同一个截止时间，重试次数受全局重试预算限制
         for attempt in range(retry_count + 1):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                deadline_exceeded = True
+                break
+            if attempt > 0:
+                url = self._retarget_url(route_config, url, tried_hosts)
+                request_kwargs["url"] = url
+            tried_hosts.add(urlsplit(url).netloc)
+            self._check_circuit(url)
+            request_kwargs["timeout"] = min(timeout, remaining)
+            if retry_budget.deadline_header:
+                processed_headers[retry_budget.deadline_header] = str(int(remaining * 1000))
+            attempts += 1
             try:
                 # 调试日志：记录改造后的请求头和请求体
                 self.logger.debug(
@@ -101,8 +223,8 @@ class ProxyEngine:
                     method=method,
                     url=url,
                     processed_headers=processed_headers,
-                    processed_body=request_kwargs.get("json"),
-                    content_length=len(str(request_kwargs.get("content", ""))) if request_kwargs.get("content") else 0,
+                    processed_body=processed_body,
+                    content_length=len(request_kwargs["content"]) if request_kwargs.get("content") else 0,
                     attempt=attempt + 1
                 )
                 
@@ -112,6 +234,7 @@ class ProxyEngine:
                     url=url,
                     attempt=attempt + 1,
                     max_attempts=retry_count + 1,
+                    remaining_seconds=round(remaining, 3),
                     is_stream=is_stream_request
                 )
                 
@@ -120,8 +243,13 @@ class ProxyEngine:
                     # 使用stream方法，立即返回响应对象，不等待内容
                     stream_response = self.client.stream(**request_kwargs)
                     response = await stream_response.__aenter__()
+                elif hedged:
+                    response = await self._send_hedged(route_config, request_kwargs, tried_hosts)
                 else:
-                    response = await self.client.request(**request_kwargs)
+                    async with self._host_slot(url):
+                        response = await self.client.request(**request_kwargs)
+                if not hedged:
+                    self._record_upstream_result(url, status_code=response.status_code)
                 
                 self.logger.info(
                     "Request forwarded successfully",
@@ -134,6 +262,8 @@ class ProxyEngine:
                 
             except (httpx.ConnectError, httpx.TimeoutException, httpx.ReadTimeout) as e:
                 last_exception = e
+                if not hedged:
+                    self._record_upstream_result(url, error=type(e).__name__)
                 self.logger.warning(
                     "Request failed, retrying",
                     error=str(e),
@@ -141,12 +271,18 @@ class ProxyEngine:
                     max_attempts=retry_count + 1
                 )
                 
-                if attempt < retry_count:
-                    # 指数退避重试
-                    await asyncio.sleep(min(2 ** attempt, 10))
-                    continue
-                else:
+                if attempt >= retry_count:
+                    break
+                
+                # 带抖动的指数退避，退避后已没有剩余时间则不再重试
+                backoff = retry_budget.backoff(attempt)
+                if deadline - time.monotonic() <= backoff:
+                    deadline_exceeded = True
                     break
+                if not retry_budget.try_acquire():
+                    self.logger.warning("Retry budget exhausted, not retrying", url=url)
+                    break
+                await asyncio.sleep(backoff)
                     
             except httpx.HTTPStatusError as e:
                 # HTTP状态码错误不重试，直接返回响应
@@ -166,13 +302,210 @@ class ProxyEngine:
                 )
                 break
         
-        # 所有重试都失败了
-        error_msg = f"Request failed after {retry_count + 1} attempts"
+        # 所有重试都失败了（或截止时间已到）
+        error_msg = f"Request failed after {attempts} attempts"
+        if deadline_exceeded:
+            error_msg = f"Request deadline exceeded after {attempts} attempts"
         if last_exception:
             error_msg += f": {str(last_exception)}"
             
         self.logger.error("Request forwarding failed", error=error_msg)
-        raise HTTPException(status_code=502, detail=error_msg)
+        raise HTTPException(status_code=504 if deadline_exceeded else 502, detail=error_msg)
+    
+    async def _send_attempt(self, request_kwargs: Dict[str, Any]) -> httpx.Response:
+        """
+        发送一次尝试，收到响应头即返回（响应体未读取）并上报转发结果
+        
+        Args:
+            request_kwargs: 请求参数
+            
+        Returns:
+            httpx.Response: 未读取响应体的响应对象
+        """
+        url = request_kwargs["url"]
+        try:
+            async with self._host_slot(url):
+                response = await self.client.send(self.client.build_request(**request_kwargs), stream=True)
+        except httpx.TransportError as e:
+            self._record_upstream_result(url, error=type(e).__name__)
+            raise
+        self._record_upstream_result(url, status_code=response.status_code)
+        return response
+    
+    async def _send_hedged(
+        self,
+        route_config: Dict[str, Any],
+        request_kwargs: Dict[str, Any],
+        tried_hosts: set
+    ) -> httpx.Response:
+        """
+        对冲发送：首次尝试超过对冲延迟仍未收到响应头时，在额外负载预算内向另一个目标再发一次，
+        先收到响应头的一方胜出，另一方被取消；两次都失败时抛出首次尝试的异常
+        
+        Args:
+            route_config: 路由配置
+            request_kwargs: 请求参数
+            tried_hosts: 已尝试过的主机（对冲目标会加入其中）
+            
+        Returns:
+            httpx.Response: 已读取响应体的响应对象
+        """
+        url = request_kwargs["url"]
+        delay = hedge_policy.delay(route_config)
+        primary = asyncio.ensure_future(self._send_attempt(request_kwargs))
+        done, _ = await asyncio.wait({primary}, timeout=min(delay, request_kwargs["timeout"]))
+        
+        hedge = None
+        if not done and hedge_policy.try_acquire():
+            hedge_url = self._retarget_url(route_config, url, tried_hosts)
+            hedge_host = urlsplit(hedge_url).netloc
+            if circuit_breaker.allow(hedge_host):
+                tried_hosts.add(hedge_host)
+                self.logger.info("Hedging request", url=url, hedge_url=hedge_url, delay_ms=round(delay * 1000))
+                hedge = asyncio.ensure_future(self._send_attempt({**request_kwargs, "url": hedge_url}))
+        
+        attempts = [primary] if hedge is None else [primary, hedge]
+        winner = None
+        try:
+            pending = set(attempts)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winner = next((task for task in attempts if task in done and task.exception() is None), None)
+        finally:
+            losers = [task for task in attempts if task is not winner]
+            for task in losers:
+                task.cancel()
+            for result in await asyncio.gather(*losers, return_exceptions=True):
+                if isinstance(result, httpx.Response):
+                    await result.aclose()
+        
+        if winner is None:
+            return primary.result()
+        if winner is hedge:
+            hedge_policy.hedge_wins += 1
+        response = winner.result()
+        try:
+            await response.aread()
+        except httpx.TransportError as e:
+            await response.aclose()
+            self._record_upstream_result(str(response.request.url), error=type(e).__name__)
+            raise
+        return response
+    
+    async def forward_streamed_body(
+        self,
+        route_config: Dict[str, Any],
+        method: str,
+        url: str,
+        body: StreamedBody,
+        headers: Optional[Dict[str, str]] = None
+    ) -> httpx.Response:
+        """
+        边读边转发请求体，收到上游响应头即返回（响应体未读取，调用方负责关闭）
+        请求体只能读取一次，因此不重试
+        
+        Args:
+            route_config: 路由配置
+            method: HTTP方法
+            url: 目标URL
+            body: 流式请求体
+            headers: 请求头
+            
+        Returns:
+            httpx.Response: 未读取响应体的响应对象
+            
+        Raises:
+            HTTPException: 转发失败时抛出
+        """
+        timeout = route_config.get('timeout', settings.proxy.get('timeout', 30))
+        original_headers = headers or {}
+        processed_headers = self._process_headers(original_headers, route_config)
+        
+        # 保留原始长度，避免上游收到 chunked 请求体；aiter_raw 转发要求上游返回未压缩内容
+        if original_headers.get("content-length"):
+            processed_headers["content-length"] = original_headers["content-length"]
+        processed_headers["accept-encoding"] = "identity"
+        
+        self._check_circuit(url)
+        self.logger.info("Forwarding streamed request body", method=method, url=url)
+        request = self.client.build_request(
+            method=method,
+            url=url,
+            headers=processed_headers,
+            content=body,
+            timeout=timeout
+        )
+        try:
+            async with self._host_slot(url):
+                response = await self.client.send(request, stream=True)
+        except httpx.HTTPError as e:
+            if isinstance(e, httpx.TransportError):
+                self._record_upstream_result(url, error=type(e).__name__)
+            self.logger.error("Streamed body forwarding failed", error=str(e), url=url)
+            raise HTTPException(status_code=502, detail=f"Request failed: {str(e)}")
+        self._record_upstream_result(url, status_code=response.status_code)
+        return response
+    
+    def relay_streamed_body_response(
+        self,
+        response: httpx.Response,
+        body: StreamedBody,
+        audit_service=None,
+        request_id: str = None
+    ) -> StreamingResponse:
+        """
+        将流式请求体请求的流式响应按原始分块转发，结束时记录审计
+        
+        Args:
+            response: forward_streamed_body 返回的响应对象
+            body: 流式请求体
+            audit_service: 审计服务（可选）
+            request_id: 请求ID（可选）
+            
+        Returns:
+            StreamingResponse: FastAPI流式响应
+        """
+        async def relay() -> AsyncGenerator[bytes, None]:
+            from datetime import datetime
+            
+            first_chunk_time = None
+            chunk_count = 0
+            total_size = 0
+            error_message = None
+            try:
+                async for chunk in response.aiter_raw():
+                    if first_chunk_time is None:
+                        first_chunk_time = datetime.now()
+                    chunk_count += 1
+                    total_size += len(chunk)
+                    yield chunk
+            except Exception as e:
+                self.logger.error("Streamed body relay error", error=str(e), request_id=request_id)
+                error_message = str(e)
+                raise
+            finally:
+                await response.aclose()
+                if audit_service and request_id:
+                    await audit_service.log_request_complete(request_id, {
+                        "status_code": response.status_code,
+                        "response_time": datetime.now(),
+                        "first_response_time": first_chunk_time,
+                        "is_stream": True,
+                        "stream_chunks": chunk_count,
+                        "response_headers": dict(response.headers),
+                        "response_body": None,
+                        "response_size": total_size,
+                        "request_body": body.audit_body(),
+                        "request_size": body.size,
+                        "error_message": error_message
+                    })
+        
+        return StreamingResponse(
+            relay(),
+            status_code=response.status_code,
+            headers=self._process_response_headers(dict(response.headers)),
+            media_type=response.headers.get("content-type", "text/event-stream")
+        )
     
     async def handle_stream_response(self, response: httpx.Response, audit_service=None, request_id=None) -> StreamingResponse:
         """
@@ -236,8 +569,8 @@ class ProxyEngine:
         # 如果remove_headers是字符串，尝试解析为JSON
         if isinstance(remove_headers, str):
             try:
-                remove_headers = json.loads(remove_headers)
-            except (json.JSONDecodeError, TypeError):
+                remove_headers = jsoncodec.loads(remove_headers)
+            except (jsoncodec.JSONDecodeError, TypeError):
                 remove_headers = []
         
         # 确保remove_headers是列表类型
@@ -253,8 +586,8 @@ class ProxyEngine:
         # 如果add_headers是字符串，尝试解析为JSON
         if isinstance(add_headers, str):
             try:
-                add_headers = json.loads(add_headers)
-            except (json.JSONDecodeError, TypeError):
+                add_headers = jsoncodec.loads(add_headers)
+            except (jsoncodec.JSONDecodeError, TypeError):
                 add_headers = {}
         
         if add_headers:
@@ -288,8 +621,8 @@ class ProxyEngine:
         # 如果add_body_fields是字符串，尝试解析为JSON
         if isinstance(add_body_fields, str):
             try:
-                add_body_fields = json.loads(add_body_fields)
-            except (json.JSONDecodeError, TypeError):
+                add_body_fields = jsoncodec.loads(add_body_fields)
+            except (jsoncodec.JSONDecodeError, TypeError):
                 add_body_fields = {}
         
         if add_body_fields:
@@ -297,6 +630,21 @@ class ProxyEngine:
         
         return processed_body
     
+    def _encode_json_body(self, body: Any, headers: Dict[str, str]) -> bytes:
+        """
+        序列化 JSON 请求体（代替 httpx 的 json= 参数，使用 jsoncodec 直接得到 bytes）
+        
+        Args:
+            body: 处理后的请求体
+            headers: 转发请求头，缺少 content-type 时补充 application/json
+            
+        Returns:
+            bytes: 序列化后的请求体
+        """
+        if not any(name.lower() == "content-type" for name in headers):
+            headers["content-type"] = "application/json"
+        return jsoncodec.dumpb(body)
+    
     def _process_response_headers(self, headers: Dict[str, str]) -> Dict[str, str]:
         """
         处理响应头 - 强制流式无缓冲
@@ -374,19 +722,27 @@ class ProxyEngine:
             "text/plain" in content_type and "stream" in content_type
         )
     
-    def build_target_url(self, route_config: Dict[str, Any], original_path: str) -> str:
+    def build_target_url(
+        self,
+        route_config: Dict[str, Any],
+        original_path: str,
+        api_key: Optional[str] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> str:
         """
-        构建目标URL
+        构建目标URL，路由配置了上游目标池时按负载均衡策略选择主机
         
         Args:
             route_config: 路由配置
             original_path: 原始请求路径
+            api_key: 调用方 API Key（一致性哈希使用）
+            headers: 请求头（一致性哈希使用）
             
         Returns:
             str: 构建的目标URL
         """
         protocol = route_config.get('target_protocol', 'http')
-        host = route_config['target_host']
+        host = load_balancer.select(route_config, api_key=api_key, headers=headers)
         target_path = route_config['target_path']
         
         # 处理路径前缀剔除
@@ -400,6 +756,62 @@ class ProxyEngine:
         # 构建完整URL
         return f"{protocol}://{host}{target_path}"
     
+    def _record_upstream_result(self, url: str, status_code: Optional[int] = None, error: Optional[str] = None) -> None:
+        """
+        向健康检查和熔断器上报一次转发结果：连接错误、超时和 5xx 计为失败
+        
+        Args:
+            url: 目标URL
+            status_code: 上游响应状态码
+            error: 传输错误类型
+        """
+        host = urlsplit(url).netloc
+        if error is not None or (status_code is not None and status_code >= 500):
+            reason = error or f"status_{status_code}"
+            upstream_health.record_failure(host, reason)
+            circuit_breaker.record_failure(host, reason)
+        else:
+            upstream_health.record_success(host)
+            circuit_breaker.record_success(host)
+    
+    def _check_circuit(self, url: str) -> None:
+        """
+        转发前检查目标主机的熔断状态，熔断中直接返回 503，不占用连接和重试
+        
+        Args:
+            url: 目标URL
+            
+        Raises:
+            HTTPException: 目标主机熔断中
+        """
+        host = urlsplit(url).netloc
+        if circuit_breaker.allow(host):
+            return
+        self.logger.warning("Upstream circuit open, request rejected", host=host)
+        raise HTTPException(
+            status_code=503,
+            detail=f"Upstream circuit open: {host}",
+            headers={"Retry-After": str(circuit_breaker.retry_after(host))}
+        )
+    
+    def _retarget_url(self, route_config: Dict[str, Any], url: str, tried_hosts: set) -> str:
+        """
+        重试时从上游目标池中另选一个未尝试过的主机（全部尝试过时按策略重新选择）
+        
+        Args:
+            route_config: 路由配置
+            url: 上一次尝试的目标URL
+            tried_hosts: 已尝试过的主机
+            
+        Returns:
+            str: 本次尝试的目标URL
+        """
+        host = load_balancer.select(route_config, exclude=tried_hosts)
+        parts = urlsplit(url)
+        if host == parts.netloc:
+            return url
+        return parts._replace(netloc=host).geturl()
+    
     async def raw_stream_response(self, response: httpx.Response) -> httpx.Response:
         """
         直接返回原始流式响应 - 绕过FastAPI包装
@@ -450,6 +862,9 @@ class ProxyEngine:
         """
         timeout = route_config.get('timeout', settings.proxy.get('timeout', 30))
         
+        # 熔断检查需在返回流式响应之前完成，才能以 503 响应客户端
+        self._check_circuit(url)
+        
         # 处理请求头
         processed_headers = self._process_headers(headers or {}, route_config)
         
@@ -460,24 +875,38 @@ class ProxyEngine:
             request_id=request_id
         )
         
+        # 透传模式：路由选择 passthrough 或未开启完整响应审计时，不解析响应内容
+        if route_config.get('stream_mode') == 'passthrough' or not settings.proxy.get('audit_full_response', True):
+            return StreamingResponse(
+                self._passthrough_stream(
+                    route_config, method, url, processed_headers, params, json, content,
+                    timeout, audit_service, request_id
+                ),
+                media_type="text/event-stream",
+                headers=self._process_response_headers({
+                    "content-type": "text/event-stream",
+                    "cache-control": "no-cache",
+                    "connection": "keep-alive"
+                })
+            )
+        
         async def stream_wrapper() -> AsyncGenerator[bytes, None]:
             """流式响应包装器 - 审计缓存+chunk合并模式"""
             import time
-            import json as json_module  # 重命名避免与参数json冲突
             from datetime import datetime
             
             # 审计缓存变量（仅内存操作，不阻塞）
             start_time = time.time()
             first_chunk_time = None
             chunk_count = 0
+            audit_logged = False
             total_size = 0
             response_status = None
             response_headers = None
             
-            # OpenAI chunk收集和合并变量
-            collected_chunks = []  # 收集所有chunk数据
-            merged_content = ""    # 合并后的完整content
-            completion_info = {}   # 完整的completion信息
+            # OpenAI chunk增量解析和合并（内存占用只与合并后的内容相关）
+            sse_parser = SSEParser()
+            accumulator = OpenAIStreamAccumulator()
             
             try:
                 # 调试日志：记录改造后的流式请求头和请求体
@@ -493,15 +922,15 @@ class ProxyEngine:
                 )
                 
                 # 关键：直接在async with中使用client.stream()
-                async with self.client.stream(
+                async with self._host_slot(url), self.client.stream(
                     method=method,
                     url=url,
                     headers=processed_headers,
                     timeout=timeout,
                     params=params,
-                    json=processed_json,
-                    content=content
+                    content=self._encode_json_body(processed_json, processed_headers) if processed_json is not None else content
                 ) as response:
+                    self._record_upstream_result(url, status_code=response.status_code)
                     response.raise_for_status()
                     
                     # 缓存响应信息（仅内存操作）
@@ -528,20 +957,21 @@ class ProxyEngine:
                             chunk_count += 1
                             total_size += len(chunk)
                             
-                            # 收集chunk用于后续合并（仅内存操作）
-                            chunk_text = chunk.decode('utf-8', errors='ignore')
-                            collected_chunks.append(chunk_text)
-                            
                             # 立即yield，绝对无阻塞
                             yield chunk
                             
+                            # 转发后再增量解析本段（仅内存操作）
+                            accumulator.add_events(sse_parser.feed(chunk))
+                            
             except Exception as e:
+                if isinstance(e, httpx.TransportError):
+                    self._record_upstream_result(url, error=type(e).__name__)
                 self.logger.error("Stream request error", error=str(e), request_id=request_id)
                 # 即使出错也要记录审计信息
                 if audit_service and request_id:
-                    import asyncio
+                    audit_logged = True
                     end_time = datetime.now()
-                    asyncio.create_task(audit_service.log_request_complete(request_id, {
+                    await audit_service.log_request_complete(request_id, {
                         "status_code": response_status or 500,
                         "response_time": end_time,
                         "first_response_time": first_chunk_time,
@@ -551,16 +981,16 @@ class ProxyEngine:
                         "response_body": None,
                         "response_size": total_size,
                         "error_message": str(e)
-                    }))
+                    })
                 raise
             finally:
-                # 流式传输完成后，进行chunk合并和审计记录
-                if audit_service and request_id:
-                    import asyncio
+                # 流式传输完成后，进行chunk合并和审计记录（出错时已在上面记录）
+                if audit_service and request_id and not audit_logged:
                     end_time = datetime.now()
                     
-                    # OpenAI格式chunk合并处理
-                    merged_response = self._merge_openai_chunks(collected_chunks)
+                    # OpenAI格式chunk合并结果（已在传输过程中增量合并）
+                    accumulator.add_events(sse_parser.flush())
+                    merged_response = accumulator.result()
                     
                     self.logger.info(
                         "Stream completed - merged response ready",
@@ -570,8 +1000,8 @@ class ProxyEngine:
                         request_id=request_id
                     )
                     
-                    # 异步记录完整的审计信息，包含合并后的响应体
-                    asyncio.create_task(audit_service.log_request_complete(request_id, {
+                    # 记录完整的审计信息，包含合并后的响应体（仅入队，不等待写库）
+                    await audit_service.log_request_complete(request_id, {
                         "status_code": response_status,
                         "response_time": end_time,
                         "first_response_time": first_chunk_time,
@@ -580,11 +1010,7 @@ class ProxyEngine:
                         "response_headers": response_headers,
                         "response_body": merged_response,  # 合并后的完整响应体
                         "response_size": total_size
-                    }))
-                    
-                    # 如果需要记录首次响应时间
-                    if first_chunk_time:
-                        asyncio.create_task(audit_service.log_first_response(request_id, first_chunk_time))
+                    })
         
         # 优化响应头，强制无缓冲  
         response_headers = self._process_response_headers({
@@ -599,121 +1025,126 @@ class ProxyEngine:
             headers=response_headers
         )
     
-    def _merge_openai_chunks(self, collected_chunks: List[str]) -> Dict[str, Any]:
+    async def _passthrough_stream(
+        self,
+        route_config: Dict[str, Any],
+        method: str,
+        url: str,
+        headers: Dict[str, str],
+        params: Optional[Dict[str, Any]],
+        json: Optional[Dict[str, Any]],
+        content: Optional[bytes],
+        timeout: float,
+        audit_service=None,
+        request_id: str = None
+    ) -> AsyncGenerator[bytes, None]:
         """
-        合并OpenAI格式的流式响应chunks
+        透传流式响应：按上游原始分块转发，不解码、不收集，仅记录状态、大小和耗时
         
         Args:
-            collected_chunks: 收集的所有chunk文本列表
-            
-        Returns:
-            Dict[str, Any]: 合并后的完整响应信息
-        """
-        import json
-        import re
-        
-        merged_content = ""
-        completion_info = {
-            "id": "",
-            "object": "chat.completion",
-            "created": 0,
-            "model": "",
-            "choices": [],
-            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
-        }
+            route_config: 路由配置
+            method: HTTP方法
+            url: 目标URL
+            headers: 已处理的请求头
+            params: 查询参数
+            json: JSON请求体
+            content: 原始请求体
+            timeout: 超时时间
+            audit_service: 审计服务（可选）
+            request_id: 请求ID（可选）
+        """
+        from datetime import datetime
+        
+        first_chunk_time = None
+        chunk_count = 0
+        total_size = 0
+        response_status = None
+        response_headers = None
+        error_message = None
+        
+        # aiter_raw 不做解压，要求上游返回未压缩内容
+        headers = dict(headers)
+        headers["accept-encoding"] = "identity"
+        processed_json = self._process_request_body(json, route_config) if json is not None else None
         
         try:
-            # 合并所有chunk文本
-            full_text = "".join(collected_chunks)
-            
-            # 按行分割，每个data行是一个chunk
-            lines = full_text.split('\n')
-            
-            content_parts = []
-            role = None
-            finish_reason = None
-            
-            for line in lines:
-                line = line.strip()
+            async with self._host_slot(url), self.client.stream(
+                method=method,
+                url=url,
+                headers=headers,
+                timeout=timeout,
+                params=params,
+                content=self._encode_json_body(processed_json, headers) if processed_json is not None else content
+            ) as response:
+                self._record_upstream_result(url, status_code=response.status_code)
+                response.raise_for_status()
+                response_status = response.status_code
+                response_headers = dict(response.headers)
                 
-                # 跳过空行和非data行
-                if not line or not line.startswith('data: '):
-                    continue
+                async for chunk in response.aiter_raw():
+                    if first_chunk_time is None:
+                        first_chunk_time = datetime.now()
+                    chunk_count += 1
+                    total_size += len(chunk)
+                    yield chunk
                     
-                # 跳过[DONE]标记
-                if line == 'data: [DONE]':
-                    continue
-                
-                try:
-                    # 提取JSON部分
-                    json_str = line[6:]  # 去掉 'data: ' 前缀
-                    chunk_data = json.loads(json_str)
-                    
-                    # 提取基础信息（从第一个有效chunk）
-                    if not completion_info["id"] and "id" in chunk_data:
-                        completion_info["id"] = chunk_data.get("id", "")
-                        completion_info["created"] = chunk_data.get("created", 0)
-                        completion_info["model"] = chunk_data.get("model", "")
-                    
-                    # 处理choices
-                    if "choices" in chunk_data and chunk_data["choices"]:
-                        choice = chunk_data["choices"][0]
-                        delta = choice.get("delta", {})
-                        
-                        # 提取role（通常在第一个chunk）
-                        if "role" in delta and not role:
-                            role = delta["role"]
-                        
-                        # 提取content
-                        if "content" in delta:
-                            content_parts.append(delta["content"])
-                        
-                        # 提取finish_reason（通常在最后一个chunk）
-                        if choice.get("finish_reason"):
-                            finish_reason = choice["finish_reason"]
-                            
-                except json.JSONDecodeError as e:
-                    self.logger.warning(f"Failed to parse chunk JSON: {e}")
-                    continue
-            
-            # 合并所有content部分
-            merged_content = "".join(content_parts)
-            
-            # 构建完整的响应格式
-            completion_info["choices"] = [{
-                "index": 0,
-                "message": {
-                    "role": role or "assistant",
-                    "content": merged_content
-                },
-                "finish_reason": finish_reason or "stop"
-            }]
-            
-            # 简单估算token数量（实际应该用tokenizer）
-            estimated_completion_tokens = len(merged_content.split())
-            completion_info["usage"]["completion_tokens"] = estimated_completion_tokens
-            completion_info["usage"]["total_tokens"] = estimated_completion_tokens
-            
-            self.logger.info(
-                "Chunks merged successfully",
-                chunks_processed=len([l for l in full_text.split('\n') if l.strip().startswith('data: ')]),
-                content_length=len(merged_content),
-                estimated_tokens=estimated_completion_tokens
-            )
-            
-            return {
-                "content": merged_content,
-                "full_response": completion_info,
-                "role": role or "assistant",
-                "finish_reason": finish_reason or "stop"
-            }
-            
         except Exception as e:
-            self.logger.error(f"Error merging chunks: {e}")
-            return {
-                "content": "",
-                "full_response": completion_info,
-                "role": "assistant",
-                "finish_reason": "error",
-                "error": str(e)
-            } 
\ No newline at end of file
+            if isinstance(e, httpx.TransportError):
+                self._record_upstream_result(url, error=type(e).__name__)
+            self.logger.error("Passthrough stream error", error=str(e), request_id=request_id)
+            error_message = str(e)
+            raise
+        finally:
+            if audit_service and request_id:
+                await audit_service.log_request_complete(request_id, {
+                    "status_code": response_status or 500,
+                    "response_time": datetime.now(),
+                    "first_response_time": first_chunk_time,
+                    "is_stream": True,
+                    "stream_chunks": chunk_count,
+                    "response_headers": response_headers,
+                    "response_body": None,
+                    "response_size": total_size,
+                    "error_message": error_message
+                })
+
+
+# 进程级共享的代理引擎（由 app.main 的 lifespan 创建和关闭）
+_proxy_engine: Optional[ProxyEngine] = None
+
+
+def init_proxy_engine() -> ProxyEngine:
+    """
+    创建进程级共享的代理引擎
+    
+    Returns:
+        ProxyEngine: 共享的代理引擎
+    """
+    global _proxy_engine
+    if _proxy_engine is None:
+        _proxy_engine = ProxyEngine()
+        logger.info(
+            "Shared proxy engine created",
+            pool=settings.proxy.get('pool', {})
+        )
+    return _proxy_engine
+
+
+def get_proxy_engine() -> ProxyEngine:
+    """
+    获取共享的代理引擎，未初始化时（如未启用lifespan的测试客户端）按需创建
+    
+    Returns:
+        ProxyEngine: 共享的代理引擎
+    """
+    if _proxy_engine is None:
+        return init_proxy_engine()
+    return _proxy_engine
+
+
+async def close_proxy_engine() -> None:
+    """关闭共享的代理引擎及其连接池"""
+    global _proxy_engine
+    if _proxy_engine is not None:
+        engine, _proxy_engine = _proxy_engine, None
+        await engine.close()
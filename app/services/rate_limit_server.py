@@ -0,0 +1,115 @@
+"""
+限流计数服务 - 本机 Unix socket 上的共享 GCRA 桶
+多个网关 worker 连接同一个计数服务，按批租用令牌，使限流在任意 worker 数量下都成立
+
+协议：每行一个 JSON 消息
+  请求 {"id": 1, "ops": [{"key": "key:fg_x", "rpm": 60, "capacity": 60, "n": 10}, ...]}
+  响应 {"id": 1, "results": [{"granted": 10, "remaining": 50, "reset_after": 10.0, "retry_after": 0.0}, ...]}
+
+运行：python -m app.services.rate_limit_server --socket /tmp/fastgate-ratelimit.sock
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from typing import Any, Dict, Optional, Set
+
+import structlog
+
+from .rate_limiter import LocalRateLimitBackend
+from ..utils import jsoncodec
+
+logger = structlog.get_logger(__name__)
+
+
+class RateLimitServer:
+    """Unix socket 限流计数服务"""
+
+    def __init__(self, socket_path: str, max_buckets: int = 100000):
+        """
+        初始化
+
+        Args:
+            socket_path: 监听的 Unix socket 路径
+            max_buckets: 最多保留的桶数量
+        """
+        self.socket_path = socket_path
+        self.store = LocalRateLimitBackend(max_buckets)
+        self.logger = logger.bind(service="rate_limit_server")
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: Set[asyncio.StreamWriter] = set()
+
+    def handle_message(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """处理一条请求消息（同一消息内的操作在事件循环中连续执行，互不交错）"""
+        now = time.monotonic()
+        results = [
+            self.store.take(op["key"], op["rpm"], op["capacity"], op.get("n", 1), now)
+            for op in message.get("ops", [])
+        ]
+        return {"id": message.get("id"), "results": results}
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """处理单个 worker 连接"""
+        self._connections.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    response = self.handle_message(jsoncodec.loads(line))
+                except (ValueError, KeyError, TypeError, ZeroDivisionError) as e:
+                    self.logger.warning("Invalid rate limit request", error=str(e))
+                    break
+                writer.write(jsoncodec.dumpb(response) + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def start(self) -> None:
+        """开始监听（会清理残留的 socket 文件）"""
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o600)
+        self.logger.info("Rate limit server listening", socket_path=self.socket_path)
+
+    async def stop(self) -> None:
+        """停止监听并删除 socket 文件"""
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    async def serve_forever(self) -> None:
+        """启动并持续运行"""
+        await self.start()
+        try:
+            await self._server.serve_forever()
+        finally:
+            await self.stop()
+
+
+def main() -> None:
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description="M-FastGate 限流计数服务")
+    parser.add_argument("--socket", default="/tmp/fastgate-ratelimit.sock", help="Unix socket 路径")
+    parser.add_argument("--max-buckets", type=int, default=100000, help="最多保留的桶数量")
+    args = parser.parse_args()
+
+    try:
+        asyncio.run(RateLimitServer(args.socket, args.max_buckets).serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
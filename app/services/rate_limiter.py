@@ -0,0 +1,480 @@
+"""
+限流服务 - GCRA（通用信元速率算法，等价于令牌桶）
+每个桶只保存一个“理论到达时间”(TAT)，检查为 O(1) 且只在事件循环中执行，无需加锁；
+桶按 API Key、路由、source_path 和全局维度组合检查，全部通过才扣减；
+已完全恢复的空闲桶可以无损淘汰，内存随活跃调用方数量而非历史 Key 数量增长
+
+后端：
+- local: 进程内桶，多 worker 部署时每个进程各自计数
+- socket: 通过本机 Unix socket 计数服务（app.services.rate_limit_server）共享桶，
+  每个 worker 按批租用令牌并在本地扣减，热路径上大多数检查不产生 IO；
+  计数服务不可用时自动降级为进程内桶
+"""
+
+import asyncio
+import itertools
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import structlog
+
+from ..config import settings
+from ..utils import jsoncodec
+
+logger = structlog.get_logger(__name__)
+
+# 限流维度：(桶键, 维度, 每分钟请求数, 桶容量)
+Limit = Tuple[str, str, int, int]
+
+
+class RateLimitResult:
+    """限流检查结果"""
+
+    __slots__ = ("allowed", "limit", "remaining", "reset_after", "retry_after", "scope")
+
+    def __init__(self, allowed: bool, limit: int, remaining: int, reset_after: float,
+                 retry_after: float = 0.0, scope: Optional[str] = None):
+        self.allowed = allowed
+        self.limit = limit
+        self.remaining = remaining
+        self.reset_after = reset_after
+        self.retry_after = retry_after
+        self.scope = scope
+
+    def headers(self) -> Dict[str, str]:
+        """限流响应头"""
+        headers = {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.remaining, 0)),
+            "X-RateLimit-Reset": str(math.ceil(self.reset_after)),
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(1, math.ceil(self.retry_after)))
+            if self.scope:
+                headers["X-RateLimit-Scope"] = self.scope
+        return headers
+
+
+class LocalRateLimitBackend:
+    """进程内 GCRA 桶（也是 Unix socket 计数服务的存储实现）"""
+
+    def __init__(self, max_buckets: int = 100000):
+        """
+        初始化
+
+        Args:
+            max_buckets: 最多保留的桶数量
+        """
+        self.max_buckets = max_buckets
+        # {bucket_key: TAT}，按最近访问排序
+        self._buckets: "OrderedDict[str, float]" = OrderedDict()
+
+    def take(self, key: str, rpm: int, capacity: int, count: int, now: float) -> Dict[str, float]:
+        """
+        从单个桶中尽量取出 count 个令牌
+
+        Args:
+            key: 桶键
+            rpm: 每分钟请求数
+            capacity: 桶容量
+            count: 希望取出的令牌数
+            now: 当前时间（monotonic秒）
+
+        Returns:
+            Dict[str, float]: granted 实际取出数、remaining 剩余数、reset_after 完全恢复所需秒数、
+                retry_after 未取到时需等待的秒数
+        """
+        interval = 60.0 / rpm
+        tolerance = interval * capacity
+
+        tat = self._buckets.get(key, now)
+        if tat < now:
+            tat = now
+
+        available = int((now + tolerance - tat) / interval + 1e-9)
+        granted = max(0, min(count, available))
+        if granted == 0:
+            self._evict(now)
+            return {
+                "granted": 0,
+                "remaining": 0,
+                "reset_after": tat - now,
+                "retry_after": tat + interval - tolerance - now
+            }
+
+        tat += granted * interval
+        self._buckets[key] = tat
+        self._buckets.move_to_end(key)
+        self._evict(now)
+        return {
+            "granted": granted,
+            "remaining": available - granted,
+            "reset_after": tat - now,
+            "retry_after": 0.0
+        }
+
+    def acquire(self, limits: List[Limit], now: float) -> RateLimitResult:
+        """
+        检查所有维度，全部通过才各扣减一个令牌
+
+        Args:
+            limits: 本次请求需要检查的桶
+            now: 当前时间（monotonic秒）
+
+        Returns:
+            RateLimitResult: 限流结果
+        """
+        # 先检查，任一维度超限即拒绝，不扣减其他维度
+        for key, scope, rpm, capacity in limits:
+            interval = 60.0 / rpm
+            tat = self._buckets.get(key, now)
+            if tat < now:
+                tat = now
+            allow_at = tat + interval - interval * capacity
+            if allow_at > now + 1e-9:
+                self._evict(now)
+                return RateLimitResult(False, rpm, 0, tat - now, allow_at - now, scope)
+
+        tightest: Optional[RateLimitResult] = None
+        for key, scope, rpm, capacity in limits:
+            taken = self.take(key, rpm, capacity, 1, now)
+            if tightest is None or taken["remaining"] < tightest.remaining:
+                tightest = RateLimitResult(True, rpm, taken["remaining"], taken["reset_after"], scope=scope)
+        return tightest
+
+    def _evict(self, now: float) -> None:
+        """淘汰已完全恢复的空闲桶，并限制桶总数"""
+        buckets = self._buckets
+        while buckets:
+            key, tat = next(iter(buckets.items()))
+            if tat <= now or len(buckets) > self.max_buckets:
+                buckets.popitem(last=False)
+            else:
+                break
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class _Lease:
+    """从计数服务租用的令牌"""
+
+    __slots__ = ("tokens", "expires_at", "remaining", "reset_after")
+
+    def __init__(self):
+        self.tokens = 0
+        self.expires_at = 0.0
+        self.remaining = 0
+        self.reset_after = 0.0
+
+
+class SocketRateLimitBackend:
+    """基于本机 Unix socket 计数服务的跨进程限流后端"""
+
+    def __init__(
+        self,
+        socket_path: str,
+        lease_size: int = 10,
+        lease_ttl: float = 1.0,
+        timeout: float = 0.05,
+        reconnect_interval: float = 1.0,
+        fallback: Optional[LocalRateLimitBackend] = None
+    ):
+        """
+        初始化
+
+        Args:
+            socket_path: 计数服务的 Unix socket 路径
+            lease_size: 单次租用的最大令牌数（实际不超过约 1 秒的配额）
+            lease_ttl: 租用令牌的有效期（秒），过期未用的令牌作废
+            timeout: 单次请求计数服务的超时（秒）
+            reconnect_interval: 连接失败后重连的最小间隔（秒）
+            fallback: 计数服务不可用时使用的进程内后端
+        """
+        self.socket_path = socket_path
+        self.lease_size = max(1, lease_size)
+        self.lease_ttl = lease_ttl
+        self.timeout = timeout
+        self.reconnect_interval = reconnect_interval
+        self.fallback = fallback or LocalRateLimitBackend()
+
+        self.logger = logger.bind(service="rate_limiter")
+        self._leases: Dict[str, _Lease] = {}
+        self._reader: Optional[asyncio.StreamReader] = None
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+        self._connect_lock: Optional[asyncio.Lock] = None
+        self._next_connect_at = 0.0
+        self.fallback_checks = 0
+        self.remote_requests = 0
+
+    @property
+    def connected(self) -> bool:
+        """是否已连接计数服务"""
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def connect(self) -> bool:
+        """
+        连接计数服务（失败时在 reconnect_interval 内不再重试）
+
+        Returns:
+            bool: 是否已连接
+        """
+        if self.connected:
+            return True
+        if time.monotonic() < self._next_connect_at:
+            return False
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+
+        async with self._connect_lock:
+            if self.connected:
+                return True
+            try:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_unix_connection(self.socket_path), timeout=max(self.timeout, 0.5)
+                )
+            except (OSError, asyncio.TimeoutError) as e:
+                self._next_connect_at = time.monotonic() + self.reconnect_interval
+                self.logger.warning("Rate limit server unavailable, using local buckets",
+                                    socket_path=self.socket_path, error=str(e))
+                return False
+
+            self._reader_task = asyncio.create_task(self._read_responses())
+            self.logger.info("Connected to rate limit server", socket_path=self.socket_path)
+            return True
+
+    async def close(self) -> None:
+        """断开计数服务"""
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+            try:
+                await self._reader_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader_task = None
+        self._disconnect()
+
+    def _disconnect(self) -> None:
+        """关闭连接并让等待中的请求失败"""
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = None
+        self._writer = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("rate limit server disconnected"))
+        self._pending.clear()
+
+    async def _read_responses(self) -> None:
+        """读取响应并按 id 分发"""
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                message = jsoncodec.loads(line)
+                future = self._pending.pop(message.get("id"), None)
+                if future is not None and not future.done():
+                    future.set_result(message.get("results", []))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.logger.warning("Rate limit server connection lost", error=str(e))
+        finally:
+            self._next_connect_at = time.monotonic() + self.reconnect_interval
+            self._disconnect()
+
+    async def _request(self, ops: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """发送一批租用请求（同一条消息，一次往返）"""
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        self._writer.write(jsoncodec.dumpb({"id": request_id, "ops": ops}) + b"\n")
+        self.remote_requests += 1
+        try:
+            return await asyncio.wait_for(future, timeout=self.timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    def _lease_size_for(self, rpm: int, capacity: int) -> int:
+        """单次租用数量：不超过约 1 秒的配额和桶容量"""
+        return max(1, min(self.lease_size, capacity, math.ceil(rpm / 60)))
+
+    async def acquire(self, limits: List[Limit], now: float) -> RateLimitResult:
+        """
+        检查所有维度：优先使用本地租用的令牌，不足时向计数服务批量租用
+
+        Args:
+            limits: 本次请求需要检查的桶
+            now: 当前时间（monotonic秒）
+
+        Returns:
+            RateLimitResult: 限流结果
+        """
+        for _ in range(3):
+            missing = []
+            for limit in limits:
+                lease = self._leases.get(limit[0])
+                if lease is None or lease.tokens <= 0 or lease.expires_at <= now:
+                    missing.append(limit)
+
+            if not missing:
+                break
+
+            if not await self.connect():
+                self.fallback_checks += 1
+                return self.fallback.acquire(limits, now)
+
+            ops = [
+                {"key": key, "rpm": rpm, "capacity": capacity, "n": self._lease_size_for(rpm, capacity)}
+                for key, scope, rpm, capacity in missing
+            ]
+            try:
+                results = await self._request(ops)
+            except (OSError, ConnectionError, asyncio.TimeoutError, ValueError) as e:
+                self.logger.warning("Rate limit server request failed, using local buckets", error=str(e))
+                self.fallback_checks += 1
+                return self.fallback.acquire(limits, now)
+
+            rejected: Optional[RateLimitResult] = None
+            for (key, scope, rpm, capacity), result in zip(missing, results):
+                lease = self._leases.get(key)
+                if lease is None:
+                    lease = _Lease()
+                    self._leases[key] = lease
+                if lease.expires_at <= now:
+                    lease.tokens = 0
+                lease.tokens += result["granted"]
+                lease.expires_at = now + self.lease_ttl
+                lease.remaining = result["remaining"]
+                lease.reset_after = result["reset_after"]
+                if result["granted"] == 0 and rejected is None:
+                    rejected = RateLimitResult(False, rpm, 0, result["reset_after"], result["retry_after"], scope)
+            if rejected is not None:
+                return rejected
+        else:
+            # 并发请求持续抢占租用令牌，按超限处理
+            key, scope, rpm, capacity = missing[0]
+            return RateLimitResult(False, rpm, 0, 60.0 / rpm, 60.0 / rpm, scope)
+
+        # 所有维度都有令牌：各扣减一个
+        tightest: Optional[RateLimitResult] = None
+        for key, scope, rpm, capacity in limits:
+            lease = self._leases[key]
+            lease.tokens -= 1
+            remaining = lease.tokens + lease.remaining
+            if tightest is None or remaining < tightest.remaining:
+                tightest = RateLimitResult(True, rpm, remaining, lease.reset_after, scope=scope)
+
+        self._evict_leases(now)
+        return tightest
+
+    def _evict_leases(self, now: float) -> None:
+        """清理过期租约，防止字典随历史 Key 增长"""
+        if len(self._leases) > 1024:
+            for key in [key for key, lease in self._leases.items() if lease.expires_at <= now]:
+                del self._leases[key]
+
+
+class RateLimiter:
+    """多维度 GCRA 限流器"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化限流器
+
+        Args:
+            config: 限流配置，默认读取 settings.rate_limiting
+        """
+        config = config if config is not None else settings.rate_limiting
+        self.enabled = config.get('enabled', True)
+        self.default_rpm = config.get('default_requests_per_minute', 100)
+        self.burst = config.get('burst')
+        self.global_rpm = config.get('global_requests_per_minute', 0) or 0
+        self.route_limits: Dict[str, int] = dict(config.get('routes') or {})
+        self.source_path_limits: Dict[str, int] = dict(config.get('source_paths') or {})
+
+        self.logger = logger.bind(service="rate_limiter")
+        self.local = LocalRateLimitBackend(config.get('max_buckets', 100000))
+        self.backend_name = config.get('backend', 'local')
+        self.remote: Optional[SocketRateLimitBackend] = None
+        if self.backend_name == 'socket':
+            socket_config = config.get('socket') or {}
+            self.remote = SocketRateLimitBackend(
+                socket_path=socket_config.get('path', '/tmp/fastgate-ratelimit.sock'),
+                lease_size=socket_config.get('lease_size', 10),
+                lease_ttl=socket_config.get('lease_ttl', 1.0),
+                timeout=socket_config.get('timeout_ms', 50) / 1000,
+                fallback=self.local
+            )
+        elif self.backend_name != 'local':
+            raise ValueError(f"Invalid rate limit backend: {self.backend_name}")
+
+    def _limits_for(self, api_key_info, route: Optional[Dict[str, Any]]) -> List[Limit]:
+        """收集本次请求需要检查的桶"""
+        limits = []
+        if api_key_info is not None:
+            key_rpm = getattr(api_key_info, "rate_limit", None) or self.default_rpm
+            if key_rpm and key_rpm > 0:
+                limits.append((f"key:{api_key_info.key_value}", "api_key", key_rpm, self.burst or key_rpm))
+
+            source_path = getattr(api_key_info, "source_path", None)
+            source_rpm = self.source_path_limits.get(source_path) if source_path else None
+            if source_rpm:
+                limits.append((f"source:{source_path}", "source_path", source_rpm, self.burst or source_rpm))
+
+        if route:
+            route_id = route.get("route_id")
+            route_rpm = self.route_limits.get(route_id) if route_id else None
+            if route_rpm:
+                limits.append((f"route:{route_id}", "route", route_rpm, self.burst or route_rpm))
+
+        if self.global_rpm > 0:
+            limits.append(("global", "global", self.global_rpm, self.burst or self.global_rpm))
+        return limits
+
+    async def check(self, api_key_info, route: Optional[Dict[str, Any]] = None,
+                    now: Optional[float] = None) -> Optional[RateLimitResult]:
+        """
+        检查并扣减限流配额
+
+        Args:
+            api_key_info: API Key 信息（APIKeyResponse）
+            route: 匹配到的路由
+            now: 当前时间（monotonic秒），测试时传入
+
+        Returns:
+            Optional[RateLimitResult]: 限流结果，未启用或没有适用的桶时返回 None
+        """
+        if not self.enabled:
+            return None
+        limits = self._limits_for(api_key_info, route)
+        if not limits:
+            return None
+
+        now = time.monotonic() if now is None else now
+        if self.remote is not None:
+            return await self.remote.acquire(limits, now)
+        return self.local.acquire(limits, now)
+
+    async def start(self) -> None:
+        """连接跨进程计数服务（本地后端无操作）"""
+        if self.remote is not None:
+            await self.remote.connect()
+
+    async def close(self) -> None:
+        """断开跨进程计数服务"""
+        if self.remote is not None:
+            await self.remote.close()
+
+    def __len__(self) -> int:
+        return len(self.local)
+
+
+# 全局限流器实例
+rate_limiter = RateLimiter()
@@ -0,0 +1,415 @@
+"""
+响应缓存
+路由开启 cache_enabled 后缓存非流式请求的 200 响应，命中时不请求上游并在响应头中带上 x-cache：
+- 缓存键：方法 + 路由 + 目标路径 + 路由 cache_key_fields 指定的请求体顶层字段 / 请求头
+  （未配置时使用整个请求体的规范化哈希）
+- 有效期：上游 Cache-Control 的 s-maxage / max-age 优先，否则使用路由 cache_ttl（为空时使用 default_ttl_seconds）；
+  no-store / private 不缓存，no-cache 只在有校验器时缓存且每次都重新校验
+- 过期条目保留 ETag / Last-Modified，下次请求带条件请求头向上游重新校验，304 时刷新有效期继续使用缓存
+- 按字节数计算容量的 LRU，超过 max_bytes 时淘汰最久未使用的条目
+- 开启 disk 后，条目同时写入磁盘层（app/services/disk_cache.py），内存未命中时从磁盘读取
+"""
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+import structlog
+
+from ..config import settings
+from .disk_cache import DiskCache
+from .single_flight import body_digest
+
+logger = structlog.get_logger(__name__)
+
+# x-cache 响应头取值
+HIT = "HIT"
+MISS = "MISS"
+STALE = "STALE"
+REVALIDATED = "REVALIDATED"
+
+# 不随缓存条目保存的响应头（响应体已解码，长度由返回时重新计算）
+_UNSTORED_HEADERS = frozenset(("content-length", "content-encoding", "transfer-encoding", "connection"))
+
+
+def parse_cache_control(value: Optional[str]) -> Dict[str, Optional[str]]:
+    """
+    解析 Cache-Control 头
+
+    Args:
+        value: 头部取值
+
+    Returns:
+        Dict[str, Optional[str]]: 指令名（小写）-> 参数
+    """
+    directives: Dict[str, Optional[str]] = {}
+    if not value:
+        return directives
+    for part in value.split(","):
+        name, _, arg = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = arg.strip().strip('"') if arg else None
+    return directives
+
+
+def split_key_fields(fields: Optional[Iterable[str]]) -> Tuple[Tuple[str, ...], Tuple[str, ...]]:
+    """
+    拆分路由 cache_key_fields：header:<名称> 为请求头，其余为请求体顶层字段
+
+    Args:
+        fields: 缓存键字段列表
+
+    Returns:
+        Tuple[Tuple[str, ...], Tuple[str, ...]]: (请求体字段, 请求头名称)
+    """
+    body_keys: List[str] = []
+    header_names: List[str] = []
+    for field in fields or ():
+        if not isinstance(field, str) or not field:
+            continue
+        if field.startswith("header:"):
+            header_names.append(field[len("header:"):].lower())
+        else:
+            body_keys.append(field)
+    return tuple(body_keys), tuple(header_names)
+
+
+class CachedResponse:
+    """缓存条目"""
+
+    __slots__ = ("route_id", "status_code", "headers", "body", "etag", "last_modified",
+                 "stored_at", "expires_at", "size")
+
+    def __init__(self, route_id: str, status_code: int, headers: Dict[str, str], body: bytes,
+                 stored_at: float, expires_at: float):
+        self.route_id = route_id
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = headers.get("etag")
+        self.last_modified = headers.get("last-modified")
+        self.stored_at = stored_at
+        self.expires_at = expires_at
+        self.size = len(body) + sum(len(key) + len(value) for key, value in headers.items())
+
+    def is_fresh(self, now: float) -> bool:
+        """是否仍在有效期内"""
+        return now < self.expires_at
+
+    def has_validators(self) -> bool:
+        """是否可以向上游条件请求重新校验"""
+        return bool(self.etag or self.last_modified)
+
+    def age(self, now: float) -> int:
+        """缓存时长（秒），用于 Age 响应头"""
+        return max(int(now - self.stored_at), 0)
+
+
+class ResponseCache:
+    """按字节计算容量的 LRU 响应缓存"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化响应缓存
+
+        Args:
+            config: 缓存配置，默认读取 proxy.response_cache
+        """
+        config = config if config is not None else settings.proxy.get('response_cache', {})
+
+        self.enabled = config.get('enabled', True)
+        self.max_bytes = config.get('max_bytes', 67108864)
+        self.default_ttl = config.get('default_ttl_seconds', 60)
+        self.max_entry_bytes = config.get('max_entry_bytes', 1048576)
+        self.methods = {method.upper() for method in config.get('methods', ["GET", "HEAD", "POST"])}
+        self.disk = DiskCache(config.get('disk', {}))
+
+        self.logger = logger.bind(service="response_cache")
+        self._entries: "OrderedDict[str, CachedResponse]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def make_key(
+        self,
+        route_config: Dict[str, Any],
+        method: str,
+        target_path: str,
+        headers: Mapping[str, str],
+        body: Any = None,
+        body_fields: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
+        """
+        计算缓存键
+
+        Args:
+            route_config: 路由配置
+            method: HTTP方法
+            target_path: 目标路径（含查询字符串，不含主机）
+            headers: 客户端请求头
+            body: 已解析的 JSON 值或原始字节（路由未配置请求体字段时参与哈希）
+            body_fields: 路由 cache_key_fields 指定的请求体顶层字段
+
+        Returns:
+            Optional[str]: 缓存键，不缓存时返回 None
+        """
+        method = method.upper()
+        if not self.enabled or not route_config.get("cache_enabled") or method not in self.methods:
+            return None
+        if "no-store" in parse_cache_control(headers.get("cache-control")):
+            return None
+
+        key_fields = route_config.get("_cache_key_fields")
+        if key_fields is None:
+            key_fields = split_key_fields(route_config.get("cache_key_fields"))
+        body_keys, header_names = key_fields
+        if body_keys or header_names:
+            fields = body_fields or {}
+            material = {
+                "body": {key: fields.get(key) for key in body_keys},
+                "headers": {name: headers.get(name) for name in header_names},
+            }
+        else:
+            material = body
+        return "\x1f".join((method, route_config.get("route_id") or "", target_path, body_digest(material)))
+
+    def lookup(self, key: str, headers: Optional[Mapping[str, str]] = None,
+               now: Optional[float] = None) -> Tuple[Optional[CachedResponse], str]:
+        """
+        查找缓存
+
+        Args:
+            key: 缓存键
+            headers: 客户端请求头（Cache-Control: no-cache 时强制重新校验）
+            now: 当前时间（time.time 秒）
+
+        Returns:
+            Tuple[Optional[CachedResponse], str]: (条目, HIT / STALE / MISS)，STALE 表示需要条件请求重新校验
+        """
+        now = time.time() if now is None else now
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        elif self.disk.enabled:
+            record = self.disk.get(key, now)
+            if record is not None:
+                entry = CachedResponse(*record)
+        if entry is None:
+            self.misses += 1
+            return None, MISS
+
+        force_revalidate = headers is not None and "no-cache" in parse_cache_control(headers.get("cache-control"))
+        if entry.is_fresh(now) and not force_revalidate:
+            self.hits += 1
+            return entry, HIT
+        if entry.has_validators():
+            return entry, STALE
+
+        self._remove(key)
+        self.misses += 1
+        return None, MISS
+
+    def conditional_headers(self, entry: CachedResponse) -> Dict[str, str]:
+        """
+        重新校验过期条目的条件请求头
+
+        Args:
+            entry: 缓存条目
+
+        Returns:
+            Dict[str, str]: If-None-Match / If-Modified-Since
+        """
+        headers = {}
+        if entry.etag:
+            headers["if-none-match"] = entry.etag
+        if entry.last_modified:
+            headers["if-modified-since"] = entry.last_modified
+        return headers
+
+    def not_modified(self, entry: CachedResponse, headers: Mapping[str, str]) -> bool:
+        """
+        客户端的 If-None-Match 是否与缓存条目的 ETag 一致（一致时可直接返回 304）
+
+        Args:
+            entry: 缓存条目
+            headers: 客户端请求头
+
+        Returns:
+            bool: 是否未修改
+        """
+        if not entry.etag:
+            return False
+        candidates = headers.get("if-none-match")
+        if not candidates:
+            return False
+        return any(tag.strip() in ("*", entry.etag) for tag in candidates.split(","))
+
+    def ttl(self, route_config: Dict[str, Any], response_headers: Mapping[str, str]) -> Optional[float]:
+        """
+        按上游 Cache-Control 和路由配置计算有效期
+
+        Args:
+            route_config: 路由配置
+            response_headers: 上游响应头
+
+        Returns:
+            Optional[float]: 有效期秒数，不可缓存时返回 None
+        """
+        directives = parse_cache_control(response_headers.get("cache-control"))
+        if "no-store" in directives or "private" in directives:
+            return None
+        if "no-cache" in directives:
+            return 0
+        for name in ("s-maxage", "max-age"):
+            if directives.get(name) is not None:
+                try:
+                    return max(int(directives[name]), 0)
+                except ValueError:
+                    return None
+        ttl = route_config.get("cache_ttl")
+        return self.default_ttl if ttl is None else ttl
+
+    def store(
+        self,
+        key: str,
+        route_config: Dict[str, Any],
+        status_code: int,
+        response_headers: Mapping[str, str],
+        body: bytes,
+        now: Optional[float] = None
+    ) -> Optional[CachedResponse]:
+        """
+        保存上游响应
+
+        Args:
+            key: 缓存键
+            route_config: 路由配置
+            status_code: 响应状态码（只缓存 200）
+            response_headers: 上游响应头
+            body: 完整响应体
+            now: 当前时间（time.time 秒）
+
+        Returns:
+            Optional[CachedResponse]: 保存的条目，不可缓存时返回 None
+        """
+        if status_code != 200:
+            return None
+        ttl = self.ttl(route_config, response_headers)
+        if ttl is None:
+            return None
+        max_entry = route_config.get("cache_max_entry_bytes") or self.max_entry_bytes
+        if len(body) > max_entry:
+            return None
+
+        now = time.time() if now is None else now
+        headers = {
+            name.lower(): value for name, value in response_headers.items()
+            if name.lower() not in _UNSTORED_HEADERS
+        }
+        entry = CachedResponse(route_config.get("route_id") or "", status_code, headers, bytes(body), now, now + ttl)
+        if ttl == 0 and not entry.has_validators():
+            return None
+
+        self._insert(key, entry)
+        self.disk.put(key, entry)
+        return entry
+
+    def refresh(self, key: str, entry: CachedResponse, route_config: Dict[str, Any],
+                response_headers: Mapping[str, str], now: Optional[float] = None) -> CachedResponse:
+        """
+        上游返回 304 后刷新条目有效期
+
+        Args:
+            key: 缓存键
+            entry: 缓存条目
+            route_config: 路由配置
+            response_headers: 304 响应头（可能带新的 Cache-Control / ETag）
+            now: 当前时间（time.time 秒）
+
+        Returns:
+            CachedResponse: 刷新后的条目
+        """
+        now = time.time() if now is None else now
+        self.revalidations += 1
+        for name in ("cache-control", "etag", "last-modified", "expires"):
+            if name in response_headers:
+                entry.headers[name] = response_headers[name]
+        entry.etag = entry.headers.get("etag")
+        entry.last_modified = entry.headers.get("last-modified")
+        ttl = self.ttl(route_config, entry.headers)
+        entry.stored_at = now
+        entry.expires_at = now + (ttl or 0)
+        if ttl is None:
+            self._remove(key)
+            return entry
+        if self._entries.get(key) is not entry:
+            # 来自磁盘层的条目：复制到内存并以新的有效期重新写入磁盘
+            entry.body = bytes(entry.body)
+            self._insert(key, entry)
+        self.disk.put(key, entry)
+        return entry
+
+    def invalidate_route(self, route_id: str) -> int:
+        """
+        删除路由的全部缓存条目（路由修改、删除后调用）
+
+        Args:
+            route_id: 路由ID
+
+        Returns:
+            int: 删除的条目数
+        """
+        keys = [key for key, entry in self._entries.items() if entry.route_id == route_id]
+        for key in keys:
+            self._remove(key)
+        self.disk.delete_route(route_id)
+        if keys:
+            self.logger.info("Route cache invalidated", route_id=route_id, entries=len(keys))
+        return len(keys)
+
+    def clear(self) -> None:
+        """清空缓存"""
+        self._entries.clear()
+        self.bytes = 0
+
+    def start(self) -> None:
+        """打开磁盘层并启动后台压缩（未开启磁盘层时无操作）"""
+        self.disk.start()
+
+    async def stop(self) -> None:
+        """停止磁盘层后台压缩"""
+        await self.disk.stop()
+
+    def _insert(self, key: str, entry: CachedResponse) -> None:
+        if entry.size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = entry
+        self.bytes += entry.size
+        while self.bytes > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry.size
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计快照"""
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "revalidations": self.revalidations,
+            "evictions": self.evictions,
+            "disk": self.disk.stats(),
+        }
+
+
+# 全局响应缓存实例
+response_cache = ResponseCache()
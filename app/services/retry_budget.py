@@ -0,0 +1,117 @@
+"""
+重试预算
+按滚动窗口统计转发请求数和重试次数，窗口内重试次数不超过
+max(请求数 × budget_ratio, min_retries_per_second × 窗口秒数)，
+避免上游故障时重试成倍放大负载；预算耗尽时直接返回最后一次失败，不再重试
+"""
+
+import random
+import time
+from typing import Any, Dict, Optional
+
+import structlog
+
+from ..config import settings
+from .metrics import RateWindow
+
+logger = structlog.get_logger(__name__)
+
+
+class RetryBudget:
+    """进程级重试预算与退避策略"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化重试预算
+
+        Args:
+            config: 重试配置，默认读取 proxy.retry
+        """
+        config = config if config is not None else settings.proxy.get('retry', {})
+
+        self.deadline_seconds = config.get('deadline_seconds', 0) or 0
+        self.base_backoff = config.get('base_backoff_seconds', 0.5)
+        self.max_backoff = config.get('max_backoff_seconds', 10)
+        self.budget_ratio = config.get('budget_ratio', 0.2)
+        self.min_retries_per_second = config.get('min_retries_per_second', 5)
+        self.window_seconds = max(int(config.get('budget_window_seconds', 10)), 1)
+        self.deadline_header = (config.get('deadline_header') or '').lower()
+        self.accept_client_deadline = config.get('accept_client_deadline', True)
+
+        self.logger = logger.bind(service="retry_budget")
+        self._requests = RateWindow(self.window_seconds)
+        self._retries = RateWindow(self.window_seconds)
+        self.rejected = 0
+
+    def deadline(self, timeout: float, headers: Optional[Dict[str, str]] = None,
+                 now: Optional[float] = None) -> float:
+        """
+        计算请求的截止时间：deadline_seconds（为 0 时使用路由 timeout），
+        客户端通过 deadline_header 传入了更短的剩余时间时取较小值
+
+        Args:
+            timeout: 路由超时时间（秒）
+            headers: 客户端请求头
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            float: 截止时间（monotonic 秒）
+        """
+        now = time.monotonic() if now is None else now
+        budget = self.deadline_seconds or timeout
+        if self.accept_client_deadline and self.deadline_header and headers:
+            value = headers.get(self.deadline_header)
+            if value is not None:
+                try:
+                    budget = min(budget, max(int(value), 0) / 1000)
+                except ValueError:
+                    pass
+        return now + budget
+
+    def backoff(self, attempt: int) -> float:
+        """
+        第 attempt 次失败后的退避时间（指数上限内的完全随机抖动）
+
+        Args:
+            attempt: 已失败的尝试序号（从 0 开始）
+
+        Returns:
+            float: 退避秒数
+        """
+        return random.uniform(0, min(self.max_backoff, self.base_backoff * (2 ** attempt)))
+
+    def record_request(self, now: Optional[float] = None) -> None:
+        """记录一次转发请求（不含重试）"""
+        self._requests.add(1, now)
+
+    def try_acquire(self, now: Optional[float] = None) -> bool:
+        """
+        申请一次重试，预算内则计入重试次数
+
+        Args:
+            now: 当前时间（time.time 秒）
+
+        Returns:
+            bool: 是否允许重试
+        """
+        allowed = max(self._requests.total(now) * self.budget_ratio,
+                      self.min_retries_per_second * self.window_seconds)
+        if self._retries.total(now) >= allowed:
+            self.rejected += 1
+            return False
+        self._retries.add(1, now)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """重试预算快照"""
+        return {
+            "window_seconds": self.window_seconds,
+            "requests": self._requests.total(),
+            "retries": self._retries.total(),
+            "budget_ratio": self.budget_ratio,
+            "rejected": self.rejected,
+        }
+
+
+# 全局重试预算实例
+retry_budget = RetryBudget()
@@ -0,0 +1,139 @@
+"""
+路由索引 - 按路径段压缩的前缀树（radix tree）
+由 match_path 的字面量路径段构建分支，{param} 段作为单段参数分支，
+含通配符的段（*、**、{path:path} 等）之后的部分挂在节点的尾部桶中；
+每个桶再按HTTP方法分组。查找时只返回少量候选路由（保持优先级顺序），
+最终仍由 RouteMatcher 用预编译正则做完整校验，因此结果与线性扫描完全一致。
+"""
+
+import re
+from typing import Dict, List, Any, Optional, Sequence
+
+from .route_matcher import RouteMatcher
+
+# 可以作为单段参数分支的路径段：{name}，不含通配符、转义符或嵌套括号
+_PARAM_SEGMENT = re.compile(r'\{[^{}*\\/]+\}')
+
+# 匹配任意方法的桶键
+ANY_METHOD = "*"
+
+
+class _RouteNode:
+    """前缀树节点"""
+
+    __slots__ = ("children", "param_child", "terminal", "tail")
+
+    def __init__(self):
+        self.children: Dict[str, "_RouteNode"] = {}
+        self.param_child: Optional["_RouteNode"] = None
+        # 路径模式恰好在此节点结束的路由：{method: [ordinal, ...]}
+        self.terminal: Dict[str, List[int]] = {}
+        # 路径模式在此节点之后含通配符的路由：{method: [ordinal, ...]}
+        self.tail: Dict[str, List[int]] = {}
+
+
+class RouteIndex:
+    """路由前缀树索引"""
+
+    def __init__(self, routes: Sequence[Dict[str, Any]]):
+        """
+        构建索引
+
+        Args:
+            routes: 已按优先级排序的活跃路由（路由表快照）
+        """
+        self.routes = list(routes)
+        self._root = _RouteNode()
+        self._matcher = RouteMatcher()
+
+        for ordinal, route in enumerate(self.routes):
+            match_path = route.get("match_path")
+            if not match_path:
+                # 空路径模式永远不匹配
+                continue
+            if route.get("_path_regex") is None:
+                route["_path_regex"] = self._matcher._compile_path_pattern(match_path)
+            self._insert(ordinal, match_path, self._parse_methods(route.get("match_method", "ANY")))
+
+    def candidates(self, path: str, method: str) -> List[Dict[str, Any]]:
+        """
+        查找可能匹配的候选路由
+
+        Args:
+            path: 请求路径
+            method: 请求方法
+
+        Returns:
+            List[Dict[str, Any]]: 按优先级排序的候选路由
+        """
+        method = (method or "").upper()
+        segments = path.split("/")
+        total = len(segments)
+        ordinals = set()
+
+        stack = [(self._root, 0)]
+        while stack:
+            node, depth = stack.pop()
+
+            if node.tail:
+                self._collect(node.tail, method, ordinals)
+
+            if depth == total:
+                if node.terminal:
+                    self._collect(node.terminal, method, ordinals)
+                continue
+
+            segment = segments[depth]
+            child = node.children.get(segment)
+            if child is not None:
+                stack.append((child, depth + 1))
+            if node.param_child is not None and segment:
+                stack.append((node.param_child, depth + 1))
+
+        routes = self.routes
+        return [routes[ordinal] for ordinal in sorted(ordinals)]
+
+    def _insert(self, ordinal: int, match_path: str, methods: List[str]) -> None:
+        """将路由挂到前缀树上"""
+        node = self._root
+        for segment in match_path.split("/"):
+            if "*" in segment or "{" in segment or "}" in segment or "\\" in segment:
+                if segment != "{path:path}" and _PARAM_SEGMENT.fullmatch(segment):
+                    if node.param_child is None:
+                        node.param_child = _RouteNode()
+                    node = node.param_child
+                    continue
+                # 通配符段：剩余部分由正则校验
+                self._add(node.tail, ordinal, methods)
+                return
+
+            child = node.children.get(segment)
+            if child is None:
+                child = _RouteNode()
+                node.children[segment] = child
+            node = child
+
+        self._add(node.terminal, ordinal, methods)
+
+    @staticmethod
+    def _parse_methods(route_method: Optional[str]) -> List[str]:
+        """解析路由方法配置，语义与 RouteMatcher.match_method 一致"""
+        if not route_method or route_method.upper() == "ANY":
+            return [ANY_METHOD]
+        return list({method.strip().upper() for method in route_method.split(",")})
+
+    @staticmethod
+    def _add(buckets: Dict[str, List[int]], ordinal: int, methods: List[str]) -> None:
+        """按方法加入桶"""
+        for method in methods:
+            buckets.setdefault(method, []).append(ordinal)
+
+    @staticmethod
+    def _collect(buckets: Dict[str, List[int]], method: str, ordinals: set) -> None:
+        """收集指定方法和任意方法桶中的路由"""
+        bucket = buckets.get(method)
+        if bucket:
+            ordinals.update(bucket)
+        bucket = buckets.get(ANY_METHOD)
+        if bucket:
+            ordinals.update(bucket)
@@ -4,9 +4,9 @@
 """
 
 import re
-import json
 from typing import Dict, List, Any, Optional
 import structlog
+from ..utils import jsoncodec
 
 logger = structlog.get_logger(__name__)
 
@@ -22,7 +22,8 @@ class RouteMatcher:
     def find_matching_route(
         self, 
         request: Dict[str, Any], 
-        routes: List[Dict[str, Any]]
+        routes: List[Dict[str, Any]],
+        presorted: bool = False
     ) -> Optional[Dict[str, Any]]:
         """
         查找匹配的路由
@@ -30,6 +31,7 @@ class RouteMatcher:
         Args:
             request: 请求信息 {"path": str, "method": str, "headers": dict, "body": dict}
             routes: 路由配置列表
+            presorted: 路由是否已过滤为活跃路由并按优先级排序（如路由表快照）
             
         Returns:
             Optional[Dict[str, Any]]: 匹配的路由配置，如果没有匹配则返回None
@@ -42,8 +44,11 @@ class RouteMatcher:
         )
         
         # 过滤活跃路由并按优先级排序
-        active_routes = [route for route in routes if route.get("is_active", True)]
-        sorted_routes = sorted(active_routes, key=lambda r: r.get("priority", 100))
+        if presorted:
+            sorted_routes = routes
+        else:
+            active_routes = [route for route in routes if route.get("is_active", True)]
+            sorted_routes = sorted(active_routes, key=lambda r: r.get("priority", 100))
         
         for route in sorted_routes:
             if self._is_route_match(request, route):
@@ -69,8 +74,12 @@ class RouteMatcher:
         Returns:
             bool: 是否匹配
         """
-        # 路径匹配
-        if not self.match_path(request.get("path", ""), route.get("match_path", "")):
+        # 路径匹配（优先使用路由表预编译的正则）
+        path_regex = route.get("_path_regex")
+        if path_regex is not None:
+            if not path_regex.match(request.get("path", "")):
+                return False
+        elif not self.match_path(request.get("path", ""), route.get("match_path", "")):
             return False
         
         # HTTP方法匹配
@@ -81,10 +90,10 @@ class RouteMatcher:
         route_headers = route.get("match_headers")
         if route_headers:
             try:
-                match_headers = json.loads(route_headers) if isinstance(route_headers, str) else route_headers
+                match_headers = jsoncodec.loads(route_headers) if isinstance(route_headers, str) else route_headers
                 if not self.match_headers(request.get("headers", {}), match_headers):
                     return False
-            except (json.JSONDecodeError, TypeError):
+            except (jsoncodec.JSONDecodeError, TypeError):
                 self.logger.warning("Invalid match_headers format", route_id=route.get("route_id"))
                 return False
         
@@ -92,10 +101,10 @@ class RouteMatcher:
         route_body_schema = route.get("match_body_schema")
         if route_body_schema:
             try:
-                body_schema = json.loads(route_body_schema) if isinstance(route_body_schema, str) else route_body_schema
+                body_schema = jsoncodec.loads(route_body_schema) if isinstance(route_body_schema, str) else route_body_schema
                 if not self.match_body_schema(request.get("body", {}), body_schema):
                     return False
-            except (json.JSONDecodeError, TypeError):
+            except (jsoncodec.JSONDecodeError, TypeError):
                 self.logger.warning("Invalid match_body_schema format", route_id=route.get("route_id"))
                 return False
         
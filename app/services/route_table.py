@@ -0,0 +1,249 @@
+"""
+路由表快照服务
+将活跃路由预排序、预解析JSON规则、预编译路径正则后常驻内存，
+管理接口修改路由时递增版本号，下一次请求时原子替换快照
+"""
+
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+import structlog
+
+from ..config import settings
+from ..database import SessionLocal
+from ..models.proxy_route import ProxyRouteDB
+from .route_matcher import RouteMatcher
+from .route_index import RouteIndex
+from .body_view import body_schema_keys, encode_fields_fragment
+from .load_balancer import parse_targets
+from .response_cache import split_key_fields
+from ..utils import jsoncodec
+
+logger = structlog.get_logger(__name__)
+
+# 需要预解析的JSON字段
+JSON_FIELDS = ("match_headers", "match_body_schema", "add_headers", "add_body_fields", "remove_headers", "target_hosts",
+               "cache_key_fields")
+
+
+class RouteSnapshot:
+    """不可变的路由表快照"""
+
+    __slots__ = ("version", "routes", "index", "loaded_at")
+
+    def __init__(self, version: int, routes: Tuple[Dict[str, Any], ...], loaded_at: float):
+        """
+        初始化快照
+
+        Args:
+            version: 快照对应的路由表版本
+            routes: 按优先级排序的已编译路由
+            loaded_at: 加载时间（monotonic秒）
+        """
+        self.version = version
+        self.routes = routes
+        self.index = RouteIndex(routes)
+        self.loaded_at = loaded_at
+
+    def candidates(self, path: str, method: str) -> List[Dict[str, Any]]:
+        """
+        通过路由索引获取候选路由（按优先级排序）
+
+        Args:
+            path: 请求路径
+            method: 请求方法
+
+        Returns:
+            List[Dict[str, Any]]: 候选路由
+        """
+        return self.index.candidates(path, method)
+
+
+class RouteTable:
+    """内存路由表，支持按版本热更新"""
+
+    def __init__(self, refresh_interval: Optional[float] = None):
+        """
+        初始化路由表
+
+        Args:
+            refresh_interval: 快照最长存活时间（秒），用于多worker间同步，0表示仅按版本刷新
+        """
+        if refresh_interval is None:
+            refresh_interval = settings.proxy.get('route_table', {}).get('refresh_interval', 5)
+        self.refresh_interval = refresh_interval or 0
+        self.logger = logger.bind(service="route_table")
+        self._matcher = RouteMatcher()
+        self._version = 0
+        self._snapshot: Optional[RouteSnapshot] = None
+        self._reload_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def version(self) -> int:
+        """当前路由表版本"""
+        return self._version
+
+    def invalidate(self) -> int:
+        """
+        递增版本号，使当前快照失效（路由新增、修改、删除、启停后调用）
+
+        Returns:
+            int: 新的版本号
+        """
+        self._version += 1
+        self.logger.info("Route table invalidated", version=self._version)
+        return self._version
+
+    def is_stale(self, snapshot: Optional[RouteSnapshot]) -> bool:
+        """
+        判断快照是否需要重新加载
+
+        Args:
+            snapshot: 路由快照
+
+        Returns:
+            bool: 是否过期
+        """
+        if snapshot is None or snapshot.version != self._version:
+            return True
+        if self.refresh_interval and time.monotonic() - snapshot.loaded_at > self.refresh_interval:
+            return True
+        return False
+
+    async def get_snapshot(self) -> RouteSnapshot:
+        """
+        获取当前路由快照，过期时在线程池中重新加载
+
+        Returns:
+            RouteSnapshot: 路由快照
+        """
+        snapshot = self._snapshot
+        if not self.is_stale(snapshot):
+            return snapshot
+
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+
+        async with self._reload_lock:
+            # 等锁期间可能已被其他请求刷新
+            snapshot = self._snapshot
+            if not self.is_stale(snapshot):
+                return snapshot
+            return await run_in_threadpool(self.reload)
+
+    async def upstream_targets(self) -> List[Tuple[str, str]]:
+        """
+        配置了多个上游目标的活跃路由中的 (协议, 主机)，供上游健康检查主动探测
+
+        Returns:
+            List[Tuple[str, str]]: 去重后的探测目标
+        """
+        snapshot = await self.get_snapshot()
+        targets = {
+            (route.get("target_protocol") or "http", host)
+            for route in snapshot.routes
+            if len(route.get("_upstreams") or ()) > 1
+            for host, _ in route["_upstreams"]
+        }
+        return sorted(targets)
+
+    def reload(self) -> RouteSnapshot:
+        """
+        从数据库加载活跃路由并原子替换快照
+
+        Returns:
+            RouteSnapshot: 新快照
+        """
+        version = self._version
+        db = SessionLocal()
+        try:
+            db_routes = db.query(ProxyRouteDB).filter(ProxyRouteDB.is_active == True).all()
+            compiled = [self.compile_route(route) for route in db_routes]
+        finally:
+            db.close()
+
+        compiled.sort(key=lambda r: r.get("priority", 100))
+        snapshot = RouteSnapshot(version, tuple(compiled), time.monotonic())
+        self._snapshot = snapshot
+
+        self.logger.info("Route table reloaded", version=version, total_routes=len(compiled))
+        return snapshot
+
+    def compile_route(self, route: ProxyRouteDB) -> Dict[str, Any]:
+        """
+        将数据库路由编译为匹配和转发使用的字典
+
+        Args:
+            route: 数据库路由对象
+
+        Returns:
+            Dict[str, Any]: 已编译的路由配置
+        """
+        route_dict = {
+            "route_id": route.route_id,
+            "route_name": route.route_name,
+            "description": route.description,
+            "match_path": route.match_path,
+            "match_method": route.match_method,
+            "match_headers": route.match_headers,
+            "match_body_schema": route.match_body_schema,
+            "target_host": route.target_host,
+            "target_path": route.target_path,
+            "target_protocol": route.target_protocol,
+            "target_hosts": route.target_hosts,
+            "lb_strategy": route.lb_strategy or "round_robin",
+            "lb_hash_key": route.lb_hash_key,
+            "strip_path_prefix": route.strip_path_prefix,
+            "add_headers": route.add_headers,
+            "add_body_fields": route.add_body_fields,
+            "remove_headers": route.remove_headers,
+            "stream_mode": route.stream_mode or "audit",
+            "batch_mode": route.batch_mode or "none",
+            "hedge_enabled": bool(route.hedge_enabled),
+            "hedge_delay_ms": route.hedge_delay_ms,
+            "coalesce_enabled": bool(route.coalesce_enabled),
+            "cache_enabled": bool(route.cache_enabled),
+            "cache_ttl": route.cache_ttl,
+            "cache_max_entry_bytes": route.cache_max_entry_bytes,
+            "cache_key_fields": route.cache_key_fields,
+            "timeout": route.timeout,
+            "retry_count": route.retry_count,
+            "is_active": route.is_active,
+            "priority": route.priority
+        }
+
+        for field in JSON_FIELDS:
+            route_dict[field] = self._parse_json_field(route_dict[field])
+        route_dict["_body_keys"] = body_schema_keys(route_dict["match_body_schema"])
+        route_dict["_body_fields_fragment"] = encode_fields_fragment(route_dict["add_body_fields"])
+        route_dict["_upstreams"] = parse_targets(route_dict["target_hosts"], route.target_host)
+        route_dict["_cache_key_fields"] = split_key_fields(route_dict["cache_key_fields"])
+
+        if route.match_path:
+            route_dict["_path_regex"] = self._matcher._compile_path_pattern(route.match_path)
+
+        return route_dict
+
+    def _parse_json_field(self, value: Any) -> Any:
+        """
+        预解析JSON字段，解析失败时保留原字符串，由匹配器按原逻辑处理
+
+        Args:
+            value: 字段值
+
+        Returns:
+            Any: 解析后的值
+        """
+        if not value or not isinstance(value, str):
+            return value
+        try:
+            return jsoncodec.loads(value)
+        except (jsoncodec.JSONDecodeError, TypeError):
+            self.logger.warning("Invalid JSON in route rule", value=value[:100])
+            return value
+
+
+# 全局路由表实例
+route_table = RouteTable()
@@ -0,0 +1,183 @@
+"""
+请求合并（single-flight）
+路由开启 coalesce_enabled 后，同时到达的相同非流式请求只向上游转发一次，其余请求等待并共享同一份响应：
+- 合并键：方法 + 路由 + 目标路径 + 规范化请求体哈希 + API Key 范围（不含负载均衡选出的主机）
+  + 转发给上游的条件请求头（缓存重新校验时），客户端自己的条件请求头不转发，由调用方按共享的响应判断
+- JSON 请求体按键排序后重新序列化再哈希，键顺序和空白不同的请求视为相同；其他请求体按原始字节哈希
+- 上游调用在独立任务中执行，首个请求的客户端断开不会影响等待中的请求
+"""
+
+import asyncio
+import hashlib
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+
+import structlog
+
+from ..config import settings
+from ..utils import jsoncodec
+
+logger = structlog.get_logger(__name__)
+
+KEY_SCOPES = ("api_key", "source_path", "global")
+
+
+def _canonical(value: Any) -> Any:
+    """按键排序的 JSON 值（dict 按插入顺序序列化，各后端输出一致）"""
+    if isinstance(value, dict):
+        return {key: _canonical(value[key]) for key in sorted(value)}
+    if isinstance(value, list):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def body_digest(body: Any) -> str:
+    """
+    规范化请求体哈希
+
+    Args:
+        body: 已解析的 JSON 值或原始字节（None 表示无请求体）
+
+    Returns:
+        str: 十六进制摘要
+    """
+    if body is None:
+        data = b""
+    elif isinstance(body, (bytes, bytearray, memoryview)):
+        data = bytes(body)
+    else:
+        data = jsoncodec.dumpb(_canonical(body))
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class _Call:
+    """一次进行中的上游调用"""
+
+    __slots__ = ("future", "leader_id", "waiters")
+
+    def __init__(self, future: "asyncio.Future", leader_id: Optional[str]):
+        self.future = future
+        self.leader_id = leader_id
+        self.waiters = 0
+
+
+class SingleFlight:
+    """相同请求合并"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化请求合并
+
+        Args:
+            config: 合并配置，默认读取 proxy.coalescing
+        """
+        config = config if config is not None else settings.proxy.get('coalescing', {})
+
+        self.key_scope = config.get('key_scope', 'api_key')
+        if self.key_scope not in KEY_SCOPES:
+            raise ValueError(f"Unknown coalescing key scope: {self.key_scope}")
+        self.max_body_bytes = config.get('max_body_bytes', 1048576)
+
+        self.logger = logger.bind(service="single_flight")
+        self._calls: Dict[str, _Call] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    @property
+    def in_flight(self) -> int:
+        """进行中的上游调用数"""
+        return len(self._calls)
+
+    def make_key(
+        self,
+        method: str,
+        route_id: str,
+        target_path: str,
+        body: Any,
+        body_size: int = 0,
+        api_key: Optional[str] = None,
+        source_path: Optional[str] = None,
+        vary: Optional[Mapping[str, str]] = None
+    ) -> Optional[str]:
+        """
+        计算合并键
+
+        Args:
+            method: HTTP方法
+            route_id: 路由ID
+            target_path: 目标路径（含查询字符串，不含主机）
+            body: 已解析的 JSON 值或原始字节
+            body_size: 请求体字节数，超过 max_body_bytes 时不合并
+            api_key: 调用方 API Key
+            source_path: 调用方 source_path
+            vary: 转发给上游、会影响响应的请求头（如条件请求头），取值不同的请求不合并
+
+        Returns:
+            Optional[str]: 合并键，不参与合并时返回 None
+        """
+        if body_size > self.max_body_bytes:
+            return None
+        if self.key_scope == "api_key":
+            scope = api_key or ""
+        elif self.key_scope == "source_path":
+            scope = source_path or ""
+        else:
+            scope = ""
+        parts = [method.upper(), route_id or "", target_path, body_digest(body), scope]
+        if vary:
+            parts.extend(f"{name.lower()}={value}" for name, value in sorted(vary.items()))
+        return "\x1f".join(parts)
+
+    async def do(
+        self,
+        key: str,
+        request_id: Optional[str],
+        fn: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, Optional[str]]:
+        """
+        执行或加入一次上游调用
+
+        Args:
+            key: 合并键
+            request_id: 当前请求ID
+            fn: 发起上游调用的协程函数（结果会被所有等待者共享，应已读取完整响应体）
+
+        Returns:
+            Tuple[Any, Optional[str]]: (调用结果, 被合并时首个请求的ID，否则为 None)
+
+        Raises:
+            Exception: 上游调用抛出的异常（所有等待者都会收到）
+        """
+        call = self._calls.get(key)
+        if call is not None:
+            self.coalesced += 1
+            call.waiters += 1
+            return await asyncio.shield(call.future), call.leader_id
+
+        self.leaders += 1
+        call = _Call(asyncio.ensure_future(fn()), request_id)
+        self._calls[key] = call
+        call.future.add_done_callback(lambda future: self._finish(key, call))
+        result = await asyncio.shield(call.future)
+        if call.waiters:
+            self.logger.info("Coalesced requests", leader=request_id, waiters=call.waiters)
+        return result, None
+
+    def _finish(self, key: str, call: _Call) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # 所有等待者都已取消时避免 "exception was never retrieved"
+        if not call.future.cancelled():
+            call.future.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """请求合并统计快照"""
+        return {
+            "key_scope": self.key_scope,
+            "in_flight": self.in_flight,
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+        }
+
+
+# 全局请求合并实例
+single_flight = SingleFlight()
@@ -0,0 +1,252 @@
+"""
+SSE 增量解析服务
+- SSEParser: 按字节增量解析 Server-Sent Events，处理跨 chunk 的事件、CRLF/CR 换行和多行 data
+- OpenAIStreamAccumulator: 边转发边合并 OpenAI 格式的流式 completion（content、role、finish_reason、usage），
+  内存占用只与合并后的内容大小相关，流结束时无需再整体解析
+"""
+
+from typing import Any, Dict, List, Optional
+
+import structlog
+
+from ..utils import jsoncodec
+
+logger = structlog.get_logger(__name__)
+
+# 单行最大缓冲字节数，超过后丢弃该行（防止异常上游导致缓冲无限增长）
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class SSEEvent:
+    """一个完整的 SSE 事件"""
+
+    __slots__ = ("event", "data", "id")
+
+    def __init__(self, data: str, event: Optional[str] = None, id: Optional[str] = None):
+        self.data = data
+        self.event = event
+        self.id = id
+
+    def __repr__(self) -> str:
+        return f"SSEEvent(event={self.event!r}, data={self.data!r}, id={self.id!r})"
+
+
+class SSEParser:
+    """SSE 增量解析器"""
+
+    def __init__(self, max_line_bytes: int = MAX_LINE_BYTES):
+        """
+        初始化解析器
+
+        Args:
+            max_line_bytes: 单行最大缓冲字节数
+        """
+        self.max_line_bytes = max_line_bytes
+        self._buffer = b""
+        self._pending_cr = False
+        self._data_lines: List[str] = []
+        self._event_type: Optional[str] = None
+        self._last_id: Optional[str] = None
+        self.dropped_lines = 0
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        """
+        输入一段字节，返回本次输入后完整的事件
+
+        Args:
+            chunk: 上游返回的原始字节
+
+        Returns:
+            List[SSEEvent]: 已完整的事件
+        """
+        if not chunk:
+            return []
+
+        # 上一段以 \r 结尾时，本段开头的 \n 属于同一个 CRLF
+        if self._pending_cr and chunk[:1] == b"\n":
+            chunk = chunk[1:]
+        self._pending_cr = False
+
+        if b"\r" in chunk:
+            self._pending_cr = chunk.endswith(b"\r")
+            chunk = chunk.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+
+        if b"\n" not in chunk:
+            self._buffer += chunk
+            if len(self._buffer) > self.max_line_bytes:
+                self._buffer = b""
+                self.dropped_lines += 1
+            return []
+
+        lines = (self._buffer + chunk).split(b"\n")
+        self._buffer = lines.pop()
+
+        events: List[SSEEvent] = []
+        for line in lines:
+            self._process_line(line, events)
+        return events
+
+    def flush(self) -> List[SSEEvent]:
+        """
+        流结束时处理缓冲中剩余的行和未以空行结束的事件
+
+        Returns:
+            List[SSEEvent]: 剩余的事件
+        """
+        events: List[SSEEvent] = []
+        if self._buffer:
+            self._process_line(self._buffer, events)
+            self._buffer = b""
+        self._dispatch(events)
+        return events
+
+    def _process_line(self, line: bytes, events: List[SSEEvent]) -> None:
+        """处理一行"""
+        if not line:
+            self._dispatch(events)
+            return
+        if line[:1] == b":":
+            # 注释行（心跳）
+            return
+
+        field, sep, value = line.partition(b":")
+        if sep and value[:1] == b" ":
+            value = value[1:]
+
+        if field == b"data":
+            self._data_lines.append(value.decode("utf-8", errors="replace"))
+        elif field == b"event":
+            self._event_type = value.decode("utf-8", errors="replace")
+        elif field == b"id":
+            self._last_id = value.decode("utf-8", errors="replace")
+
+    def _dispatch(self, events: List[SSEEvent]) -> None:
+        """空行结束一个事件"""
+        if self._data_lines:
+            events.append(SSEEvent("\n".join(self._data_lines), self._event_type, self._last_id))
+        self._data_lines = []
+        self._event_type = None
+
+
+class OpenAIStreamAccumulator:
+    """OpenAI 流式 completion 增量合并器"""
+
+    def __init__(self):
+        self.logger = logger.bind(service="sse_parser")
+        self.id = ""
+        self.created = 0
+        self.model = ""
+        self.usage: Optional[Dict[str, Any]] = None
+        self.events = 0
+        self.parse_errors = 0
+        self.done = False
+        # {choice_index: {"role": ..., "content": [片段], "finish_reason": ...}}
+        self._choices: Dict[int, Dict[str, Any]] = {}
+
+    def add_event(self, event: SSEEvent) -> None:
+        """
+        合并一个 SSE 事件
+
+        Args:
+            event: SSE 事件
+        """
+        data = event.data
+        if data == "[DONE]":
+            self.done = True
+            return
+
+        try:
+            chunk_data = jsoncodec.loads(data)
+        except (jsoncodec.JSONDecodeError, TypeError):
+            self.parse_errors += 1
+            return
+        if not isinstance(chunk_data, dict):
+            self.parse_errors += 1
+            return
+
+        self.events += 1
+
+        # 基础信息取第一个带 id 的 chunk
+        if not self.id and chunk_data.get("id"):
+            self.id = chunk_data.get("id", "")
+            self.created = chunk_data.get("created", 0)
+            self.model = chunk_data.get("model", "")
+
+        # stream_options.include_usage 时最后一个 chunk 携带真实 usage
+        if chunk_data.get("usage"):
+            self.usage = chunk_data["usage"]
+
+        for choice in chunk_data.get("choices") or ():
+            index = choice.get("index", 0)
+            state = self._choices.get(index)
+            if state is None:
+                state = {"role": None, "content": [], "finish_reason": None}
+                self._choices[index] = state
+
+            delta = choice.get("delta") or {}
+            if delta.get("role") and not state["role"]:
+                state["role"] = delta["role"]
+            if delta.get("content"):
+                state["content"].append(delta["content"])
+            if choice.get("finish_reason"):
+                state["finish_reason"] = choice["finish_reason"]
+
+    def add_events(self, events: List[SSEEvent]) -> None:
+        """批量合并事件"""
+        for event in events:
+            self.add_event(event)
+
+    def result(self) -> Dict[str, Any]:
+        """
+        生成合并后的完整响应
+
+        Returns:
+            Dict[str, Any]: 合并结果（content、role、finish_reason 以及 chat.completion 结构的 full_response）
+        """
+        choices = []
+        for index in sorted(self._choices):
+            state = self._choices[index]
+            choices.append({
+                "index": index,
+                "message": {
+                    "role": state["role"] or "assistant",
+                    "content": "".join(state["content"])
+                },
+                "finish_reason": state["finish_reason"] or "stop"
+            })
+        if not choices:
+            choices.append({
+                "index": 0,
+                "message": {"role": "assistant", "content": ""},
+                "finish_reason": "stop"
+            })
+
+        first = choices[0]
+        merged_content = first["message"]["content"]
+
+        usage = self.usage
+        if usage is None:
+            # 上游未返回 usage 时简单估算（实际应该用tokenizer）
+            estimated_completion_tokens = len(merged_content.split())
+            usage = {
+                "prompt_tokens": 0,
+                "completion_tokens": estimated_completion_tokens,
+                "total_tokens": estimated_completion_tokens
+            }
+
+        if self.parse_errors:
+            self.logger.warning("Failed to parse some stream chunks", parse_errors=self.parse_errors)
+
+        return {
+            "content": merged_content,
+            "full_response": {
+                "id": self.id,
+                "object": "chat.completion",
+                "created": self.created,
+                "model": self.model,
+                "choices": choices,
+                "usage": usage
+            },
+            "role": first["message"]["role"],
+            "finish_reason": first["finish_reason"]
+        }
@@ -0,0 +1,284 @@
+"""
+上游健康检查
+- 被动检测：代理引擎每次转发后上报结果，连续的连接错误、超时和 5xx 达到阈值时摘除该主机，
+  摘除时长按摘除次数指数增长，到期后自动恢复（恢复后首次成功清零摘除次数）
+- 主动探测：后台任务按间隔探测配置了多个上游目标的路由的各个主机，连续失败标记为不健康，连续成功后恢复
+
+不可用主机集合在状态变化时更新，负载均衡选择时只做一次集合查询，不增加请求路径上的等待
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+import httpx
+import structlog
+
+from ..config import settings
+
+logger = structlog.get_logger(__name__)
+
+# 主动探测目标：(协议, 主机)
+ProbeTarget = Tuple[str, str]
+
+
+class HostHealth:
+    """单个上游主机的健康状态"""
+
+    __slots__ = ("consecutive_failures", "ejected_until", "ejections", "total_failures",
+                 "last_error", "last_failure_at", "probe_healthy", "probe_successes",
+                 "probe_failures", "last_probe_at")
+
+    def __init__(self):
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.total_failures = 0
+        self.last_error: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+        self.probe_healthy = True
+        self.probe_successes = 0
+        self.probe_failures = 0
+        self.last_probe_at: Optional[float] = None
+
+
+class UpstreamHealth:
+    """上游主机健康状态（被动摘除 + 主动探测）"""
+
+    def __init__(self, config: Optional[Dict[str, Any]] = None):
+        """
+        初始化健康检查
+
+        Args:
+            config: 健康检查配置，默认读取 proxy.upstream_health
+        """
+        config = config if config is not None else settings.proxy.get('upstream_health', {})
+        passive = config.get('passive', {})
+        active = config.get('active', {})
+
+        self.passive_enabled = passive.get('enabled', True)
+        self.consecutive_failures = passive.get('consecutive_failures', 5)
+        self.base_ejection = passive.get('base_ejection_seconds', 30)
+        self.max_ejection = passive.get('max_ejection_seconds', 300)
+
+        self.active_enabled = active.get('enabled', False)
+        self.probe_interval = active.get('interval_seconds', 10)
+        self.probe_timeout = active.get('timeout_seconds', 2)
+        self.probe_path = active.get('path', '/health')
+        self.healthy_threshold = active.get('healthy_threshold', 2)
+        self.unhealthy_threshold = active.get('unhealthy_threshold', 3)
+
+        self.logger = logger.bind(service="upstream_health")
+        self._hosts: Dict[str, HostHealth] = {}
+        # 被摘除的主机及恢复时间；主动探测判定为不健康的主机
+        self._ejected: Dict[str, float] = {}
+        self._unhealthy: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def running(self) -> bool:
+        """主动探测任务是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    def _state(self, host: str) -> HostHealth:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostHealth()
+        return state
+
+    def unavailable(self, now: Optional[float] = None) -> Set[str]:
+        """
+        当前不可用的主机（被摘除或主动探测不健康），到期的摘除在此处清理
+
+        Args:
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            Set[str]: 主机集合，没有不可用主机时返回空集合
+        """
+        if not self._ejected:
+            return self._unhealthy
+        now = time.monotonic() if now is None else now
+        for host in [host for host, until in self._ejected.items() if until <= now]:
+            del self._ejected[host]
+            self.logger.info("Upstream ejection expired", host=host)
+        if not self._unhealthy:
+            return set(self._ejected)
+        return self._unhealthy.union(self._ejected)
+
+    def is_available(self, host: str, now: Optional[float] = None) -> bool:
+        """主机当前是否可用"""
+        return host not in self.unavailable(now)
+
+    def record_success(self, host: str) -> None:
+        """
+        记录一次成功转发
+
+        Args:
+            host: 目标主机
+        """
+        state = self._hosts.get(host)
+        if state is None or (not state.consecutive_failures and not state.ejections):
+            return
+        state.consecutive_failures = 0
+        if host not in self._ejected:
+            # 摘除到期后重新收到成功响应，下次摘除时长重新计算
+            state.ejections = 0
+
+    def record_failure(self, host: str, reason: str, now: Optional[float] = None) -> bool:
+        """
+        记录一次失败转发（连接错误、超时或 5xx），连续失败达到阈值时摘除
+
+        Args:
+            host: 目标主机
+            reason: 失败原因
+            now: 当前时间（monotonic 秒）
+
+        Returns:
+            bool: 本次是否触发摘除
+        """
+        if not self.passive_enabled:
+            return False
+        now = time.monotonic() if now is None else now
+        state = self._state(host)
+        state.consecutive_failures += 1
+        state.total_failures += 1
+        state.last_error = reason
+        state.last_failure_at = now
+
+        if state.consecutive_failures < self.consecutive_failures or host in self._ejected:
+            return False
+
+        duration = min(self.base_ejection * (2 ** state.ejections), self.max_ejection)
+        state.ejections += 1
+        state.consecutive_failures = 0
+        state.ejected_until = now + duration
+        self._ejected[host] = state.ejected_until
+        self.logger.warning("Upstream ejected", host=host, reason=reason,
+                            ejection_seconds=duration, ejections=state.ejections)
+        return True
+
+    def record_probe(self, host: str, healthy: bool, error: Optional[str] = None) -> None:
+        """
+        记录一次主动探测结果
+
+        Args:
+            host: 目标主机
+            healthy: 探测是否成功
+            error: 失败原因
+        """
+        state = self._state(host)
+        state.last_probe_at = time.monotonic()
+        if healthy:
+            state.probe_failures = 0
+            state.probe_successes += 1
+            if not state.probe_healthy and state.probe_successes >= self.healthy_threshold:
+                state.probe_healthy = True
+                self._unhealthy.discard(host)
+                self.logger.info("Upstream marked healthy", host=host)
+        else:
+            state.probe_successes = 0
+            state.probe_failures += 1
+            state.last_error = error
+            if state.probe_healthy and state.probe_failures >= self.unhealthy_threshold:
+                state.probe_healthy = False
+                self._unhealthy.add(host)
+                self.logger.warning("Upstream marked unhealthy", host=host, error=error)
+
+    async def probe(self, protocol: str, host: str) -> None:
+        """
+        探测单个主机（2xx/3xx 视为健康）
+
+        Args:
+            protocol: 协议
+            host: 目标主机
+        """
+        try:
+            response = await self._client.get(f"{protocol}://{host}{self.probe_path}")
+            healthy = response.status_code < 400
+            self.record_probe(host, healthy, None if healthy else f"status_{response.status_code}")
+        except httpx.HTTPError as e:
+            self.record_probe(host, False, type(e).__name__)
+
+    async def _run(self, targets_provider: Callable[[], Awaitable[Iterable[ProbeTarget]]]) -> None:
+        """主动探测循环"""
+        while True:
+            try:
+                targets = set(await targets_provider())
+                if targets:
+                    await asyncio.gather(*(self.probe(protocol, host) for protocol, host in targets))
+                # 不再属于任何目标池的主机不再参与主动探测，清除其不健康标记
+                hosts = {host for _, host in targets}
+                for host in self._unhealthy - hosts:
+                    self._unhealthy.discard(host)
+                    self._hosts[host].probe_healthy = True
+            except Exception as e:
+                self.logger.error("Upstream probe round failed", error=str(e))
+            await asyncio.sleep(self.probe_interval)
+
+    def start(self, targets_provider: Callable[[], Awaitable[Iterable[ProbeTarget]]]) -> None:
+        """
+        启动主动探测任务（需在事件循环中调用，未开启主动探测时无操作）
+
+        Args:
+            targets_provider: 返回当前需要探测的 (协议, 主机) 的协程函数
+        """
+        if not self.active_enabled or self.running:
+            return
+        self._client = httpx.AsyncClient(timeout=self.probe_timeout)
+        self._task = asyncio.create_task(self._run(targets_provider))
+        self.logger.info("Upstream prober started", interval=self.probe_interval, path=self.probe_path)
+
+    async def stop(self) -> None:
+        """停止主动探测任务"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self, in_flight: Optional[Callable[[str], int]] = None) -> Dict[str, Any]:
+        """
+        健康状态快照（管理接口使用）
+
+        Args:
+            in_flight: 查询主机在途请求数的函数
+
+        Returns:
+            Dict[str, Any]: 各主机的健康状态
+        """
+        now = time.monotonic()
+        unavailable = self.unavailable(now)
+        hosts = []
+        for host, state in sorted(self._hosts.items()):
+            entry = {
+                "host": host,
+                "available": host not in unavailable,
+                "ejected": host in self._ejected,
+                "ejection_remaining_seconds": round(max(state.ejected_until - now, 0), 1),
+                "ejections": state.ejections,
+                "consecutive_failures": state.consecutive_failures,
+                "total_failures": state.total_failures,
+                "last_error": state.last_error,
+                "probe_healthy": state.probe_healthy,
+                "last_probe_seconds_ago": round(now - state.last_probe_at, 1) if state.last_probe_at else None,
+            }
+            if in_flight is not None:
+                entry["in_flight"] = in_flight(host)
+            hosts.append(entry)
+        return {
+            "passive_enabled": self.passive_enabled,
+            "active_enabled": self.active_enabled,
+            "prober_running": self.running,
+            "hosts": hosts,
+        }
+
+
+# 全局上游健康状态实例
+upstream_health = UpstreamHealth()
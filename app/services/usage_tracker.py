@@ -0,0 +1,179 @@
+"""
+API Key 使用统计写回服务
+请求路径上只在内存中累加每个 Key 的调用次数和最后使用时间，
+由后台任务按时间间隔或累计次数批量写回数据库（一次 executemany UPDATE）
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import bindparam, update
+from sqlalchemy.engine import Engine
+from starlette.concurrency import run_in_threadpool
+import structlog
+
+from ..config import settings
+from ..database import engine
+from ..models.api_key import APIKeyDB
+
+logger = structlog.get_logger(__name__)
+
+
+class UsageTracker:
+    """API Key 使用计数批量写回"""
+
+    def __init__(
+        self,
+        flush_interval_ms: Optional[int] = None,
+        flush_max_hits: Optional[int] = None,
+        bind: Optional[Engine] = None
+    ):
+        """
+        初始化使用统计写回服务
+
+        Args:
+            flush_interval_ms: 写回间隔（毫秒）
+            flush_max_hits: 累计调用次数达到该值时立即写回
+            bind: 写回使用的数据库引擎，默认使用应用数据库
+        """
+        tracker_config = settings.security.get('usage_tracker', {})
+        self.enabled = tracker_config.get('enabled', True)
+        self.flush_interval = (flush_interval_ms or tracker_config.get('flush_interval_ms', 1000)) / 1000
+        self.flush_max_hits = flush_max_hits or tracker_config.get('flush_max_hits', 1000)
+
+        self.logger = logger.bind(service="usage_tracker")
+        self._engine = bind or engine
+        # {key_value: [累计次数, 最后使用时间]}
+        self._pending: Dict[str, list] = {}
+        self._pending_hits = 0
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._statement = (
+            update(APIKeyDB.__table__)
+            .where(APIKeyDB.__table__.c.key_value == bindparam("k"))
+            .values(
+                usage_count=APIKeyDB.__table__.c.usage_count + bindparam("n"),
+                last_used_at=bindparam("ts")
+            )
+        )
+
+    @property
+    def running(self) -> bool:
+        """后台写回任务是否在运行"""
+        return self._task is not None and not self._task.done()
+
+    def record(self, key_value: str) -> None:
+        """
+        记录一次调用（仅内存累加）
+
+        Args:
+            key_value: API Key Value
+        """
+        entry = self._pending.get(key_value)
+        now = datetime.utcnow()
+        if entry is None:
+            self._pending[key_value] = [1, now]
+        else:
+            entry[0] += 1
+            entry[1] = now
+
+        self._pending_hits += 1
+        if self._pending_hits >= self.flush_max_hits and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _take_pending(self) -> List[dict]:
+        """取出待写回的计数并清空缓冲"""
+        if not self._pending:
+            return []
+        pending, self._pending = self._pending, {}
+        self._pending_hits = 0
+        return [{"k": key, "n": count, "ts": last_used} for key, (count, last_used) in pending.items()]
+
+    def _write(self, batch: List[dict]) -> None:
+        """批量写回数据库"""
+        with self._engine.begin() as conn:
+            conn.execute(self._statement, batch)
+
+    def _restore(self, batch: List[dict]) -> None:
+        """写回失败时把计数合并回缓冲，等待下次重试"""
+        for item in batch:
+            entry = self._pending.get(item["k"])
+            if entry is None:
+                self._pending[item["k"]] = [item["n"], item["ts"]]
+            else:
+                entry[0] += item["n"]
+                entry[1] = max(entry[1], item["ts"])
+            self._pending_hits += item["n"]
+
+    def flush(self) -> int:
+        """
+        同步写回所有待写计数
+
+        Returns:
+            int: 写回的 Key 数量
+        """
+        batch = self._take_pending()
+        if not batch:
+            return 0
+        try:
+            self._write(batch)
+        except Exception as e:
+            self._restore(batch)
+            self.logger.error("Failed to flush API key usage", error=str(e), keys=len(batch))
+            return 0
+        return len(batch)
+
+    async def flush_async(self) -> int:
+        """
+        在线程池中写回所有待写计数
+
+        Returns:
+            int: 写回的 Key 数量
+        """
+        batch = self._take_pending()
+        if not batch:
+            return 0
+        try:
+            await run_in_threadpool(self._write, batch)
+        except Exception as e:
+            self._restore(batch)
+            self.logger.error("Failed to flush API key usage", error=str(e), keys=len(batch))
+            return 0
+        return len(batch)
+
+    async def _run(self) -> None:
+        """后台写回循环"""
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush_async()
+
+    def start(self) -> None:
+        """启动后台写回任务（需在事件循环中调用）"""
+        if not self.enabled or self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        self.logger.info("Usage tracker started", flush_interval=self.flush_interval,
+                         flush_max_hits=self.flush_max_hits)
+
+    async def stop(self) -> None:
+        """停止后台任务并写回剩余计数"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._wakeup = None
+        flushed = await self.flush_async()
+        self.logger.info("Usage tracker stopped", flushed_keys=flushed)
+
+
+# 全局使用统计实例
+usage_tracker = UsageTracker()
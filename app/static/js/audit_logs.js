@@ -430,6 +430,7 @@ class AuditLogsManager {
                         <hr class="my-2">
                         <dt class="col-sm-3">状态码:</dt><dd class="col-sm-9"><span class="badge ${this.getStatusClass(log.status_code)}">${log.status_code}</span></dd>
                         <dt class="col-sm-3">响应时间:</dt><dd class="col-sm-9">${log.response_time_ms} ms</dd>
+                        ${log.coalesced_with ? `<dt class="col-sm-3">合并到请求:</dt><dd class="col-sm-9 text-monospace">${escapeHtml(log.coalesced_with)}</dd>` : ''}
                         ${log.error_message ? `<dt class="col-sm-3 text-danger">错误信息:</dt><dd class="col-sm-9 text-danger text-break">${escapeHtml(log.error_message)}</dd>` : ''}
                     </dl>
                 </div>
@@ -169,6 +169,9 @@ function showCreateRouteModal() {
         document.getElementById('routePriority').value = 100;
         document.getElementById('timeout').value = 30;
         document.getElementById('retryCount').value = 0;
+        document.getElementById('streamMode').value = 'audit';
+        document.getElementById('batchMode').value = 'none';
+        document.getElementById('lbStrategy').value = 'round_robin';
         document.getElementById('isActive').checked = true;
         document.getElementById('targetProtocol').value = 'http';
         document.getElementById('matchMethod').value = 'POST';
@@ -179,6 +182,8 @@ function showCreateRouteModal() {
         document.getElementById('addHeaders').value = '';
         document.getElementById('removeHeaders').value = '';
         document.getElementById('addBodyFields').value = '';
+        document.getElementById('targetHosts').value = '';
+        document.getElementById('cacheKeyFields').value = '';
     }
     
     // 更新模态框标题
@@ -213,6 +218,16 @@ function editRoute(routeId) {
     document.getElementById('stripPathPrefix').checked = route.strip_path_prefix;
     document.getElementById('timeout').value = route.timeout;
     document.getElementById('retryCount').value = route.retry_count;
+    document.getElementById('streamMode').value = route.stream_mode || 'audit';
+    document.getElementById('batchMode').value = route.batch_mode || 'none';
+    document.getElementById('lbStrategy').value = route.lb_strategy || 'round_robin';
+    document.getElementById('lbHashKey').value = route.lb_hash_key || '';
+    document.getElementById('hedgeEnabled').checked = !!route.hedge_enabled;
+    document.getElementById('hedgeDelayMs').value = route.hedge_delay_ms || '';
+    document.getElementById('coalesceEnabled').checked = !!route.coalesce_enabled;
+    document.getElementById('cacheEnabled').checked = !!route.cache_enabled;
+    document.getElementById('cacheTtl').value = route.cache_ttl ?? '';
+    document.getElementById('cacheMaxEntryBytes').value = route.cache_max_entry_bytes || '';
     document.getElementById('isActive').checked = route.is_active;
     
     // 处理JSON字段 - 将对象转换为JSON字符串显示
@@ -226,6 +241,10 @@ function editRoute(routeId) {
         JSON.stringify(route.remove_headers, null, 2) : '';
     document.getElementById('addBodyFields').value = route.add_body_fields ? 
         JSON.stringify(route.add_body_fields, null, 2) : '';
+    document.getElementById('targetHosts').value = route.target_hosts ? 
+        JSON.stringify(route.target_hosts, null, 2) : '';
+    document.getElementById('cacheKeyFields').value = route.cache_key_fields ? 
+        JSON.stringify(route.cache_key_fields) : '';
     
     // 更新模态框标题
     document.getElementById('routeModalLabel').innerHTML = 
@@ -246,7 +265,7 @@ async function saveRoute() {
     }
     
     // 验证JSON格式
-    const jsonFields = ['matchHeaders', 'matchBodySchema', 'addHeaders', 'removeHeaders', 'addBodyFields'];
+    const jsonFields = ['matchHeaders', 'matchBodySchema', 'addHeaders', 'removeHeaders', 'addBodyFields', 'targetHosts', 'cacheKeyFields'];
     for (const fieldId of jsonFields) {
         const field = document.getElementById(fieldId);
         if (field.value.trim() && !isValidJSON(field.value)) {
@@ -268,6 +287,16 @@ async function saveRoute() {
         strip_path_prefix: document.getElementById('stripPathPrefix').checked,
         timeout: parseInt(document.getElementById('timeout').value),
         retry_count: parseInt(document.getElementById('retryCount').value),
+        stream_mode: document.getElementById('streamMode').value,
+        batch_mode: document.getElementById('batchMode').value,
+        lb_strategy: document.getElementById('lbStrategy').value,
+        lb_hash_key: document.getElementById('lbHashKey').value.trim() || null,
+        hedge_enabled: document.getElementById('hedgeEnabled').checked,
+        hedge_delay_ms: parseInt(document.getElementById('hedgeDelayMs').value) || null,
+        coalesce_enabled: document.getElementById('coalesceEnabled').checked,
+        cache_enabled: document.getElementById('cacheEnabled').checked,
+        cache_ttl: document.getElementById('cacheTtl').value === '' ? null : parseInt(document.getElementById('cacheTtl').value),
+        cache_max_entry_bytes: parseInt(document.getElementById('cacheMaxEntryBytes').value) || null,
         priority: parseInt(document.getElementById('routePriority').value),
         is_active: document.getElementById('isActive').checked
     };
@@ -306,6 +335,12 @@ async function saveRoute() {
         data.add_headers = null;
     }
     
+    const targetHosts = document.getElementById('targetHosts').value.trim();
+    data.target_hosts = targetHosts ? JSON.parse(targetHosts) : null;
+    
+    const cacheKeyFields = document.getElementById('cacheKeyFields').value.trim();
+    data.cache_key_fields = cacheKeyFields ? JSON.parse(cacheKeyFields) : null;
+    
     const removeHeaders = document.getElementById('removeHeaders').value.trim();
     if (removeHeaders) {
         try {
@@ -533,6 +568,13 @@ function viewRoute(routeId) {
                     <tr><td>剔除前缀</td><td>${route.strip_path_prefix ? '是' : '否'}</td></tr>
                     <tr><td>超时</td><td>${route.timeout}秒</td></tr>
                     <tr><td>重试</td><td>${route.retry_count}次</td></tr>
+                    <tr><td>流式模式</td><td>${route.stream_mode || 'audit'}</td></tr>
+                    <tr><td>合批模式</td><td>${route.batch_mode || 'none'}</td></tr>
+                    <tr><td>目标池</td><td>${route.target_hosts ? route.target_hosts.map(t => `<code>${escapeHtml(t.host)}</code>×${t.weight}`).join(' ') : '-'}</td></tr>
+                    <tr><td>对冲请求</td><td>${route.hedge_enabled ? (route.hedge_delay_ms ? `${route.hedge_delay_ms}ms` : '实时 P95') : '关闭'}</td></tr>
+                    <tr><td>请求合并</td><td>${route.coalesce_enabled ? '开启' : '关闭'}</td></tr>
+                    <tr><td>响应缓存</td><td>${route.cache_enabled ? (route.cache_ttl != null ? `${route.cache_ttl}秒` : '默认有效期') : '关闭'}</td></tr>
+                    <tr><td>负载均衡</td><td>${route.lb_strategy || 'round_robin'}${route.lb_hash_key ? ` (${escapeHtml(route.lb_hash_key)})` : ''}</td></tr>
                 </table>
             </div>
             
@@ -0,0 +1,139 @@
+"""
+JSON 编解码 - 统一入口
+优先使用已安装的原生实现（orjson，其次 msgspec），未安装时回退标准库 json；
+可通过环境变量 FASTGATE_JSON_BACKEND=orjson|msgspec|json 指定
+
+约定（所有后端一致）：
+- loads 接受 bytes 或 str；解析失败统一抛出 json.JSONDecodeError
+  （原生后端拒绝的输入会交给标准库再解析一次，如 NaN）；
+  超过 64 位的整数在部分 orjson 版本中会被解析为浮点数，需要精确大整数时使用 json 后端
+- dumps 返回 str，dumpb 返回 UTF-8 bytes，均为紧凑格式且不转义非 ASCII 字符
+- default 用于序列化后端不支持的类型；原生后端会直接把 datetime 序列化为 ISO 8601 字符串
+"""
+
+import json
+import os
+from typing import Any, Callable, Optional, Union
+
+JSONDecodeError = json.JSONDecodeError
+
+Default = Optional[Callable[[Any], Any]]
+
+
+class StdlibBackend:
+    """标准库 json"""
+
+    name = "json"
+
+    def loads(self, data: Union[bytes, bytearray, memoryview, str]) -> Any:
+        if isinstance(data, memoryview):
+            data = bytes(data)
+        return json.loads(data)
+
+    def dumps(self, obj: Any, default: Default = None, indent: bool = False) -> str:
+        if indent:
+            return json.dumps(obj, ensure_ascii=False, default=default, indent=2)
+        return json.dumps(obj, ensure_ascii=False, default=default, separators=(",", ":"))
+
+    def dumpb(self, obj: Any, default: Default = None, indent: bool = False) -> bytes:
+        # 子类回退时调用，不经过子类的 dumps
+        return StdlibBackend.dumps(self, obj, default=default, indent=indent).encode("utf-8")
+
+
+class OrjsonBackend(StdlibBackend):
+    """orjson：直接输出 bytes"""
+
+    name = "orjson"
+
+    def __init__(self):
+        import orjson
+        self._orjson = orjson
+
+    def loads(self, data):
+        try:
+            return self._orjson.loads(data)
+        except self._orjson.JSONDecodeError:
+            return super().loads(data)
+
+    def dumpb(self, obj, default=None, indent=False):
+        option = self._orjson.OPT_INDENT_2 if indent else 0
+        try:
+            return self._orjson.dumps(obj, default=default, option=option)
+        except TypeError:
+            # 非字符串键、超过 64 位的整数等
+            return super().dumpb(obj, default=default, indent=indent)
+
+    def dumps(self, obj, default=None, indent=False):
+        return self.dumpb(obj, default=default, indent=indent).decode("utf-8")
+
+
+class MsgspecBackend(StdlibBackend):
+    """msgspec.json"""
+
+    name = "msgspec"
+
+    def __init__(self):
+        import msgspec
+        self._msgspec = msgspec
+        self._encoder = msgspec.json.Encoder()
+
+    def loads(self, data):
+        try:
+            return self._msgspec.json.decode(data)
+        except self._msgspec.DecodeError:
+            return super().loads(data)
+
+    def dumpb(self, obj, default=None, indent=False):
+        try:
+            if default is None:
+                encoded = self._encoder.encode(obj)
+            else:
+                encoded = self._msgspec.json.encode(obj, enc_hook=default)
+        except (TypeError, self._msgspec.EncodeError):
+            return super().dumpb(obj, default=default, indent=indent)
+        return self._msgspec.json.format(encoded, indent=2) if indent else encoded
+
+    def dumps(self, obj, default=None, indent=False):
+        return self.dumpb(obj, default=default, indent=indent).decode("utf-8")
+
+
+BACKENDS = {
+    "orjson": OrjsonBackend,
+    "msgspec": MsgspecBackend,
+    "json": StdlibBackend,
+}
+
+
+def load_backend(name: Optional[str] = None) -> StdlibBackend:
+    """
+    加载编解码后端
+
+    Args:
+        name: 后端名称，None 时按 orjson、msgspec、json 的顺序选择第一个可用的
+
+    Returns:
+        StdlibBackend: 后端实例
+
+    Raises:
+        ValueError: 未知的后端名称
+        ImportError: 指定的后端未安装
+    """
+    if name:
+        if name not in BACKENDS:
+            raise ValueError(f"Unknown JSON backend: {name}")
+        return BACKENDS[name]()
+
+    for backend_class in (OrjsonBackend, MsgspecBackend):
+        try:
+            return backend_class()
+        except ImportError:
+            continue
+    return StdlibBackend()
+
+
+# 全局编解码后端
+backend = load_backend(os.environ.get("FASTGATE_JSON_BACKEND") or None)
+
+loads = backend.loads
+dumps = backend.dumps
+dumpb = backend.dumpb
@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+网关端到端压测
+启动本地模拟上游（OpenAI 风格的 JSON / SSE 响应，可配置出字速率、延迟和错误注入）和使用临时 SQLite 数据库的网关，
+通过管理接口创建 API Key 和路由后，用异步负载生成器经过完整的 universal_proxy 路径压测，
+输出 RPS、延迟 p50/p95/p99、首字节时间（TTFB）、SSE 分块间隔以及网关每请求 CPU 耗时
+
+模拟上游和网关分别运行在独立的子进程中，网关 CPU 通过 /proc/<pid>/stat 统计（非 Linux 系统输出 null）
+
+用法:
+    python scripts/bench-gateway.py [--scenarios json,sse,embeddings] [--concurrency 32] [--requests 2000]
+                                    [--token-rate 200] [--tokens 64] [--latency-ms 20] [--error-rate 0]
+                                    [--stream-mode audit] [--json] [--output results.json]
+
+    # 单独启动模拟上游（供手工调试）
+    python scripts/bench-gateway.py --serve-stub --port 9000 --token-rate 50
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+project_root = Path(__file__).parent.parent
+
+# 压测场景：请求路径、请求体以及是否为 SSE
+SCENARIOS = {
+    "json": {"path": "/v1/chat/completions", "stream": False},
+    "sse": {"path": "/v1/chat/completions", "stream": True},
+    "embeddings": {"path": "/v1/embeddings", "stream": False},
+}
+
+
+# ---------------------------------------------------------------------------
+# 模拟上游
+# ---------------------------------------------------------------------------
+
+def build_stub_app(token_rate: float, tokens: int, latency_ms: float, jitter_ms: float, error_rate: float):
+    """
+    构造模拟上游应用
+
+    Args:
+        token_rate: SSE 出字速率（token/秒），0 表示不限速
+        tokens: 每个响应生成的 token 数
+        latency_ms: 首个 token 前的固定延迟（毫秒）
+        jitter_ms: 延迟的随机抖动上限（毫秒）
+        error_rate: 返回 500 错误的比例（0~1）
+
+    Returns:
+        Starlette: 模拟上游应用
+    """
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, StreamingResponse
+    from starlette.routing import Route
+
+    rng = random.Random()
+    interval = 1 / token_rate if token_rate > 0 else 0
+
+    async def delay_or_error():
+        await asyncio.sleep((latency_ms + rng.uniform(0, jitter_ms)) / 1000)
+        if error_rate and rng.random() < error_rate:
+            return JSONResponse({"error": {"message": "injected upstream error", "type": "server_error"}},
+                                status_code=500)
+        return None
+
+    async def chat_completions(request):
+        body = await request.json()
+        error = await delay_or_error()
+        if error is not None:
+            return error
+
+        completion_id = f"chatcmpl-{secrets.token_hex(8)}"
+        model = body.get("model", "stub-model")
+        created = int(time.time())
+
+        if not body.get("stream"):
+            return JSONResponse({
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "tok " * tokens}}],
+                "usage": {"prompt_tokens": 16, "completion_tokens": tokens, "total_tokens": 16 + tokens},
+            })
+
+        async def events():
+            for index in range(tokens):
+                if index and interval:
+                    await asyncio.sleep(interval)
+                chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": created,
+                         "model": model,
+                         "choices": [{"index": 0, "delta": {"content": "tok "}, "finish_reason": None}]}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            final = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model,
+                     "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                     "usage": {"prompt_tokens": 16, "completion_tokens": tokens, "total_tokens": 16 + tokens}}
+            yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def embeddings(request):
+        body = await request.json()
+        error = await delay_or_error()
+        if error is not None:
+            return error
+
+        inputs = body.get("input")
+        inputs = [inputs] if isinstance(inputs, str) else list(inputs or [])
+        total = sum(len(str(item)) for item in inputs)
+        return JSONResponse({
+            "object": "list",
+            "model": body.get("model", "stub-embedding"),
+            "data": [{"object": "embedding", "index": index, "embedding": [0.01 * index] * 64}
+                     for index in range(len(inputs))],
+            "usage": {"prompt_tokens": total, "total_tokens": total},
+        })
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", chat_completions, methods=["POST"]),
+        Route("/v1/embeddings", embeddings, methods=["POST"]),
+    ])
+
+
+def serve_stub(args) -> None:
+    """在当前进程运行模拟上游"""
+    import uvicorn
+
+    app = build_stub_app(args.token_rate, args.tokens, args.latency_ms, args.jitter_ms, args.error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning", access_log=False)
+
+
+# ---------------------------------------------------------------------------
+# 进程管理
+# ---------------------------------------------------------------------------
+
+def free_port() -> int:
+    """获取一个空闲端口"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def process_cpu_seconds(pid: int) -> Optional[float]:
+    """进程累计 CPU 时间（用户态 + 内核态，秒），无法读取时返回 None"""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        # 去掉 "pid (comm)" 后，utime / stime 位于第 12 / 13 个字段
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+async def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30) -> None:
+    """等待子进程开始监听"""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Process exited with code {process.returncode} before becoming ready: {url}")
+            try:
+                await client.get(url, timeout=1)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def start_stub(args, port: int) -> subprocess.Popen:
+    """以子进程方式启动模拟上游"""
+    command = [
+        sys.executable, __file__, "--serve-stub", "--port", str(port),
+        "--token-rate", str(args.token_rate), "--tokens", str(args.tokens),
+        "--latency-ms", str(args.latency_ms), "--jitter-ms", str(args.jitter_ms),
+        "--error-rate", str(args.error_rate),
+    ]
+    return subprocess.Popen(command, cwd=project_root)
+
+
+def start_gateway(port: int, workdir: str, admin_token: str) -> subprocess.Popen:
+    """以子进程方式启动网关（临时 SQLite 数据库和日志文件，控制台输出重定向到 workdir/console.log）"""
+    env = dict(os.environ)
+    env.update({
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "ADMIN_TOKEN": admin_token,
+        "LOG_LEVEL": "WARNING",
+        "LOG_FILE": os.path.join(workdir, "gateway.log"),
+    })
+    command = [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+               "--log-level", "warning", "--no-access-log"]
+    with open(os.path.join(workdir, "console.log"), "wb") as console:
+        return subprocess.Popen(command, cwd=project_root, env=env, stdout=console, stderr=subprocess.STDOUT)
+
+
+def console_tail(workdir: str, lines: int = 20) -> str:
+    """网关控制台输出的最后几行（启动失败时用于排查）"""
+    try:
+        with open(os.path.join(workdir, "console.log"), encoding="utf-8", errors="replace") as f:
+            return "".join(f.readlines()[-lines:])
+    except OSError:
+        return ""
+
+
+def stop_process(process: subprocess.Popen) -> None:
+    """停止子进程"""
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def provision(gateway_url: str, admin_token: str, stub_port: int, stream_mode: str) -> str:
+    """
+    通过管理接口创建压测用的 API Key 和路由
+
+    Args:
+        gateway_url: 网关地址
+        admin_token: 管理员令牌
+        stub_port: 模拟上游端口
+        stream_mode: 路由的流式转发模式（audit / passthrough）
+
+    Returns:
+        str: API Key
+    """
+    params = {"token": admin_token}
+    async with httpx.AsyncClient(base_url=gateway_url, timeout=10) as client:
+        response = await client.post("/admin/keys", params=params,
+                                     json={"source_path": "bench", "rate_limit": 100_000_000})
+        response.raise_for_status()
+        api_key = response.json()["key_value"]
+
+        for name, path in (("bench chat", "/v1/chat/completions"), ("bench embeddings", "/v1/embeddings")):
+            response = await client.post("/admin/routes", params=params, json={
+                "route_name": name,
+                "match_path": path,
+                "match_method": "POST",
+                "target_host": f"127.0.0.1:{stub_port}",
+                "target_path": path,
+                "stream_mode": stream_mode,
+                "timeout": 60,
+            })
+            response.raise_for_status()
+    return api_key
+
+
+# ---------------------------------------------------------------------------
+# 负载生成
+# ---------------------------------------------------------------------------
+
+def request_body(scenario: str, tokens: int) -> Dict[str, Any]:
+    """构造场景的请求体（每个请求内容不同，避免命中缓存或合并）"""
+    nonce = secrets.token_hex(6)
+    if scenario == "embeddings":
+        return {"model": "stub-embedding", "input": [f"bench input {nonce} {index}" for index in range(4)]}
+    return {
+        "model": "stub-model",
+        "messages": [{"role": "user", "content": f"bench {nonce}"}],
+        "max_tokens": tokens,
+        "stream": SCENARIOS[scenario]["stream"],
+    }
+
+
+async def one_request(client: httpx.AsyncClient, scenario: str, tokens: int) -> Dict[str, Any]:
+    """
+    发送单个请求并记录耗时
+
+    Returns:
+        Dict[str, Any]: status、latency、ttfb（秒）以及 SSE 分块间隔列表
+    """
+    spec = SCENARIOS[scenario]
+    start = time.perf_counter()
+    ttfb = None
+    gaps = []
+    try:
+        async with client.stream("POST", spec["path"], json=request_body(scenario, tokens)) as response:
+            if spec["stream"] and response.status_code == 200:
+                last = None
+                async for line in response.aiter_lines():
+                    now = time.perf_counter()
+                    if ttfb is None:
+                        ttfb = now - start
+                    if not line.startswith("data:"):
+                        continue
+                    if last is not None:
+                        gaps.append(now - last)
+                    last = now
+            else:
+                async for _ in response.aiter_raw():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - start
+            status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    latency = time.perf_counter() - start
+    return {"status": status, "latency": latency, "ttfb": ttfb if ttfb is not None else latency, "gaps": gaps}
+
+
+async def run_load(client: httpx.AsyncClient, scenario: str, total: int, concurrency: int,
+                   tokens: int) -> List[Dict[str, Any]]:
+    """以固定并发发送 total 个请求"""
+    results = []
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            results.append(await one_request(client, scenario, tokens))
+
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return results
+
+
+def percentiles(values: List[float]) -> Optional[Dict[str, float]]:
+    """计算 p50/p95/p99/mean/max（毫秒）"""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def pick(q):
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "p50": round(pick(0.50) * 1000, 3),
+        "p95": round(pick(0.95) * 1000, 3),
+        "p99": round(pick(0.99) * 1000, 3),
+        "mean": round(sum(ordered) / len(ordered) * 1000, 3),
+        "max": round(ordered[-1] * 1000, 3),
+    }
+
+
+async def bench_scenario(gateway_url: str, api_key: str, gateway_pid: int, scenario: str, args) -> Dict[str, Any]:
+    """预热后压测单个场景并汇总结果"""
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=gateway_url, headers={"Authorization": f"Bearer {api_key}"},
+                                 limits=limits, timeout=args.timeout) as client:
+        await run_load(client, scenario, args.warmup, args.concurrency, args.tokens)
+
+        cpu_before = process_cpu_seconds(gateway_pid)
+        start = time.perf_counter()
+        results = await run_load(client, scenario, args.requests, args.concurrency, args.tokens)
+        duration = time.perf_counter() - start
+        cpu_after = process_cpu_seconds(gateway_pid)
+
+    status_counts: Dict[str, int] = {}
+    for result in results:
+        status_counts[str(result["status"])] = status_counts.get(str(result["status"]), 0) + 1
+    ok = [result for result in results if result["status"] == 200]
+    cpu = None if cpu_before is None or cpu_after is None else cpu_after - cpu_before
+
+    return {
+        "scenario": scenario,
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "status_counts": status_counts,
+        "duration_s": round(duration, 3),
+        "rps": round(len(results) / duration, 2) if duration else None,
+        "latency_ms": percentiles([result["latency"] for result in ok]),
+        "ttfb_ms": percentiles([result["ttfb"] for result in ok]),
+        "chunk_gap_ms": percentiles([gap for result in ok for gap in result["gaps"]]),
+        "gateway_cpu_ms_per_request": round(cpu / len(results) * 1000, 3) if cpu is not None and results else None,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """当前提交（便于跨提交对比）"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> Dict[str, Any]:
+    """启动模拟上游和网关并依次压测各场景"""
+    stub_port = free_port()
+    gateway_port = free_port()
+    admin_token = secrets.token_urlsafe(16)
+    gateway_url = f"http://127.0.0.1:{gateway_port}"
+
+    with tempfile.TemporaryDirectory(prefix="fastgate-bench-") as workdir:
+        stub = start_stub(args, stub_port)
+        gateway = start_gateway(gateway_port, workdir, admin_token)
+        try:
+            await wait_ready(f"http://127.0.0.1:{stub_port}/", stub)
+            try:
+                await wait_ready(f"{gateway_url}/health", gateway)
+                api_key = await provision(gateway_url, admin_token, stub_port, args.stream_mode)
+            except (RuntimeError, httpx.HTTPError):
+                print(console_tail(workdir), file=sys.stderr)
+                raise
+
+            results = []
+            for scenario in args.scenarios.split(","):
+                results.append(await bench_scenario(gateway_url, api_key, gateway.pid, scenario, args))
+        finally:
+            stop_process(gateway)
+            stop_process(stub)
+
+    return {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "tokens": args.tokens,
+            "token_rate": args.token_rate,
+            "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms,
+            "error_rate": args.error_rate,
+            "stream_mode": args.stream_mode,
+        },
+        "results": results,
+    }
+
+
+def print_table(report: Dict[str, Any]) -> None:
+    """以表格形式输出结果"""
+    print(f"commit {report['commit']}  concurrency {report['config']['concurrency']}  "
+          f"requests {report['config']['requests']}")
+    print(f"{'scenario':>11} {'rps':>9} {'errors':>7} {'p50(ms)':>9} {'p95(ms)':>9} {'p99(ms)':>9} "
+          f"{'ttfb p50':>9} {'gap p50':>8} {'cpu/req(ms)':>12}")
+    for r in report["results"]:
+        latency = r["latency_ms"] or {}
+        ttfb = r["ttfb_ms"] or {}
+        gap = r["chunk_gap_ms"] or {}
+        print(f"{r['scenario']:>11} {r['rps'] or 0:>9} {r['errors']:>7} {latency.get('p50', '-'):>9} "
+              f"{latency.get('p95', '-'):>9} {latency.get('p99', '-'):>9} {ttfb.get('p50', '-'):>9} "
+              f"{gap.get('p50', '-'):>8} {r['gateway_cpu_ms_per_request'] or '-':>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="网关端到端压测")
+    parser.add_argument("--scenarios", default="json,sse,embeddings", help="压测场景，逗号分隔：json/sse/embeddings")
+    parser.add_argument("--concurrency", type=int, default=32, help="并发请求数")
+    parser.add_argument("--requests", type=int, default=2000, help="每个场景的请求数")
+    parser.add_argument("--warmup", type=int, default=100, help="每个场景的预热请求数（不计入结果）")
+    parser.add_argument("--timeout", type=float, default=60, help="单个请求超时（秒）")
+    parser.add_argument("--tokens", type=int, default=64, help="模拟上游每个响应的 token 数")
+    parser.add_argument("--token-rate", type=float, default=200, help="模拟上游 SSE 出字速率（token/秒），0 表示不限速")
+    parser.add_argument("--latency-ms", type=float, default=20, help="模拟上游首个 token 前的延迟（毫秒）")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="模拟上游延迟的随机抖动上限（毫秒）")
+    parser.add_argument("--error-rate", type=float, default=0, help="模拟上游返回 500 的比例（0~1）")
+    parser.add_argument("--stream-mode", default="audit", choices=["audit", "passthrough"],
+                        help="压测路由的流式转发模式")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    parser.add_argument("--output", help="把JSON结果写入文件")
+    parser.add_argument("--serve-stub", action="store_true", help="只启动模拟上游")
+    parser.add_argument("--port", type=int, default=9000, help="--serve-stub 时的监听端口")
+    args = parser.parse_args()
+
+    if args.serve_stub:
+        serve_stub(args)
+        return
+
+    unknown = [name for name in args.scenarios.split(",") if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    report = asyncio.run(run(args))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+    else:
+        print_table(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+JSON 编解码基准测试
+在 OpenAI 风格的负载（对话请求、对话响应、embedding 响应、SSE chunk）上
+对比各个已安装后端（json / orjson / msgspec）的 loads、dumpb 单次耗时，并校验结果一致
+
+用法:
+    python scripts/bench-json-codec.py [--backends json,orjson,msgspec] [--iterations 2000] [--json]
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils.jsoncodec import BACKENDS, load_backend  # noqa: E402
+
+
+def build_payloads():
+    """生成典型负载：中英文混合的多轮对话、1536 维 embedding、单个 SSE chunk"""
+    rng = random.Random(42)
+    words = ["gateway", "route", "模型", "上游", "latency", "token", "请求", "stream", "审计", "cache"]
+
+    def sentence(count):
+        return " ".join(rng.choice(words) for _ in range(count))
+
+    chat_request = {
+        "model": "gpt-4o",
+        "stream": False,
+        "temperature": 0.7,
+        "messages": [{"role": "system", "content": sentence(60)}] + [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": sentence(rng.randint(20, 200))}
+            for i in range(20)
+        ],
+        "tools": [{"type": "function", "function": {
+            "name": f"tool_{i}", "description": sentence(20),
+            "parameters": {"type": "object", "properties": {"q": {"type": "string"}}, "required": ["q"]},
+        }} for i in range(4)],
+    }
+    chat_response = {
+        "id": "chatcmpl-9xYz", "object": "chat.completion", "created": 1718000000, "model": "gpt-4o",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": sentence(400)}}],
+        "usage": {"prompt_tokens": 2345, "completion_tokens": 512, "total_tokens": 2857},
+    }
+    embedding_response = {
+        "object": "list", "model": "text-embedding-3-small",
+        "data": [{"object": "embedding", "index": i,
+                  "embedding": [rng.uniform(-0.1, 0.1) for _ in range(1536)]} for i in range(8)],
+        "usage": {"prompt_tokens": 64, "total_tokens": 64},
+    }
+    sse_chunk = {
+        "id": "chatcmpl-9xYz", "object": "chat.completion.chunk", "created": 1718000000, "model": "gpt-4o",
+        "choices": [{"index": 0, "delta": {"content": "上游"}, "finish_reason": None}],
+    }
+    return {
+        "chat_request": chat_request,
+        "chat_response": chat_response,
+        "embedding_response": embedding_response,
+        "sse_chunk": sse_chunk,
+    }
+
+
+def time_per_call(func, arg, iterations):
+    """返回每次调用的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def run(backend, payloads, iterations):
+    """运行单个后端的基准"""
+    results = []
+    for name, payload in payloads.items():
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        # 结果一致性校验（浮点数按各自实现往返后应完全相等）
+        assert backend.loads(raw) == json.loads(raw), name
+        assert json.loads(backend.dumpb(payload)) == payload, name
+
+        # 小负载多跑几轮，避免计时误差
+        rounds = iterations * 20 if len(raw) < 1024 else iterations
+        results.append({
+            "backend": backend.name,
+            "payload": name,
+            "bytes": len(raw),
+            "loads_us": round(time_per_call(backend.loads, raw, rounds), 2),
+            "dumpb_us": round(time_per_call(backend.dumpb, payload, rounds), 2),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON 编解码基准测试")
+    parser.add_argument("--backends", default=",".join(BACKENDS), help="后端名称，逗号分隔（未安装的跳过）")
+    parser.add_argument("--iterations", type=int, default=2000, help="每个负载的调用次数")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    payloads = build_payloads()
+    results = []
+    for name in args.backends.split(","):
+        try:
+            backend = load_backend(name)
+        except ImportError:
+            print(f"skip {name}: not installed", file=sys.stderr)
+            continue
+        results.extend(run(backend, payloads, args.iterations))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    baseline = {r["payload"]: r for r in results if r["backend"] == "json"}
+    print(f"{'backend':>8} {'payload':>19} {'bytes':>8} {'loads(us)':>10} {'dumpb(us)':>10} {'speedup':>14}")
+    for r in results:
+        base = baseline.get(r["payload"])
+        speedup = ""
+        if base and r["loads_us"] and r["dumpb_us"]:
+            speedup = f"{base['loads_us'] / r['loads_us']:.1f}x/{base['dumpb_us'] / r['dumpb_us']:.1f}x"
+        print(f"{r['backend']:>8} {r['payload']:>19} {r['bytes']:>8} {r['loads_us']:>10} "
+              f"{r['dumpb_us']:>10} {speedup:>14}")
+
+
+if __name__ == "__main__":
+    main()
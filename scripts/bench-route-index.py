@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+路由匹配基准测试
+对比线性扫描（RouteMatcher.find_matching_route）与前缀树索引（RouteIndex）
+在 10 / 1k / 10k 条路由下的单次匹配耗时，并校验两者结果一致
+
+用法:
+    python scripts/bench-route-index.py [--sizes 10,1000,10000] [--lookups 2000] [--json]
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import time
+
+import structlog
+
+# 基准测试期间屏蔽匹配日志，避免日志输出主导耗时
+structlog.configure(wrapper_class=structlog.make_filtering_bound_logger(logging.CRITICAL))
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.route_matcher import RouteMatcher  # noqa: E402
+from app.services.route_index import RouteIndex  # noqa: E402
+
+
+def build_routes(size: int, matcher: RouteMatcher):
+    """按租户生成路由：精确路径、参数路径、通配符路径混合"""
+    routes = []
+    tenant = 0
+    while len(routes) < size:
+        prefix = f"/t{tenant}/v1"
+        routes.extend([
+            {"route_id": f"{tenant}-chat", "match_path": f"{prefix}/chat/completions",
+             "match_method": "POST", "priority": 10},
+            {"route_id": f"{tenant}-models", "match_path": f"{prefix}/models",
+             "match_method": "GET", "priority": 10},
+            {"route_id": f"{tenant}-embed", "match_path": f"{prefix}/{{model}}/embeddings",
+             "match_method": "POST", "priority": 20},
+            {"route_id": f"{tenant}-any", "match_path": f"{prefix}/*",
+             "match_method": "ANY", "priority": 100},
+        ])
+        tenant += 1
+    routes = routes[:size]
+    routes.append({"route_id": "global-fallback", "match_path": "/fallback/**",
+                   "match_method": "ANY", "priority": 1000})
+
+    for route in routes:
+        route["is_active"] = True
+        route["_path_regex"] = matcher._compile_path_pattern(route["match_path"])
+    routes.sort(key=lambda r: r["priority"])
+    return routes, tenant
+
+
+def build_requests(tenants: int, count: int):
+    """生成命中/未命中混合的请求"""
+    rng = random.Random(42)
+    requests = []
+    for _ in range(count):
+        tenant = rng.randrange(tenants)
+        path, method = rng.choice([
+            (f"/t{tenant}/v1/chat/completions", "POST"),
+            (f"/t{tenant}/v1/models", "GET"),
+            (f"/t{tenant}/v1/qwen/embeddings", "POST"),
+            (f"/t{tenant}/v1/files/abc", "DELETE"),
+            ("/fallback/a/b", "GET"),
+            (f"/unknown/{tenant}", "GET"),
+        ])
+        requests.append({"path": path, "method": method, "headers": {}, "body": {}})
+    return requests
+
+
+def time_per_lookup(func, requests):
+    """返回每次查找的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for request in requests:
+        func(request)
+    return (time.perf_counter() - start) / len(requests) * 1e6
+
+
+def run(size: int, lookups: int):
+    """运行单个规模的基准"""
+    matcher = RouteMatcher()
+    routes, tenants = build_routes(size, matcher)
+    requests = build_requests(tenants, lookups)
+
+    build_start = time.perf_counter()
+    index = RouteIndex(routes)
+    build_ms = (time.perf_counter() - build_start) * 1000
+
+    def linear(request):
+        return matcher.find_matching_route(request, routes, presorted=True)
+
+    def indexed(request):
+        candidates = index.candidates(request["path"], request["method"])
+        return matcher.find_matching_route(request, candidates, presorted=True)
+
+    # 结果一致性校验
+    for request in requests:
+        expected, actual = linear(request), indexed(request)
+        assert (expected and expected["route_id"]) == (actual and actual["route_id"]), request
+
+    # 线性扫描在大规模下很慢，限制样本数量
+    linear_sample = requests[:max(50, min(lookups, 200_000 // max(size, 1)))]
+    avg_candidates = sum(len(index.candidates(r["path"], r["method"])) for r in requests) / len(requests)
+
+    return {
+        "routes": len(routes),
+        "index_build_ms": round(build_ms, 2),
+        "linear_us": round(time_per_lookup(linear, linear_sample), 2),
+        "indexed_us": round(time_per_lookup(indexed, requests), 2),
+        "avg_candidates": round(avg_candidates, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="路由匹配基准测试")
+    parser.add_argument("--sizes", default="10,1000,10000", help="路由规模，逗号分隔")
+    parser.add_argument("--lookups", type=int, default=2000, help="每个规模的查找次数")
+    parser.add_argument("--json", action="store_true", help="以JSON格式输出")
+    args = parser.parse_args()
+
+    results = [run(int(size), args.lookups) for size in args.sizes.split(",")]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'routes':>8} {'build(ms)':>10} {'linear(us)':>12} {'indexed(us)':>12} {'candidates':>11} {'speedup':>8}")
+    for r in results:
+        speedup = r["linear_us"] / r["indexed_us"] if r["indexed_us"] else 0
+        print(f"{r['routes']:>8} {r['index_build_ms']:>10} {r['linear_us']:>12} "
+              f"{r['indexed_us']:>12} {r['avg_candidates']:>11} {speedup:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
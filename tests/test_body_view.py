@@ -0,0 +1,141 @@
+"""
+请求体惰性视图测试
+测试顶层字段扫描、嵌套结构与转义跳过、回退完整解析、路由所需字段的计算以及按字节注入字段
+"""
+
+import os
+import sys
+import json
+import random
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.body_view import JSONBodyView, scan_top_level, body_schema_keys, encode_fields_fragment
+
+
+class TestScanTopLevel:
+    """顶层字段扫描测试类"""
+
+    def test_skips_nested_values_and_escapes(self):
+        """测试跳过包含括号、引号和反斜杠的嵌套值"""
+        raw = (b'{"messages": [{"role": "user", "content": "a ]} \\" [{ \\\\"}],'
+               b' "tools": {"x": [1, 2, {"y": "}"}]}, "model" : "gpt-4", "stream": true}')
+        assert scan_top_level(raw, {"model", "stream"}) == {"model": "gpt-4", "stream": True}
+        assert scan_top_level(raw, {"tools"}) == {"tools": {"x": [1, 2, {"y": "}"}]}}
+
+    def test_duplicate_keys_and_escaped_keys(self):
+        """测试重复键以最后一个为准、转义键名正确解码"""
+        assert scan_top_level(b' {"a": 1, "a": 2} ', {"a"}) == {"a": 2}
+        assert scan_top_level(b'{"mo\\u0064el": "x"}', {"model"}) == {"model": "x"}
+        assert scan_top_level(b'{}', {"model"}) == {}
+
+    def test_matches_json_loads(self):
+        """测试随机结构下与 json.loads 的结果一致"""
+        rng = random.Random(7)
+
+        def value(depth=0):
+            roll = rng.random()
+            if depth > 3 or roll < 0.3:
+                return rng.choice([1, -2.5e3, True, None, 's\\"]}[{', "中文", ""])
+            if roll < 0.65:
+                return [value(depth + 1) for _ in range(rng.randint(0, 4))]
+            return {rng.choice(["a", "model", 'k"q']): value(depth + 1) for _ in range(rng.randint(0, 3))}
+
+        for _ in range(500):
+            body = {rng.choice(["a", "b", "model", "stream"]): value() for _ in range(rng.randint(0, 5))}
+            raw = json.dumps(body, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2])).encode()
+            expected = {key: body[key] for key in ("model", "stream") if key in body}
+            assert scan_top_level(raw, {"model", "stream"}) == expected
+
+    @pytest.mark.parametrize("raw", [b'[1, 2]', b'{"a": 1', b'{"a" 1}', b'{"a": 1}x', b'{"a": "x}'])
+    def test_invalid_bodies(self, raw):
+        """测试非对象或格式错误时抛出 ValueError"""
+        with pytest.raises(ValueError):
+            scan_top_level(raw, {"a"})
+
+
+class TestJSONBodyView:
+    """请求体视图测试类"""
+
+    def test_extract_without_full_parse(self):
+        """测试只提取需要的字段，不做完整解析"""
+        content = "x" * 4096
+        raw = json.dumps({"model": "m", "messages": [{"content": content}] * 10, "stream": True}).encode()
+        view = JSONBodyView(raw)
+        assert view.extract({"model", "stream"}) == {"model": "m", "stream": True}
+        assert view._is_parsed is False
+
+    def test_dense_body_falls_back_to_full_parse(self):
+        """测试大量短字符串时直接完整解析"""
+        raw = json.dumps({"model": "m", "items": ["a"] * 1000}).encode()
+        view = JSONBodyView(raw)
+        assert view.extract({"model"}) == {"model": "m"}
+        assert view._is_parsed is True
+
+    def test_invalid_json_raises_like_full_parse(self):
+        """测试非法 JSON 回退完整解析并抛出原异常，非对象返回空字典"""
+        with pytest.raises(json.JSONDecodeError):
+            JSONBodyView(b'{"model": ').extract({"model"})
+        assert JSONBodyView(b'[1, 2]').extract({"model"}) == {}
+
+    def test_audit_text_truncates(self):
+        """测试审计文本截断"""
+        view = JSONBodyView(b'{"a": "' + b"x" * 100 + b'"}')
+        assert view.audit_text(10) == '{"a": "xxx...[truncated, 109 bytes]'
+        assert JSONBodyView(b'{}').audit_text() == "{}"
+
+
+class TestBodySchemaKeys:
+    """路由所需请求体字段测试类"""
+
+    def test_body_schema_keys(self):
+        """测试简单键值匹配返回字段集合，JSON Schema 需要完整解析"""
+        assert body_schema_keys({"model": "gpt-4"}) == {"model"}
+        assert body_schema_keys({"type": "object", "required": ["model"]}) is None
+        assert body_schema_keys('{"model": ') is None
+        assert body_schema_keys(None) is None
+
+    def test_routing_body_keys(self):
+        """测试候选路由所需字段的合并"""
+        from app.api.proxy import _routing_body_keys
+
+        assert _routing_body_keys([{"route_id": "a"}]) == {"stream"}
+        assert _routing_body_keys([
+            {"match_body_schema": {"model": "a"}, "_body_keys": {"model"}},
+            {"match_body_schema": {"user": "b"}}
+        ]) == {"stream", "model", "user"}
+        assert _routing_body_keys([{"match_body_schema": {"type": "object"}}]) is None
+
+
+class TestFieldInjection:
+    """按字节注入 add_body_fields 测试类"""
+
+    def test_splice_matches_dict_update(self):
+        """测试注入结果与完整解析后 update 等价，且其余字节保持不变"""
+        raw = b'{"model": "m", "messages": [{"role": "user", "content": "hi"}]}\n'
+        fields = {"user": "gateway", "metadata": {"team": "a"}}
+        view = JSONBodyView(raw)
+
+        spliced = view.with_fields(fields, encode_fields_fragment(fields))
+        assert spliced.startswith(raw[:-2])
+        assert json.loads(spliced) == {**json.loads(raw), **fields}
+        assert view._is_parsed is False
+
+    def test_empty_object(self):
+        """测试空对象注入时不加逗号"""
+        assert JSONBodyView(b' { } ').with_fields({"user": 1}) == b' { "user":1} '
+
+    def test_key_collision_requires_full_rewrite(self):
+        """测试与顶层键冲突时返回 None，仅出现在值或嵌套对象中时仍可拼接"""
+        assert JSONBodyView(b'{"user" : "client"}').with_fields({"user": "gw"}) is None
+        assert JSONBodyView(b'{"role": "user"}').with_fields({"user": 1}) == b'{"role": "user","user":1}'
+        nested = JSONBodyView(b'{"meta": {"user": 2}}').with_fields({"user": 1})
+        assert json.loads(nested) == {"meta": {"user": 2}, "user": 1}
+
+    def test_non_object_body(self):
+        """测试请求体不是对象时返回 None"""
+        assert JSONBodyView(b'[1, 2]').with_fields({"user": 1}) is None
+        assert encode_fields_fragment({}) is None
+        assert encode_fields_fragment({"a": "中"}) == '"a":"中"'.encode("utf-8")
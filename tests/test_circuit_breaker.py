@@ -0,0 +1,167 @@
+"""
+上游熔断器测试
+测试滚动窗口失败率熔断、半开试探、熔断时快速返回 503 以及负载均衡跳过熔断中的目标
+"""
+
+import os
+import sys
+import httpx
+import pytest
+from fastapi import HTTPException
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services import load_balancer as load_balancer_module
+from app.services.circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+from app.services.load_balancer import LoadBalancer, parse_targets
+from app.services.upstream_health import UpstreamHealth
+
+
+def make_breaker(**overrides):
+    """构造熔断器（10 秒窗口内至少 4 个请求、失败率 50% 熔断 5 秒，半开放行 2 个试探请求）"""
+    config = {"enabled": True, "window_seconds": 10, "minimum_requests": 4,
+              "failure_rate_threshold": 0.5, "open_seconds": 5, "half_open_max_calls": 2}
+    config.update(overrides)
+    return CircuitBreaker(config)
+
+
+@pytest.fixture
+def breaker(monkeypatch):
+    """替换负载均衡与代理引擎使用的全局熔断器和健康状态"""
+    from app.services import proxy_engine as proxy_engine_module
+
+    instance = make_breaker()
+    health = UpstreamHealth({"passive": {"enabled": False}})
+    monkeypatch.setattr(load_balancer_module, "circuit_breaker", instance)
+    monkeypatch.setattr(proxy_engine_module, "circuit_breaker", instance)
+    monkeypatch.setattr(load_balancer_module, "upstream_health", health)
+    monkeypatch.setattr(proxy_engine_module, "upstream_health", health)
+    return instance
+
+
+class TestCircuitStates:
+    """熔断状态转换测试类"""
+
+    def test_opens_on_failure_rate(self):
+        """测试请求数不足时不熔断，失败率达到阈值时熔断"""
+        breaker = make_breaker()
+        assert not breaker.record_failure("a:1", "ConnectError", now=0)
+        assert not breaker.record_failure("a:1", "ConnectError", now=0)
+        breaker.record_success("a:1", now=1)
+        assert breaker.state("a:1", now=1) == CLOSED
+        assert breaker.record_failure("a:1", "status_503", now=1)
+        assert breaker.state("a:1", now=2) == OPEN
+        assert breaker.open_hosts(now=2) == {"a:1"}
+        assert not breaker.allow("a:1", now=2)
+        assert breaker.retry_after("a:1", now=2) == 4
+
+    def test_window_rolls_over(self):
+        """测试滚动窗口外的失败不再计入"""
+        breaker = make_breaker()
+        for _ in range(3):
+            breaker.record_failure("a:1", "ConnectError", now=0)
+        for _ in range(3):
+            breaker.record_success("a:1", now=20)
+        assert not breaker.record_failure("a:1", "ConnectError", now=20)
+        assert breaker.state("a:1", now=20) == CLOSED
+
+    def test_half_open_trials_close_circuit(self):
+        """测试半开状态只放行有限的试探请求，全部成功后恢复"""
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record_failure("a:1", "ConnectError", now=0)
+        assert breaker.state("a:1", now=5) == HALF_OPEN
+        assert breaker.open_hosts(now=5) == set()
+        assert breaker.allow("a:1", now=5)
+        assert breaker.allow("a:1", now=5)
+        assert not breaker.allow("a:1", now=5)
+
+        breaker.record_success("a:1", now=6)
+        assert breaker.state("a:1", now=6) == HALF_OPEN
+        breaker.record_success("a:1", now=6)
+        assert breaker.state("a:1", now=6) == CLOSED
+        assert breaker.allow("a:1", now=6)
+        assert not breaker.record_failure("a:1", "ConnectError", now=6)
+
+    def test_half_open_failure_reopens(self):
+        """测试半开试探失败时重新熔断"""
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record_failure("a:1", "ConnectError", now=0)
+        assert breaker.allow("a:1", now=5)
+        assert breaker.record_failure("a:1", "ReadTimeout", now=6)
+        assert breaker.state("a:1", now=7) == OPEN
+        stats = breaker.stats()
+        assert stats["hosts"][0]["opens"] == 2
+
+    def test_stale_trials_are_released(self):
+        """测试试探请求没有结果时，过了 open_seconds 重新放行"""
+        breaker = make_breaker()
+        for _ in range(4):
+            breaker.record_failure("a:1", "ConnectError", now=0)
+        assert breaker.allow("a:1", now=5) and breaker.allow("a:1", now=5)
+        assert not breaker.allow("a:1", now=8)
+        assert breaker.allow("a:1", now=10)
+
+    def test_disabled(self):
+        """测试关闭熔断器时始终放行"""
+        breaker = make_breaker(enabled=False)
+        for _ in range(10):
+            assert not breaker.record_failure("a:1", "ConnectError", now=0)
+        assert breaker.allow("a:1", now=0)
+
+
+class TestProxyIntegration:
+    """代理引擎与负载均衡集成测试类"""
+
+    def test_balancer_skips_open_circuits(self, breaker):
+        """测试熔断中的目标不参与选择，全部熔断时仍按策略选择"""
+        balancer = LoadBalancer()
+        hosts = ["a:1", "b:1"]
+        route = {"route_id": "r", "target_host": "a:1", "target_hosts": hosts,
+                 "lb_strategy": "round_robin", "_upstreams": parse_targets(hosts)}
+
+        for _ in range(4):
+            breaker.record_failure("a:1", "ConnectError")
+        assert {balancer.select(route) for _ in range(10)} == {"b:1"}
+
+        for _ in range(4):
+            breaker.record_failure("b:1", "ConnectError")
+        assert {balancer.select(route) for _ in range(10)} == set(hosts)
+
+    @pytest.mark.asyncio
+    async def test_open_circuit_fails_fast(self, breaker, monkeypatch):
+        """测试熔断后不再重试、不再请求上游，直接返回 503"""
+        import asyncio
+        from app.services.proxy_engine import ProxyEngine
+
+        calls = []
+
+        def handler(request):
+            calls.append(request.url.host)
+            raise httpx.ConnectError("connection refused", request=request)
+
+        real_sleep = asyncio.sleep
+
+        async def no_backoff(_):
+            await real_sleep(0)
+
+        monkeypatch.setattr(asyncio, "sleep", no_backoff)
+        engine = ProxyEngine()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        route = {"route_id": "route_cb", "target_host": "down:8001", "target_path": "/v1",
+                 "match_path": "/v1", "retry_count": 10}
+
+        with pytest.raises(HTTPException) as exc_info:
+            await engine.forward_request(route, "GET", "http://down:8001/v1", headers={})
+
+        assert exc_info.value.status_code == 503
+        assert "Retry-After" in exc_info.value.headers
+        assert len(calls) == 4
+
+        with pytest.raises(HTTPException) as exc_info:
+            await engine.forward_stream_request(route, "POST", "http://down:8001/v1", headers={})
+        assert exc_info.value.status_code == 503
+        assert len(calls) == 4
+        await engine.close()
@@ -208,6 +208,41 @@ class TestConfigIntegration:
         assert config.proxy['enable_streaming'] == True
 
 
+class TestLoggingSetup:
+    """日志初始化测试类"""
+
+    def test_honors_configured_file_and_level(self, tmp_path, monkeypatch):
+        """测试日志文件和级别来自 settings.logging（LOG_FILE / LOG_LEVEL）"""
+        import logging
+        from logging.handlers import RotatingFileHandler
+        from app.config import settings
+        from app.core.logging_config import setup_logging
+
+        log_file = tmp_path / "nested" / "gateway.log"
+        monkeypatch.setitem(settings.logging, "file", str(log_file))
+        monkeypatch.setitem(settings.logging, "level", "WARNING")
+        root_logger = logging.getLogger()
+        saved_handlers, saved_level = list(root_logger.handlers), root_logger.level
+        try:
+            setup_logging()
+            file_handlers = [h for h in root_logger.handlers if isinstance(h, RotatingFileHandler)]
+            assert [h.baseFilename for h in file_handlers] == [str(log_file)]
+            assert root_logger.level == logging.WARNING
+
+            logging.getLogger("fastgate.test").info("hidden")
+            logging.getLogger("fastgate.test").warning("shown")
+            file_handlers[0].flush()
+            content = log_file.read_text(encoding="utf-8")
+            assert "shown" in content and "hidden" not in content
+        finally:
+            for handler in list(root_logger.handlers):
+                root_logger.removeHandler(handler)
+                handler.close()
+            for handler in saved_handlers:
+                root_logger.addHandler(handler)
+            root_logger.setLevel(saved_level)
+
+
 # 测试辅助函数
 def test_load_config_function():
     """测试load_config函数"""
@@ -0,0 +1,161 @@
+"""
+响应缓存磁盘层测试
+测试分段文件读写、重启后重建索引、多实例共享目录、路由删除标记、压缩、损坏记录的跳过以及后台写入和同步
+"""
+
+import asyncio
+import os
+import sys
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.disk_cache import DiskCache
+from app.services.response_cache import HIT, CachedResponse, ResponseCache
+
+
+def make_disk(path, **overrides):
+    """构造磁盘缓存（每次都同步其他实例的写入）"""
+    config = {"enabled": True, "path": str(path), "segment_bytes": 4096, "max_bytes": 1048576,
+              "compaction_interval_seconds": 300, "compaction_dead_ratio": 0.5, "sync_interval_seconds": 0}
+    config.update(overrides)
+    return DiskCache(config)
+
+
+def make_entry(body=b'{"data": [1]}', route_id="route_cache", stored_at=100.0, ttl=60):
+    """构造缓存条目"""
+    return CachedResponse(route_id, 200, {"content-type": "application/json", "etag": '"v1"'},
+                          body, stored_at, stored_at + ttl)
+
+
+class TestDiskCache:
+    """磁盘缓存测试类"""
+
+    def test_put_get_memoryview(self, tmp_path):
+        """测试写入后通过 mmap 读取，响应体为 memoryview"""
+        disk = make_disk(tmp_path)
+        assert disk.put("k1", make_entry())
+
+        route_id, status, headers, body, stored_at, expires_at = disk.get("k1")
+        assert isinstance(body, memoryview)
+        assert bytes(body) == b'{"data": [1]}'
+        assert (route_id, status, stored_at, expires_at) == ("route_cache", 200, 100.0, 160.0)
+        assert headers["etag"] == '"v1"'
+        assert disk.get("missing") is None
+
+    def test_survives_restart(self, tmp_path):
+        """测试新实例扫描分段重建索引，同一个键以较新的写入为准"""
+        disk = make_disk(tmp_path)
+        disk.put("k1", make_entry(b"old", stored_at=100))
+        disk.put("k1", make_entry(b"new", stored_at=200))
+        disk.put("k2", make_entry(b"x" * 3000))
+        disk.put("k3", make_entry(b"y" * 3000))
+
+        reopened = make_disk(tmp_path)
+        assert bytes(reopened.get("k1")[3]) == b"new"
+        assert bytes(reopened.get("k3")[3]) == b"y" * 3000
+        assert reopened.stats()["segments"] >= 2
+
+    def test_shared_between_instances(self, tmp_path):
+        """测试一个实例写入的条目和路由删除标记被另一个实例同步"""
+        writer = make_disk(tmp_path)
+        reader = make_disk(tmp_path)
+        reader.open()
+
+        writer.put("k1", make_entry(route_id="r1"))
+        writer.put("k2", make_entry(route_id="r2"))
+        assert reader.get("k1") is not None
+
+        writer.delete_route("r1", now=150)
+        reader.sync(force=True)
+        assert reader.get("k1") is None
+        assert reader.get("k2") is not None
+
+    def test_compaction(self, tmp_path):
+        """测试压缩丢弃过期条目、重写失效分段，并被其他实例正确同步"""
+        disk = make_disk(tmp_path)
+        other = make_disk(tmp_path)
+        for index in range(6):
+            disk.put(f"expired{index}", make_entry(b"e" * 1000, stored_at=0, ttl=10))
+        disk.put("live", make_entry(b"live", stored_at=0, ttl=1000))
+        other.open()
+        segments_before = disk.stats()["segments"]
+
+        result = disk.compact(now=100)
+        assert result["dropped"] == 6
+        assert result["rewritten"] >= 1
+        assert disk.stats()["segments"] < segments_before
+        assert bytes(disk.get("live", now=100)[3]) == b"live"
+
+        other.sync(force=True)
+        assert bytes(other.get("live", now=100)[3]) == b"live"
+        assert other.get("expired0", now=100) is None
+
+    def test_corrupted_record_skipped(self, tmp_path):
+        """测试损坏的记录被跳过，之后的记录仍可读取"""
+        disk = make_disk(tmp_path, segment_bytes=1048576)
+        disk.put("k1", make_entry(b"first"))
+        segment = os.path.join(tmp_path, "segment-00000001.dat")
+        with open(segment, "ab") as f:
+            f.write(b"FGC1garbage-from-a-torn-write")
+        disk.put("k2", make_entry(b"second"))
+
+        reopened = make_disk(tmp_path)
+        assert bytes(reopened.get("k1")[3]) == b"first"
+        assert bytes(reopened.get("k2")[3]) == b"second"
+
+    @pytest.mark.asyncio
+    async def test_background_writes_and_sync(self, tmp_path):
+        """测试后台任务运行时写入进入队列、读取只查索引，其他实例由后台同步看到新记录"""
+        writer = make_disk(tmp_path, sync_interval_seconds=0.05)
+        reader = make_disk(tmp_path, sync_interval_seconds=0.05)
+        writer.start()
+        reader.start()
+        try:
+            assert writer.put("k1", make_entry(b"queued"))
+            assert writer.stats()["pending_writes"] == 1
+            assert reader.get("k1") is None
+
+            for _ in range(100):
+                await asyncio.sleep(0.02)
+                if reader.get("k1") is not None:
+                    break
+            assert bytes(reader.get("k1")[3]) == b"queued"
+            assert writer.stats()["pending_writes"] == 0
+
+            writer.delete_route("route_cache")
+            assert writer.get("k1") is None
+        finally:
+            await writer.stop()
+            await reader.stop()
+
+    @pytest.mark.asyncio
+    async def test_stop_flushes_pending_writes(self, tmp_path):
+        """测试停止后台任务时写入队列中剩余的记录"""
+        disk = make_disk(tmp_path)
+        disk.start()
+        disk.put("k1", make_entry(b"pending"))
+        await disk.stop()
+
+        assert bytes(make_disk(tmp_path).get("k1")[3]) == b"pending"
+
+
+class TestResponseCacheDiskTier:
+    """内存 + 磁盘两级缓存测试类"""
+
+    def test_memory_miss_served_from_disk(self, tmp_path):
+        """测试内存层淘汰或重启后从磁盘层命中"""
+        config = {"max_bytes": 4096, "default_ttl_seconds": 60, "max_entry_bytes": 1048576,
+                  "disk": {"enabled": True, "path": str(tmp_path), "sync_interval_seconds": 0}}
+        route = {"route_id": "route_cache", "cache_enabled": True}
+        cache = ResponseCache(config)
+        cache.store("big", route, 200, {"content-type": "application/json"}, b"z" * 8192, now=0)
+        assert cache.stats()["entries"] == 0
+
+        entry, status = cache.lookup("big", now=1)
+        assert status == HIT and bytes(entry.body) == b"z" * 8192
+
+        restarted = ResponseCache(config)
+        entry, status = restarted.lookup("big", now=1)
+        assert status == HIT and isinstance(entry.body, memoryview)
@@ -0,0 +1,196 @@
+"""
+Embedding 合批测试
+测试输入拆分、并发请求合并去重、按参数和请求头分组、index 和 usage 拆分、上游错误分发以及数量上限触发发送
+"""
+
+import asyncio
+import os
+import sys
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+
+from app.services.embedding_batcher import EmbeddingBatcher, split_inputs
+from app.utils import jsoncodec
+
+ROUTE = {"route_id": "route_embed", "batch_mode": "embeddings"}
+
+
+class FakeUpstream:
+    """记录合批请求并按输入顺序返回 embedding 的上游"""
+
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.calls = []
+        self.headers = []
+
+    async def send(self, body, headers):
+        self.calls.append(body)
+        self.headers.append(headers)
+        if self.status_code != 200:
+            return httpx.Response(self.status_code, content=b'{"error": "overloaded"}')
+        data = [{"object": "embedding", "index": index, "embedding": [float(len(item))]}
+                for index, item in enumerate(body["input"])]
+        total = sum(len(item) for item in body["input"])
+        payload = {"object": "list", "model": body["model"], "data": data,
+                   "usage": {"prompt_tokens": total, "total_tokens": total}}
+        return httpx.Response(200, headers={"content-type": "application/json"}, content=jsoncodec.dumpb(payload))
+
+
+async def submit_all(batcher, upstream, bodies, headers=None):
+    """并发提交多个请求（x-request-id 各不相同，不影响合批）"""
+    return await asyncio.gather(*[
+        batcher.submit(ROUTE, "/v1/embeddings", {"x-request-id": str(i), **(headers[i] if headers else {})},
+                       body, upstream.send)
+        for i, body in enumerate(bodies)
+    ], return_exceptions=True)
+
+
+class TestSplitInputs:
+    """输入拆分测试类"""
+
+    def test_input_formats(self):
+        """测试字符串、字符串数组、token 数组和 token 数组的数组，其余格式不合批"""
+        assert split_inputs("a") == ("text", ["a"])
+        assert split_inputs(["a", "b"]) == ("text", ["a", "b"])
+        assert split_inputs([1, 2]) == ("tokens", [(1, 2)])
+        assert split_inputs([[1], [2, 3]]) == ("tokens", [(1,), (2, 3)])
+        assert split_inputs([]) is None
+        assert split_inputs(["a", 1]) is None
+        assert split_inputs({"text": "a"}) is None
+
+
+class TestEmbeddingBatcher:
+    """合批测试类"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_one_call(self):
+        """测试并发请求合并为一次上游请求，重复输入只发送一次，index 按各请求重新编号"""
+        batcher = EmbeddingBatcher({"window_ms": 5, "max_items": 256})
+        upstream = FakeUpstream()
+        results = await submit_all(batcher, upstream, [
+            {"model": "m", "input": ["aa", "bbbb"]},
+            {"model": "m", "input": "bbbb"},
+            {"model": "m", "input": ["c", "aa"]},
+        ])
+
+        assert len(upstream.calls) == 1
+        assert upstream.calls[0]["input"] == ["aa", "bbbb", "c"]
+        payloads = [jsoncodec.loads(result.content) for result in results]
+        assert [(item["index"], item["embedding"]) for item in payloads[0]["data"]] == [(0, [2.0]), (1, [4.0])]
+        assert [(item["index"], item["embedding"]) for item in payloads[1]["data"]] == [(0, [4.0])]
+        assert [(item["index"], item["embedding"]) for item in payloads[2]["data"]] == [(0, [1.0]), (1, [2.0])]
+        assert [payload["usage"]["prompt_tokens"] for payload in payloads] == [6, 4, 3]
+
+        stats = batcher.stats()
+        assert (stats["batches"], stats["requests"], stats["items"], stats["unique_items"]) == (1, 3, 5, 3)
+
+    @pytest.mark.asyncio
+    async def test_grouping_and_unbatchable(self):
+        """测试不同 model 或参数分开合批，缺少 model 或无法识别的输入不合批"""
+        batcher = EmbeddingBatcher({"window_ms": 5})
+        upstream = FakeUpstream()
+        results = await submit_all(batcher, upstream, [
+            {"model": "m1", "input": "a"},
+            {"model": "m2", "input": "a"},
+            {"model": "m1", "input": "a", "dimensions": 8},
+            {"model": "m1", "input": [1, 2]},
+            {"input": "a"},
+            {"model": "m1", "input": [{"text": "a"}]},
+        ])
+
+        assert len(upstream.calls) == 4
+        assert results[4] is None and results[5] is None
+
+    @pytest.mark.asyncio
+    async def test_user_and_forwarded_headers_grouped(self):
+        """测试 user 或转发给上游的请求头不同的请求分开合批，user 原样转发，strip_headers 中的请求头不影响分组"""
+        batcher = EmbeddingBatcher({"window_ms": 5})
+        upstream = FakeUpstream()
+        await submit_all(batcher, upstream, [
+            {"model": "m", "input": "a", "user": "alice"},
+            {"model": "m", "input": "b", "user": "alice"},
+            {"model": "m", "input": "c", "user": "bob"},
+            {"model": "m", "input": "d", "user": "alice"},
+        ], headers=[
+            {"authorization": "Bearer 1"},
+            {"authorization": "Bearer 2"},
+            {},
+            {"openai-organization": "org-2"},
+        ])
+
+        calls = sorted((call.get("user"), call["input"]) for call in upstream.calls)
+        assert calls == [("alice", ["a", "b"]), ("alice", ["d"]), ("bob", ["c"])]
+        assert sorted(headers.get("openai-organization", "") for headers in upstream.headers) == ["", "", "org-2"]
+
+    @pytest.mark.asyncio
+    async def test_upstream_error_propagates(self):
+        """测试上游错误响应原样分发给同一批的所有请求"""
+        batcher = EmbeddingBatcher({"window_ms": 5})
+        upstream = FakeUpstream(status_code=429)
+        results = await submit_all(batcher, upstream, [
+            {"model": "m", "input": "a"}, {"model": "m", "input": "b"}])
+
+        assert len(upstream.calls) == 1
+        assert [result.status_code for result in results] == [429, 429]
+        assert results[1].content == b'{"error": "overloaded"}'
+
+    @pytest.mark.asyncio
+    async def test_exception_propagates(self):
+        """测试发送异常和不完整的响应传递给同一批的所有请求"""
+        batcher = EmbeddingBatcher({"window_ms": 5})
+
+        async def failing_send(body, headers):
+            raise httpx.ConnectError("connection refused")
+
+        results = await asyncio.gather(*[
+            batcher.submit(ROUTE, "/v1/embeddings", {}, {"model": "m", "input": text}, failing_send)
+            for text in ("a", "b")
+        ], return_exceptions=True)
+        assert all(isinstance(result, httpx.ConnectError) for result in results)
+
+        async def incomplete_send(body, headers):
+            return httpx.Response(200, content=b'{"data": [{"index": 0, "embedding": [0.0]}]}')
+
+        results = await asyncio.gather(*[
+            batcher.submit(ROUTE, "/v1/embeddings", {}, {"model": "m", "input": text}, incomplete_send)
+            for text in ("a", "b")
+        ], return_exceptions=True)
+        assert all(getattr(result, "status_code", None) == 502 for result in results)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("content", [
+        b'["not", "an", "object"]',
+        b'"text"',
+        b'{"data": "oops"}',
+        b'{"data": [{"index": "0", "embedding": [0.0]}, {"embedding": [0.0]}]}',
+    ])
+    async def test_malformed_response_is_502(self, content):
+        """测试上游 200 响应不是 JSON 对象、data 不是数组或缺少整数 index 时同一批的所有请求收到 502"""
+        batcher = EmbeddingBatcher({"window_ms": 5})
+
+        async def malformed_send(body, headers):
+            return httpx.Response(200, content=content)
+
+        results = await asyncio.gather(*[
+            batcher.submit(ROUTE, "/v1/embeddings", {}, {"model": "m", "input": text}, malformed_send)
+            for text in ("a", "b")
+        ], return_exceptions=True)
+        assert [getattr(result, "status_code", None) for result in results] == [502, 502]
+
+    @pytest.mark.asyncio
+    async def test_max_items_flushes(self):
+        """测试不重复输入达到上限时立即发送，不等待窗口到期"""
+        batcher = EmbeddingBatcher({"window_ms": 10000, "max_items": 3})
+        upstream = FakeUpstream()
+        results = await asyncio.wait_for(submit_all(batcher, upstream, [
+            {"model": "m", "input": ["a", "b"]},
+            {"model": "m", "input": ["a", "c"]},
+            {"model": "m", "input": ["d", "e", "f"]},
+        ]), timeout=1)
+
+        assert [call["input"] for call in upstream.calls] == [["a", "b", "c"], ["d", "e", "f"]]
+        assert all(result.status_code == 200 for result in results)
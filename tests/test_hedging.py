@@ -0,0 +1,161 @@
+"""
+对冲请求测试
+测试对冲延迟计算（固定值 / 实时 P95）、额外负载预算以及 forward_request 的对冲发送与取消
+"""
+
+import asyncio
+import os
+import sys
+import httpx
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.hedging import HedgePolicy
+from app.services.load_balancer import parse_targets
+from app.services.metrics import GatewayMetrics
+from app.services.upstream_health import UpstreamHealth
+
+
+def make_policy(metrics=None, **overrides):
+    """构造对冲策略（样本数至少 5 个才使用 P95，对冲不超过请求数的 50%）"""
+    config = {"default_delay_ms": 200, "min_delay_ms": 10, "min_samples": 5,
+              "p95_refresh_seconds": 5, "max_extra_ratio": 0.5, "budget_window_seconds": 10}
+    config.update(overrides)
+    return HedgePolicy(config, metrics=metrics or GatewayMetrics())
+
+
+def make_route(hosts, **overrides):
+    """构造开启对冲的多目标路由"""
+    route = {"route_id": "route_hedge", "target_host": hosts[0], "target_hosts": hosts,
+             "target_path": "/v1/embeddings", "match_path": "/v1/embeddings",
+             "lb_strategy": "round_robin", "_upstreams": parse_targets(hosts),
+             "timeout": 5, "retry_count": 0, "hedge_enabled": True, "hedge_delay_ms": 20}
+    route.update(overrides)
+    return route
+
+
+@pytest.fixture
+def policy(monkeypatch):
+    """替换代理引擎使用的全局对冲策略，隔离熔断器和健康状态"""
+    from app.services import load_balancer as load_balancer_module
+    from app.services import proxy_engine as proxy_engine_module
+
+    instance = make_policy(max_extra_ratio=1.0)
+    breaker = CircuitBreaker({"enabled": False})
+    health = UpstreamHealth({"passive": {"enabled": False}})
+    monkeypatch.setattr(proxy_engine_module, "hedge_policy", instance)
+    monkeypatch.setattr(proxy_engine_module, "circuit_breaker", breaker)
+    monkeypatch.setattr(load_balancer_module, "circuit_breaker", breaker)
+    monkeypatch.setattr(proxy_engine_module, "upstream_health", health)
+    monkeypatch.setattr(load_balancer_module, "upstream_health", health)
+    return instance
+
+
+def make_engine(delays, calls, cancelled):
+    """构造按主机延迟响应的代理引擎"""
+    from app.services.proxy_engine import ProxyEngine
+
+    async def handler(request):
+        host = request.url.host
+        calls.append(host)
+        try:
+            await asyncio.sleep(delays.get(host, 0))
+        except asyncio.CancelledError:
+            cancelled.append(host)
+            raise
+        return httpx.Response(200, json={"host": host})
+
+    engine = ProxyEngine()
+    engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    return engine
+
+
+class TestHedgePolicy:
+    """对冲策略测试类"""
+
+    def test_fixed_delay(self):
+        """测试路由配置的固定对冲延迟"""
+        assert make_policy().delay({"route_id": "r", "hedge_delay_ms": 150}) == 0.15
+
+    def test_live_p95_delay(self):
+        """测试样本不足时使用默认延迟，足够后使用 P95 并按间隔缓存"""
+        metrics = GatewayMetrics()
+        policy = make_policy(metrics)
+        route = {"route_id": "r", "hedge_delay_ms": None}
+        for _ in range(4):
+            metrics.ttfb.observe(0.04, "r")
+        assert policy.delay(route, now=0) == 0.2
+
+        metrics.ttfb.observe(0.04, "r")
+        assert policy.delay(route, now=1) == 0.2
+        delay = policy.delay(route, now=10)
+        assert 0.025 <= delay <= 0.05
+
+    def test_extra_load_budget(self):
+        """测试对冲次数不超过开启对冲的请求数 × max_extra_ratio"""
+        policy = make_policy()
+        for _ in range(4):
+            policy.record_request(now=1000)
+        assert policy.try_acquire(now=1000)
+        assert policy.try_acquire(now=1000)
+        assert not policy.try_acquire(now=1000)
+        assert policy.stats()["rejected"] == 1
+
+
+class TestHedgedForwarding:
+    """对冲转发测试类"""
+
+    @pytest.mark.asyncio
+    async def test_hedge_wins_and_loser_cancelled(self, policy):
+        """测试首次尝试过慢时对冲请求胜出，慢请求被取消"""
+        calls, cancelled = [], []
+        engine = make_engine({"slow": 2, "fast": 0}, calls, cancelled)
+        route = make_route(["slow:1", "fast:1"])
+
+        response = await engine.forward_request(route, "POST", "http://slow:1/v1/embeddings",
+                                                headers={}, content=b"{}")
+        assert response.json() == {"host": "fast"}
+        assert calls == ["slow", "fast"]
+        assert cancelled == ["slow"]
+        assert policy.hedge_wins == 1
+        await engine.close()
+
+    @pytest.mark.asyncio
+    async def test_no_hedge_when_primary_is_fast(self, policy):
+        """测试首次尝试在对冲延迟内响应时不发对冲请求"""
+        calls, cancelled = [], []
+        engine = make_engine({}, calls, cancelled)
+        route = make_route(["a:1", "b:1"], hedge_delay_ms=500)
+
+        response = await engine.forward_request(route, "GET", "http://a:1/v1/embeddings", headers={})
+        assert response.json() == {"host": "a"}
+        assert calls == ["a"] and policy.hedges == 0
+        await engine.close()
+
+    @pytest.mark.asyncio
+    async def test_budget_exhausted_waits_for_primary(self, policy):
+        """测试额外负载预算耗尽时不对冲，等待首次尝试"""
+        calls, cancelled = [], []
+        engine = make_engine({"slow": 0.1}, calls, cancelled)
+        route = make_route(["slow:1", "fast:1"])
+        policy.max_extra_ratio = 0
+
+        response = await engine.forward_request(route, "GET", "http://slow:1/v1/embeddings", headers={})
+        assert response.json() == {"host": "slow"}
+        assert calls == ["slow"] and policy.rejected == 1
+        await engine.close()
+
+    @pytest.mark.asyncio
+    async def test_hedge_disabled_route(self, policy):
+        """测试未开启对冲的路由不经过对冲"""
+        calls, cancelled = [], []
+        engine = make_engine({"slow": 0.1}, calls, cancelled)
+        route = make_route(["slow:1", "fast:1"], hedge_enabled=False)
+
+        response = await engine.forward_request(route, "GET", "http://slow:1/v1/embeddings", headers={})
+        assert response.json() == {"host": "slow"}
+        assert calls == ["slow"]
+        await engine.close()
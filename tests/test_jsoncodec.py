@@ -0,0 +1,80 @@
+"""
+JSON 编解码测试
+测试各后端的往返一致性、bytes 输出、default 钩子、缩进以及原生后端不支持时回退标准库
+"""
+
+import os
+import sys
+import json
+from datetime import datetime
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.utils import jsoncodec
+from app.utils.jsoncodec import load_backend
+
+
+def _available_backends():
+    backends = []
+    for name in ("json", "orjson", "msgspec"):
+        try:
+            backends.append(load_backend(name))
+        except ImportError:
+            continue
+    return backends
+
+
+@pytest.fixture(params=_available_backends(), ids=lambda backend: backend.name)
+def backend(request):
+    return request.param
+
+
+class TestJSONCodec:
+    """编解码后端测试类"""
+
+    def test_round_trip(self, backend):
+        """测试往返一致，输出紧凑且不转义中文"""
+        data = {"model": "gpt-4", "messages": [{"role": "user", "content": "你好"}], "n": 1.5, "ok": None}
+        encoded = backend.dumpb(data)
+        assert isinstance(encoded, bytes)
+        assert encoded == json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        assert backend.dumps(data) == encoded.decode("utf-8")
+        assert backend.loads(encoded) == data
+        assert backend.loads(encoded.decode("utf-8")) == data
+        assert backend.loads(memoryview(encoded)) == data
+
+    def test_default_and_indent(self, backend):
+        """测试 default 钩子与缩进输出"""
+        class Token:
+            pass
+
+        assert backend.loads(backend.dumpb({"t": Token()}, default=lambda value: "token")) == {"t": "token"}
+        assert backend.dumps({"a": [1]}, indent=True) == json.dumps({"a": [1]}, indent=2)
+
+    def test_datetime_iso_format(self, backend):
+        """测试日期按 ISO 8601 输出（标准库后端经由 default）"""
+        value = datetime(2024, 1, 2, 3, 4, 5, 678)
+        encoded = backend.dumps({"at": value}, default=lambda v: v.isoformat())
+        assert datetime.fromisoformat(backend.loads(encoded)["at"]) == value
+
+    def test_falls_back_for_unsupported_values(self, backend):
+        """测试超过 64 位的整数、NaN、非字符串键回退标准库"""
+        big = 2 ** 70 + 1
+        assert json.loads(backend.dumpb({"v": big})) == {"v": big}
+        assert json.loads(backend.dumpb({1: "a"})) == {"1": "a"}
+        value = backend.loads(b'{"v": NaN}')["v"]
+        assert value != value
+
+    def test_invalid_json_raises_decode_error(self, backend):
+        """测试解析失败统一抛出 json.JSONDecodeError"""
+        with pytest.raises(jsoncodec.JSONDecodeError):
+            backend.loads(b'{"model": ')
+        assert jsoncodec.JSONDecodeError is json.JSONDecodeError
+
+    def test_load_backend(self):
+        """测试未知后端名称与默认选择"""
+        with pytest.raises(ValueError):
+            load_backend("simdjson")
+        assert load_backend().name in ("orjson", "msgspec", "json")
@@ -0,0 +1,153 @@
+"""
+上游负载均衡测试
+测试目标池解析、平滑加权轮询、最少在途请求、随机两选一、一致性哈希以及重试时换目标
+"""
+
+import os
+import sys
+from collections import Counter
+import httpx
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.load_balancer import LoadBalancer, UpstreamPool, parse_targets
+
+
+def make_route(strategy="round_robin", hosts=None, **overrides):
+    """构造带目标池的路由配置"""
+    targets = hosts or [{"host": "a:8000", "weight": 5}, {"host": "b:8000"}, {"host": "c:8000"}]
+    route = {
+        "route_id": f"route_{strategy}",
+        "target_host": "a:8000",
+        "target_hosts": targets,
+        "lb_strategy": strategy,
+        "lb_hash_key": None,
+        "_upstreams": parse_targets(targets, "a:8000"),
+    }
+    route.update(overrides)
+    return route
+
+
+class TestParseTargets:
+    """目标池解析测试类"""
+
+    def test_parse_targets(self):
+        """测试字符串与对象元素、非法元素跳过、为空时回退主目标"""
+        assert parse_targets('["a:1", {"host": "b:2", "weight": 3}]') == (("a:1", 1), ("b:2", 3))
+        assert parse_targets([{"host": "a:1", "weight": 0}, 5, {"weight": 2}], "main:80") == (("main:80", 1),)
+        assert parse_targets("{broken", "main:80") == (("main:80", 1),)
+        assert parse_targets(None, None) == ()
+
+
+class TestStrategies:
+    """负载均衡策略测试类"""
+
+    def test_single_target_route_skips_pool(self):
+        """测试未配置目标池的路由直接返回 target_host"""
+        balancer = LoadBalancer()
+        assert balancer.select({"target_host": "only:80"}) == "only:80"
+        assert balancer.select({"target_host": "only:80", "_upstreams": (("only:80", 1),)}) == "only:80"
+        assert not balancer._pools
+
+    def test_smooth_weighted_round_robin(self):
+        """测试平滑加权轮询的选择顺序（权重 5:1:1 时不连续选中低权重目标）"""
+        balancer = LoadBalancer()
+        route = make_route()
+        picks = [balancer.select(route)[0] for _ in range(14)]
+        assert "".join(picks) == "aabacaa" * 2
+
+    def test_least_outstanding(self):
+        """测试选择在途请求数 / 权重最小的目标，负载相同时轮流选择"""
+        balancer = LoadBalancer()
+        route = make_route("least_outstanding", hosts=["a:8000", "b:8000", "c:8000"])
+
+        assert {balancer.select(route) for _ in range(3)} == {"a:8000", "b:8000", "c:8000"}
+        with balancer.track("a:8000"), balancer.track("b:8000"):
+            assert balancer.in_flight("a:8000") == 1
+            assert [balancer.select(route) for _ in range(5)] == ["c:8000"] * 5
+        assert balancer.in_flight("a:8000") == 0
+
+    def test_power_of_two_choices(self):
+        """测试两个目标时总是选中负载较小者"""
+        balancer = LoadBalancer()
+        route = make_route("p2c", hosts=["a:8000", "b:8000"])
+        with balancer.track("a:8000"):
+            assert {balancer.select(route) for _ in range(50)} == {"b:8000"}
+        assert {balancer.select(route) for _ in range(200)} == {"a:8000", "b:8000"}
+
+    def test_consistent_hash_is_stable(self):
+        """测试同一键总是落到同一目标，新增目标时只有少量键迁移"""
+        balancer = LoadBalancer()
+        hosts = ["a:8000", "b:8000", "c:8000"]
+        route = make_route("consistent_hash", hosts=hosts)
+        before = {f"key-{i}": balancer.select(route, api_key=f"key-{i}") for i in range(3000)}
+        assert all(balancer.select(route, api_key=key) == host for key, host in list(before.items())[:100])
+        counts = Counter(before.values())
+        assert min(counts.values()) > 700
+
+        grown = make_route("consistent_hash", hosts=hosts + ["d:8000"])
+        moved = sum(balancer.select(grown, api_key=key) != host for key, host in before.items())
+        assert moved < 3000 * 0.35
+        assert all(balancer.select(grown, api_key=key) in (host, "d:8000") for key, host in before.items())
+
+    def test_consistent_hash_on_header(self):
+        """测试按请求头哈希（名称不区分大小写），缺少请求头时退化为 p2c"""
+        balancer = LoadBalancer()
+        route = make_route("consistent_hash", hosts=["a:8000", "b:8000", "c:8000"], lb_hash_key="header:X-Session")
+        picks = {balancer.select(route, api_key=f"k{i}", headers={"x-session": "s1"}) for i in range(20)}
+        assert len(picks) == 1
+        assert balancer.select(route, headers={}) in ("a:8000", "b:8000", "c:8000")
+
+    def test_exclude_tried_hosts(self):
+        """测试排除已尝试过的目标，全部排除时忽略"""
+        pool = UpstreamPool((("a:1", 1), ("b:1", 1)), "consistent_hash")
+        first = pool.select({}, key="user")
+        assert pool.select({}, key="user", exclude={first}) != first
+        assert pool.select({}, key="user", exclude={"a:1", "b:1"}) in ("a:1", "b:1")
+
+    def test_pool_rebuilt_when_route_changes(self):
+        """测试路由目标或策略变化后重建目标池"""
+        balancer = LoadBalancer()
+        route = make_route()
+        pool = balancer.pool_for(route)
+        assert balancer.pool_for(dict(route)) is pool
+        assert balancer.pool_for(make_route(lb_strategy="p2c", route_id=route["route_id"])) is not pool
+
+
+class TestProxyEngineBalancing:
+    """代理引擎按尝试选择目标测试类"""
+
+    @pytest.mark.asyncio
+    async def test_build_target_url_and_retry_on_other_target(self, monkeypatch):
+        """测试构建URL时按策略选择主机，连接失败重试时换到另一个目标，转发期间计入在途请求"""
+        from app.services import proxy_engine as proxy_engine_module
+        from app.services.load_balancer import load_balancer
+
+        async def no_sleep(_):
+            return None
+
+        monkeypatch.setattr(proxy_engine_module.asyncio, "sleep", no_sleep)
+        seen = []
+
+        def handler(request):
+            seen.append((request.url.host, load_balancer.in_flight(request.url.netloc.decode())))
+            if request.url.host == "bad":
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={"ok": True})
+
+        engine = proxy_engine_module.ProxyEngine()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        route = make_route(hosts=["bad:8001", "good:8001"], target_host="bad:8001", target_path="/v1/chat",
+                           match_path="/v1/chat", route_id="route_retry", retry_count=1)
+        route["_upstreams"] = parse_targets(route["target_hosts"], "bad:8001")
+
+        url = engine.build_target_url(route, "/v1/chat")
+        assert url == "http://bad:8001/v1/chat"
+        response = await engine.forward_request(route, "POST", url, headers={}, content=b"{}")
+
+        assert response.status_code == 200
+        assert seen == [("bad", 1), ("good", 1)]
+        assert load_balancer.in_flight("good:8001") == 0
+        await engine.close()
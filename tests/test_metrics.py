@@ -0,0 +1,161 @@
+"""
+进程内指标测试
+测试计数器、直方图分位数估算、滑动窗口计数以及 /metrics 文本导出
+"""
+
+import os
+import sys
+import pytest
+from fastapi.testclient import TestClient
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.metrics import (
+    MetricsRegistry, GatewayMetrics, RateWindow, observe_stream, observe_stream_response
+)
+
+
+class TestMetricsRegistry:
+    """指标注册表测试类"""
+
+    def test_counter_and_gauge_exposition(self):
+        """测试计数器和仪表的文本格式"""
+        registry = MetricsRegistry()
+        counter = registry.counter("demo_requests_total", "Demo requests", ("route", "status"))
+        gauge = registry.gauge("demo_depth", "Demo depth", function=lambda: 7)
+        counter.inc("chat", "200")
+        counter.inc("chat", "200")
+        counter.inc('we"ird', "500", amount=3)
+
+        text = registry.render()
+        assert "# TYPE demo_requests_total counter" in text
+        assert 'demo_requests_total{route="chat",status="200"} 2' in text
+        assert 'demo_requests_total{route="we\\"ird",status="500"} 3' in text
+        assert "demo_depth 7" in text
+        assert gauge.value() == 7
+
+        with pytest.raises(ValueError):
+            counter.inc("only-one-label")
+
+    def test_histogram_buckets_and_quantile(self):
+        """测试直方图累积桶与分位数估算"""
+        registry = MetricsRegistry()
+        histogram = registry.histogram("demo_seconds", "Demo latency", ("route",), buckets=(0.1, 0.5, 1.0))
+        for _ in range(90):
+            histogram.observe(0.05, "a")
+        for _ in range(10):
+            histogram.observe(0.8, "b")
+
+        text = registry.render()
+        assert 'demo_seconds_bucket{route="a",le="0.1"} 90' in text
+        assert 'demo_seconds_bucket{route="b",le="+Inf"} 10' in text
+        assert 'demo_seconds_count{route="a"} 90' in text
+
+        assert histogram.count() == 100
+        assert histogram.quantile(0.5) <= 0.1
+        assert 0.5 < histogram.quantile(0.95) <= 1.0
+        assert histogram.quantile(0.95, ("a",)) <= 0.1
+        assert registry.histogram("empty_seconds", "Empty").quantile(0.95) is None
+
+    def test_rate_window(self):
+        """测试最近60秒请求数"""
+        window = RateWindow(60)
+        window.add(now=1000)
+        window.add(amount=2, now=1030)
+        assert window.total(now=1059) == 3
+        assert window.total(now=1060) == 2
+        assert window.total(now=1200) == 0
+
+
+class TestRequestMetrics:
+    """请求指标记录测试类"""
+
+    def test_finish_is_idempotent(self):
+        """测试重复 finish 只记录一次"""
+        metrics = GatewayMetrics(MetricsRegistry())
+        request_metrics = metrics.start_request("route_chat", "POST")
+        assert metrics.in_flight.value() == 1
+
+        request_metrics.first_byte()
+        request_metrics.finish(200)
+        request_metrics.finish(500)
+
+        assert metrics.in_flight.value() == 0
+        assert metrics.requests_total.value("route_chat", "POST", "200") == 1
+        assert metrics.requests_total.total() == 1
+        assert metrics.ttfb.count("route_chat") == 1
+        assert metrics.request_rate.total() == 1
+
+    @pytest.mark.asyncio
+    async def test_observe_stream(self):
+        """测试流式响应结束时记录指标，出错时记录上游错误"""
+        metrics = GatewayMetrics(MetricsRegistry())
+
+        async def body():
+            yield b"a"
+            yield b"b"
+
+        request_metrics = metrics.start_request("route_stream", "POST")
+        chunks = [chunk async for chunk in observe_stream(body(), request_metrics)]
+        assert chunks == [b"a", b"b"]
+        assert metrics.requests_total.value("route_stream", "POST", "200") == 1
+        assert metrics.ttfb.count("route_stream") == 1
+
+        async def broken():
+            yield b"a"
+            raise RuntimeError("upstream reset")
+
+        request_metrics = metrics.start_request("route_stream", "POST")
+        with pytest.raises(RuntimeError):
+            async for _ in observe_stream(broken(), request_metrics):
+                pass
+        assert metrics.requests_total.value("route_stream", "POST", "502") == 1
+        assert metrics.upstream_errors.value("route_stream", "RuntimeError") == 1
+        assert metrics.in_flight.value() == 0
+
+
+    @pytest.mark.asyncio
+    async def test_stream_response_finishes_on_early_disconnect(self):
+        """测试客户端在响应体开始迭代之前断开时仍记录请求完成，在途请求数归零"""
+        from starlette.responses import StreamingResponse
+
+        metrics = GatewayMetrics(MetricsRegistry())
+        started = []
+
+        async def body():
+            started.append(True)
+            yield b"a"
+
+        async def receive():
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            raise OSError("client disconnected")
+
+        request_metrics = metrics.start_request("route_stream", "POST")
+        response = observe_stream_response(StreamingResponse(body(), media_type="text/event-stream"),
+                                           request_metrics)
+        response.headers["x-extra"] = "1"
+        assert response.response.headers["x-extra"] == "1"
+        with pytest.raises(Exception):
+            await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+
+        assert started == []
+        assert metrics.in_flight.value() == 0
+        assert metrics.requests_total.value("route_stream", "POST", "200") == 1
+
+
+class TestMetricsEndpoint:
+    """/metrics 接口测试类"""
+
+    def test_metrics_endpoint(self):
+        """测试 /metrics 返回文本格式且包含审计队列深度"""
+        from app.main import app
+
+        client = TestClient(app)
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE fastgate_requests_total counter" in response.text
+        assert "fastgate_audit_queue_depth 0" in response.text
@@ -0,0 +1,183 @@
+"""
+限流服务测试
+测试 GCRA 突发与恢复、多维度原子扣减、空闲桶淘汰、限流响应头以及跨进程计数服务
+"""
+
+import os
+import sys
+import time
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.rate_limiter import RateLimiter
+from app.services.rate_limit_server import RateLimitServer
+
+
+def make_key(key_value="fg_test", rate_limit=None, source_path="team-a"):
+    """构造 API Key 信息"""
+    return SimpleNamespace(key_value=key_value, rate_limit=rate_limit, source_path=source_path)
+
+
+class TestRateLimiter:
+    """GCRA 限流器测试类"""
+
+    @pytest.mark.asyncio
+    async def test_burst_then_reject_and_recover(self):
+        """测试突发容量用尽后拒绝，并按速率恢复"""
+        limiter = RateLimiter({"enabled": True, "default_requests_per_minute": 60})
+        key = make_key()
+
+        results = [await limiter.check(key, now=100.0) for _ in range(60)]
+        assert all(result.allowed for result in results)
+        assert results[0].remaining == 59
+        assert results[-1].remaining == 0
+
+        rejected = await limiter.check(key, now=100.0)
+        assert not rejected.allowed
+        assert rejected.scope == "api_key"
+        assert rejected.retry_after == pytest.approx(1.0)
+        assert rejected.headers()["Retry-After"] == "1"
+
+        # 每秒恢复一个
+        assert (await limiter.check(key, now=101.0)).allowed
+        assert not (await limiter.check(key, now=101.0)).allowed
+
+    @pytest.mark.asyncio
+    async def test_key_rate_limit_overrides_default(self):
+        """测试 API Key 的 rate_limit 字段覆盖默认值"""
+        limiter = RateLimiter({"enabled": True, "default_requests_per_minute": 100, "burst": 2})
+        key = make_key(rate_limit=6)
+
+        assert (await limiter.check(key, now=0.0)).limit == 6
+        assert (await limiter.check(key, now=0.0)).allowed
+        rejected = await limiter.check(key, now=0.0)
+        assert not rejected.allowed
+        assert rejected.retry_after == pytest.approx(10.0)
+
+    @pytest.mark.asyncio
+    async def test_multi_dimension_is_atomic(self):
+        """测试任一维度拒绝时其他维度不扣减"""
+        limiter = RateLimiter({
+            "enabled": True, "default_requests_per_minute": 600, "burst": 1,
+            "routes": {"route_chat": 60}, "source_paths": {"team-a": 600}
+        })
+        route = {"route_id": "route_chat"}
+        key_a = make_key("fg_a")
+        key_b = make_key("fg_b", source_path="team-b")
+
+        assert (await limiter.check(key_a, route, now=0.0)).allowed
+        rejected = await limiter.check(key_b, route, now=0.0)
+        assert not rejected.allowed
+        assert rejected.scope == "route"
+
+        # fg_b 的 Key 桶未被扣减：换一个不限流的路由可立即通过
+        assert (await limiter.check(key_b, {"route_id": "route_other"}, now=0.0)).allowed
+
+    @pytest.mark.asyncio
+    async def test_global_limit_and_disabled(self):
+        """测试全局限流与关闭限流"""
+        limiter = RateLimiter({"enabled": True, "default_requests_per_minute": 0,
+                               "global_requests_per_minute": 60, "burst": 1})
+        assert (await limiter.check(make_key("fg_a"), now=0.0)).allowed
+        assert (await limiter.check(make_key("fg_b"), now=0.0)).scope == "global"
+
+        disabled = RateLimiter({"enabled": False})
+        assert await disabled.check(make_key(), now=0.0) is None
+
+    @pytest.mark.asyncio
+    async def test_idle_buckets_are_evicted(self):
+        """测试已恢复的空闲桶被淘汰，桶总数受上限约束"""
+        limiter = RateLimiter({"enabled": True, "default_requests_per_minute": 60, "max_buckets": 50})
+        for index in range(200):
+            await limiter.check(make_key(f"fg_{index}"), now=0.0)
+        assert len(limiter) <= 51
+
+        # 所有桶在 1 秒后都已恢复，下一次检查时被淘汰
+        await limiter.check(make_key("fg_new"), now=5.0)
+        assert len(limiter) == 1
+
+    @pytest.mark.asyncio
+    async def test_allowed_headers(self):
+        """测试放行时的限流响应头"""
+        limiter = RateLimiter({"enabled": True, "default_requests_per_minute": 60})
+        headers = (await limiter.check(make_key(), now=0.0)).headers()
+        assert headers["X-RateLimit-Limit"] == "60"
+        assert headers["X-RateLimit-Remaining"] == "59"
+        assert headers["X-RateLimit-Reset"] == "1"
+        assert "Retry-After" not in headers
+
+
+class TestSocketRateLimitBackend:
+    """Unix socket 计数服务后端测试类"""
+
+    @pytest_asyncio.fixture
+    async def server(self, tmp_path):
+        """在临时目录启动计数服务"""
+        server = RateLimitServer(str(tmp_path / "ratelimit.sock"))
+        await server.start()
+        yield server
+        await server.stop()
+
+    def make_limiter(self, socket_path, **overrides):
+        """构造使用 socket 后端的限流器（模拟一个 worker）"""
+        config = {"enabled": True, "default_requests_per_minute": 60, "burst": 5,
+                  "backend": "socket", "socket": {"path": socket_path, "timeout_ms": 500}}
+        config.update(overrides)
+        return RateLimiter(config)
+
+    @pytest.mark.asyncio
+    async def test_limit_shared_across_workers(self, server):
+        """测试多个 worker 共享同一组桶"""
+        workers = [self.make_limiter(server.socket_path) for _ in range(3)]
+        key = make_key()
+
+        allowed = 0
+        for _ in range(4):
+            for worker in workers:
+                if (await worker.check(key)).allowed:
+                    allowed += 1
+        assert allowed == 5
+
+        rejected = await workers[0].check(key)
+        assert not rejected.allowed
+        assert rejected.scope == "api_key"
+        assert rejected.retry_after > 0
+
+        for worker in workers:
+            assert worker.remote.fallback_checks == 0
+            await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_tokens_are_leased_in_batches(self, server):
+        """测试按批租用令牌，大部分检查不访问计数服务"""
+        worker = self.make_limiter(server.socket_path, default_requests_per_minute=6000, burst=100)
+        key = make_key()
+
+        for _ in range(20):
+            assert (await worker.check(key)).allowed
+        assert worker.remote.remote_requests == 2
+
+        # 计数服务中已扣减整批令牌
+        taken = server.store.take("key:fg_test", 6000, 100, 0, time.monotonic())
+        assert taken["remaining"] <= 80
+        await worker.close()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_local_when_server_unavailable(self, tmp_path):
+        """测试计数服务不可用时降级为进程内桶"""
+        worker = self.make_limiter(str(tmp_path / "missing.sock"), burst=1)
+        key = make_key()
+
+        assert (await worker.check(key, now=0.0)).allowed
+        assert not (await worker.check(key, now=0.0)).allowed
+        assert worker.remote.fallback_checks == 2
+        await worker.close()
+
+    def test_invalid_backend(self):
+        """测试未知后端"""
+        with pytest.raises(ValueError):
+            RateLimiter({"enabled": True, "backend": "redis"})
@@ -0,0 +1,134 @@
+"""
+响应缓存测试
+测试缓存键字段、Cache-Control 处理、按字节淘汰的 LRU、过期条目重新校验以及路由失效
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.response_cache import (
+    HIT, MISS, STALE, ResponseCache, parse_cache_control, split_key_fields
+)
+
+
+def make_cache(**overrides):
+    """构造响应缓存"""
+    config = {"enabled": True, "max_bytes": 4096, "default_ttl_seconds": 60,
+              "max_entry_bytes": 1024, "methods": ["GET", "POST"]}
+    config.update(overrides)
+    return ResponseCache(config)
+
+
+def make_route(**overrides):
+    """构造开启缓存的路由"""
+    route = {"route_id": "route_cache", "cache_enabled": True, "cache_ttl": None,
+             "cache_max_entry_bytes": None, "cache_key_fields": None}
+    route.update(overrides)
+    return route
+
+
+class TestCacheKey:
+    """缓存键测试类"""
+
+    def test_parse_helpers(self):
+        """测试 Cache-Control 解析与缓存键字段拆分"""
+        assert parse_cache_control('Max-Age=30, no-cache, private="x"') == \
+            {"max-age": "30", "no-cache": None, "private": "x"}
+        assert split_key_fields(["model", "header:X-Tenant", "", None]) == (("model",), ("x-tenant",))
+
+    def test_whole_body_key(self):
+        """测试未配置字段时按规范化请求体计算键，未开启缓存或不缓存的方法返回 None"""
+        cache = make_cache()
+        route = make_route()
+        first = cache.make_key(route, "post", "/v1/embeddings", {}, {"input": "a", "model": "m"})
+        assert first == cache.make_key(route, "POST", "/v1/embeddings", {}, {"model": "m", "input": "a"})
+        assert first != cache.make_key(route, "POST", "/v1/embeddings", {}, {"model": "m", "input": "b"})
+        assert cache.make_key(make_route(cache_enabled=False), "POST", "/v1", {}, None) is None
+        assert cache.make_key(route, "DELETE", "/v1", {}, None) is None
+        assert cache.make_key(route, "GET", "/v1", {"cache-control": "no-store"}, None) is None
+
+    def test_key_fields(self):
+        """测试配置字段时只有选中的请求体字段和请求头参与缓存键"""
+        cache = make_cache()
+        route = make_route(cache_key_fields=["model", "header:x-tenant"])
+        base = cache.make_key(route, "POST", "/v1", {"x-tenant": "t1", "x-trace": "1"}, body_fields={"model": "m"})
+        assert base == cache.make_key(route, "POST", "/v1", {"x-tenant": "t1", "x-trace": "2"},
+                                      body_fields={"model": "m"})
+        assert base != cache.make_key(route, "POST", "/v1", {"x-tenant": "t2"}, body_fields={"model": "m"})
+
+
+class TestResponseCache:
+    """缓存存取测试类"""
+
+    def test_hit_and_ttl(self):
+        """测试命中、路由有效期和上游 max-age 优先"""
+        cache = make_cache()
+        route = make_route(cache_ttl=10)
+        cache.store("k", route, 200, {"content-type": "application/json", "content-length": "2"}, b"{}", now=100)
+        entry, status = cache.lookup("k", now=105)
+        assert status == HIT and entry.body == b"{}"
+        assert "content-length" not in entry.headers
+        assert cache.lookup("k", now=111) == (None, MISS)
+
+        cache.store("k", route, 200, {"cache-control": "max-age=100"}, b"{}", now=100)
+        assert cache.lookup("k", now=150)[1] == HIT
+
+    def test_not_cacheable(self):
+        """测试非 200、no-store、private、超过单条上限的响应不缓存"""
+        cache = make_cache()
+        route = make_route()
+        assert cache.store("k", route, 500, {}, b"error") is None
+        assert cache.store("k", route, 200, {"cache-control": "no-store"}, b"{}") is None
+        assert cache.store("k", route, 200, {"cache-control": "private, max-age=60"}, b"{}") is None
+        assert cache.store("k", route, 200, {}, b"x" * 2048) is None
+        assert cache.store("k", make_route(cache_max_entry_bytes=4096), 200, {}, b"x" * 2048) is not None
+
+    def test_lru_evicts_by_bytes(self):
+        """测试总字节数超过上限时淘汰最久未使用的条目"""
+        cache = make_cache(max_bytes=2500)
+        route = make_route()
+        for key in ("a", "b"):
+            cache.store(key, route, 200, {}, b"x" * 1000, now=0)
+        cache.lookup("a", now=1)
+        cache.store("c", route, 200, {}, b"x" * 1000, now=1)
+
+        assert cache.lookup("b", now=2)[1] == MISS
+        assert cache.lookup("a", now=2)[1] == HIT
+        assert cache.stats()["evictions"] == 1
+        assert cache.bytes == 2000
+
+    def test_stale_revalidation(self):
+        """测试过期条目带条件请求头重新校验，304 后刷新有效期"""
+        cache = make_cache()
+        route = make_route(cache_ttl=10)
+        cache.store("k", route, 200, {"etag": '"v1"', "last-modified": "Mon, 01 Jan 2024 00:00:00 GMT"},
+                    b"{}", now=0)
+
+        entry, status = cache.lookup("k", now=20)
+        assert status == STALE
+        assert cache.conditional_headers(entry) == {
+            "if-none-match": '"v1"', "if-modified-since": "Mon, 01 Jan 2024 00:00:00 GMT"}
+
+        cache.refresh("k", entry, route, {"cache-control": "max-age=30"}, now=20)
+        assert cache.lookup("k", now=40)[1] == HIT
+        assert cache.lookup("k", {"cache-control": "no-cache"}, now=40)[1] == STALE
+        assert cache.not_modified(entry, {"if-none-match": 'W/"v0", "v1"'})
+
+    def test_no_cache_requires_validators(self):
+        """测试 no-cache 响应只有带校验器时才缓存，且每次都需要重新校验"""
+        cache = make_cache()
+        route = make_route()
+        assert cache.store("k", route, 200, {"cache-control": "no-cache"}, b"{}") is None
+        cache.store("k", route, 200, {"cache-control": "no-cache", "etag": '"v1"'}, b"{}", now=0)
+        assert cache.lookup("k", now=0)[1] == STALE
+
+    def test_invalidate_route(self):
+        """测试路由修改后清除该路由的缓存"""
+        cache = make_cache()
+        cache.store("a", make_route(route_id="r1"), 200, {}, b"{}")
+        cache.store("b", make_route(route_id="r2"), 200, {}, b"{}")
+        assert cache.invalidate_route("r1") == 1
+        assert cache.stats()["entries"] == 1
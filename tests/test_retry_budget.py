@@ -0,0 +1,161 @@
+"""
+重试预算与截止时间测试
+测试截止时间计算、抖动退避范围、预算上限以及 forward_request 的截止时间传递
+"""
+
+import asyncio
+import os
+import sys
+import httpx
+import pytest
+from fastapi import HTTPException
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.retry_budget import RetryBudget
+
+
+def make_budget(**overrides):
+    """构造重试预算（10 秒窗口，重试不超过请求数的 20%，每秒保底 0.2 次）"""
+    config = {"deadline_seconds": 0, "base_backoff_seconds": 0.5, "max_backoff_seconds": 4,
+              "budget_ratio": 0.2, "min_retries_per_second": 0.2, "budget_window_seconds": 10,
+              "deadline_header": "x-request-deadline-ms", "accept_client_deadline": True}
+    config.update(overrides)
+    return RetryBudget(config)
+
+
+@pytest.fixture
+def budget(monkeypatch):
+    """替换代理引擎使用的全局重试预算和熔断器，去掉退避等待"""
+    from app.services import proxy_engine as proxy_engine_module
+
+    instance = make_budget(min_retries_per_second=5)
+    monkeypatch.setattr(proxy_engine_module, "retry_budget", instance)
+    monkeypatch.setattr(proxy_engine_module, "circuit_breaker", CircuitBreaker({"enabled": False}))
+    real_sleep = asyncio.sleep
+
+    async def no_backoff(_):
+        await real_sleep(0)
+
+    monkeypatch.setattr(asyncio, "sleep", no_backoff)
+    return instance
+
+
+class TestRetryBudget:
+    """重试预算测试类"""
+
+    def test_deadline(self):
+        """测试截止时间默认取路由超时，客户端请求头只能缩短"""
+        budget = make_budget()
+        assert budget.deadline(30, now=100) == 130
+        assert budget.deadline(30, {"x-request-deadline-ms": "1500"}, now=100) == 101.5
+        assert budget.deadline(30, {"x-request-deadline-ms": "90000"}, now=100) == 130
+        assert budget.deadline(30, {"x-request-deadline-ms": "soon"}, now=100) == 130
+        assert make_budget(deadline_seconds=5).deadline(30, now=0) == 5
+        assert make_budget(accept_client_deadline=False).deadline(
+            30, {"x-request-deadline-ms": "10"}, now=0) == 30
+
+    def test_backoff_is_jittered_and_capped(self):
+        """测试退避在 [0, min(max, base × 2^attempt)] 之间"""
+        budget = make_budget()
+        for attempt, cap in ((0, 0.5), (2, 2), (10, 4)):
+            samples = [budget.backoff(attempt) for _ in range(200)]
+            assert all(0 <= sample <= cap for sample in samples)
+            assert len(set(samples)) > 1
+
+    def test_budget_ratio(self):
+        """测试窗口内重试次数受请求数比例限制，窗口滚动后恢复"""
+        budget = make_budget()
+        for _ in range(20):
+            budget.record_request(now=1000)
+        granted = sum(budget.try_acquire(now=1000) for _ in range(10))
+        assert granted == 4
+        assert budget.rejected == 6
+
+        for _ in range(20):
+            budget.record_request(now=1020)
+        assert budget.try_acquire(now=1020)
+
+    def test_min_retries_floor(self):
+        """测试请求量很小时仍保留每秒最低重试数"""
+        budget = make_budget()
+        budget.record_request(now=1000)
+        assert budget.try_acquire(now=1000)
+        assert budget.try_acquire(now=1000)
+        assert not budget.try_acquire(now=1000)
+
+
+class TestForwardRequestDeadline:
+    """forward_request 截止时间与预算测试类"""
+
+    @pytest.mark.asyncio
+    async def test_deadline_header_propagated(self, budget):
+        """测试剩余时间通过请求头传给上游，且不超过客户端传入的截止时间"""
+        from app.services.proxy_engine import ProxyEngine
+
+        seen = []
+
+        def handler(request):
+            seen.append(int(request.headers["x-request-deadline-ms"]))
+            return httpx.Response(200)
+
+        engine = ProxyEngine()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        route = {"route_id": "r", "target_host": "up:1", "timeout": 30, "retry_count": 0}
+
+        await engine.forward_request(route, "GET", "http://up:1/v1", headers={})
+        await engine.forward_request(route, "GET", "http://up:1/v1",
+                                     headers={"x-request-deadline-ms": "2000"})
+        assert 29000 < seen[0] <= 30000
+        assert 1900 < seen[1] <= 2000
+        await engine.close()
+
+    @pytest.mark.asyncio
+    async def test_expired_client_deadline_returns_504(self, budget):
+        """测试客户端截止时间已到时不请求上游，返回 504"""
+        from app.services.proxy_engine import ProxyEngine
+
+        calls = []
+        engine = ProxyEngine()
+        engine.client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: calls.append(request) or httpx.Response(200))
+        )
+        route = {"route_id": "r", "target_host": "up:1", "timeout": 30, "retry_count": 3}
+
+        with pytest.raises(HTTPException) as exc_info:
+            await engine.forward_request(route, "GET", "http://up:1/v1",
+                                         headers={"x-request-deadline-ms": "0"})
+        assert exc_info.value.status_code == 504
+        assert not calls
+        await engine.close()
+
+    @pytest.mark.asyncio
+    async def test_budget_stops_retries(self, budget):
+        """测试重试预算耗尽后不再重试"""
+        from app.services.proxy_engine import ProxyEngine
+
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise httpx.ConnectError("connection refused", request=request)
+
+        engine = ProxyEngine()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        route = {"route_id": "r", "target_host": "down:1", "timeout": 30, "retry_count": 5}
+
+        # 保底 5 次/秒 × 10 秒 = 50 次重试：10 个请求各重试 5 次即耗尽
+        for _ in range(10):
+            with pytest.raises(HTTPException):
+                await engine.forward_request(route, "GET", "http://down:1/v1", headers={})
+        assert len(calls) == 60
+
+        calls.clear()
+        with pytest.raises(HTTPException) as exc_info:
+            await engine.forward_request(route, "GET", "http://down:1/v1", headers={})
+        assert exc_info.value.status_code == 502
+        assert len(calls) == 1
+        assert budget.rejected == 1
+        await engine.close()
@@ -0,0 +1,220 @@
+"""
+路由表快照与路由索引测试
+"""
+
+import os
+import sys
+import pytest
+from types import SimpleNamespace
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.database import create_tables, SessionLocal
+from app.models.proxy_route import ProxyRouteDB
+from app.services.route_matcher import RouteMatcher
+from app.services.route_table import RouteTable
+
+
+def make_db_route(**overrides):
+    """构造数据库路由对象（不落库）"""
+    data = {
+        "route_id": "route_chat",
+        "route_name": "Chat",
+        "description": None,
+        "match_path": "/v1/chat/*",
+        "match_method": "POST",
+        "match_headers": '{"x-tenant": "a"}',
+        "match_body_schema": '{"model": "qwen"}',
+        "target_host": "upstream:8000",
+        "target_path": "/v1/chat/completions",
+        "target_protocol": "http",
+        "target_hosts": None,
+        "lb_strategy": "round_robin",
+        "lb_hash_key": None,
+        "strip_path_prefix": False,
+        "add_headers": '{"Authorization": "Bearer upstream"}',
+        "add_body_fields": None,
+        "remove_headers": '["cookie"]',
+        "stream_mode": "audit",
+        "hedge_enabled": False,
+        "hedge_delay_ms": None,
+        "coalesce_enabled": False,
+        "batch_mode": "none",
+        "cache_enabled": False,
+        "cache_ttl": None,
+        "cache_max_entry_bytes": None,
+        "cache_key_fields": None,
+        "timeout": 30,
+        "retry_count": 0,
+        "is_active": True,
+        "priority": 100
+    }
+    data.update(overrides)
+    return SimpleNamespace(**data)
+
+
+class TestRouteTable:
+    """路由表快照测试"""
+
+    def test_compile_route_preparses_rules(self):
+        """测试编译时预解析JSON规则并预编译路径正则"""
+        table = RouteTable(refresh_interval=0)
+        route = table.compile_route(make_db_route())
+
+        assert route["match_headers"] == {"x-tenant": "a"}
+        assert route["match_body_schema"] == {"model": "qwen"}
+        assert route["add_headers"] == {"Authorization": "Bearer upstream"}
+        assert route["remove_headers"] == ["cookie"]
+        assert route["_path_regex"].match("/v1/chat/completions")
+        assert route["_upstreams"] == (("upstream:8000", 1),)
+
+    def test_compile_route_parses_upstream_pool(self):
+        """测试编译时解析带权重的上游目标池"""
+        table = RouteTable(refresh_interval=0)
+        route = table.compile_route(make_db_route(
+            target_hosts='[{"host": "u1:8000", "weight": 3}, "u2:8000"]', lb_strategy="p2c"
+        ))
+        assert route["_upstreams"] == (("u1:8000", 3), ("u2:8000", 1))
+        assert route["lb_strategy"] == "p2c"
+
+    def test_invalid_rule_keeps_original_semantics(self):
+        """测试非法JSON规则保留原字符串，匹配时仍按原逻辑拒绝"""
+        table = RouteTable(refresh_interval=0)
+        route = table.compile_route(make_db_route(match_headers="{broken"))
+
+        assert route["match_headers"] == "{broken"
+        request = {
+            "path": "/v1/chat/completions",
+            "method": "POST",
+            "headers": {"x-tenant": "a"},
+            "body": {"model": "qwen"}
+        }
+        assert RouteMatcher().find_matching_route(request, [route], presorted=True) is None
+
+    def test_compiled_route_matches_like_raw_route(self):
+        """测试预编译路由与原始路由的匹配结果一致"""
+        table = RouteTable(refresh_interval=0)
+        raw = vars(make_db_route())
+        compiled = table.compile_route(make_db_route())
+        matcher = RouteMatcher()
+
+        for path, headers, body in [
+            ("/v1/chat/completions", {"x-tenant": "a"}, {"model": "qwen"}),
+            ("/v1/chat/completions", {"x-tenant": "b"}, {"model": "qwen"}),
+            ("/v1/embeddings", {"x-tenant": "a"}, {"model": "qwen"}),
+            ("/v1/chat/completions", {"x-tenant": "a"}, {"model": "other"}),
+        ]:
+            request = {"path": path, "method": "POST", "headers": headers, "body": body}
+            expected = matcher.find_matching_route(request, [raw])
+            actual = matcher.find_matching_route(request, [compiled], presorted=True)
+            assert (expected is None) == (actual is None)
+
+    @pytest.mark.asyncio
+    async def test_snapshot_reload_on_version_bump(self):
+        """测试版本递增后快照重新加载"""
+        create_tables()
+        db = SessionLocal()
+        try:
+            db.query(ProxyRouteDB).filter(ProxyRouteDB.route_id.like("rt-test-%")).delete(synchronize_session=False)
+            db.add(ProxyRouteDB(
+                route_id="rt-test-low", route_name="low", match_path="/rt/*",
+                target_host="h:1", target_path="/", priority=200, is_active=True
+            ))
+            db.add(ProxyRouteDB(
+                route_id="rt-test-high", route_name="high", match_path="/rt/x",
+                target_host="h:1", target_path="/", priority=10, is_active=True
+            ))
+            db.commit()
+
+            table = RouteTable(refresh_interval=0)
+            snapshot = await table.get_snapshot()
+            ids = [r["route_id"] for r in snapshot.routes if r["route_id"].startswith("rt-test-")]
+            assert ids == ["rt-test-high", "rt-test-low"]
+
+            # 版本未变化时复用同一快照
+            assert await table.get_snapshot() is snapshot
+
+            db.query(ProxyRouteDB).filter(ProxyRouteDB.route_id == "rt-test-high").delete()
+            db.commit()
+            table.invalidate()
+
+            new_snapshot = await table.get_snapshot()
+            assert new_snapshot is not snapshot
+            assert new_snapshot.version == table.version
+            ids = [r["route_id"] for r in new_snapshot.routes if r["route_id"].startswith("rt-test-")]
+            assert ids == ["rt-test-low"]
+        finally:
+            db.query(ProxyRouteDB).filter(ProxyRouteDB.route_id.like("rt-test-%")).delete(synchronize_session=False)
+            db.commit()
+            db.close()
+
+
+class TestRouteIndex:
+    """路由前缀树索引测试"""
+
+    PATTERNS = [
+        "/v1/chat/completions", "/v1/*", "/v1/**", "/v1/models", "/v1/{model}/embeddings",
+        "/v1/{model}", "/{tenant}/v1/*", "/v1/chat*", "/v1/{path:path}", "/api/v1/",
+        "/api/*/status", "/a/{x}/b/{y}", "*", "/v2/{a/b}/c", "/v1/models/{id}.json",
+        "v1/*", "/v1/{}", "",
+    ]
+    METHODS = ["ANY", "GET", "POST", "GET,POST", "post", "ANY,GET"]
+    PATHS = [
+        "/v1/chat/completions", "/v1/models", "/v1/", "/v1", "/v1/qwen/embeddings",
+        "/v1/qwen", "/t1/v1/chat", "/v1/chatty", "/api/v1/", "/api/x/status",
+        "/api/x/y/status", "/a/1/b/2", "/a//b/2", "/v2/x/c", "/v1/models/42.json",
+        "/v1/{}", "/", "", "/other",
+    ]
+
+    def _routes(self):
+        """生成覆盖各种模式组合的路由（已按优先级排序）"""
+        routes = []
+        for i, pattern in enumerate(self.PATTERNS):
+            for j, method in enumerate(self.METHODS):
+                routes.append({
+                    "route_id": f"r{i}-{j}",
+                    "match_path": pattern,
+                    "match_method": method,
+                    "priority": (i * 7 + j * 3) % 11,
+                    "is_active": True
+                })
+        routes.sort(key=lambda r: r["priority"])
+        return routes
+
+    def test_index_matches_linear_scan(self):
+        """测试索引查找结果与线性扫描完全一致"""
+        from app.services.route_index import RouteIndex
+
+        routes = self._routes()
+        index = RouteIndex(routes)
+        matcher = RouteMatcher()
+
+        for path in self.PATHS:
+            for method in ["GET", "POST", "DELETE"]:
+                request = {"path": path, "method": method, "headers": {}, "body": {}}
+                expected = [r["route_id"] for r in routes if matcher._is_route_match(request, r)]
+                candidates = index.candidates(path, method)
+                actual = [r["route_id"] for r in candidates if matcher._is_route_match(request, r)]
+                assert actual == expected, (path, method)
+
+                linear = matcher.find_matching_route(request, routes, presorted=True)
+                indexed = matcher.find_matching_route(request, candidates, presorted=True)
+                assert (linear and linear["route_id"]) == (indexed and indexed["route_id"])
+
+    def test_index_prunes_candidates(self):
+        """测试索引只返回少量候选路由"""
+        from app.services.route_index import RouteIndex
+
+        routes = [
+            {"route_id": f"tenant-{i}", "match_path": f"/tenant{i}/v1/chat/completions",
+             "match_method": "POST", "priority": 100}
+            for i in range(500)
+        ]
+        routes.append({"route_id": "fallback", "match_path": "/tenant7/*", "match_method": "ANY", "priority": 900})
+        index = RouteIndex(routes)
+
+        candidates = index.candidates("/tenant7/v1/chat/completions", "POST")
+        assert [r["route_id"] for r in candidates] == ["tenant-7", "fallback"]
+        assert index.candidates("/tenant7/v1/chat/completions", "GET")[0]["route_id"] == "fallback"
+        assert index.candidates("/unknown", "POST") == []
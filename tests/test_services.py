@@ -143,9 +143,165 @@ class TestProxyEngine:
         # 验证流式响应包装器
         assert hasattr(stream_response, 'status_code')
         assert stream_response.status_code == 200
-        
+
+        await engine.close()
+
+    @pytest.mark.asyncio
+    async def test_shared_proxy_engine_lifecycle(self):
+        """测试进程级共享代理引擎的创建与关闭"""
+        from app.services import proxy_engine as proxy_engine_module
+
+        engine = proxy_engine_module.init_proxy_engine()
+        assert proxy_engine_module.get_proxy_engine() is engine
+        assert proxy_engine_module.init_proxy_engine() is engine
+
+        await proxy_engine_module.close_proxy_engine()
+        assert engine.client.is_closed
+
+        # 关闭后再次获取会重新创建
+        new_engine = proxy_engine_module.get_proxy_engine()
+        assert new_engine is not engine
+        await proxy_engine_module.close_proxy_engine()
+
+    @pytest.mark.asyncio
+    async def test_per_host_connection_cap(self):
+        """测试单主机并发连接上限"""
+        from app.services.proxy_engine import ProxyEngine
+
+        engine = ProxyEngine(pool_config={"max_connections_per_host": 1})
+        url = "http://upstream.local:8000/v1/models"
+
+        async with engine._host_slot(url):
+            waiter = asyncio.ensure_future(engine._host_slot(url).__aenter__())
+            await asyncio.sleep(0.01)
+            # 同一主机的第二个请求需要等待槽位释放
+            assert not waiter.done()
+
+            # 其他主机不受影响
+            async with engine._host_slot("http://other.local/v1/models"):
+                pass
+
+        await asyncio.wait_for(waiter, timeout=1)
+        await engine.close()
+
+    @pytest.mark.asyncio
+    async def test_passthrough_stream_preserves_upstream_chunks(self):
+        """测试透传模式按上游原始分块转发且只记录状态/大小/耗时"""
+        from app.services.proxy_engine import ProxyEngine
+
+        upstream_chunks = [b"data: {\"a\"", b": 1}\n\n", b"data: [DONE]\n\n"]
+        seen_headers = {}
+
+        async def body():
+            for chunk in upstream_chunks:
+                yield chunk
+
+        async def handler(request):
+            seen_headers.update(request.headers)
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=body())
+
+        engine = ProxyEngine()
+        await engine.client.aclose()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        audit_service = AsyncMock()
+
+        response = await engine.forward_stream_request(
+            route_config={"timeout": 5, "stream_mode": "passthrough"}, method="POST",
+            url="http://upstream.local/v1/chat/completions", headers={"accept-encoding": "gzip"},
+            json={"stream": True}, audit_service=audit_service, request_id="req_raw"
+        )
+        received = [chunk async for chunk in response.body_iterator]
         await engine.close()
 
+        assert received == upstream_chunks
+        assert seen_headers["accept-encoding"] == "identity"
+        _, response_info = audit_service.log_request_complete.await_args.args
+        assert response_info["response_body"] is None
+        assert response_info["stream_chunks"] == 3
+        assert response_info["response_size"] == sum(len(chunk) for chunk in upstream_chunks)
+
+    @pytest.mark.asyncio
+    async def test_streamed_body_forwards_without_buffering(self):
+        """测试流式请求体按分块转发、保留原始长度且只记录审计前缀"""
+        from app.services.proxy_engine import ProxyEngine, StreamedBody
+
+        client_chunks = [b"a" * 3000, b"b" * 3000, b"c" * 3000]
+        received = {}
+
+        async def client_stream():
+            for chunk in client_chunks:
+                yield chunk
+
+        async def handler(request):
+            received["headers"] = dict(request.headers)
+            received["body"] = b"".join([chunk async for chunk in request.stream])
+            return httpx.Response(200, headers={"content-type": "application/json"}, content=b'{"ok": true}')
+
+        engine = ProxyEngine()
+        await engine.client.aclose()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        body = StreamedBody(client_stream(), prefix_limit=4096)
+        response = await engine.forward_streamed_body(
+            route_config={"timeout": 5}, method="POST", url="http://upstream.local/v1/files",
+            body=body, headers={"content-type": "application/octet-stream", "content-length": "9000"}
+        )
+        assert await response.aread() == b'{"ok": true}'
+        await response.aclose()
+        await engine.close()
+
+        assert received["body"] == b"".join(client_chunks)
+        assert received["headers"]["content-length"] == "9000"
+        assert body.size == 9000
+        assert len(body.prefix) == 4096
+        assert body.audit_body().endswith("...[truncated, 9000 bytes]")
+
+    @pytest.mark.asyncio
+    async def test_response_headers_callback_before_body(self):
+        """测试收到响应头时（响应体读完之前）调用首字节回调"""
+        from app.services.proxy_engine import ProxyEngine
+
+        events = []
+
+        async def body():
+            events.append("body_start")
+            await asyncio.sleep(0.05)
+            yield b'{"ok": true}'
+            events.append("body_end")
+
+        async def handler(request):
+            return httpx.Response(200, headers={"content-type": "application/json"}, content=body())
+
+        engine = ProxyEngine()
+        await engine.client.aclose()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler),
+                                          event_hooks={"response": [engine._on_response_headers]})
+
+        response = await engine.forward_request(
+            route_config={"timeout": 5, "retry_count": 0}, method="POST", url="http://upstream.local/v1/test",
+            json={"a": 1}, on_response_headers=lambda: events.append("headers")
+        )
+        await engine.close()
+
+        assert response.content == b'{"ok": true}'
+        assert events == ["headers", "body_start", "body_end"]
+
+    def test_should_stream_body(self):
+        """测试流式请求体的启用条件"""
+        from app.api.proxy import _should_stream_body
+
+        plain = [{"route_id": "route_files"}]
+        needs_body = [{"route_id": "route_chat", "add_body_fields": {"model": "x"}}]
+        octet = {"content-type": "application/octet-stream"}
+        small_json = {"content-type": "application/json", "content-length": "100"}
+        large_json = {"content-type": "application/json", "content-length": str(8 * 1024 * 1024)}
+
+        assert _should_stream_body(octet, plain)
+        assert not _should_stream_body(octet, needs_body)
+        assert not _should_stream_body(small_json, plain)
+        assert _should_stream_body(large_json, plain)
+        assert not _should_stream_body({}, plain)
+
 
 class TestRouteMatcher:
     """路由匹配引擎测试类"""
@@ -268,6 +424,365 @@ class TestRouteMatcher:
         assert result is False
 
 
+class TestAPIKeyCache:
+    """API Key 验证缓存测试类"""
+
+    @pytest.fixture
+    def db_session(self):
+        """内存数据库会话"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.database import Base
+
+        engine = create_engine("sqlite:///:memory:")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        yield session
+        session.close()
+
+    @staticmethod
+    def _key_info(**overrides):
+        from app.models.api_key import APIKeyResponse
+        data = {
+            "key_id": "key_1", "key_value": "fg_cached", "source_path": "test",
+            "permissions": [], "created_at": datetime.utcnow(), "expires_at": None,
+            "is_active": True, "usage_count": 0, "rate_limit": None, "last_used_at": None
+        }
+        data.update(overrides)
+        return APIKeyResponse(**data)
+
+    def test_hit_miss_and_negative(self):
+        """测试命中、未命中与负缓存"""
+        from app.services.key_cache import APIKeyCache
+
+        cache = APIKeyCache(max_size=10, ttl=60, negative_ttl=60, enabled=True)
+        assert cache.get("fg_cached") == (False, None)
+
+        info = self._key_info()
+        cache.set("fg_cached", info)
+        assert cache.get("fg_cached") == (True, info)
+
+        cache.set("fg_invalid", None)
+        assert cache.get("fg_invalid") == (True, None)
+
+    def test_ttl_expiry_and_lru_eviction(self):
+        """测试TTL过期与LRU淘汰"""
+        from app.services.key_cache import APIKeyCache
+
+        cache = APIKeyCache(max_size=2, ttl=60, negative_ttl=0, enabled=True)
+        cache.set("fg_invalid", None)
+        assert cache.get("fg_invalid") == (False, None)
+
+        cache.set("a", self._key_info(key_value="a"))
+        cache.set("b", self._key_info(key_value="b"))
+        cache.get("a")
+        cache.set("c", self._key_info(key_value="c"))
+        assert cache.get("b") == (False, None)
+        assert cache.get("a")[0] and cache.get("c")[0]
+
+    def test_cached_key_expires_at(self):
+        """测试缓存中的Key到期后视为无效"""
+        from app.services.key_cache import APIKeyCache
+
+        cache = APIKeyCache(max_size=10, ttl=60, negative_ttl=60, enabled=True)
+        cache.set("fg_cached", self._key_info(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+        assert cache.get("fg_cached") == (True, None)
+
+    def test_stale_fill_after_invalidation_is_dropped(self):
+        """测试失效期间发起的查询结果不会写回缓存"""
+        from app.services.key_cache import APIKeyCache
+
+        cache = APIKeyCache(max_size=10, ttl=60, negative_ttl=60, enabled=True)
+        generation = cache.generation
+        cache.invalidate("fg_cached")
+        cache.set("fg_cached", self._key_info(), generation)
+        assert cache.get("fg_cached") == (False, None)
+
+    def test_key_manager_invalidates_on_update_and_delete(self, db_session):
+        """测试更新、删除Key时立即失效缓存"""
+        from app.models.api_key import APIKeyCreate, APIKeyUpdate
+        from app.services.key_manager import KeyManager
+        from app.services.key_cache import api_key_cache
+
+        manager = KeyManager(db_session)
+        created = manager.create_key(APIKeyCreate(source_path="cache-test"))
+        api_key_cache.set(created.key_value, manager.validate_key(created.key_value))
+        assert api_key_cache.get(created.key_value)[1] is not None
+
+        manager.update_key(created.key_id, APIKeyUpdate(is_active=False))
+        assert api_key_cache.get(created.key_value) == (False, None)
+        assert manager.validate_key(created.key_value) is None
+
+        api_key_cache.set(created.key_value, None)
+        manager.delete_key(created.key_id)
+        assert api_key_cache.get(created.key_value) == (False, None)
+
+
+class TestUsageTracker:
+    """API Key 使用统计批量写回测试类"""
+
+    @pytest.fixture
+    def usage_db(self, tmp_path):
+        """临时数据库及一条 API Key"""
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from app.database import Base
+        from app.models.api_key import APIKeyDB
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'usage.db'}")
+        Base.metadata.create_all(bind=engine)
+        session = sessionmaker(bind=engine)()
+        session.add(APIKeyDB(key_id="key_usage", key_value="fg_usage", source_path="test", usage_count=5))
+        session.commit()
+        yield engine, session
+        session.close()
+        engine.dispose()
+
+    def test_flush_accumulates_into_one_update(self, usage_db):
+        """测试多次调用累加后一次写回"""
+        from app.models.api_key import APIKeyDB
+        from app.services.usage_tracker import UsageTracker
+
+        engine, session = usage_db
+        tracker = UsageTracker(flush_interval_ms=60000, flush_max_hits=1000, bind=engine)
+        for _ in range(3):
+            tracker.record("fg_usage")
+        tracker.record("fg_unknown")
+
+        assert tracker.flush() == 2
+        assert tracker.flush() == 0
+
+        db_key = session.query(APIKeyDB).filter(APIKeyDB.key_value == "fg_usage").one()
+        session.refresh(db_key)
+        assert db_key.usage_count == 8
+        assert db_key.last_used_at is not None
+
+    @pytest.mark.asyncio
+    async def test_background_flush_on_max_hits_and_stop(self, usage_db):
+        """测试达到次数阈值时后台写回，停止时写回剩余计数"""
+        from app.models.api_key import APIKeyDB
+        from app.services.usage_tracker import UsageTracker
+
+        engine, session = usage_db
+        tracker = UsageTracker(flush_interval_ms=60000, flush_max_hits=2, bind=engine)
+        tracker.start()
+        assert tracker.running
+
+        tracker.record("fg_usage")
+        tracker.record("fg_usage")
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if not tracker._pending:
+                break
+        assert not tracker._pending
+
+        tracker.record("fg_usage")
+        await tracker.stop()
+        assert not tracker.running
+
+        db_key = session.query(APIKeyDB).filter(APIKeyDB.key_value == "fg_usage").one()
+        session.refresh(db_key)
+        assert db_key.usage_count == 8
+
+
+class TestAuditPipeline:
+    """审计日志批量写入测试类"""
+
+    @pytest.fixture
+    def audit_engine(self, tmp_path):
+        """临时审计数据库"""
+        from sqlalchemy import create_engine
+        from app.database import Base
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'audit.db'}")
+        Base.metadata.create_all(bind=engine)
+        yield engine
+        engine.dispose()
+
+    @staticmethod
+    def _rows(engine):
+        from sqlalchemy.orm import sessionmaker
+        session = sessionmaker(bind=engine)()
+        try:
+            return session.query(AuditLogDB).order_by(AuditLogDB.request_id).all()
+        finally:
+            session.close()
+
+    @staticmethod
+    def _row(request_id):
+        from app.services.audit_writer import AuditWriter
+        return AuditWriter.build_row({
+            "id": f"log_{request_id}", "request_id": request_id, "method": "POST",
+            "path": "/v1/test", "request_time": datetime.now(), "created_at": datetime.now()
+        })
+
+    @pytest.mark.asyncio
+    async def test_request_lifecycle_writes_single_row(self, audit_engine):
+        """测试开始、首次响应、完成合并为一行写入"""
+        from app.services import audit_service as audit_module
+        from app.services.audit_writer import AuditWriter
+
+        writer = AuditWriter(batch_size=10, linger_ms=5, overflow_policy="drop", bind=audit_engine)
+        with patch.object(audit_module, "audit_writer", writer):
+            service = audit_module.AuditService()
+            writer.start()
+            for index in range(3):
+                request_id = f"req_{index}"
+                await service.log_request_start({
+                    "request_id": request_id, "method": "POST", "path": "/v1/test",
+                    "request_time": datetime.now(), "request_body": {"index": index}
+                })
+                await service.log_first_response(request_id, datetime.now())
+                await service.log_request_complete(request_id, {
+                    "status_code": 200, "response_time": datetime.now(),
+                    "is_stream": True, "stream_chunks": 4, "response_size": 128
+                })
+            await writer.stop()
+
+        rows = self._rows(audit_engine)
+        assert [row.request_id for row in rows] == ["req_0", "req_1", "req_2"]
+        assert all(row.status_code == 200 and row.first_response_time for row in rows)
+        assert rows[0].stream_chunks == 4 and rows[0].response_size == 128
+        assert writer.written == 3
+        assert "req_0" not in audit_module._pending_records
+
+    @pytest.mark.asyncio
+    async def test_error_completion_writes_status(self, audit_engine):
+        """测试上游错误时按错误状态完成审计，而不是留在暂存记录中"""
+        from app.services import audit_service as audit_module
+        from app.services.audit_writer import AuditWriter
+
+        writer = AuditWriter(batch_size=10, linger_ms=5, overflow_policy="drop", bind=audit_engine)
+        with patch.object(audit_module, "audit_writer", writer):
+            service = audit_module.AuditService()
+            writer.start()
+            await service.log_request_start({
+                "request_id": "req_error", "method": "POST", "path": "/v1/test", "request_time": datetime.now()
+            })
+            assert service.is_pending("req_error")
+            await service.log_request_complete("req_error", {
+                "status_code": 503, "response_time": datetime.now(), "error_message": "Upstream circuit open"
+            })
+            assert not service.is_pending("req_error")
+            await writer.stop()
+
+        rows = self._rows(audit_engine)
+        assert rows[0].status_code == 503
+        assert rows[0].error_message == "Upstream circuit open"
+
+    @pytest.mark.asyncio
+    async def test_rate_limited_request_audited(self, audit_engine):
+        """测试被限流的请求在返回 429 之前写入审计记录，error_message 带限流维度"""
+        from fastapi import HTTPException
+        from app.api import proxy as proxy_module
+        from app.services import audit_service as audit_module
+        from app.services.audit_writer import AuditWriter
+        from app.services.rate_limiter import RateLimitResult
+
+        writer = AuditWriter(batch_size=10, linger_ms=5, overflow_policy="drop", bind=audit_engine)
+        limiter = Mock()
+        limiter.check = AsyncMock(return_value=RateLimitResult(False, 10, 0, 30, retry_after=5, scope="api_key"))
+        with patch.object(audit_module, "audit_writer", writer), patch.object(proxy_module, "rate_limiter", limiter):
+            service = audit_module.AuditService()
+            writer.start()
+            with pytest.raises(HTTPException) as exc_info:
+                await proxy_module._check_rate_limit(service, Mock(), {"route_id": "route_limited"}, {
+                    "request_id": "req_limited", "method": "POST", "path": "/v1/test",
+                    "request_time": datetime.now()
+                })
+            assert not service.is_pending("req_limited")
+            await writer.stop()
+
+        assert exc_info.value.status_code == 429
+        assert exc_info.value.headers["X-RateLimit-Scope"] == "api_key"
+        rows = self._rows(audit_engine)
+        assert [(row.request_id, row.status_code) for row in rows] == [("req_limited", 429)]
+        assert rows[0].error_message == "Rate limit exceeded (api_key)"
+
+    @pytest.mark.asyncio
+    async def test_overflow_drop_counts(self, audit_engine):
+        """测试队列满时 drop 策略计数"""
+        from app.services.audit_writer import AuditWriter
+
+        writer = AuditWriter(queue_size=2, batch_size=10, linger_ms=0, overflow_policy="drop", bind=audit_engine)
+        writer.start()
+        for index in range(5):
+            await writer.submit(self._row(f"req_{index}"))
+        assert writer.dropped == 3
+        await writer.stop()
+        assert len(self._rows(audit_engine)) == 2
+
+    @pytest.mark.asyncio
+    async def test_overflow_spill_and_replay(self, audit_engine, tmp_path):
+        """测试队列满时先缓存在内存中，由消费者写入本地文件并在空闲时回放"""
+        from app.services.audit_writer import AuditWriter
+
+        spill_file = str(tmp_path / "spill.jsonl")
+        writer = AuditWriter(queue_size=1, batch_size=10, linger_ms=0, overflow_policy="spill",
+                             spill_file=spill_file, bind=audit_engine)
+        writer.start()
+        with patch.object(writer, "_spill", wraps=writer._spill) as spill:
+            for index in range(4):
+                await writer.submit(self._row(f"req_{index}"))
+            # 请求路径上不写文件
+            assert writer.stats()["spill_pending"] == 3
+            assert not os.path.exists(spill_file)
+
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if writer.spilled == 3:
+                    break
+            assert spill.call_count == 1
+        assert writer.stats()["spill_pending"] == 0
+
+        for _ in range(100):
+            await asyncio.sleep(0.01)
+            if len(self._rows(audit_engine)) == 4:
+                break
+        await writer.stop()
+
+        rows = self._rows(audit_engine)
+        assert [row.request_id for row in rows] == ["req_0", "req_1", "req_2", "req_3"]
+        assert not os.path.exists(spill_file)
+
+    @pytest.mark.asyncio
+    async def test_direct_write_when_not_running(self, audit_engine):
+        """测试写入器未启动时直接写入"""
+        from app.services.audit_writer import AuditWriter
+
+        writer = AuditWriter(bind=audit_engine)
+        await writer.submit(self._row("req_direct"))
+        assert [row.request_id for row in self._rows(audit_engine)] == ["req_direct"]
+
+
+class TestDatabaseMigration:
+    """数据库列迁移测试类"""
+
+    def test_migrate_adds_missing_columns(self, tmp_path):
+        """测试为旧版 proxy_routes 表补齐 stream_mode 列"""
+        from sqlalchemy import create_engine, inspect, text
+        from app.database import migrate_columns, Base
+        from app.models import proxy_route  # noqa: F401
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'legacy.db'}")
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE proxy_routes (route_id VARCHAR(50) PRIMARY KEY, route_name VARCHAR(100), "
+                "match_path VARCHAR(500), target_host VARCHAR(200), target_path VARCHAR(500))"
+            ))
+            conn.execute(text("INSERT INTO proxy_routes VALUES ('r1', 'legacy', '/v1/*', 'h', '/')"))
+
+        added = migrate_columns(engine)
+        assert "proxy_routes.stream_mode" in added
+        assert migrate_columns(engine) == []
+
+        columns = {column["name"] for column in inspect(engine).get_columns("proxy_routes")}
+        assert set(Base.metadata.tables["proxy_routes"].columns.keys()) <= columns
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT stream_mode FROM proxy_routes")).scalar() == "audit"
+        engine.dispose()
+
+
 # 暂时简化其他测试类，先专注于核心功能
 class TestServicesBasic:
     """基础服务测试"""
@@ -0,0 +1,184 @@
+"""
+请求合并测试
+测试合并键规范化与范围隔离、并发请求共享一次上游调用、异常传递、首个请求取消时其余请求不受影响
+以及客户端条件请求头不影响其他合并的请求
+"""
+
+import asyncio
+import os
+import sys
+import httpx
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.single_flight import SingleFlight
+
+
+def make_flight(**overrides):
+    """构造请求合并实例"""
+    config = {"key_scope": "api_key", "max_body_bytes": 1024}
+    config.update(overrides)
+    return SingleFlight(config)
+
+
+class TestCoalesceKey:
+    """合并键测试类"""
+
+    def test_json_body_normalized(self):
+        """测试键顺序和空白不同的 JSON 请求体得到相同的键"""
+        flight = make_flight()
+        first = flight.make_key("post", "r1", "/v1/embeddings",
+                                {"model": "m", "input": ["a", {"x": 1, "y": 2}]}, api_key="k")
+        second = flight.make_key("POST", "r1", "/v1/embeddings",
+                                 {"input": ["a", {"y": 2, "x": 1}], "model": "m"}, api_key="k")
+        assert first == second
+        assert first != flight.make_key("POST", "r1", "/v1/embeddings",
+                                        {"model": "m", "input": ["b"]}, api_key="k")
+        assert first != flight.make_key("POST", "r2", "/v1/embeddings",
+                                        {"model": "m", "input": ["a", {"x": 1, "y": 2}]}, api_key="k")
+
+    def test_key_scope(self):
+        """测试 api_key / source_path / global 三种范围"""
+        by_key = make_flight()
+        assert by_key.make_key("GET", "r", "/v1", None, api_key="a") != \
+            by_key.make_key("GET", "r", "/v1", None, api_key="b")
+
+        by_source = make_flight(key_scope="source_path")
+        assert by_source.make_key("GET", "r", "/v1", None, api_key="a", source_path="s") == \
+            by_source.make_key("GET", "r", "/v1", None, api_key="b", source_path="s")
+
+        shared = make_flight(key_scope="global")
+        assert shared.make_key("GET", "r", "/v1", None, api_key="a", source_path="s1") == \
+            shared.make_key("GET", "r", "/v1", None, api_key="b", source_path="s2")
+
+        with pytest.raises(ValueError):
+            make_flight(key_scope="tenant")
+
+    def test_large_body_not_coalesced(self):
+        """测试请求体超过 max_body_bytes 时不合并"""
+        flight = make_flight()
+        assert flight.make_key("POST", "r", "/v1", b"x" * 2048, body_size=2048) is None
+
+
+class TestSingleFlight:
+    """并发合并测试类"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        """测试并发的相同请求只执行一次上游调用，并记录首个请求ID"""
+        flight = make_flight()
+        calls = []
+        release = asyncio.Event()
+
+        async def fetch():
+            calls.append(1)
+            await release.wait()
+            return b"shared"
+
+        tasks = [asyncio.ensure_future(flight.do("k", f"req_{i}", fetch)) for i in range(3)]
+        await asyncio.sleep(0)
+        assert flight.in_flight == 1
+        release.set()
+        results = await asyncio.gather(*tasks)
+
+        assert len(calls) == 1
+        assert results == [(b"shared", None), (b"shared", "req_0"), (b"shared", "req_0")]
+        assert flight.in_flight == 0
+        assert flight.stats()["coalesced"] == 2
+
+        # 调用结束后相同的键重新发起上游调用
+        release.set()
+        assert await flight.do("k", "req_9", fetch) == (b"shared", None)
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_propagates_to_all(self):
+        """测试上游调用的异常传递给所有等待者"""
+        flight = make_flight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            raise RuntimeError("upstream down")
+
+        tasks = [asyncio.ensure_future(flight.do("k", f"req_{i}", fetch)) for i in range(2)]
+        await asyncio.sleep(0)
+        release.set()
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert flight.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_leader_cancel_does_not_affect_followers(self):
+        """测试首个请求被取消（客户端断开）时，等待中的请求仍拿到结果"""
+        flight = make_flight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "ok"
+
+        leader = asyncio.ensure_future(flight.do("k", "req_0", fetch))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", "req_1", fetch))
+        await asyncio.sleep(0)
+
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        assert await follower == ("ok", "req_0")
+        assert leader.cancelled()
+
+
+class TestCoalescedConditionalRequests:
+    """合并请求的条件请求头测试类"""
+
+    def test_forwarded_validators_in_key(self):
+        """测试转发给上游的条件请求头不同的请求不合并"""
+        flight = make_flight()
+        plain = flight.make_key("GET", "r1", "/v1/models", None, api_key="k")
+        stale = flight.make_key("GET", "r1", "/v1/models", None, api_key="k", vary={"if-none-match": '"v1"'})
+        assert plain != stale
+        assert stale == flight.make_key("GET", "r1", "/v1/models", None, api_key="k",
+                                        vary={"If-None-Match": '"v1"'})
+
+    @pytest.mark.asyncio
+    async def test_leader_validators_not_shared(self):
+        """测试首个请求带 If-None-Match 时，没有校验器的合并请求仍拿到完整的 200 响应"""
+        from app.api.proxy import _shared_response, _strip_conditional_headers
+
+        flight = make_flight()
+        route = {"route_id": "r1"}
+        sent = []
+        release = asyncio.Event()
+
+        def make_fetch(client_headers):
+            async def fetch():
+                upstream_headers = _strip_conditional_headers(client_headers)
+                sent.append(upstream_headers)
+                await release.wait()
+                if upstream_headers.get("if-none-match") == '"v1"':
+                    return httpx.Response(304, headers={"etag": '"v1"'})
+                return httpx.Response(200, headers={"etag": '"v1"'}, content=b'{"data": []}')
+            return fetch
+
+        leader_headers = {"if-none-match": '"v1"', "accept": "application/json"}
+        follower_headers = {"accept": "application/json"}
+        tasks = [asyncio.ensure_future(flight.do("k", f"req_{index}", make_fetch(headers)))
+                 for index, headers in enumerate((leader_headers, follower_headers))]
+        await asyncio.sleep(0)
+        release.set()
+        (leader_response, _), (follower_response, coalesced_with) = await asyncio.gather(*tasks)
+
+        assert sent == [{"accept": "application/json"}]
+        assert coalesced_with == "req_0"
+
+        response, body = _shared_response(route, leader_response, leader_headers)
+        assert response.status_code == 304 and body == b""
+        assert "content-length" not in response.headers
+
+        response, body = _shared_response(route, follower_response, follower_headers)
+        assert response.status_code == 200 and body is None
+        assert response.content == b'{"data": []}'
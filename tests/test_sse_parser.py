@@ -0,0 +1,160 @@
+"""
+SSE 增量解析测试
+测试跨 chunk 边界的事件解析、换行符处理以及 OpenAI 流式 completion 的增量合并
+"""
+
+import os
+import sys
+import json
+import pytest
+import httpx
+from unittest.mock import AsyncMock
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.sse_parser import SSEParser, OpenAIStreamAccumulator
+
+
+def build_openai_stream(contents, usage=None, newline="\n"):
+    """构建 OpenAI 格式的 SSE 字节流"""
+    events = []
+    for index, content in enumerate(contents):
+        delta = {"content": content}
+        if index == 0:
+            delta["role"] = "assistant"
+        chunk = {
+            "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 1700000000,
+            "model": "test-model",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}]
+        }
+        events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}{newline}{newline}")
+    final = {
+        "id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 1700000000,
+        "model": "test-model", "choices": [{"index": 0, "delta": {}, "finish_reason": "length"}]
+    }
+    if usage:
+        final["usage"] = usage
+    events.append(f"data: {json.dumps(final)}{newline}{newline}")
+    events.append(f"data: [DONE]{newline}{newline}")
+    return "".join(events).encode("utf-8")
+
+
+def parse_in_pieces(payload: bytes, size: int):
+    """按固定大小切分后逐段解析"""
+    parser = SSEParser()
+    events = []
+    for start in range(0, len(payload), size):
+        events.extend(parser.feed(payload[start:start + size]))
+    events.extend(parser.flush())
+    return [(event.event, event.data, event.id) for event in events]
+
+
+class TestSSEParser:
+    """SSE 解析器测试类"""
+
+    def test_events_split_at_every_boundary(self):
+        """测试任意切分位置下结果一致（含多字节字符被切开）"""
+        payload = build_openai_stream(["你好", "，世界", " hello"])
+        expected = parse_in_pieces(payload, len(payload))
+        assert len(expected) == 5
+        for size in range(1, 40):
+            assert parse_in_pieces(payload, size) == expected
+
+    @pytest.mark.parametrize("newline", ["\r\n", "\r"])
+    def test_crlf_and_cr_line_endings(self, newline):
+        """测试 CRLF 与 CR 换行（包括 \\r 与 \\n 落在不同 chunk）"""
+        expected = parse_in_pieces(build_openai_stream(["a", "b"]), 1024)
+        payload = build_openai_stream(["a", "b"], newline=newline)
+        for size in (1, 2, 3, 7, len(payload)):
+            assert parse_in_pieces(payload, size) == expected
+
+    def test_multiline_data_comments_and_fields(self):
+        """测试多行 data、注释行、event/id 字段"""
+        payload = b": keep-alive\n\nevent: message\nid: 7\ndata: line1\ndata:line2\n\ndata: tail"
+        assert parse_in_pieces(payload, 5) == [
+            ("message", "line1\nline2", "7"),
+            (None, "tail", "7"),
+        ]
+
+    def test_oversized_line_is_dropped(self):
+        """测试超长行被丢弃而不是无限缓冲"""
+        parser = SSEParser(max_line_bytes=16)
+        assert parser.feed(b"data: " + b"x" * 64) == []
+        assert parser.dropped_lines == 1
+        events = parser.feed(b"\ndata: ok\n\n")
+        assert [event.data for event in events] == ["ok"]
+
+
+class TestOpenAIStreamAccumulator:
+    """OpenAI 流式合并测试类"""
+
+    def test_merge_with_real_usage(self):
+        """测试合并 content/role/finish_reason 并使用上游真实 usage"""
+        usage = {"prompt_tokens": 3, "completion_tokens": 5, "total_tokens": 8}
+        parser = SSEParser()
+        accumulator = OpenAIStreamAccumulator()
+        accumulator.add_events(parser.feed(build_openai_stream(["Hello", " world"], usage=usage)))
+        accumulator.add_events(parser.flush())
+
+        result = accumulator.result()
+        assert accumulator.done
+        assert result["content"] == "Hello world"
+        assert result["role"] == "assistant"
+        assert result["finish_reason"] == "length"
+        assert result["full_response"]["id"] == "chatcmpl-1"
+        assert result["full_response"]["model"] == "test-model"
+        assert result["full_response"]["usage"] == usage
+
+    def test_estimated_usage_and_invalid_chunks(self):
+        """测试无 usage 时估算，非法 JSON 被跳过"""
+        accumulator = OpenAIStreamAccumulator()
+        parser = SSEParser()
+        accumulator.add_events(parser.feed(b"data: {not json}\n\n" + build_openai_stream(["one two", " three"])))
+
+        result = accumulator.result()
+        assert accumulator.parse_errors == 1
+        assert result["content"] == "one two three"
+        assert result["full_response"]["usage"]["completion_tokens"] == 3
+
+    def test_merge_across_split_chunks(self):
+        """测试网络分块在任意位置切分时的合并结果"""
+        payload = build_openai_stream(["foo", "bar"])
+        parser = SSEParser()
+        accumulator = OpenAIStreamAccumulator()
+        for i in range(0, len(payload), 10):
+            accumulator.add_events(parser.feed(payload[i:i + 10]))
+        accumulator.add_events(parser.flush())
+
+        result = accumulator.result()
+        assert result["content"] == "foobar"
+        assert result["finish_reason"] == "length"
+
+    @pytest.mark.asyncio
+    async def test_stream_request_audits_merged_response(self):
+        """测试流式转发过程中增量合并并记录审计"""
+        from app.services.proxy_engine import ProxyEngine
+
+        payload = build_openai_stream(["流式", "响应"])
+
+        async def handler(request):
+            return httpx.Response(200, headers={"content-type": "text/event-stream"}, content=payload)
+
+        engine = ProxyEngine()
+        await engine.client.aclose()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        audit_service = AsyncMock()
+
+        response = await engine.forward_stream_request(
+            route_config={"timeout": 5}, method="POST", url="http://upstream.local/v1/chat/completions",
+            headers={}, json={"stream": True}, audit_service=audit_service, request_id="req_sse"
+        )
+        body = b"".join([chunk async for chunk in response.body_iterator])
+        await engine.close()
+
+        assert body == payload
+        audit_service.log_request_complete.assert_awaited_once()
+        request_id, response_info = audit_service.log_request_complete.await_args.args
+        assert request_id == "req_sse"
+        assert response_info["response_body"]["content"] == "流式响应"
+        assert response_info["response_size"] == len(payload)
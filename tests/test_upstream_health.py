@@ -0,0 +1,173 @@
+"""
+上游健康检查测试
+测试连续失败摘除、指数退避、到期恢复、主动探测阈值以及负载均衡跳过不可用目标
+"""
+
+import os
+import sys
+import httpx
+import pytest
+
+# 添加项目根目录到Python路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services import load_balancer as load_balancer_module
+from app.services.load_balancer import LoadBalancer, parse_targets
+from app.services.upstream_health import UpstreamHealth
+
+
+def make_health(**active):
+    """构造健康检查实例（3 次连续失败摘除 10 秒，最长 40 秒）"""
+    return UpstreamHealth({
+        "passive": {"enabled": True, "consecutive_failures": 3,
+                    "base_ejection_seconds": 10, "max_ejection_seconds": 40},
+        "active": {"enabled": False, "healthy_threshold": 2, "unhealthy_threshold": 2, **active},
+    })
+
+
+@pytest.fixture
+def health(monkeypatch):
+    """替换负载均衡与代理引擎使用的全局健康状态"""
+    from app.services import proxy_engine as proxy_engine_module
+
+    instance = make_health()
+    monkeypatch.setattr(load_balancer_module, "upstream_health", instance)
+    monkeypatch.setattr(proxy_engine_module, "upstream_health", instance)
+    return instance
+
+
+class TestPassiveEjection:
+    """被动摘除测试类"""
+
+    def test_eject_after_consecutive_failures(self):
+        """测试连续失败达到阈值时摘除，中间有成功则重新计数"""
+        health = make_health()
+        health.record_failure("a:1", "ConnectError", now=0)
+        health.record_failure("a:1", "status_502", now=0)
+        health.record_success("a:1")
+        assert not health.record_failure("a:1", "status_503", now=1)
+        assert not health.record_failure("a:1", "status_503", now=1)
+        assert health.record_failure("a:1", "ReadTimeout", now=1)
+        assert health.unavailable(now=5) == {"a:1"}
+        assert health.is_available("a:1", now=11)
+
+    def test_ejection_backoff_grows_and_resets(self):
+        """测试摘除时长指数增长并受上限约束，恢复后成功则重新计算"""
+        health = make_health()
+        now = 0
+        durations = []
+        for _ in range(4):
+            for _ in range(3):
+                health.record_failure("a:1", "status_500", now=now)
+            until = health._hosts["a:1"].ejected_until
+            durations.append(until - now)
+            now = until
+            health.unavailable(now=now)
+        assert durations == [10, 20, 40, 40]
+
+        health.record_success("a:1")
+        for _ in range(3):
+            health.record_failure("a:1", "status_500", now=now)
+        assert health._hosts["a:1"].ejected_until - now == 10
+
+    def test_passive_disabled(self):
+        """测试关闭被动检测时不摘除"""
+        health = UpstreamHealth({"passive": {"enabled": False}})
+        for _ in range(10):
+            assert not health.record_failure("a:1", "status_500")
+        assert health.unavailable() == set()
+
+
+class TestActiveProbe:
+    """主动探测测试类"""
+
+    @pytest.mark.asyncio
+    async def test_probe_thresholds(self):
+        """测试连续探测失败标记不健康，连续成功后恢复"""
+        health = make_health()
+        status = {"code": 503}
+        health._client = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(status["code"]))
+        )
+
+        await health.probe("http", "a:1")
+        assert health.is_available("a:1")
+        await health.probe("http", "a:1")
+        assert not health.is_available("a:1")
+        assert health.stats()["hosts"][0]["last_error"] == "status_503"
+
+        status["code"] = 200
+        await health.probe("http", "a:1")
+        assert not health.is_available("a:1")
+        await health.probe("http", "a:1")
+        assert health.is_available("a:1")
+        await health.stop()
+
+    @pytest.mark.asyncio
+    async def test_prober_runs_against_provider(self):
+        """测试后台任务按提供的目标探测，停止后关闭客户端"""
+        import asyncio
+
+        health = make_health(enabled=True, interval_seconds=0.01, path="/healthz")
+        probed = []
+
+        async def provider():
+            return [("http", "a:1"), ("http", "b:1")]
+
+        async def fake_probe(protocol, host):
+            probed.append(f"{protocol}://{host}{health.probe_path}")
+
+        health.probe = fake_probe
+        health.start(provider)
+        await asyncio.sleep(0.05)
+        assert health.running
+        await health.stop()
+        assert not health.running and health._client is None
+        assert {"http://a:1/healthz", "http://b:1/healthz"} <= set(probed)
+
+
+class TestBalancerIntegration:
+    """负载均衡跳过不可用目标测试类"""
+
+    def test_skips_ejected_targets(self, health):
+        """测试被摘除的目标不参与选择，全部不可用时仍然转发"""
+        balancer = LoadBalancer()
+        hosts = ["a:1", "b:1", "c:1"]
+        route = {"route_id": "r", "target_host": "a:1", "target_hosts": hosts,
+                 "lb_strategy": "round_robin", "_upstreams": parse_targets(hosts)}
+
+        for _ in range(3):
+            health.record_failure("b:1", "status_500")
+        assert {balancer.select(route) for _ in range(20)} == {"a:1", "c:1"}
+
+        for host in ("a:1", "c:1"):
+            for _ in range(3):
+                health.record_failure(host, "ConnectError")
+        assert {balancer.select(route) for _ in range(20)} == set(hosts)
+
+    @pytest.mark.asyncio
+    async def test_forward_request_reports_failures(self, health):
+        """测试代理引擎上报 5xx 和连接错误，摘除后不再选中该目标"""
+        from app.services.proxy_engine import ProxyEngine
+
+        def handler(request):
+            if request.url.host == "sick":
+                return httpx.Response(503)
+            return httpx.Response(200)
+
+        engine = ProxyEngine()
+        engine.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        hosts = ["sick:8001", "well:8001"]
+        route = {"route_id": "route_health", "target_host": "sick:8001", "target_hosts": hosts,
+                 "target_path": "/v1", "match_path": "/v1", "lb_strategy": "round_robin",
+                 "_upstreams": parse_targets(hosts), "retry_count": 0}
+
+        for _ in range(6):
+            url = engine.build_target_url(route, "/v1")
+            await engine.forward_request(route, "GET", url, headers={})
+
+        assert health.unavailable() == {"sick:8001"}
+        stats = {entry["host"]: entry for entry in health.stats()["hosts"]}
+        assert stats["sick:8001"]["ejected"] and stats["sick:8001"]["total_failures"] == 3
+        assert {engine.build_target_url(route, "/v1") for _ in range(5)} == {"http://well:8001/v1"}
+        await engine.close()